@@ -44,6 +44,14 @@ async def health_check():
     )
 
 
+@router.get("/scheduler")
+async def scheduler_status():
+    """后台任务调度状态：本 worker 是否 leader、下次运行时间、上次耗时 / 结果、跳过与错过次数"""
+    from app.core.leader import elector
+    from app.core.scheduler import scheduler
+    return {**elector.status(), "jobs": scheduler.status()}
+
+
 @router.post("/analyze/stream")
 async def analyze_stream(request: AnalyzeRequest):
     """分析加密货币（流式）"""
@@ -56,11 +64,12 @@ async def analyze_stream(request: AnalyzeRequest):
         try:
             yield render(sse_start(rid, request.conversation_id))
 
-            with Timer(rid, "agent.answer"):
+            with Timer(rid, "agent.answer") as t:
                 async for chunk in crypto_agent.answer(
                     request.message, mode="think",
                     conversation_id=request.conversation_id
                 ):
+                    t.mark("first_chunk")
                     if isinstance(chunk, dict):
                         chunk_type = chunk.get("type", "")
                         if chunk_type == "signal_card":
@@ -98,11 +107,12 @@ async def chat_stream(request: ChatRequest):
         try:
             yield render(sse_start(rid, request.conversation_id))
 
-            with Timer(rid, "agent.answer"):
+            with Timer(rid, "agent.answer") as t:
                 async for chunk in crypto_agent.answer(
                     request.message, mode="chat",
                     conversation_id=request.conversation_id
                 ):
+                    t.mark("first_chunk")
                     if isinstance(chunk, dict):
                         chunk_type = chunk.get("type", "")
                         if chunk_type == "signal_card":
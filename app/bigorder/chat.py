@@ -13,6 +13,7 @@ import app.bigorder.deps as bigorder_deps
 from app.core.llm_client import get_llm_client
 from config.settings import settings
 from app.utils.chat_trace import trace, Timer, mask
+from app.utils.metrics import instrument_connection
 from app.utils.sse_protocol import (
     sse_start, sse_chat_delta, sse_suggestions,
     sse_tool_debug, sse_done, sse_error, render,
@@ -471,12 +472,12 @@ def _query_history(coin: Optional[str], days: int, level: Optional[str], limit:
     conn = None
     try:
         mysql_cfg = _get_bigorder_mysql_config()
-        conn = pymysql.connect(
+        conn = instrument_connection(lambda: pymysql.connect(
             host=mysql_cfg["host"], port=mysql_cfg["port"],
             user=mysql_cfg["user"], password=mysql_cfg["password"],
             database=mysql_cfg["database"], charset="utf8mb4",
             connect_timeout=5, read_timeout=10
-        )
+        ), "bigorder")
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         sql = "SELECT * FROM anomaly_history WHERE 1=1"
         params = []
@@ -645,7 +646,7 @@ async def chat(request: ChatRequest):
         ]
 
         try:
-            with Timer(rid, "step3.llm_stream"):
+            with Timer(rid, "step3.llm_stream") as t:
                 final_resp = await client.chat.completions.create(
                     model=model,
                     messages=messages,
@@ -657,6 +658,7 @@ async def chat(request: ChatRequest):
                     delta = chunk.choices[0].delta
                     if delta.content:
                         chunk_n += 1
+                        t.mark("first_token")
                         yield render(sse_chat_delta(rid, delta.content))
             trace(rid, "step3.done", chunks=chunk_n)
         except Exception as e:
@@ -186,6 +186,19 @@ class RedisConsumer:
 
         return {k: v for k, v in grouped.items() if v[0] or v[1]}
 
+    def count_ticks(self, base: str, from_ms: int, to_ms: Optional[int] = None) -> int:
+        """所有交易所 buy+sell 在 [from_ms, to_ms] 内的成交笔数（ZCOUNT，不解析成员）"""
+        to_ms = to_ms if to_ms is not None else int(time.time() * 1000)
+        pipe = self.client.pipeline()
+        for exchange in settings.exchanges:
+            for side in ("buy", "sell"):
+                pipe.zcount(self._build_key(exchange, base, side), from_ms, to_ms)
+        try:
+            return sum(int(n or 0) for n in pipe.execute())
+        except Exception as e:
+            logger.error(f"pipeline 计数失败: {e}")
+            return 0
+
     def ping(self) -> bool:
         """检查 Redis 连接"""
         try:
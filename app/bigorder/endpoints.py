@@ -11,6 +11,7 @@ import app.bigorder.deps as bigorder_deps
 from app.bigorder.models import AnomalySignal, SignalLevel
 from config.settings import settings
 from app.utils.logger import get_logger
+from app.utils.metrics import instrument_connection
 
 logger = get_logger("app.bigorder.endpoints")
 
@@ -128,55 +129,97 @@ async def get_large_orders(
 # ----------------------------------------------------------------
 # 5. search_history: 历史异动记录
 # ----------------------------------------------------------------
+# anomaly_history 全部列（默认全返回，与原 SELECT * 一致；fields 可收窄，如去掉 llm_analysis）
+_HISTORY_COLUMNS = (
+    "id", "coin", "exchange", "total_score", "level", "net_flow_score", "density_score",
+    "ratio_score", "price_score", "buy_amount", "sell_amount", "net_flow", "price_change_pct",
+    "llm_analysis", "timestamp", "created_at",
+)
+
+
+def _history_conn(read_timeout: int = 10):
+    import pymysql
+    mysql_cfg = _get_bigorder_mysql_config()
+    return instrument_connection(lambda: pymysql.connect(
+        host=mysql_cfg["host"],
+        port=mysql_cfg["port"],
+        user=mysql_cfg["user"],
+        password=mysql_cfg["password"],
+        database=mysql_cfg["database"],
+        charset="utf8mb4",
+        connect_timeout=5,
+        read_timeout=read_timeout
+    ), "bigorder")
+
+
 @router.get("/history")
 async def search_history(
     coin: Optional[str] = Query(None),
     days: int = Query(7, le=30),
     level: Optional[str] = Query(None),
-    limit: int = Query(100, le=500)
+    limit: int = Query(100, le=500),
+    cursor: Optional[str] = Query(None, description="翻页游标（上一页返回的 next_cursor）"),
+    fields: Optional[str] = Query(None, description="返回列，逗号分隔；默认全部列"),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="ndjson=流式导出全部匹配记录"),
 ):
-    """查询历史异动记录（使用 bigorder 专属 MySQL 配置）"""
-    import pymysql
-    conn = None
+    """查询历史异动记录（使用 bigorder 专属 MySQL 配置）
+
+    按 (created_at, id) 倒序 keyset 分页，next_cursor 为 null 表示末页；
+    format=ndjson 时忽略 limit，服务端游标逐行流式输出。
+    """
+    from app.utils import keyset
     try:
-        mysql_cfg = _get_bigorder_mysql_config()
-        conn = pymysql.connect(
-            host=mysql_cfg["host"],
-            port=mysql_cfg["port"],
-            user=mysql_cfg["user"],
-            password=mysql_cfg["password"],
-            database=mysql_cfg["database"],
-            charset="utf8mb4",
-            connect_timeout=5,
-            read_timeout=10
+        selected = keyset.parse_fields(fields, _HISTORY_COLUMNS, _HISTORY_COLUMNS)
+        cursor_sql, cursor_params = keyset.keyset_where(cursor)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"count": 0, "data": [], "error": str(e)})
+
+    columns = list(dict.fromkeys(["id", "created_at", *selected]))
+    sql = f"SELECT {', '.join(columns)} FROM anomaly_history WHERE 1=1"
+    params = []
+
+    if coin:
+        sql += " AND coin = %s"
+        params.append(coin.upper())
+    if level:
+        sql += " AND level = %s"
+        params.append(level)
+    if days:
+        sql += " AND created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)"
+        params.append(days)
+    if cursor_sql:
+        sql += f" AND {cursor_sql}"
+        params.extend(cursor_params)
+
+    sql += " ORDER BY created_at DESC, id DESC"
+
+    def _project(row: dict) -> dict:
+        return {c: row[c] for c in selected}
+
+    if format == "ndjson":
+        return keyset.NDJSONResponse(
+            keyset.stream_ndjson(lambda: _history_conn(read_timeout=60), sql, params, _project),
         )
-        cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-        sql = "SELECT * FROM anomaly_history WHERE 1=1"
-        params = []
-
-        if coin:
-            sql += " AND coin = %s"
-            params.append(coin.upper())
-        if level:
-            sql += " AND level = %s"
-            params.append(level)
-        if days:
-            sql += " AND created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)"
-            params.append(days)
-
-        sql += " ORDER BY timestamp DESC LIMIT %s"
-        params.append(limit)
-
-        cursor.execute(sql, params)
-        rows = cursor.fetchall()
-        cursor.close()
-        return {"count": len(rows), "data": rows}
+
+    def _query():
+        import pymysql.cursors
+        conn = None
+        try:
+            conn = _history_conn()
+            cur = conn.cursor(pymysql.cursors.DictCursor)
+            cur.execute(sql + " LIMIT %s", params + [limit])
+            rows = cur.fetchall()
+            cur.close()
+            return {"count": len(rows), "data": [_project(r) for r in rows],
+                    "next_cursor": keyset.next_cursor(rows, limit)}
+        finally:
+            if conn:
+                conn.close()
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, _query)
     except Exception as e:
         return JSONResponse(status_code=500, content={"count": 0, "data": [], "error": str(e)})
-    finally:
-        if conn:
-            conn.close()
 
 
 # ----------------------------------------------------------------
@@ -201,16 +244,16 @@ async def manual_scan(coins: Optional[List[str]] = None):
     signals = await asyncio.get_running_loop().run_in_executor(
         None, bigorder_deps.scorer.score_all, coins
     )
+    active = [s for s in signals if s.score.level != SignalLevel.NONE]
+    try:
+        await bigorder_deps.llm_analyzer.enrich_many(active)
+    except Exception as e:
+        logger.warning(f"手动扫描 LLM 批量解读异常: {e}")
     enriched = []
-    for signal in signals:
-        if signal.score.level != SignalLevel.NONE:
-            try:
-                signal = await bigorder_deps.llm_analyzer.analyze_and_enrich(signal)
-            except Exception:
-                pass
-            d = signal.model_dump()
-            d.pop("timestamp", None)
-            enriched.append(d)
+    for signal in active:
+        d = signal.model_dump()
+        d.pop("timestamp", None)
+        enriched.append(d)
 
     await _save_to_mysql([s for s in signals if s.score.level == SignalLevel.STRONG])
 
@@ -283,7 +326,7 @@ async def _save_to_mysql(signals: List[AnomalySignal]):
     conn = None
     try:
         mysql_cfg = _get_bigorder_mysql_config()
-        conn = pymysql.connect(
+        conn = instrument_connection(lambda: pymysql.connect(
             host=mysql_cfg["host"],
             port=mysql_cfg["port"],
             user=mysql_cfg["user"],
@@ -291,7 +334,7 @@ async def _save_to_mysql(signals: List[AnomalySignal]):
             database=mysql_cfg["database"],
             charset="utf8mb4",
             connect_timeout=5
-        )
+        ), "bigorder")
         cursor = conn.cursor()
         for s in signals:
             cursor.execute(
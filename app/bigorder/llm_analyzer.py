@@ -1,7 +1,10 @@
 """LLM 智能分析 - 异动信号解读"""
+import re
 import json
+import time
 import asyncio
-from typing import Optional
+import hashlib
+from typing import Dict, List, Optional, Tuple
 from openai import AsyncOpenAI
 from app.bigorder.models import AnomalySignal, SignalLevel
 from app.core.llm_client import get_llm_client
@@ -10,6 +13,11 @@ from app.utils.logger import get_logger
 
 logger = get_logger("app.bigorder.llm_analyzer")
 
+# 缓存 key 中四维得分的取整粒度（分）
+_SCORE_BUCKET = 5
+_CACHE_MAX_ENTRIES = 2000
+_BATCH_MARKER = re.compile(r"^\s*=+\s*SIGNAL\s+(\d+)\s*=+\s*$", re.MULTILINE | re.IGNORECASE)
+
 
 class LLMAnalyzer:
     """调用 DeepSeek 对异动信号生成智能解读"""
@@ -18,6 +26,8 @@ class LLMAnalyzer:
         # 使用共享 LLM 客户端，但模型用 bigorder 专属配置
         self.client = get_llm_client()
         self.model = settings.bigorder_deepseek_model
+        # 内容寻址缓存 {cache_key: (llm_analysis, expires_at)}
+        self._cache: Dict[str, Tuple[str, float]] = {}
 
     def _get_prompt(self, lang: str = "zh") -> str:
         if lang == "en":
@@ -60,11 +70,9 @@ Keep under 200 words. Do not mention other coins. Do not fabricate data."""
 
 总字数 200 字以内。禁止提及其他币种。禁止编造数据。"""
 
-    async def analyze(self, signal: AnomalySignal, lang: str = "zh") -> str:
-        """对信号生成 LLM 解读"""
+    def _build_summary(self, signal: AnomalySignal, lang: str = "zh") -> Tuple[dict, str]:
+        """构造喂给 LLM 的信号摘要，返回 (summary, level_text)"""
         s = signal.score
-        prompt_template = self._get_prompt(lang)
-
         if lang == "en":
             summary = {
                 "coin": signal.coin,
@@ -101,30 +109,244 @@ Keep under 200 words. Do not mention other coins. Do not fabricate data."""
                 ]
             }
             level_text = "强烈" if s.level == SignalLevel.STRONG else "中等"
+        return summary, level_text
+
+    def _fallback_text(self, signal: AnomalySignal, lang: str = "zh") -> str:
+        if lang == "en":
+            return f"⚠️ LLM analysis unavailable ({signal.coin} total score: {signal.score.total_score})"
+        return f"⚠️ LLM解读暂不可用（{signal.coin} 综合得分{signal.score.total_score}）"
+
+    def cache_key(self, signal: AnomalySignal, lang: str = "zh") -> str:
+        """内容寻址 key：币种 + 交易所 + 等级 + 取整后的四维得分。
+
+        分数按 _SCORE_BUCKET 取整，小幅抖动落在同一个 key 上，不会重复请求 LLM。
+        """
+        s = signal.score
+
+        def _r(v: float) -> int:
+            return int(round(v / _SCORE_BUCKET) * _SCORE_BUCKET)
+
+        raw = "|".join(str(x) for x in (
+            lang, signal.coin, signal.exchange, s.level.value, _r(s.total_score),
+            _r(s.net_flow.score), _r(s.density.score), _r(s.ratio.score), _r(s.price_change.score),
+            1 if signal.net_flow >= 0 else -1,
+        ))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        hit = self._cache.get(key)
+        if not hit:
+            return None
+        text, expires_at = hit
+        if time.time() > expires_at:
+            self._cache.pop(key, None)
+            return None
+        return text
+
+    def _cache_put(self, key: str, text: str):
+        if len(self._cache) >= _CACHE_MAX_ENTRIES:
+            # 先清过期，仍超限则丢最早写入的一半
+            now = time.time()
+            for k in [k for k, (_, exp) in self._cache.items() if exp < now]:
+                self._cache.pop(k, None)
+            if len(self._cache) >= _CACHE_MAX_ENTRIES:
+                for k in list(self._cache.keys())[:_CACHE_MAX_ENTRIES // 2]:
+                    self._cache.pop(k, None)
+        self._cache[key] = (text, time.time() + settings.bigorder_llm_cache_ttl)
+
+    async def _complete(self, prompt: str, max_tokens: int = 500) -> str:
+        """单次 LLM 调用，失败直接抛出由调用方决定兜底"""
+        response = await asyncio.wait_for(
+            self.client.chat.completions.create(
+                model=self.model,
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}]
+            ),
+            timeout=30.0
+        )
+        return response.choices[0].message.content.strip()
 
-        prompt = prompt_template.format(
+    async def analyze(self, signal: AnomalySignal, lang: str = "zh") -> str:
+        """对信号生成 LLM 解读（命中缓存时不请求 LLM）"""
+        key = self.cache_key(signal, lang)
+        cached = self._cache_get(key)
+        if cached:
+            return cached
+
+        summary, level_text = self._build_summary(signal, lang)
+        prompt = self._get_prompt(lang).format(
             signal_data=json.dumps(summary, ensure_ascii=False, indent=2),
             coin=signal.coin,
             level=level_text
         )
 
         try:
-            response = await asyncio.wait_for(
-                self.client.chat.completions.create(
-                    model=self.model,
-                    max_tokens=500,
-                    messages=[{"role": "user", "content": prompt}]
-                ),
-                timeout=30.0
-            )
-            return response.choices[0].message.content.strip()
+            text = await self._complete(prompt)
         except Exception as e:
             logger.error(f"LLM 分析失败: {e}")
-            if lang == "en":
-                return f"⚠️ LLM analysis unavailable ({signal.coin} total score: {s.total_score})"
-            return f"⚠️ LLM解读暂不可用（{signal.coin} 综合得分{s.total_score}）"
+            return self._fallback_text(signal, lang)
+        if text:
+            self._cache_put(key, text)
+        return text
 
     async def analyze_and_enrich(self, signal: AnomalySignal, lang: str = "zh") -> AnomalySignal:
         """分析并回填到 signal"""
         signal.llm_analysis = await self.analyze(signal, lang=lang)
         return signal
+
+    # ================================================================
+    # 批量解读：有界并发 + 缓存去重 + 可选多信号合并 prompt
+    # ================================================================
+
+    def _get_batch_prompt(self, lang: str = "zh") -> str:
+        if lang == "en":
+            return """You are a cryptocurrency large-trade anomaly analysis expert. Interpret EACH of the following {n} anomaly signals independently.
+
+Signals (JSON array, "idx" identifies each signal):
+{signal_data}
+
+For every signal output exactly one block, starting with its own marker line `=== SIGNAL <idx> ===`, in this format:
+=== SIGNAL <idx> ===
+🔴/🟡 【<coin> <level> Signal】
+📊 Direction: ...
+🔍 Analysis: ...
+⚡ Impact: ...
+💡 Advice: ...
+
+Each block under 200 words. Never mix data between signals. Do not fabricate data."""
+        return """你是加密货币大单异动分析专家。请对以下 {n} 个异动信号分别独立解读。
+
+信号数据（JSON 数组，idx 为信号编号）：
+{signal_data}
+
+每个信号输出一个独立段落，段落第一行必须是标记行 `=== SIGNAL <idx> ===`，格式：
+=== SIGNAL <idx> ===
+🔴/🟡 【<币种> <等级>信号】
+📊 方向：...
+🔍 分析：...
+⚡ 影响：...
+💡 建议：...
+
+每段 200 字以内。禁止混用不同信号的数据。禁止编造数据。"""
+
+    @staticmethod
+    def _parse_batch_output(text: str, n: int) -> Dict[int, str]:
+        """按 `=== SIGNAL <idx> ===` 标记切分批量输出，返回 {idx: 解读}"""
+        parts = _BATCH_MARKER.split(text or "")
+        result: Dict[int, str] = {}
+        # split 结果: [前导文本, idx1, body1, idx2, body2, ...]
+        for i in range(1, len(parts) - 1, 2):
+            try:
+                idx = int(parts[i])
+            except ValueError:
+                continue
+            body = parts[i + 1].strip()
+            if 0 <= idx < n and body and idx not in result:
+                result[idx] = body
+        return result
+
+    async def analyze_batch(self, signals: List[AnomalySignal], lang: str = "zh") -> List[str]:
+        """多个信号合并为一次 LLM 调用；解析缺失的信号逐个回退到单条 analyze"""
+        if len(signals) == 1:
+            return [await self.analyze(signals[0], lang=lang)]
+
+        items = []
+        for idx, signal in enumerate(signals):
+            summary, _ = self._build_summary(signal, lang)
+            items.append({"idx": idx, **summary})
+        prompt = self._get_batch_prompt(lang).format(
+            n=len(signals),
+            signal_data=json.dumps(items, ensure_ascii=False, indent=2),
+        )
+
+        parsed: Dict[int, str] = {}
+        try:
+            text = await self._complete(prompt, max_tokens=min(500 * len(signals), 4000))
+            parsed = self._parse_batch_output(text, len(signals))
+        except Exception as e:
+            logger.warning(f"LLM 批量分析失败，回退逐条: {e}")
+
+        results: List[Optional[str]] = [None] * len(signals)
+        for idx, signal in enumerate(signals):
+            if idx in parsed:
+                results[idx] = parsed[idx]
+                self._cache_put(self.cache_key(signal, lang), parsed[idx])
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            logger.info(f"LLM 批量输出缺失 {len(missing)}/{len(signals)} 条，逐条补齐")
+            fills = await asyncio.gather(*(self.analyze(signals[i], lang=lang) for i in missing))
+            for i, text in zip(missing, fills):
+                results[i] = text
+        return results
+
+    async def enrich_many(
+        self,
+        signals: List[AnomalySignal],
+        lang: str = "zh",
+        concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> List[AnomalySignal]:
+        """批量回填 llm_analysis。
+
+        - 同一内容 key 在本批内只请求一次，已缓存的直接回填
+        - 未命中的按 batch_size 分组（<=1 表示逐条），最多 concurrency 组并发
+        - 单组失败只影响本组，返回兜底文案
+        - 全部分组（含批量失败后的逐条补齐）共用一个 deadline（默认 BIGORDER_LLM_DEADLINE），
+          到时未完成的分组取消并回填兜底文案，不会拖住下一轮大单扫描
+        """
+        if not signals:
+            return signals
+        concurrency = max(1, concurrency or settings.bigorder_llm_concurrency)
+        batch_size = settings.bigorder_llm_batch_size if batch_size is None else batch_size
+        deadline = settings.bigorder_llm_deadline if deadline is None else deadline
+
+        by_key: Dict[str, List[AnomalySignal]] = {}
+        hits = 0
+        for signal in signals:
+            key = self.cache_key(signal, lang)
+            cached = self._cache_get(key)
+            if cached:
+                signal.llm_analysis = cached
+                hits += 1
+                continue
+            by_key.setdefault(key, []).append(signal)
+
+        if by_key:
+            todo = [group[0] for group in by_key.values()]
+            size = max(1, batch_size or 1)
+            chunks = [todo[i:i + size] for i in range(0, len(todo), size)]
+            sem = asyncio.Semaphore(concurrency)
+
+            outputs: List[Optional[List[str]]] = [None] * len(chunks)
+
+            async def _run(i: int, chunk: List[AnomalySignal]):
+                async with sem:
+                    try:
+                        if len(chunk) == 1:
+                            outputs[i] = [await self.analyze(chunk[0], lang=lang)]
+                        else:
+                            outputs[i] = await self.analyze_batch(chunk, lang=lang)
+                    except Exception as e:
+                        logger.error(f"LLM 批量解读异常: {e}")
+                        outputs[i] = [self._fallback_text(s, lang) for s in chunk]
+
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(_run(i, c) for i, c in enumerate(chunks))), timeout=deadline)
+            except asyncio.TimeoutError:
+                unfinished = sum(1 for o in outputs if o is None)
+                logger.warning(f"LLM 批量解读超过 {deadline:.0f}s，{unfinished}/{len(chunks)} 组使用兜底文案")
+            for i, chunk in enumerate(chunks):
+                if outputs[i] is None:
+                    outputs[i] = [self._fallback_text(s, lang) for s in chunk]
+            for chunk, texts in zip(chunks, outputs):
+                for signal, text in zip(chunk, texts):
+                    for same in by_key[self.cache_key(signal, lang)]:
+                        same.llm_analysis = text
+
+            logger.info(
+                f"LLM 批量解读: {len(signals)} 信号, {hits} 命中缓存, "
+                f"{len(todo)} 条请求分 {len(chunks)} 组 (并发 {concurrency})"
+            )
+        return signals
@@ -0,0 +1,195 @@
+"""
+后台任务选主 — 多 uvicorn worker 时只有一个 worker 跑 leader_only 后台任务
+
+问题：每个 worker 的 lifespan 都会启动全套后台任务，N 个 worker 就是 N 份大单扫描、
+N 份全市场扫描、N 个结算循环同时处理同一批 pending 卡。
+
+约定：
+- 后端 LEADER_LOCK_BACKEND=file（默认）：FileLock("background_leader")，fcntl.flock，
+  持有进程退出由内核释放；只适用于同一台机器上的多个 worker
+- 后端 redis：SET key token NX PX ttl 抢锁，持有者每 ttl/3 续期（比对 token 后 PEXPIRE），
+  续期失败即视为失去领导权；适用于多台机器。Redis 不可用时回退 file
+- 每 LEADER_CHECK_INTERVAL 秒检查一次：非 leader 尝试抢锁，抢到即 scheduler.start(leader_only=True)；
+  leader 续期失败则 scheduler.stop(leader_only=True)。leader 退出后其他 worker 在一个检查周期内接管
+- 抢锁 / 续期的阻塞 I/O 在专用的 leader 线程池（单线程）里执行，不与聊天共用 interactive 池
+- 调度器持久化的上次运行时间让新 leader 延续原节拍，不会接管后立刻重跑周级任务
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import uuid
+from typing import Any, Dict, Optional
+
+from app.core.config import get_settings
+from app.core.scheduler import Scheduler, scheduler as _scheduler
+from app.utils.executors import LEADER, run_in
+from app.utils.file_lock import FileLock
+from app.utils.logger import get_logger
+
+logger = get_logger("app.core.leader")
+
+LOCK_NAME = "background_leader"
+
+# 比对 token 后续期 / 释放（只动自己持有的锁）
+_RENEW_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class FileLeaderLock:
+    """fcntl 文件锁：持有即 leader，进程退出自动释放"""
+
+    backend = "file"
+
+    def __init__(self):
+        self._lock = FileLock(LOCK_NAME)
+
+    def acquire(self) -> bool:
+        return self._lock.held or self._lock.try_acquire()
+
+    def renew(self) -> bool:
+        return self._lock.held
+
+    def release(self):
+        self._lock.release()
+
+
+class RedisLeaderLock:
+    """Redis 租约锁：token + TTL，持有者周期续期"""
+
+    backend = "redis"
+    KEY = f"mozi:{LOCK_NAME}"
+
+    def __init__(self, client, ttl: int):
+        self.client = client
+        self.ttl_ms = int(ttl * 1000)
+        self.token = f"{os.getpid()}:{uuid.uuid4().hex}"
+        self._held = False
+
+    def acquire(self) -> bool:
+        if self._held:
+            return self.renew()
+        try:
+            self._held = bool(self.client.set(self.KEY, self.token, nx=True, px=self.ttl_ms))
+        except Exception as e:
+            logger.warning(f"选主: Redis 抢锁失败: {e}")
+            self._held = False
+        return self._held
+
+    def renew(self) -> bool:
+        try:
+            self._held = bool(self.client.eval(_RENEW_LUA, 1, self.KEY, self.token, self.ttl_ms))
+        except Exception as e:
+            logger.warning(f"选主: Redis 续期失败: {e}")
+            self._held = False
+        return self._held
+
+    def release(self):
+        try:
+            self.client.eval(_RELEASE_LUA, 1, self.KEY, self.token)
+        except Exception:
+            pass
+        self._held = False
+
+
+def _create_lock():
+    """按 LEADER_LOCK_BACKEND 创建锁；redis 不可用时回退文件锁"""
+    settings = get_settings()
+    backend = (settings.leader_lock_backend or "file").strip().lower()
+    if backend == "redis":
+        try:
+            import redis
+            client = redis.Redis(
+                host=settings.redis_host,
+                port=settings.redis_port,
+                db=settings.redis_db,
+                password=settings.redis_password or None,
+                decode_responses=True,
+                socket_connect_timeout=3,
+                socket_timeout=3,
+                protocol=2,
+            )
+            client.ping()
+            return RedisLeaderLock(client, ttl=settings.leader_lock_ttl)
+        except Exception as e:
+            logger.warning(f"选主: Redis 不可用，回退文件锁 ({e})")
+    return FileLeaderLock()
+
+
+class LeaderElector:
+    """周期抢锁 / 续期，领导权变化时启停调度器的 leader_only 任务"""
+
+    def __init__(self, scheduler: Scheduler, lock=None, check_interval: Optional[float] = None):
+        self.scheduler = scheduler
+        self.lock = lock
+        self.check_interval = check_interval
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """启动时先同步抢一次（单 worker 部署立即成为 leader），再进入周期检查"""
+        if self.lock is None:
+            self.lock = _create_lock()
+        if self.check_interval is None:
+            settings = get_settings()
+            self.check_interval = settings.leader_check_interval
+            if self.lock.backend == "redis":
+                self.check_interval = min(self.check_interval, settings.leader_lock_ttl / 3)
+        await self._check()
+        if not self.is_leader:
+            logger.info(f"选主: 其他 worker 是 leader，本进程 (pid={os.getpid()}) 待命")
+        self._task = asyncio.get_running_loop().create_task(self._loop(), name="leader_elector")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self.is_leader:
+            await self.scheduler.stop(leader_only=True)
+            self.is_leader = False
+        if self.lock is not None:
+            self.lock.release()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "leader": self.is_leader,
+            "pid": os.getpid(),
+            "backend": self.lock.backend if self.lock is not None else None,
+        }
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self._check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"选主检查异常: {e}", exc_info=True)
+
+    async def _check(self):
+        if self.is_leader:
+            held = await run_in(LEADER, self.lock.renew)
+            if not held:
+                logger.warning(f"选主: 失去领导权 (pid={os.getpid()})，停止后台任务")
+                self.is_leader = False
+                await self.scheduler.stop(leader_only=True)
+            return
+        if await run_in(LEADER, self.lock.acquire):
+            self.is_leader = True
+            logger.info(f"选主: 本进程 (pid={os.getpid()}) 成为 leader（{self.lock.backend}），启动后台任务")
+            self.scheduler.start(leader_only=True)
+
+
+# 全局单例（驱动 app.core.scheduler.scheduler）
+elector = LeaderElector(_scheduler)
@@ -0,0 +1,282 @@
+"""
+进程内后台任务调度器 — 统一替代 lifespan 里各自 while True + sleep 的循环
+
+问题：原来每个后台任务 sleep(N) → 跑 → 再 sleep(N)，周期随单轮耗时漂移；多个任务
+周期对齐后同一时刻打 MySQL；也没有地方记录上次运行时间和耗时。
+
+约定：
+- fixed_rate：按 起点 + k*interval 的节拍触发，不随单轮耗时漂移；节拍到了上一轮还在跑
+  则跳过本拍（skip-if-running，计入 skipped）；进程卡顿错过的多个节拍合并成一次（计入 missed）
+- fixed_delay：上一轮结束后再等 interval
+- next_time：日历型任务（如每周日 03:00），给定当前时间返回下次触发时间
+- jitter：每次触发时间加 [0, jitter) 秒随机偏移，错开周期相同的任务
+- timeout：单轮超时取消（asyncio.wait_for）。经 executors.run_in 已在线程里跑的同步函数取消不掉，
+  调度器等它们跑完才算本轮结束（running 保持，fixed_rate 的下一拍照常跳过），不会叠加第二轮
+- 上次开始时间持久化到 SCHEDULER_STATE_PATH：重启后首轮不早于 上次开始 + interval，
+  周级 / 日级任务不会因重启立即重跑
+- 单轮耗时 / 最近成功时间计入 background_task_* 指标；/api/v1/scheduler 查看状态
+- leader_only：多 worker 时只在选主成功的 worker 上运行（app.core.leader）；
+  leader_only=False 的任务（如本进程内存队列的刷写）每个 worker 都跑。只持久化 leader_only 任务
+
+用法:
+    scheduler.add("settlement", run_settlement, interval=300, jitter=30, timeout=280)
+    scheduler.start()
+    ...
+    await scheduler.stop()
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import get_settings
+from app.utils import metrics
+from app.utils.executors import collect_pending
+from app.utils.logger import get_logger
+
+logger = get_logger("app.core.scheduler")
+
+FIXED_RATE = "fixed_rate"
+FIXED_DELAY = "fixed_delay"
+
+
+@dataclass
+class JobState:
+    running: bool = False
+    next_run: Optional[float] = None
+    last_started: Optional[float] = None
+    last_finished: Optional[float] = None
+    last_duration: Optional[float] = None
+    last_outcome: Optional[str] = None   # ok / error / timeout / cancelled
+    runs: int = 0
+    skipped: int = 0
+    missed: int = 0
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[], Awaitable[Any]]
+    interval: float
+    mode: str = FIXED_RATE
+    jitter: float = 0.0
+    timeout: Optional[float] = None
+    initial_delay: Optional[float] = None          # 无持久化记录时首轮延迟，默认 = interval
+    next_time: Optional[Callable[[float], float]] = None
+    leader_only: bool = True
+    state: JobState = field(default_factory=JobState)
+    _task: Optional[asyncio.Task] = None
+    _run_task: Optional[asyncio.Task] = None
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts else None
+
+
+class Scheduler:
+    """单事件循环内的任务调度器（只在 lifespan 里 start / stop）"""
+
+    def __init__(self, state_path: Optional[str] = None):
+        self._state_path = state_path
+        self._jobs: Dict[str, Job] = {}
+        self._persisted: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def state_path(self) -> str:
+        return (
+            self._state_path
+            or get_settings().scheduler_state_path
+            or os.path.join(tempfile.gettempdir(), "mozi_scheduler_state.json")
+        )
+
+    def add(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        interval: float,
+        mode: str = FIXED_RATE,
+        jitter: float = 0.0,
+        timeout: Optional[float] = None,
+        initial_delay: Optional[float] = None,
+        next_time: Optional[Callable[[float], float]] = None,
+        leader_only: bool = True,
+    ) -> Job:
+        """注册任务（func 为单轮执行的 async 函数）；同名任务覆盖"""
+        if mode not in (FIXED_RATE, FIXED_DELAY):
+            raise ValueError(f"unknown mode: {mode}")
+        job = Job(name, func, interval, mode, jitter, timeout, initial_delay, next_time, leader_only)
+        self._jobs[name] = job
+        return job
+
+    def _select(self, leader_only: Optional[bool]) -> List[Job]:
+        return [j for j in self._jobs.values() if leader_only is None or j.leader_only == leader_only]
+
+    def start(self, leader_only: Optional[bool] = None) -> None:
+        """启动任务循环；leader_only=True/False 只启动对应一组，None 全部"""
+        self._load_state()
+        started = []
+        for job in self._select(leader_only):
+            if job._task is None or job._task.done():
+                job._task = asyncio.get_running_loop().create_task(self._loop(job), name=f"job:{job.name}")
+                started.append(job.name)
+        if started:
+            logger.info("调度器已启动: " + ", ".join(started))
+
+    async def stop(self, leader_only: Optional[bool] = None) -> None:
+        """取消任务循环及正在执行的一轮；参数含义同 start"""
+        tasks = []
+        for job in self._select(leader_only):
+            for task in (job._task, job._run_task):
+                if task is not None and not task.done():
+                    task.cancel()
+                    tasks.append(task)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def status(self) -> List[Dict[str, Any]]:
+        out = []
+        for job in self._jobs.values():
+            st = job.state
+            out.append({
+                "name": job.name,
+                "mode": "calendar" if job.next_time else job.mode,
+                "interval": job.interval,
+                "jitter": job.jitter,
+                "timeout": job.timeout,
+                "leader_only": job.leader_only,
+                "active": job._task is not None and not job._task.done(),
+                "running": st.running,
+                "next_run": _iso(st.next_run),
+                "last_started": _iso(st.last_started),
+                "last_finished": _iso(st.last_finished),
+                "last_duration": round(st.last_duration, 3) if st.last_duration is not None else None,
+                "last_outcome": st.last_outcome,
+                "runs": st.runs,
+                "skipped": st.skipped,
+                "missed": st.missed,
+            })
+        return out
+
+    # ── 调度循环 ──
+
+    def _jitter(self, job: Job) -> float:
+        return random.uniform(0, job.jitter) if job.jitter > 0 else 0.0
+
+    def _first_base(self, job: Job, now: float) -> float:
+        if job.next_time is not None:
+            return job.next_time(now)
+        last = (self._persisted.get(job.name) or {}).get("last_started")
+        if last:
+            return max(now, float(last) + job.interval)
+        delay = job.interval if job.initial_delay is None else job.initial_delay
+        return now + delay
+
+    async def _loop(self, job: Job):
+        st = job.state
+        base = self._first_base(job, time.time())
+        while True:
+            fire_at = base + self._jitter(job)
+            st.next_run = fire_at
+            await asyncio.sleep(max(0.0, fire_at - time.time()))
+
+            if job.next_time is not None or job.mode == FIXED_DELAY:
+                await self._execute(job)
+                now = time.time()
+                base = job.next_time(now) if job.next_time is not None else now + job.interval
+                continue
+
+            # fixed_rate：上一轮还没结束就跳过本拍
+            if job._run_task is not None and not job._run_task.done():
+                st.skipped += 1
+                logger.warning(f"任务 {job.name} 上一轮仍在运行，跳过本次触发")
+            else:
+                job._run_task = asyncio.get_running_loop().create_task(self._execute(job))
+            base += job.interval
+            now = time.time()
+            if base <= now:
+                # 错过的节拍合并，直接对齐到下一个未来节拍
+                behind = int((now - base) // job.interval) + 1
+                st.missed += behind
+                base += behind * job.interval
+
+    async def _execute(self, job: Job):
+        st = job.state
+        st.running = True
+        st.last_started = time.time()
+        if job.leader_only:
+            self._save_state()
+        t0 = time.perf_counter()
+        outcome = "error"
+        try:
+            with collect_pending() as pending:
+                try:
+                    with metrics.track_task(job.name):
+                        if job.timeout:
+                            await asyncio.wait_for(job.func(), timeout=job.timeout)
+                        else:
+                            await job.func()
+                    outcome = "ok"
+                except asyncio.TimeoutError:
+                    outcome = "timeout"
+                    logger.warning(f"任务 {job.name} 超时({job.timeout:.0f}s)，本轮放弃")
+                except Exception as e:
+                    logger.error(f"任务 {job.name} 异常: {e}", exc_info=True)
+            leftover = list(pending)
+            if leftover:
+                # 取消只停了协程，线程里的同步函数还在跑：跑完才算本轮结束
+                logger.warning(f"任务 {job.name} 等待线程内 {len(leftover)} 个调用结束")
+                await asyncio.wait([asyncio.wrap_future(f) for f in leftover])
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            st.running = False
+            st.last_finished = time.time()
+            st.last_duration = time.perf_counter() - t0
+            st.last_outcome = outcome
+            st.runs += 1
+            if job.leader_only:
+                self._save_state()
+
+    # ── 持久化 ──
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self._persisted = json.load(f) or {}
+        except FileNotFoundError:
+            self._persisted = {}
+        except Exception as e:
+            logger.warning(f"调度器状态读取失败，按首次启动处理: {e}")
+            self._persisted = {}
+
+    def _save_state(self):
+        # 只有 leader 跑 leader_only 任务，单写者；每个 worker 都跑的任务不持久化，避免互相覆盖
+        for name, job in self._jobs.items():
+            st = job.state
+            if st.last_started is None or not job.leader_only:
+                continue
+            self._persisted[name] = {
+                "last_started": st.last_started,
+                "last_finished": st.last_finished,
+                "last_duration": st.last_duration,
+                "last_outcome": st.last_outcome,
+            }
+        tmp = f"{self.state_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._persisted, f, ensure_ascii=False)
+            os.replace(tmp, self.state_path)
+        except Exception as e:
+            logger.warning(f"调度器状态写入失败: {e}")
+
+
+# 全局单例
+scheduler = Scheduler()
@@ -1,17 +1,35 @@
-"""会话管理 - 用户隔离，只保留问题不保留回答"""
+"""会话管理 - 用户隔离，只保留问题不保留回答
+
+两种后端，接口一致（get / update / cleanup）：
+- SessionManager:       进程内存 dict，单 worker 使用
+- RedisSessionManager:  Redis 存储 + TTL 自动过期，多 worker 共享，前面挂一层小 LRU 读缓存
+
+由 SESSION_BACKEND=memory|redis 选择；redis 不可用时自动回退内存。
+后端在首次 get / update 时才创建（LazySessionManager），导入本模块不连接 Redis。
+"""
 import time
 import threading
+from collections import OrderedDict
 from typing import Optional, Dict, List
 
+from app.core.config import get_settings
+from app.utils.logger import get_logger
+
+logger = get_logger("app.core.session")
+
 
 class SessionManager:
     """内存会话管理器，按 conversation_id 隔离用户"""
 
+    # update 时顺带清理过期会话的最小间隔（秒），避免废弃会话无限堆积
+    _SWEEP_INTERVAL = 60
+
     def __init__(self, ttl: int = 1800, max_questions: int = 5):
         self._sessions: Dict[str, Dict] = {}
         self._ttl = ttl           # 30分钟过期
         self._max_questions = max_questions  # 最多保留5轮问题
         self._lock = threading.Lock()
+        self._last_sweep = time.time()
 
     def get(self, conversation_id: str) -> Optional[Dict]:
         if not conversation_id:
@@ -43,16 +61,210 @@ class SessionManager:
                 if len(session["questions"]) > self._max_questions:
                     session["questions"] = session["questions"][-self._max_questions:]
             session["last_active"] = time.time()
+            if session["last_active"] - self._last_sweep > self._SWEEP_INTERVAL:
+                self._sweep_locked(session["last_active"])
 
     def cleanup(self):
         """清理过期会话"""
+        with self._lock:
+            self._sweep_locked(time.time())
+
+    def _sweep_locked(self, now: float):
+        expired = [k for k, v in self._sessions.items()
+                   if now - v["last_active"] > self._ttl]
+        for k in expired:
+            del self._sessions[k]
+        self._last_sweep = now
+
+
+class RedisSessionManager:
+    """Redis 会话管理器 — 多 worker 共享会话，无需粘性会话
+
+    存储结构（两个 key 同步设置 TTL，过期由 Redis 负责）：
+        session:{cid}    HASH  coin_symbol / last_active
+        session:{cid}:q  LIST  最近 max_questions 个问题
+
+    update 用 MULTI/EXEC 一次性完成 RPUSH + LTRIM + HSET + EXPIRE，
+    并发追加不会超出上限。读路径前置一个短 TTL 的 LRU，
+    本进程写入时直接刷新，其他 worker 的写入最多延迟 lru_ttl 秒可见。
+
+    client 可注入（测试用 fakeredis.FakeRedis(decode_responses=True)）。
+    """
+
+    KEY_PREFIX = "session:"
+
+    def __init__(
+        self,
+        client,
+        ttl: int = 1800,
+        max_questions: int = 5,
+        lru_size: int = 1024,
+        lru_ttl: float = 5.0,
+    ):
+        self.client = client
+        self._ttl = ttl
+        self._max_questions = max_questions
+        self._lru_size = lru_size
+        self._lru_ttl = lru_ttl
+        # {conversation_id: (session | None, cached_at)}
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _keys(self, conversation_id: str):
+        base = f"{self.KEY_PREFIX}{conversation_id}"
+        return base, f"{base}:q"
+
+    def _lru_get(self, conversation_id: str):
+        with self._lock:
+            hit = self._lru.get(conversation_id)
+            if hit is None:
+                return False, None
+            session, cached_at = hit
+            if time.time() - cached_at > self._lru_ttl:
+                self._lru.pop(conversation_id, None)
+                return False, None
+            self._lru.move_to_end(conversation_id)
+            return True, session
+
+    def _lru_put(self, conversation_id: str, session: Optional[Dict]):
+        with self._lock:
+            self._lru[conversation_id] = (session, time.time())
+            self._lru.move_to_end(conversation_id)
+            while len(self._lru) > self._lru_size:
+                self._lru.popitem(last=False)
+
+    @staticmethod
+    def _copy(session: Optional[Dict]) -> Optional[Dict]:
+        if session is None:
+            return None
+        return {**session, "questions": list(session["questions"])}
+
+    def get(self, conversation_id: str) -> Optional[Dict]:
+        if not conversation_id:
+            return None
+        found, session = self._lru_get(conversation_id)
+        if found:
+            return self._copy(session)
+
+        meta_key, q_key = self._keys(conversation_id)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hgetall(meta_key)
+            pipe.lrange(q_key, 0, -1)
+            meta, questions = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Redis 会话读取失败 {conversation_id}: {e}")
+            return None
+
+        if not meta:
+            session = None
+        else:
+            session = {
+                "coin_symbol": meta.get("coin_symbol") or None,
+                "questions": list(questions or []),
+                "last_active": float(meta.get("last_active") or 0),
+            }
+        self._lru_put(conversation_id, session)
+        return self._copy(session)
+
+    def update(self, conversation_id: str, coin_symbol: str = None, question: str = None):
+        if not conversation_id:
+            return
+        meta_key, q_key = self._keys(conversation_id)
+        now = time.time()
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            mapping = {"last_active": now}
+            if coin_symbol:
+                mapping["coin_symbol"] = coin_symbol
+            pipe.hset(meta_key, mapping=mapping)
+            if question:
+                pipe.rpush(q_key, question)
+                pipe.ltrim(q_key, -self._max_questions, -1)
+            pipe.expire(meta_key, self._ttl)
+            pipe.expire(q_key, self._ttl)
+            pipe.hget(meta_key, "coin_symbol")
+            pipe.lrange(q_key, 0, -1)
+            results = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Redis 会话写入失败 {conversation_id}: {e}")
+            with self._lock:
+                self._lru.pop(conversation_id, None)
+            return
+
+        # 事务末尾读回的最新状态直接写入 LRU（write-through）
+        self._lru_put(conversation_id, {
+            "coin_symbol": results[-2] or None,
+            "questions": list(results[-1] or []),
+            "last_active": now,
+        })
+
+    def cleanup(self):
+        """Redis 端由 TTL 自动过期，这里只清理本地 LRU"""
         with self._lock:
             now = time.time()
-            expired = [k for k, v in self._sessions.items()
-                       if now - v["last_active"] > self._ttl]
+            expired = [k for k, (_, cached_at) in self._lru.items()
+                       if now - cached_at > self._lru_ttl]
             for k in expired:
-                del self._sessions[k]
+                del self._lru[k]
+
+
+def _create_session_manager():
+    """按 SESSION_BACKEND 创建会话管理器；redis 不可用时回退内存"""
+    settings = get_settings()
+    backend = (settings.session_backend or "memory").strip().lower()
+    if backend == "redis":
+        try:
+            import redis
+            client = redis.Redis(
+                host=settings.redis_host,
+                port=settings.redis_port,
+                db=settings.redis_db,
+                password=settings.redis_password or None,
+                decode_responses=True,
+                socket_connect_timeout=3,
+                socket_timeout=3,
+                protocol=2,
+            )
+            client.ping()
+            logger.info(f"会话存储: Redis ({settings.redis_host}:{settings.redis_port})")
+            return RedisSessionManager(
+                client,
+                ttl=settings.session_ttl,
+                max_questions=settings.session_max_questions,
+                lru_size=settings.session_lru_size,
+                lru_ttl=settings.session_lru_ttl,
+            )
+        except Exception as e:
+            logger.warning(f"会话存储: Redis 不可用，回退内存 ({e})")
+    return SessionManager(ttl=settings.session_ttl, max_questions=settings.session_max_questions)
+
+
+class LazySessionManager:
+    """首次使用时才按 SESSION_BACKEND 创建后端 — 导入本模块不连接 / ping Redis"""
+
+    def __init__(self, factory=_create_session_manager):
+        self._factory = factory
+        self._impl = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._impl is None:
+            with self._lock:
+                if self._impl is None:
+                    self._impl = self._factory()
+        return self._impl
+
+    def get(self, conversation_id: str) -> Optional[Dict]:
+        return self.backend.get(conversation_id)
+
+    def update(self, conversation_id: str, coin_symbol: str = None, question: str = None):
+        self.backend.update(conversation_id, coin_symbol=coin_symbol, question=question)
+
+    def cleanup(self):
+        self.backend.cleanup()
 
 
-# 全局单例
-session_manager = SessionManager()
+# 全局单例（惰性创建后端）
+session_manager = LazySessionManager()
@@ -2,7 +2,7 @@ import asyncio
 import time
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
 from fastapi.openapi.utils import get_openapi
@@ -12,6 +12,10 @@ from app.core.exceptions import CryptoAnalystException
 from app.api.endpoints import router as api_router
 from app.api.skill_endpoints import router as skill_test_router
 from app.utils.logger import configure_logging, get_logger
+from app.utils import metrics
+from app.core.leader import elector
+from app.core.scheduler import FIXED_DELAY, scheduler
+from app.utils.executors import BIGORDER, MAINTENANCE, SETTLEMENT, install_default, run_in, shutdown_all
 
 settings = get_settings()
 configure_logging(settings.log_level if hasattr(settings, "log_level") else "INFO")
@@ -25,6 +29,8 @@ async def lifespan(app: FastAPI):
     logger.info(f"启动 {settings.app_name} v{settings.app_version}")
     logger.info(f"API地址: http://{settings.api_host}:{settings.api_port}")
     logger.info(f"调试模式: {settings.debug}")
+    # 交互请求（聊天 / 端点的 to_thread、run_in_executor(None)）独占默认线程池，后台任务走各自的命名池
+    install_default(asyncio.get_running_loop())
     logger.info(
         f"Redis配置: REDIS_ENABLED={settings.redis_enabled} "
         f"(env={__import__('os').environ.get('REDIS_ENABLED', '<unset>')}), "
@@ -32,45 +38,44 @@ async def lifespan(app: FastAPI):
     )
 
     # BigOrder 后台扫描任务（仅在 Redis 启用时）
-    scan_task = None
+    bigorder_jobs = None
     if settings.redis_enabled:
         import app.bigorder.deps as bigorder_deps
         bigorder_deps.init_bigorder_deps()
         if bigorder_deps.is_redis_available():
             coins = bigorder_deps.consumer.get_watched_coins()
             logger.info(f"BigOrder: Redis 已连接，监控 {len(coins)} 个币种")
-            scan_task = asyncio.create_task(
-                _bigorder_background_scan(
-                    bigorder_deps.consumer,
-                    bigorder_deps.scorer,
-                    bigorder_deps.llm_analyzer
-                )
-            )
+            bigorder_jobs = bigorder_deps
         else:
             logger.warning("BigOrder: Redis 连接失败，后台扫描未启动")
 
-    # 信号卡后台任务（始终启动，不依赖 Redis）
-    settlement_task = asyncio.create_task(_signal_settlement_task())
-    review_task = asyncio.create_task(_weekly_review_task())
-    market_scan_task = asyncio.create_task(_market_scan_task())
-    guardrail_task = asyncio.create_task(_guardrail_recompute_task())
-    report_task = asyncio.create_task(_daily_report_task())
-    drift_task = asyncio.create_task(_regime_drift_task())
+    # 信号卡后台任务（始终启动，不依赖 Redis）；统一由调度器按节拍触发
+    _register_jobs(bigorder_jobs)
+    # 每个 worker 都跑本进程的任务；leader_only 任务只在选主成功的 worker 上跑
+    scheduler.start(leader_only=False)
+    await elector.start()
     logger.info(
         "Signal Cards: 后台结算(5min) + 周期复盘(每周日) + 全市场扫描(30min) "
-        "+ ev_guardrail 重算(24h) + 每日报表(6h) + regime 漂移(7d) 已启动"
+        "+ ev_guardrail 重算(24h) + 每日报表(6h) + regime 漂移(7d) 已启动（状态: /api/v1/scheduler）"
     )
 
     yield
 
     # 关闭时
-    if scan_task:
-        scan_task.cancel()
-    settlement_task.cancel()
-    review_task.cancel()
-    market_scan_task.cancel()
-    guardrail_task.cancel()
-    report_task.cancel()
+    await elector.stop()
+    await scheduler.stop()
+    from app.signals.alpha_scanner import shutdown_process_pool
+    shutdown_process_pool()
+    # 会话历史 write-behind：退出前刷完队列
+    from app.services.session_service import session_service
+    try:
+        await asyncio.wait_for(
+            asyncio.get_event_loop().run_in_executor(None, session_service.shutdown),
+            timeout=10,
+        )
+    except Exception as e:
+        logger.warning(f"会话历史退出刷写失败: {e}")
+    shutdown_all()
     logger.info("服务关闭")
 
 
@@ -233,6 +238,13 @@ async def root():
     }
 
 
+# Prometheus 文本格式指标
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """进程内指标（HTTP / chat 步骤 / 上游 API / MySQL / 后台任务）"""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 # 注册API路由
 app.include_router(
     api_router,
@@ -273,252 +285,235 @@ logger.info("Signal Chat: POST /signals/v1/chat 已注册")
 # 中间件：添加请求处理时间
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
-    """添加请求处理时间头"""
+    """添加请求处理时间头，并计入 http_request_duration_seconds"""
     start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
-
-
-async def _bigorder_background_scan(consumer, scorer, llm_analyzer):
-    """BigOrder 后台定时扫描 — 与信号卡共用 discovery 币种列表"""
+    status_code = 500
+    metrics.HTTP_IN_FLIGHT.inc()
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        process_time = time.time() - start_time
+        response.headers["X-Process-Time"] = str(process_time)
+        return response
+    finally:
+        metrics.HTTP_IN_FLIGHT.dec()
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            time.time() - start_time,
+            method=request.method,
+            route=_route_label(request),
+            status=str(status_code),
+        )
+
+
+def _route_label(request: Request) -> str:
+    """路由模板做指标标签（/coin/BTC/signal → /coin/{coin}/signal），未匹配的统一归为 unmatched
+
+    直接取 Starlette 匹配到的路由模板（scope["route"].path），不按参数值回填路径：
+    静态段恰好等于参数值时（/coin/signal/signal）回填会把静态段也替换掉。
+    """
+    route = request.scope.get("route")
+    path = getattr(route, "path", None)
+    if request.scope.get("endpoint") is None or path is None:
+        return "unmatched"
+    return path
+
+
+def _make_bigorder_scan(consumer, scorer, llm_analyzer):
+    """BigOrder 后台定时扫描（单轮） — 与信号卡共用 discovery 币种列表"""
     # 增量 LLM：记录上次评分，只在分数或等级变化时才调用 LLM
     _last_scores: dict = {}  # {coin: (total_score, level)}
-    while True:
-        try:
-            await asyncio.sleep(settings.scan_interval)  # 大单侦测：30s
-            from app.services.data_service import get_discovery_coins
-            scan_coins = get_discovery_coins()
-            if not scan_coins:
-                continue
-            # 超时保护：评分最多 2 分钟
-            try:
-                signals = await asyncio.wait_for(
-                    asyncio.get_event_loop().run_in_executor(None, scorer.score_all, scan_coins),
-                    timeout=120,
-                )
-            except asyncio.TimeoutError:
-                logger.warning("BigOrder 后台扫描: score_all 超时(2min)，跳过本轮")
-                continue
-            for signal in signals:
-                if signal.score.level.value == "none":
-                    continue
-                # 增量判断：分数变化 < 10 且等级相同 → 跳过 LLM
-                coin = signal.coin
-                current = (signal.score.total_score, signal.score.level.value)
-                last = _last_scores.get(coin)
-                _last_scores[coin] = current
-                if last and abs(current[0] - last[0]) < 10 and current[1] == last[1]:
-                    continue  # 数据没变，复用上次 LLM 分析
-                try:
-                    signal = await asyncio.wait_for(llm_analyzer.analyze_and_enrich(signal), timeout=30)
-                    if signal.llm_analysis:
-                        coin_key = f"signal:coin:{signal.coin}"
-                        consumer.client.hset(coin_key, "llm_analysis", signal.llm_analysis)
-                except asyncio.TimeoutError:
-                    pass
-                except Exception:
-                    pass
-        except asyncio.CancelledError:
-            break
-        except Exception as e:
-            logger.error(f"BigOrder 后台扫描异常: {e}", exc_info=True)
-            await asyncio.sleep(10)
-
 
-async def _signal_settlement_task():
-    """信号卡后台结算任务 — 每 5 分钟扫一次 pending 卡，用真实价格结算"""
-    while True:
+    async def _run():
+        from app.services.data_service import get_discovery_coins
+        scan_coins = get_discovery_coins()
+        if not scan_coins:
+            return
+        # 超时保护：评分最多 2 分钟
         try:
-            await asyncio.sleep(300)  # 5 分钟
-            from app.signals.settlement import settle_pending_cards
-            try:
-                result = await asyncio.wait_for(
-                    asyncio.get_event_loop().run_in_executor(None, settle_pending_cards),
-                    timeout=280,
-                )
-            except asyncio.TimeoutError:
-                logger.warning("信号卡结算超时(280s)，跳过本轮")
+            signals = await asyncio.wait_for(
+                run_in(BIGORDER, scorer.score_all, scan_coins),
+                timeout=120,
+            )
+        except asyncio.TimeoutError:
+            logger.warning("BigOrder 后台扫描: score_all 超时(2min)，跳过本轮")
+            return
+        pending = []
+        for signal in signals:
+            if signal.score.level.value == "none":
                 continue
-            if result["settled"] > 0:
-                logger.info(f"Signal Cards: 结算 {result['settled']} 张 (TP={result['hit_tp']} SL={result['hit_sl']} 过期={result['expired']})")
-        except asyncio.CancelledError:
-            break
-        except Exception as e:
-            logger.error(f"信号卡结算任务异常: {e}", exc_info=True)
-            await asyncio.sleep(60)
-
-
-async def _market_scan_task():
-    """全市场扫描定时任务 — 每 30 分钟扫描一次，结果存库"""
-    while True:
+            # 增量判断：分数变化 < 10 且等级相同 → 跳过 LLM
+            coin = signal.coin
+            current = (signal.score.total_score, signal.score.level.value)
+            last = _last_scores.get(coin)
+            _last_scores[coin] = current
+            if last and abs(current[0] - last[0]) < 10 and current[1] == last[1]:
+                continue  # 数据没变，复用上次 LLM 分析
+            pending.append(signal)
+        if not pending:
+            return
+        # 有界并发 + 内容缓存去重，一批信号不再串行等待 LLM
         try:
-            await asyncio.sleep(settings.signal_scan_interval)  # 信号卡扫描：30min
-            import time as _time
-            from app.signals.alpha_scanner import scan_all_coins
-            from app.signals.settlement import save_scan_batch, save_signal_card
-
-            t0 = _time.time()
-            # 超时保护：扫描最多 5 分钟，防止卡死
-            try:
-                results = await asyncio.wait_for(scan_all_coins(concurrency=10), timeout=300)
-            except asyncio.TimeoutError:
-                logger.warning("全市场扫描超时(5min)，跳过本轮")
-                continue
-            elapsed = _time.time() - t0
-
-            signals = [r for r in results if r.signal_card is not None]
-            logger.info(f"全市场扫描完成: {len(results)} 币种, {len(signals)} 信号, 耗时 {elapsed:.1f}s")
-
-            # 信号卡写入 signal_card_history（供结算和复盘）
-            saved = 0
-            for r in signals:
+            await llm_analyzer.enrich_many(pending)
+        except Exception as e:
+            logger.warning(f"BigOrder 后台扫描: LLM 批量解读异常: {e}")
+        for signal in pending:
+            if signal.llm_analysis:
                 try:
-                    record_id = save_signal_card(r.signal_card)
-                    if record_id:
-                        saved += 1
+                    consumer.client.hset(f"signal:coin:{signal.coin}", "llm_analysis", signal.llm_analysis)
                 except Exception:
                     pass
-            if saved:
-                logger.info(f"Signal Cards: {saved} 张写入 signal_card_history")
-
-            # 超时保护：存库最多 30 秒
-            try:
-                await asyncio.wait_for(
-                    asyncio.get_event_loop().run_in_executor(None, save_scan_batch, results, elapsed),
-                    timeout=30,
-                )
-            except asyncio.TimeoutError:
-                logger.warning("扫描结果存库超时(30s)，已写本地文件兜底")
-        except asyncio.CancelledError:
-            break
-        except Exception as e:
-            logger.error(f"全市场扫描任务异常: {e}", exc_info=True)
-            await asyncio.sleep(60)
-
-
-async def _weekly_review_task():
-    """信号卡周期复盘任务 — 每周日凌晨 3 点复盘"""
-    while True:
-        try:
-            import datetime
-            now = datetime.datetime.now()
-            # 计算到下一个周日凌晨 3 点的秒数
-            days_until_sunday = (6 - now.weekday()) % 7
-            if days_until_sunday == 0 and now.hour >= 3:
-                days_until_sunday = 7
-            next_review = now.replace(hour=3, minute=0, second=0, microsecond=0) + datetime.timedelta(days=days_until_sunday)
-            wait_seconds = (next_review - now).total_seconds()
-
-            logger.info(f"Signal Cards: 下次复盘时间 {next_review.strftime('%Y-%m-%d %H:%M')}（{wait_seconds/3600:.1f}h 后）")
-            await asyncio.sleep(wait_seconds)
-
-            from app.signals.review import weekly_review
-            report = await asyncio.get_event_loop().run_in_executor(None, weekly_review)
-            logger.info(f"Signal Cards: 周复盘完成 — 胜率{report.get('win_rate', 0)}% 夏普{report.get('sharpe_ratio', 0)}")
-
-        except asyncio.CancelledError:
-            break
-        except Exception as e:
-            logger.error(f"周期复盘任务异常: {e}", exc_info=True)
-            await asyncio.sleep(3600)
-
-
-async def _guardrail_recompute_task():
-    """ev_guardrail + grade 阈值校准任务 — 每 24h"""
-    while True:
-        try:
-            await asyncio.sleep(86400)  # 24h
-            loop = asyncio.get_event_loop()
-
-            # 1. ev_guardrail 重算
-            try:
-                from app.signals.ev_guardrail import recompute_guardrails
-                result = await asyncio.wait_for(
-                    loop.run_in_executor(None, recompute_guardrails),
-                    timeout=120,
-                )
-                logger.info(
-                    f"ev_guardrail 重算完成: guardrail={result.get('guardrail_count', 0)} "
-                    f"reward={result.get('reward_count', 0)}"
-                )
-            except asyncio.TimeoutError:
-                logger.warning("ev_guardrail 重算超时(120s)，跳过本轮")
-
-            # 2. Phase 3 grade 阈值校准
-            try:
-                from app.signals.grade_calibrator import calibrate_grade_thresholds
-                calib = await asyncio.wait_for(
-                    loop.run_in_executor(None, calibrate_grade_thresholds),
-                    timeout=60,
-                )
-                logger.info(
-                    f"grade 阈值校准完成: A_offset={calib.get('A_conf_offset')} "
-                    f"S_offset={calib.get('S_conf_offset')}"
-                )
-            except asyncio.TimeoutError:
-                logger.warning("grade 阈值校准超时(60s)，跳过本轮")
-        except asyncio.CancelledError:
-            break
-        except Exception as e:
-            logger.error(f"guardrail/grade 重算任务异常: {e}", exc_info=True)
-            await asyncio.sleep(3600)
-
-
-async def _daily_report_task():
-    """每日报表任务 — 每 6h 跑一次（避免错过窗口）"""
-    while True:
-        try:
-            await asyncio.sleep(21600)  # 6h
-            from app.signals.daily_report import generate_daily_report
-            try:
-                await asyncio.wait_for(
-                    asyncio.get_event_loop().run_in_executor(None, generate_daily_report),
-                    timeout=180,
-                )
-            except asyncio.TimeoutError:
-                logger.warning("daily_report 超时(180s)，跳过本轮")
-            # Phase 6: A/B 桶对照（同日报表一起跑）
-            try:
-                from app.signals.ab_framework import compare_buckets
-                compare_buckets(days=7)
-            except Exception as _e:
-                logger.warning(f"ab_framework compare_buckets 异常: {_e}")
-        except asyncio.CancelledError:
-            break
-        except Exception as e:
-            logger.error(f"daily_report 任务异常: {e}", exc_info=True)
-            await asyncio.sleep(3600)
-
-
-async def _regime_drift_task():
-    """regime 漂移监控 — 每周跑一次"""
-    while True:
-        try:
-            await asyncio.sleep(604800)  # 7d
-            from app.signals.regime_drift_monitor import run_weekly_check
-            try:
-                await asyncio.wait_for(
-                    asyncio.get_event_loop().run_in_executor(None, run_weekly_check),
-                    timeout=120,
-                )
-            except asyncio.TimeoutError:
-                logger.warning("regime_drift 超时(120s)，跳过本轮")
-        except asyncio.CancelledError:
-            break
-        except Exception as e:
-            logger.error(f"regime_drift 任务异常: {e}", exc_info=True)
-            await asyncio.sleep(3600)
 
-
-if __name__ == "__main__":
-    import uvicorn
-
-    uvicorn.run(
-        "app.main:app",
-        host=settings.api_host,
-        port=settings.api_port,
-        reload=settings.debug,
-        log_level="info" if settings.debug else "warning"
-    )
\ No newline at end of file
+    return _run
+
+
+async def _signal_settlement_job():
+    """信号卡后台结算 — 扫 pending 卡，用真实价格结算"""
+    from app.signals.settlement import settle_pending_cards
+    result = await run_in(SETTLEMENT, settle_pending_cards)
+    if result["settled"] > 0:
+        logger.info(f"Signal Cards: 结算 {result['settled']} 张 (TP={result['hit_tp']} SL={result['hit_sl']} 过期={result['expired']})")
+
+
+async def _market_scan_job():
+    """全市场扫描 — 结果存库"""
+    from app.signals import scan_refresh
+    # 与 /scan 的按需刷新共享单飞 + 跨 worker 锁，不会叠加多轮全量扫描
+    try:
+        refreshed = await scan_refresh.refresh(concurrency=10, wait_peer=False)
+    except asyncio.TimeoutError:
+        return  # 超时已在 scan_refresh 记日志
+    if refreshed is None:
+        logger.info("全市场扫描: 其他 worker 正在执行，本轮跳过")
+
+
+def _next_weekly_review(now: float) -> float:
+    """下一个周日凌晨 3 点"""
+    import datetime
+    current = datetime.datetime.fromtimestamp(now)
+    days_until_sunday = (6 - current.weekday()) % 7
+    if days_until_sunday == 0 and current.hour >= 3:
+        days_until_sunday = 7
+    next_review = current.replace(hour=3, minute=0, second=0, microsecond=0) + datetime.timedelta(days=days_until_sunday)
+    return next_review.timestamp()
+
+
+async def _weekly_review_job():
+    """信号卡周期复盘 — 每周日凌晨 3 点"""
+    from app.signals.review import weekly_review
+    report = await run_in(MAINTENANCE, weekly_review)
+    logger.info(f"Signal Cards: 周复盘完成 — 胜率{report.get('win_rate', 0)}% 夏普{report.get('sharpe_ratio', 0)}")
+
+
+async def _guardrail_recompute_job():
+    """ev_guardrail 重算 + grade 阈值校准"""
+    # 1. ev_guardrail 重算
+    try:
+        from app.signals.ev_guardrail import recompute_guardrails
+        result = await asyncio.wait_for(
+            run_in(MAINTENANCE, recompute_guardrails),
+            timeout=120,
+        )
+        logger.info(
+            f"ev_guardrail 重算完成: guardrail={result.get('guardrail_count', 0)} "
+            f"reward={result.get('reward_count', 0)}"
+        )
+    except asyncio.TimeoutError:
+        logger.warning("ev_guardrail 重算超时(120s)，跳过本轮")
+
+    # 2. Phase 3 grade 阈值校准
+    try:
+        from app.signals.grade_calibrator import calibrate_grade_thresholds
+        calib = await asyncio.wait_for(
+            run_in(MAINTENANCE, calibrate_grade_thresholds),
+            timeout=60,
+        )
+        logger.info(
+            f"grade 阈值校准完成: A_offset={calib.get('A_conf_offset')} "
+            f"S_offset={calib.get('S_conf_offset')}"
+        )
+    except asyncio.TimeoutError:
+        logger.warning("grade 阈值校准超时(60s)，跳过本轮")
+
+
+async def _daily_report_job():
+    """每日报表（Phase 6: A/B 桶对照已并入日报表的同一次遍历 report["ab_buckets_7d"]）"""
+    from app.signals.daily_report import generate_daily_report
+    await run_in(MAINTENANCE, generate_daily_report)
+
+
+async def _regime_drift_job():
+    """regime 漂移监控"""
+    from app.signals.regime_drift_monitor import run_weekly_check
+    await run_in(MAINTENANCE, run_weekly_check)
+
+
+def _make_session_history_flush():
+    """会话历史 write-behind — 首轮建表，之后周期批量刷写，定期按集合清理过期记录"""
+    from app.services.session_service import session_service
+    state = {"initialized": False, "last_sweep": time.time()}
+
+    async def _run():
+        if not state["initialized"]:
+            await run_in(MAINTENANCE, session_service.init_storage)
+            state["initialized"] = True
+        if session_service.pending_count():
+            await run_in(MAINTENANCE, session_service.flush)
+        if time.time() - state["last_sweep"] >= settings.session_history_sweep_interval:
+            state["last_sweep"] = time.time()
+            deleted = await run_in(MAINTENANCE, session_service.sweep_retention)
+            if deleted:
+                logger.info(f"会话历史清理: 删除 {deleted} 条")
+
+    return _run
+
+
+def _make_news_index_sync():
+    """新闻按币种索引 — 增量同步源表新行，每天清理一次过期索引"""
+    from app.services.news_index import news_index
+    state = {"last_sweep": 0.0}
+
+    async def _run():
+        await run_in(MAINTENANCE, news_index.sync)
+        if time.time() - state["last_sweep"] >= 86400:
+            state["last_sweep"] = time.time()
+            deleted = await run_in(MAINTENANCE, news_index.sweep_retention)
+            if deleted:
+                logger.info(f"新闻索引清理: 删除 {deleted} 行")
+
+    return _run
+
+
+def _register_jobs(bigorder_deps=None):
+    """注册全部后台任务。jitter 错开周期相同的任务；timeout 沿用原各任务的超时；
+    除会话历史刷写外都是 leader_only（多 worker 时只有 leader 跑）"""
+    from app.signals.scan_refresh import SAVE_TIMEOUT, SCAN_TIMEOUT
+
+    if bigorder_deps is not None:
+        scheduler.add(
+            "bigorder_scan",
+            _make_bigorder_scan(bigorder_deps.consumer, bigorder_deps.scorer, bigorder_deps.llm_analyzer),
+            interval=settings.scan_interval, jitter=3, timeout=300,
+        )
+    scheduler.add("settlement", _signal_settlement_job, interval=300, jitter=30, timeout=280)
+    scheduler.add(
+        "market_scan", _market_scan_job,
+        interval=settings.signal_scan_interval, jitter=60, timeout=SCAN_TIMEOUT + SAVE_TIMEOUT + 30,
+    )
+    scheduler.add(
+        "weekly_review", _weekly_review_job,
+        interval=604800, jitter=300, timeout=1800, next_time=_next_weekly_review,
+    )
+    scheduler.add("guardrail_recompute", _guardrail_recompute_job, interval=86400, jitter=600, timeout=240)
+    scheduler.add("daily_report", _daily_report_job, interval=21600, jitter=300, timeout=180)
+    scheduler.add("regime_drift", _regime_drift_job, interval=604800, jitter=600, timeout=120)
+    if settings.news_index_enabled:
+        scheduler.add(
+            "news_index_sync", _make_news_index_sync(),
+            interval=settings.news_index_sync_interval, mode=FIXED_DELAY, jitter=10, timeout=600,
+            initial_delay=10,
+        )
+    scheduler.add(
+        "session_history_flush", _make_session_history_flush(),
+        interval=settings.session_history_flush_interval, mode=FIXED_DELAY, initial_delay=0,
+        leader_only=False,  # 写入队列在各 worker 内存里，每个 worker 都要刷
+    )
@@ -0,0 +1,196 @@
+"""
+币种分析快照缓存 — 问答类 Skill 共用的每币种数据 + 派生结果
+
+问题：同一分钟内多个用户问 BTC，每个 Skill 各自 asyncio.to_thread 拉 header / kline /
+新闻 / 多空比 / 持仓 / 资金费率，再各自从头算指标。HTTP 层虽有 fetch_json_cached，
+但新闻走 MySQL 不缓存，解析 K 线、算指标也每次重来。
+
+约定：
+- 每个币种一个 CoinSnapshot，存原始数据（按 data_service 函数名）+ 派生结果
+  （解析后的 OHLCV、技术指标、趋势等，按 key 记忆化，同一快照内只算一次）
+- TTL 短（COIN_SNAPSHOT_TTL，默认 30s，与 fetch_json_cached 对齐）；过期后整体换新快照，
+  派生结果随之失效，不会出现"新 K 线 + 旧指标"
+- 按需拉取：Skill 只声明自己要的数据源，缺什么补什么；同一币种同一数据源并发只拉一次（single-flight）
+- 拉取失败不缓存，异常原样返回给本次调用方（与 gather(return_exceptions=True) 语义一致），下次重试
+- invalidate(symbol) / invalidate() 显式失效；全市场扫描刷新后会整体失效
+
+用法:
+    snap = await get_snapshot("BTC", ["get_header_data", "get_kline_data"])
+    header, kline = snap.results(["get_header_data", "get_kline_data"])
+    indicators = snap.derived("technical_indicators", ("get_kline_data", "get_header_data"), fn)
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.services.data_service import (
+    get_header_data,
+    get_kline_data,
+    get_trade_volume,
+    get_recent_news,
+    get_buy_sell_ratio,
+    get_open_interest,
+    get_funding_rate,
+    get_trading_volume,
+)
+from app.utils.logger import get_logger
+
+logger = get_logger("app.services.coin_snapshot")
+
+# 新闻统一按最大需求（量化 Skill 取 10 条）拉取，其他 Skill 自行截断
+NEWS_LIMIT = 10
+
+# 数据源名 → 拉取函数（名字与 SkillResult.api_calls 保持一致）
+SOURCES: Dict[str, Callable[[str], Any]] = {
+    "get_header_data": get_header_data,
+    "get_kline_data": get_kline_data,
+    "get_trade_volume": get_trade_volume,
+    "get_recent_news": lambda symbol: get_recent_news(symbol, limit=NEWS_LIMIT),
+    "get_buy_sell_ratio": get_buy_sell_ratio,
+    "get_open_interest": get_open_interest,
+    "get_funding_rate": get_funding_rate,
+    "get_trading_volume": get_trading_volume,
+}
+
+
+class CoinSnapshot:
+    """单个币种在一个 TTL 窗口内的数据快照"""
+
+    def __init__(self, symbol: str, ttl: float):
+        self.symbol = symbol
+        self.created_at = time.time()
+        self.expires_at = self.created_at + ttl
+        self._data: Dict[str, Any] = {}
+        self._errors: Dict[str, Exception] = {}
+        self._derived: Dict[Tuple, Any] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def has(self, name: str) -> bool:
+        return name in self._data
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self._data.get(name, default)
+
+    def result(self, name: str) -> Any:
+        """数据或本次拉取的异常（未请求过的数据源返回 KeyError 实例）"""
+        if name in self._data:
+            return self._data[name]
+        return self._errors.get(name) or KeyError(f"{name} 未加载")
+
+    def results(self, names: Iterable[str]) -> List[Any]:
+        return [self.result(name) for name in names]
+
+    def derived(self, key: str, deps: Tuple[str, ...], fn: Callable[[], Any]) -> Any:
+        """记忆化派生结果。依赖的数据源是否就绪也计入 key，补拉数据后会重新计算"""
+        memo_key = (key, tuple(d in self._data for d in deps))
+        with self._lock:
+            if memo_key in self._derived:
+                return self._derived[memo_key]
+        value = fn()
+        with self._lock:
+            return self._derived.setdefault(memo_key, value)
+
+    def ohlcv(self) -> Optional[dict]:
+        """解析后的日线 OHLCV（已用 header 实时价修正最后一根）。返回副本，调用方可随意修改"""
+        def _build():
+            from app.skills.analysis_skills.quantitative import (
+                _parse_kline, _extract_realtime_price, _apply_realtime_price,
+            )
+            parsed = _parse_kline(self.get("get_kline_data"), self.get("get_trade_volume"))
+            if parsed is None:
+                return None
+            return _apply_realtime_price(parsed, _extract_realtime_price(self._data))
+
+        parsed = self.derived("ohlcv", ("get_kline_data", "get_trade_volume", "get_header_data"), _build)
+        if parsed is None:
+            return None
+        return {k: list(v) if isinstance(v, list) else v for k, v in parsed.items()}
+
+    async def ensure(self, names: Iterable[str]):
+        """补齐缺失的数据源；同一数据源已有拉取在跑时直接等它"""
+        waiters = []
+        for name in names:
+            if name in self._data:
+                continue
+            if name not in SOURCES:
+                raise ValueError(f"未知数据源: {name}")
+            future = self._inflight.get(name)
+            if future is None or future.done():
+                future = asyncio.ensure_future(self._fetch(name))
+                self._inflight[name] = future
+            waiters.append(future)
+        if waiters:
+            await asyncio.gather(*(asyncio.shield(w) for w in waiters), return_exceptions=True)
+
+    async def _fetch(self, name: str):
+        try:
+            value = await asyncio.to_thread(SOURCES[name], self.symbol)
+        except Exception as e:
+            self._errors[name] = e
+            logger.info(f"  ⚠️ {self.symbol} {name} 拉取失败: {e}")
+        else:
+            self._data[name] = value
+            self._errors.pop(name, None)
+        finally:
+            self._inflight.pop(name, None)
+
+
+class CoinSnapshotCache:
+    """每币种快照的 LRU 容器"""
+
+    def __init__(self, ttl: float = 30.0, max_coins: int = 256):
+        self.ttl = ttl
+        self.max_coins = max_coins
+        self._snapshots: "OrderedDict[str, CoinSnapshot]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _current(self, symbol: str) -> CoinSnapshot:
+        with self._lock:
+            snap = self._snapshots.get(symbol)
+            if snap is None or snap.expired:
+                snap = CoinSnapshot(symbol, self.ttl)
+                self._snapshots[symbol] = snap
+            self._snapshots.move_to_end(symbol)
+            while len(self._snapshots) > self.max_coins:
+                self._snapshots.popitem(last=False)
+            return snap
+
+    async def get(self, symbol: str, names: Iterable[str]) -> CoinSnapshot:
+        snap = self._current(symbol)
+        await snap.ensure(names)
+        return snap
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """失效指定币种；不传则全部失效。已拿到快照引用的调用方不受影响"""
+        with self._lock:
+            if symbol is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(symbol, None)
+
+
+_settings = get_settings()
+_cache = CoinSnapshotCache(
+    ttl=_settings.coin_snapshot_ttl,
+    max_coins=_settings.coin_snapshot_max_coins,
+)
+
+
+async def get_snapshot(symbol: str, names: Iterable[str]) -> CoinSnapshot:
+    """获取币种快照，并保证 names 中的数据源已尝试加载"""
+    return await _cache.get(symbol, names)
+
+
+def invalidate(symbol: Optional[str] = None):
+    """显式失效币种快照（不传 symbol 则全部失效）"""
+    _cache.invalidate(symbol)
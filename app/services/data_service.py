@@ -1,12 +1,16 @@
+import concurrent.futures
 import requests
 import json
 import pymysql
 import time
 import threading
 from typing import Dict, List, Any, Optional
+from urllib.parse import urlsplit
 from app.core.config import get_settings
 from app.core.exceptions import DataFetchException, DatabaseException
+from app.utils.executors import KLINES, get_executor
 from app.utils.logger import get_logger
+from app.utils.metrics import UPSTREAM_FETCH_SECONDS, UPSTREAM_CACHE_TOTAL, instrument_connection
 
 settings = get_settings()
 logger = get_logger("app.services.data_service")
@@ -30,9 +34,9 @@ def get_db_pool():
     return None  # 返回None，使用单连接模式
 
 def get_db_connection():
-    """获取数据库连接（单连接模式）"""
+    """获取数据库连接（单连接模式，语句耗时计入 mysql_query_duration_seconds{db="agent"}）"""
     import pymysql
-    return pymysql.connect(
+    return instrument_connection(lambda: pymysql.connect(
         host=settings.mysql_host,
         port=settings.mysql_port,
         user=settings.mysql_user,
@@ -41,7 +45,7 @@ def get_db_connection():
         charset=settings.mysql_charset,
         connect_timeout=10,
         read_timeout=30
-    )
+    ), "agent")
 
 def close_db_pool():
     """关闭数据库连接"""
@@ -71,11 +75,18 @@ def _set_cached(url: str, data: Any, ttl: int = _CACHE_TTL):
         _api_cache[url] = (data, time.time() + ttl)
 
 
+def _endpoint_label(url: str) -> str:
+    """指标标签：只取 URL path（去掉 query，避免币种等参数撑爆标签基数）"""
+    return urlsplit(url).path or "/"
+
+
 def fetch_json_cached(url: str, timeout: int = None, max_retries: int = None, ttl: int = _CACHE_TTL) -> Any:
     """带缓存和并发去重的 fetch_json。同一 URL 在缓存有效期内只请求一次。"""
     cached = _get_cached(url)
     if cached is not None:
+        UPSTREAM_CACHE_TOTAL.inc(endpoint=_endpoint_label(url), result="hit")
         return cached
+    UPSTREAM_CACHE_TOTAL.inc(endpoint=_endpoint_label(url), result="miss")
 
     # 并发去重：如果已有线程在请求同一 URL，等待其结果
     my_event = None
@@ -111,7 +122,23 @@ def fetch_json_cached(url: str, timeout: int = None, max_retries: int = None, tt
 
 
 def fetch_json(url: str, timeout: int = None, max_retries: int = None) -> Any:
-    """通用JSON数据获取函数（支持重试和动态超时，带并发限流）"""
+    """通用JSON数据获取函数（支持重试和动态超时，带并发限流）
+
+    耗时（含重试）按 endpoint 计入 upstream_fetch_duration_seconds。
+    """
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        data = _fetch_json(url, timeout, max_retries)
+        outcome = "ok"
+        return data
+    finally:
+        UPSTREAM_FETCH_SECONDS.observe(
+            time.perf_counter() - t0, endpoint=_endpoint_label(url), outcome=outcome,
+        )
+
+
+def _fetch_json(url: str, timeout: int = None, max_retries: int = None) -> Any:
     if timeout is None:
         timeout = settings.api_timeout
     if max_retries is None:
@@ -157,15 +184,29 @@ KLINE_TYPE_META = {
 }
 
 
-def get_kline_data(symbol: str, kline_type: int = 2) -> Dict[str, Any]:
-    """获取K线数据，kline_type: 1=小时 2=天 3=周 4=月"""
+def _fetch_kline_payload(symbol: str, kline_type: int, tail_bars: Optional[int] = None) -> Dict[str, Any]:
+    """请求上游K线并取出 data 字段；tail_bars 不为空时按 KLINE_TAIL_PARAM 只取最后几根（不走 URL 缓存）"""
     url = f"{settings.kline_api_base}/detail/kline?symbol={symbol}&type={kline_type}"
-    try:
+    if tail_bars:
+        data = fetch_json(f"{url}&{settings.kline_tail_param}={tail_bars}")
+    else:
         data = fetch_json_cached(url)
-        if data.get("code") == 0:
-            return data.get("data") or {}
-        else:
-            raise DataFetchException(f"API返回错误: {data.get('errorMsg', '未知错误')}")
+    if data.get("code") == 0:
+        return data.get("data") or {}
+    raise DataFetchException(f"API返回错误: {data.get('errorMsg', '未知错误')}")
+
+
+def get_kline_data(symbol: str, kline_type: int = 2) -> Dict[str, Any]:
+    """获取K线数据，kline_type: 1=小时 2=天 3=周 4=月
+
+    KLINE_STORE_ENABLED 时由本地 K 线存储出数（增量追加最新几根，见 kline_store）。
+    """
+    try:
+        from app.services.kline_store import get_store
+        store = get_store(_fetch_kline_payload, fresh_seconds=_CACHE_TTL)
+        if store is not None:
+            return store.get(symbol, kline_type)
+        return _fetch_kline_payload(symbol, kline_type)
     except Exception as e:
         raise DataFetchException(f"获取K线数据失败: {str(e)}")
 
@@ -197,16 +238,33 @@ def get_kline_data_for_period(symbol: str, kline_type: int = 2) -> Dict[str, Any
     return trim_kline_data(get_kline_data(symbol, kline_type), kline_type)
 
 
+
 def get_multi_timeframe_klines(symbol: str, types: tuple = (1, 2, 3, 4)) -> Dict[str, Any]:
-    """获取多周期K线，失败的周期返回空字典，避免单一周期拖垮信号卡。"""
-    result = {}
+    """获取多周期K线（并发），失败或超时的周期返回空字典，避免单一周期拖垮信号卡。
+
+    每个周期最多等 KLINE_TIMEFRAME_TIMEOUT 秒（从提交起算）；超时的请求在后台继续跑完，
+    结果照常进缓存，下次出卡可直接命中。
+    """
+    timeout = settings.kline_timeframe_timeout
+    # 命名线程池 klines（有界：多个请求同时出卡时总并发仍受控，且不占用调用方线程池）
+    kline_pool = get_executor(KLINES)
+    futures = {}
     for kline_type in types:
         meta = KLINE_TYPE_META.get(kline_type, {"name": f"type_{kline_type}"})
+        futures[kline_pool.submit(get_kline_data_for_period, symbol, kline_type)] = meta["name"]
+
+    done, pending = concurrent.futures.wait(futures, timeout=timeout)
+    result = {}
+    for future, name in futures.items():
+        if future in pending:
+            logger.error(f"获取{name}超时({symbol}, >{timeout}s)")
+            result[name] = {}
+            continue
         try:
-            result[meta["name"]] = get_kline_data_for_period(symbol, kline_type)
+            result[name] = future.result()
         except Exception as e:
-            logger.error(f"获取{meta['name']}失败({symbol}): {e}")
-            result[meta["name"]] = {}
+            logger.error(f"获取{name}失败({symbol}): {e}")
+            result[name] = {}
     return result
 
 
@@ -237,47 +295,9 @@ def get_header_data(symbol: str) -> Dict[str, Any]:
 
 
 def get_news_from_mysql(symbol: str, limit: int = None) -> List[str]:
-    """从MySQL获取新闻数据（使用单连接模式）"""
-    if limit is None:
-        limit = settings.max_news_items
-
-    mysql = None
-    cursor = None
-    try:
-        # 直接创建数据库连接（单连接模式）
-        mysql = get_db_connection()
-        cursor = mysql.cursor()
-
-        sql = f"""
-        SELECT title, content, create_time, topic
-        FROM ods_news_feed_processed_di
-        WHERE coins RLIKE '{symbol}'
-        ORDER BY create_time DESC
-        LIMIT {limit}
-        """
-        cursor.execute(sql)
-        rows = cursor.fetchall()
-
-        news = []
-        for title, content, ct, topic in rows:
-            news.append(f"{ct}｜{title}｜{topic}")
-        return news
-    except Exception as e:
-        # 容错处理：不抛出异常，返回空列表
-        logger.error(f"获取新闻数据失败: {str(e)}")
-        return []
-    finally:
-        # 确保连接和游标被正确关闭
-        if cursor:
-            try:
-                cursor.close()
-            except Exception:
-                pass
-        if mysql:
-            try:
-                mysql.close()
-            except Exception:
-                pass
+    """从MySQL获取新闻数据（按币种索引 + 短 TTL 缓存，见 app.services.news_index）"""
+    from app.services.news_index import news_index
+    return news_index.get_news(symbol, limit)
 
 
 def validate_coin_exists(symbol: str) -> bool:
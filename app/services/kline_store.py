@@ -0,0 +1,326 @@
+"""
+本地 K 线存储 — SQLite 持久化 + 增量追加
+
+问题：get_kline_data 每次缓存过期（30s）都整段重拉：72 根小时线、60 根日线、
+近 1 年周线、月线全量。两次扫描之间真正变化的只有最后一两根。
+
+约定：
+- 按 (symbol, kline_type) 存一条序列：每根 K 线一行（bar_key = categoryData 里的时间串，
+  payload = 该根在各个按根对齐的列表字段里的值），非列表字段（币种名等）存在 series 元信息里
+- 首次 / 定期（KLINE_STORE_FULL_REFRESH）整段拉取并覆盖；其余时候只拉尾部
+  （上游 URL 追加 KLINE_TAIL_PARAM=KLINE_TAIL_BARS），按 bar_key 覆盖最后几根、追加新根
+- 尾部与本地没有重叠（中间缺根）或出现比本地最后一根更早的新 bar_key → 放弃增量，整段重拉
+- 序列长度保持与最近一次整段拉取一致（上游是滚动窗口）；月线（全量）只增不截
+- 未配置 KLINE_TAIL_PARAM 时每次仍整段拉取（上游不支持按条数取尾部），但同样按 bar_key 合并，
+  只写回有变化的根（不做整表 DELETE + 重插）
+- 合并在副本上进行，成功后才替换进程内副本；失败时原序列不动（回退整段也失败时照旧出本地数据）
+- 进程内另有已解码副本，新鲜期（与 fetch_json_cached 同为 30s）内不读盘也不发请求
+
+由 KLINE_STORE_ENABLED 开启；data_service.get_kline_data 透明切换，trim_kline_data /
+get_kline_data_for_period 照常在其结果上裁剪。
+"""
+from __future__ import annotations
+
+import dataclasses
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.utils.logger import get_logger
+
+logger = get_logger("app.services.kline_store")
+
+# 按根对齐的列表字段（与 trim_kline_data 裁剪的字段一致）
+SERIES_KEYS = ("values", "categoryData", "xAxisData")
+BAR_KEY = "categoryData"
+
+# 不截断的周期（月线全量）
+UNBOUNDED_TYPES = {4}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kline_series (
+    symbol TEXT NOT NULL,
+    kline_type INTEGER NOT NULL,
+    meta_json TEXT NOT NULL,
+    window INTEGER NOT NULL,
+    checked_at REAL NOT NULL,
+    full_at REAL NOT NULL,
+    PRIMARY KEY (symbol, kline_type)
+);
+CREATE TABLE IF NOT EXISTS kline_bars (
+    symbol TEXT NOT NULL,
+    kline_type INTEGER NOT NULL,
+    bar_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (symbol, kline_type, bar_key)
+) WITHOUT ROWID;
+"""
+
+
+@dataclass
+class KlineSeries:
+    """一条 (symbol, kline_type) 序列的内存形态"""
+    meta: Dict[str, Any]
+    keys: List[str]
+    bars: List[Dict[str, Any]]            # 每根：{字段名: 该根的值}
+    columns: Tuple[str, ...]              # 实际出现的列表字段（保持上游字段集合）
+    window: int
+    checked_at: float = 0.0
+    full_at: float = 0.0
+    index: Dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if not self.index:
+            self.index = {k: i for i, k in enumerate(self.keys)}
+
+    def to_payload(self) -> Dict[str, Any]:
+        """还原成与上游 data 字段同结构的 dict"""
+        result = dict(self.meta)
+        for col in self.columns:
+            result[col] = [bar.get(col) for bar in self.bars]
+        return result
+
+
+def split_payload(data: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], List[str], List[Dict[str, Any]], Tuple[str, ...]]]:
+    """上游 data → (meta, bar_keys, bars, columns)。缺 categoryData 或列表长度不齐时返回 None（不入库）"""
+    if not isinstance(data, dict):
+        return None
+    keys = data.get(BAR_KEY)
+    if not isinstance(keys, list) or not keys:
+        return None
+    columns = tuple(k for k in SERIES_KEYS if isinstance(data.get(k), list))
+    if any(len(data[c]) != len(keys) for c in columns):
+        return None
+    meta = {k: v for k, v in data.items() if k not in columns}
+    bars = [{c: data[c][i] for c in columns} for i in range(len(keys))]
+    return meta, [str(k) for k in keys], bars, columns
+
+
+def merge_tail(series: KlineSeries, tail: Dict[str, Any], bounded: bool) -> Optional[KlineSeries]:
+    """
+    把尾部数据并入序列的副本并返回（原序列不动）。返回 None 表示无法安全合并（需整段重拉）：
+    尾部与本地无重叠、字段集合变化、或出现早于本地末根的新 bar。
+    """
+    parts = split_payload(tail)
+    if parts is None:
+        return None
+    meta, keys, bars, columns = parts
+    if columns != series.columns or not keys or keys[0] not in series.index:
+        return None
+    merged_keys = list(series.keys)
+    merged_bars = list(series.bars)
+    index = dict(series.index)
+    last_key = merged_keys[-1]
+    for key, bar in zip(keys, bars):
+        pos = index.get(key)
+        if pos is not None:
+            merged_bars[pos] = bar
+        elif key > last_key:
+            index[key] = len(merged_keys)
+            merged_keys.append(key)
+            merged_bars.append(bar)
+            last_key = key
+        else:
+            return None
+    if bounded and len(merged_keys) > series.window:
+        drop = len(merged_keys) - series.window
+        merged_keys = merged_keys[drop:]
+        merged_bars = merged_bars[drop:]
+        index = {k: i for i, k in enumerate(merged_keys)}
+    return dataclasses.replace(series, meta=meta, keys=merged_keys, bars=merged_bars, index=index)
+
+
+def changed_keys(old: KlineSeries, new: KlineSeries) -> List[str]:
+    """new 里新增或取值变化的 bar_key（增量写盘只写这些）"""
+    return [k for k, bar in zip(new.keys, new.bars)
+            if k not in old.index or old.bars[old.index[k]] != bar]
+
+
+class KlineStore:
+    """SQLite 持久化的 K 线序列存储（线程安全，多进程共享同一文件）"""
+
+    def __init__(
+        self,
+        path: str,
+        fetch: Callable[[str, int, Optional[int]], Dict[str, Any]],
+        fresh_seconds: float = 30.0,
+        tail_bars: int = 3,
+        full_refresh_seconds: float = 21600.0,
+        incremental: bool = True,
+    ):
+        self.path = path
+        self._fetch = fetch
+        self.fresh_seconds = fresh_seconds
+        self.tail_bars = tail_bars
+        self.full_refresh_seconds = full_refresh_seconds
+        self.incremental = incremental
+        self._series: Dict[Tuple[str, int], KlineSeries] = {}
+        self._locks: Dict[Tuple[str, int], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def _lock_for(self, key: Tuple[str, int]) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, symbol: str, kline_type: int) -> Dict[str, Any]:
+        """取序列（必要时整段或增量刷新）；上游失败且本地有数据时返回本地数据"""
+        key = (symbol, kline_type)
+        with self._lock_for(key):
+            series = self._series.get(key) or self._load(symbol, kline_type)
+            now = time.time()
+            if series is not None and now - series.checked_at < self.fresh_seconds:
+                return series.to_payload()
+            try:
+                series = self._refresh(symbol, kline_type, series, now)
+            except Exception:
+                if series is None:
+                    raise
+                logger.warning(f"K线刷新失败，使用本地数据 {symbol}/{kline_type}")
+            return series.to_payload()
+
+    def _refresh(self, symbol: str, kline_type: int, series: Optional[KlineSeries], now: float) -> KlineSeries:
+        bounded = kline_type not in UNBOUNDED_TYPES
+        data = None
+        if series is not None and series.keys and now - series.full_at < self.full_refresh_seconds:
+            # 无 KLINE_TAIL_PARAM 时拉到的是整段，同样按 bar_key 合并
+            tail = self._fetch(symbol, kline_type, self.tail_bars if self.incremental else None)
+            merged = merge_tail(series, tail, bounded)
+            if merged is not None:
+                merged.checked_at = now
+                self._series[(symbol, kline_type)] = merged
+                self._save(symbol, kline_type, merged, changed=changed_keys(series, merged))
+                return merged
+            logger.info(f"K线增量无法衔接，整段重拉 {symbol}/{kline_type}")
+            if not self.incremental:
+                data = tail
+
+        if data is None:
+            data = self._fetch(symbol, kline_type, None)
+        parts = split_payload(data)
+        if parts is None:
+            # 结构不认识（空数据等）：不入库，原样透传
+            return KlineSeries(meta=dict(data or {}), keys=[], bars=[], columns=(), window=0,
+                               checked_at=now, full_at=now)
+        meta, keys, bars, columns = parts
+        series = KlineSeries(meta=meta, keys=keys, bars=bars, columns=columns,
+                             window=len(keys), checked_at=now, full_at=now)
+        self._series[(symbol, kline_type)] = series
+        self._save(symbol, kline_type, series, replace=True)
+        return series
+
+    # ── SQLite 读写 ──
+
+    def _load(self, symbol: str, kline_type: int) -> Optional[KlineSeries]:
+        with self._db_lock:
+            head = self._db.execute(
+                "SELECT meta_json, window, checked_at, full_at FROM kline_series WHERE symbol=? AND kline_type=?",
+                (symbol, kline_type),
+            ).fetchone()
+            if head is None:
+                return None
+            rows = self._db.execute(
+                "SELECT bar_key, payload FROM kline_bars WHERE symbol=? AND kline_type=? ORDER BY bar_key",
+                (symbol, kline_type),
+            ).fetchall()
+        if not rows:
+            return None
+        meta = json.loads(head[0])
+        columns = tuple(meta.pop("__columns__", ()))
+        series = KlineSeries(
+            meta=meta,
+            keys=[r[0] for r in rows],
+            bars=[json.loads(r[1]) for r in rows],
+            columns=columns,
+            window=head[1],
+            checked_at=head[2],
+            full_at=head[3],
+        )
+        self._series[(symbol, kline_type)] = series
+        return series
+
+    def _save(self, symbol: str, kline_type: int, series: KlineSeries, replace: bool = False,
+              changed: Optional[List[str]] = None):
+        """整段拉取时全量替换；合并时只写 changed 里的根 + 删除被截掉的旧根"""
+        meta = dict(series.meta, __columns__=list(series.columns))
+        if replace:
+            bars = list(zip(series.keys, series.bars))
+        else:
+            bars = [(k, series.bars[series.index[k]]) for k in changed or ()]
+        try:
+            with self._db_lock, self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO kline_series (symbol, kline_type, meta_json, window, checked_at, full_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (symbol, kline_type, json.dumps(meta, ensure_ascii=False), series.window,
+                     series.checked_at, series.full_at),
+                )
+                if replace:
+                    self._db.execute("DELETE FROM kline_bars WHERE symbol=? AND kline_type=?", (symbol, kline_type))
+                elif series.keys:
+                    self._db.execute(
+                        "DELETE FROM kline_bars WHERE symbol=? AND kline_type=? AND bar_key < ?",
+                        (symbol, kline_type, series.keys[0]),
+                    )
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO kline_bars (symbol, kline_type, bar_key, payload) VALUES (?, ?, ?, ?)",
+                    [(symbol, kline_type, k, json.dumps(b, ensure_ascii=False)) for k, b in bars],
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"K线本地存储写入失败 {symbol}/{kline_type}: {e}")
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """丢弃进程内副本（下次从磁盘加载并按需刷新）"""
+        if symbol is None:
+            self._series.clear()
+        else:
+            for key in [k for k in self._series if k[0] == symbol]:
+                self._series.pop(key, None)
+
+
+_store: Optional[KlineStore] = None
+_store_lock = threading.Lock()
+
+
+def store_path() -> str:
+    settings = get_settings()
+    return settings.kline_store_path or os.path.join(tempfile.gettempdir(), "mozi_klines.sqlite3")
+
+
+def get_store(
+    fetch: Callable[[str, int, Optional[int]], Dict[str, Any]],
+    fresh_seconds: float = 30.0,
+) -> Optional[KlineStore]:
+    """KLINE_STORE_ENABLED 时返回全局存储（首次调用时创建）；打不开 SQLite 时返回 None 走原路径"""
+    global _store
+    settings = get_settings()
+    if not settings.kline_store_enabled:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = KlineStore(
+                        store_path(),
+                        fetch,
+                        fresh_seconds=fresh_seconds,
+                        tail_bars=settings.kline_tail_bars,
+                        full_refresh_seconds=settings.kline_store_full_refresh,
+                        incremental=bool(settings.kline_tail_param),
+                    )
+                    logger.info(f"K线本地存储: {_store.path}")
+                except Exception as e:
+                    logger.warning(f"K线本地存储不可用，回退直连: {e}")
+                    settings.kline_store_enabled = False
+                    return None
+    return _store
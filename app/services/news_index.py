@@ -0,0 +1,291 @@
+"""
+新闻按币种索引 — 替代 get_news_from_mysql 对 ods_news_feed_processed_di 的 RLIKE 全表扫描
+
+问题：原查询 `WHERE coins RLIKE '{symbol}'` 每次全表扫描，且 symbol 直接拼进 SQL；
+综合分析 / 情绪 / 新闻问答都会查新闻，每次新建连接再扫一遍全表。
+
+约定：
+- news_coin_index：一条新闻按 coins 字段拆成多行（coin, create_time, title, topic），
+  (coin, create_time) 索引，按币取最新 N 条是一次索引范围扫描
+- 源表由外部管道写入，这里用增量同步充当写入钩子：leader 上的 news_index_sync 任务每
+  NEWS_INDEX_SYNC_INTERVAL 秒按 create_time 水位（索引表 MAX(create_time)）拉新行拆币写入，
+  (coin, news_key) 唯一键去重；首次同步回填 NEWS_INDEX_BACKFILL_DAYS 天，超过
+  NEWS_INDEX_RETENTION_DAYS 天的索引行分块清理
+- 每轮从 水位 - NEWS_INDEX_SYNC_OVERLAP 秒开始重扫，补上晚写入源表、时间戳略早于水位的新闻；
+  比水位早超过这个窗口才到的新闻不会进索引（只能从源表查到）
+- 币种匹配从 RLIKE 子串改为精确匹配（原来 ETH 会命中 ETHFI 的新闻）
+- 按币的最新新闻进程内缓存 NEWS_CACHE_TTL 秒；同步写入后失效对应币种
+- 首次回填读到源表末尾后才在 news_index_meta 记下 backfill_done，之前（含回填中途失败、
+  索引只有部分数据时）查询一律回退源表（参数化 RLIKE）；所有 SQL 均参数化
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.utils.logger import get_logger
+
+settings = get_settings()
+logger = get_logger("app.services.news_index")
+
+SOURCE_TABLE = "ods_news_feed_processed_di"
+
+_CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS news_coin_index (
+        id BIGINT PRIMARY KEY AUTO_INCREMENT,
+        coin VARCHAR(32) NOT NULL COMMENT '币种（大写）',
+        news_key CHAR(16) NOT NULL COMMENT 'blake2b(create_time|title) 去重键',
+        create_time DATETIME NOT NULL COMMENT '新闻时间（源表 create_time）',
+        title TEXT COMMENT '标题',
+        topic VARCHAR(255) COMMENT '主题',
+        UNIQUE KEY uk_coin_news (coin, news_key),
+        INDEX idx_coin_time (coin, create_time),
+        INDEX idx_create_time (create_time)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='新闻按币种索引'
+"""
+
+_CREATE_META_SQL = """
+    CREATE TABLE IF NOT EXISTS news_index_meta (
+        name VARCHAR(32) PRIMARY KEY,
+        value DATETIME COMMENT '标记对应的源表 create_time',
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='新闻索引同步状态'
+"""
+
+BACKFILL_MARKER = "backfill_done"
+
+_SYMBOL_RE = re.compile(r"^[A-Za-z0-9]{1,32}$")
+_TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
+_READY_TTL = 300  # 索引表是否可用的检查结果缓存（秒）
+
+
+def split_coins(raw) -> List[str]:
+    """源表 coins 字段（逗号 / 空格 / JSON 数组等任意分隔）→ 去重的大写币种列表"""
+    if not raw:
+        return []
+    seen = []
+    for token in _TOKEN_RE.findall(str(raw)):
+        coin = token.upper()
+        if len(coin) <= 32 and coin not in seen:
+            seen.append(coin)
+    return seen
+
+
+def _news_key(create_time, title) -> str:
+    return hashlib.blake2b(f"{create_time}|{title}".encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _format(rows) -> List[str]:
+    return [f"{ct}｜{title}｜{topic}" for title, ct, topic in rows]
+
+
+class NewsIndex:
+    """按币种的新闻索引：查询（带缓存）+ 增量同步 + 过期清理"""
+
+    def __init__(self):
+        self._cache: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+        self._cache_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._table_ready = False
+        self._backfilled = False
+        self._ready: Optional[bool] = None
+        self._ready_checked = 0.0
+
+    def _get_conn(self):
+        from app.services.data_service import get_db_connection
+        return get_db_connection()
+
+    # ── 查询 ──
+
+    def get_news(self, symbol: str, limit: Optional[int] = None) -> List[str]:
+        """币种最新 limit 条新闻（"时间｜标题｜主题"），失败返回空列表"""
+        limit = limit or settings.max_news_items
+        if not symbol or not _SYMBOL_RE.match(symbol):
+            return []
+        key = (symbol.upper(), limit)
+        now = time.time()
+        with self._cache_lock:
+            hit = self._cache.get(key)
+            if hit and hit[0] > now:
+                return list(hit[1])
+
+        conn = None
+        try:
+            conn = self._get_conn()
+            with conn.cursor() as cursor:
+                if settings.news_index_enabled and self._index_ready(cursor):
+                    cursor.execute(
+                        "SELECT title, create_time, topic FROM news_coin_index "
+                        "WHERE coin = %s ORDER BY create_time DESC LIMIT %s",
+                        (key[0], limit),
+                    )
+                else:
+                    cursor.execute(
+                        f"SELECT title, create_time, topic FROM {SOURCE_TABLE} "
+                        "WHERE coins RLIKE %s ORDER BY create_time DESC LIMIT %s",
+                        (symbol, limit),
+                    )
+                news = _format(cursor.fetchall())
+        except Exception as e:
+            # 容错处理：不抛出异常，返回空列表
+            logger.error(f"获取新闻数据失败: {str(e)}")
+            return []
+        finally:
+            if conn:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+        with self._cache_lock:
+            self._cache[key] = (now + settings.news_cache_ttl, news)
+        return list(news)
+
+    def _index_ready(self, cursor) -> bool:
+        """首次回填已完成（持久化标记，跨 worker 可见；结果缓存 _READY_TTL 秒，本进程回填完直接置为可用）"""
+        now = time.time()
+        if self._ready is not None and now - self._ready_checked < _READY_TTL:
+            return self._ready
+        try:
+            cursor.execute("SELECT 1 FROM news_index_meta WHERE name = %s", (BACKFILL_MARKER,))
+            self._ready = cursor.fetchone() is not None
+        except Exception:
+            self._ready = False
+        self._ready_checked = now
+        return self._ready
+
+    def invalidate(self, coins=None):
+        with self._cache_lock:
+            if coins is None:
+                self._cache.clear()
+                return
+            coins = set(coins)
+            for key in [k for k in self._cache if k[0] in coins]:
+                del self._cache[key]
+
+    # ── 同步 ──
+
+    def init_storage(self) -> bool:
+        """建索引表和同步状态表（只做一次）"""
+        if self._table_ready:
+            return True
+        conn = None
+        try:
+            conn = self._get_conn()
+            with conn.cursor() as cursor:
+                cursor.execute(_CREATE_TABLE_SQL)
+                cursor.execute(_CREATE_META_SQL)
+            conn.commit()
+            self._table_ready = True
+            return True
+        except Exception as e:
+            logger.warning(f"news_coin_index 建表检查失败，新闻查询回退源表: {e}")
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+    def sync(self, batch_size: Optional[int] = None) -> int:
+        """从源表增量拉取新行写入索引，返回写入的索引行数"""
+        if not self.init_storage() or not self._sync_lock.acquire(blocking=False):
+            return 0
+        batch_size = batch_size or settings.news_index_sync_batch
+        written = 0
+        touched = set()
+        conn = None
+        try:
+            conn = self._get_conn()
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT MAX(create_time) FROM news_coin_index")
+                row = cursor.fetchone()
+                if row and row[0]:
+                    watermark = row[0] - timedelta(seconds=settings.news_index_sync_overlap)
+                else:
+                    watermark = datetime.now() - timedelta(days=settings.news_index_backfill_days)
+                after = False  # 水位时间戳上的新闻已全部读完，下一批从其后开始
+                while True:
+                    # >= 水位：同一时间戳的新闻可能跨批次到达，靠唯一键去重
+                    cursor.execute(
+                        f"SELECT title, topic, create_time, coins FROM {SOURCE_TABLE} "
+                        f"WHERE create_time {'>' if after else '>='} %s ORDER BY create_time LIMIT %s",
+                        (watermark, batch_size),
+                    )
+                    rows = cursor.fetchall()
+                    full = len(rows) >= batch_size
+                    after = full and rows[0][2] == rows[-1][2]
+                    if after:
+                        # 整批同一时间戳：该时间戳一次读完，否则每轮都停在同一水位，后面的新闻永远同步不到
+                        cursor.execute(
+                            f"SELECT title, topic, create_time, coins FROM {SOURCE_TABLE} WHERE create_time = %s",
+                            (rows[0][2],),
+                        )
+                        rows = cursor.fetchall()
+                    values = []
+                    for title, topic, ct, coins in rows:
+                        key = _news_key(ct, title)
+                        for coin in split_coins(coins):
+                            values.append((coin, key, ct, title, topic))
+                            touched.add(coin)
+                    if values:
+                        written += cursor.executemany(
+                            "INSERT IGNORE INTO news_coin_index (coin, news_key, create_time, title, topic) "
+                            "VALUES (%s, %s, %s, %s, %s)",
+                            values,
+                        ) or 0
+                        conn.commit()
+                    if not full:
+                        break
+                    watermark = rows[-1][2]
+                # 读到了源表末尾：回填完成，之后查询才切到索引表
+                if not self._backfilled:
+                    cursor.execute(
+                        "INSERT INTO news_index_meta (name, value) VALUES (%s, %s) "
+                        "ON DUPLICATE KEY UPDATE value = VALUES(value)",
+                        (BACKFILL_MARKER, rows[-1][2] if rows else watermark),
+                    )
+                    conn.commit()
+                    self._backfilled = True
+                    self._ready, self._ready_checked = True, time.time()
+        except Exception as e:
+            logger.error(f"新闻索引同步失败: {e}")
+        finally:
+            if conn:
+                conn.close()
+            self._sync_lock.release()
+        if written:
+            self.invalidate(touched)
+            logger.info(f"新闻索引同步: 新增 {written} 行（{len(touched)} 个币种）")
+        return written
+
+    def sweep_retention(self) -> int:
+        """删除超过保留期的索引行（分块，避免大事务锁表），返回删除行数"""
+        if not self._table_ready:
+            return 0
+        threshold = datetime.now() - timedelta(days=settings.news_index_retention_days)
+        deleted = 0
+        conn = None
+        try:
+            conn = self._get_conn()
+            with conn.cursor() as cursor:
+                while True:
+                    n = cursor.execute(
+                        "DELETE FROM news_coin_index WHERE create_time < %s LIMIT 5000", (threshold,))
+                    conn.commit()
+                    deleted += n
+                    if n < 5000:
+                        break
+        except Exception as e:
+            logger.error(f"新闻索引清理失败: {e}")
+        finally:
+            if conn:
+                conn.close()
+        return deleted
+
+
+# 全局单例
+news_index = NewsIndex()
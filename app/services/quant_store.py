@@ -0,0 +1,184 @@
+"""
+量化六因子结果存储 — 扫描算一次，聊天直接复用
+
+全市场扫描（fusion._quantitative_source）每 30 分钟已对每个 discovery 币种跑过完整的
+六因子（日线 + 1h）、市场状态、双周期融合和 TradeSignal。聊天请求命中新鲜结果时只需
+用实时价修正 OHLCV（_apply_realtime_price）并重算价位，跳过全部因子计算。
+
+两种后端，接口一致（put / get / invalidate）：
+- 进程内存 dict：默认；多 worker 时只有执行扫描的 worker 能命中
+- Redis：quant:{COIN} 一个 JSON 字符串 + EX 过期，所有 worker 共享
+
+由 QUANT_STORE_BACKEND=memory|redis 选择；redis 不可用时自动回退内存。
+单例 quant_store 惰性创建后端：导入本模块不连接 / ping Redis，首次 put / get 时才创建。
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from app.core.config import get_settings
+from app.skills.analysis_skills.quantitative import FactorResult, TradeSignal
+from app.utils.logger import get_logger
+
+logger = get_logger("app.services.quant_store")
+
+
+@dataclass
+class QuantResult:
+    """一个币种一次完整六因子计算的产物"""
+    symbol: str
+    factors: List[FactorResult]
+    factors_1h: Optional[List[FactorResult]]
+    regime: str
+    fused_composite: float
+    dual_tf_info: dict
+    signal: TradeSignal
+    ohlcv: dict                      # 计算时使用的日线 OHLCV（已含当时实时价）
+    bar_date: str = ""               # 日线最后一根日期，跨日后不再复用
+    computed_at: float = field(default_factory=time.time)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False, default=str)
+
+    @classmethod
+    def from_json(cls, text: str) -> "QuantResult":
+        d = json.loads(text)
+        signal = dict(d["signal"])
+        signal["factors"] = [FactorResult(**f) for f in signal.get("factors") or []]
+        return cls(
+            symbol=d["symbol"],
+            factors=[FactorResult(**f) for f in d["factors"]],
+            factors_1h=[FactorResult(**f) for f in d["factors_1h"]] if d.get("factors_1h") else None,
+            regime=d["regime"],
+            fused_composite=d["fused_composite"],
+            dual_tf_info=d.get("dual_tf_info") or {},
+            signal=TradeSignal(**signal),
+            ohlcv=d["ohlcv"],
+            bar_date=d.get("bar_date", ""),
+            computed_at=d["computed_at"],
+        )
+
+
+class MemoryQuantStore:
+    """进程内存存储"""
+
+    def __init__(self, ttl: int):
+        self._ttl = ttl
+        self._items: Dict[str, QuantResult] = {}
+        self._lock = threading.Lock()
+
+    def put(self, result: QuantResult):
+        with self._lock:
+            self._items[result.symbol.upper()] = result
+            # 顺带清理过期项（币种数有限，全量扫一遍开销可忽略）
+            now = time.time()
+            for k in [k for k, v in self._items.items() if now - v.computed_at > self._ttl]:
+                del self._items[k]
+
+    def get(self, symbol: str) -> Optional[QuantResult]:
+        with self._lock:
+            result = self._items.get(symbol.upper())
+        if result is None or time.time() - result.computed_at > self._ttl:
+            return None
+        return result
+
+    def invalidate(self, symbol: Optional[str] = None):
+        with self._lock:
+            if symbol is None:
+                self._items.clear()
+            else:
+                self._items.pop(symbol.upper(), None)
+
+
+class RedisQuantStore:
+    """Redis 存储，多 worker 共享；读失败视为未命中"""
+
+    KEY_PREFIX = "quant:"
+
+    def __init__(self, client, ttl: int):
+        self.client = client
+        self._ttl = ttl
+
+    def put(self, result: QuantResult):
+        try:
+            self.client.set(f"{self.KEY_PREFIX}{result.symbol.upper()}", result.to_json(), ex=self._ttl)
+        except Exception as e:
+            logger.warning(f"量化结果写入 Redis 失败 {result.symbol}: {e}")
+
+    def get(self, symbol: str) -> Optional[QuantResult]:
+        try:
+            text = self.client.get(f"{self.KEY_PREFIX}{symbol.upper()}")
+            return QuantResult.from_json(text) if text else None
+        except Exception as e:
+            logger.warning(f"量化结果读取 Redis 失败 {symbol}: {e}")
+            return None
+
+    def invalidate(self, symbol: Optional[str] = None):
+        try:
+            if symbol is not None:
+                self.client.delete(f"{self.KEY_PREFIX}{symbol.upper()}")
+                return
+            keys = list(self.client.scan_iter(match=f"{self.KEY_PREFIX}*", count=500))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"量化结果失效 Redis 失败: {e}")
+
+
+def _create_store():
+    """按 QUANT_STORE_BACKEND 创建存储；redis 不可用时回退内存"""
+    settings = get_settings()
+    backend = (settings.quant_store_backend or "memory").strip().lower()
+    if backend == "redis":
+        try:
+            import redis
+            client = redis.Redis(
+                host=settings.redis_host,
+                port=settings.redis_port,
+                db=settings.redis_db,
+                password=settings.redis_password or None,
+                decode_responses=True,
+                socket_connect_timeout=3,
+                socket_timeout=3,
+                protocol=2,
+            )
+            client.ping()
+            logger.info(f"量化结果存储: Redis ({settings.redis_host}:{settings.redis_port})")
+            return RedisQuantStore(client, ttl=settings.quant_store_ttl)
+        except Exception as e:
+            logger.warning(f"量化结果存储: Redis 不可用，回退内存 ({e})")
+    return MemoryQuantStore(ttl=settings.quant_store_ttl)
+
+
+class LazyQuantStore:
+    """首次使用时才按 QUANT_STORE_BACKEND 创建后端 — 导入本模块不连接 / ping Redis"""
+
+    def __init__(self, factory=_create_store):
+        self._factory = factory
+        self._impl = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._impl is None:
+            with self._lock:
+                if self._impl is None:
+                    self._impl = self._factory()
+        return self._impl
+
+    def put(self, result: QuantResult):
+        self.backend.put(result)
+
+    def get(self, symbol: str) -> Optional[QuantResult]:
+        return self.backend.get(symbol)
+
+    def invalidate(self, symbol: Optional[str] = None):
+        self.backend.invalidate(symbol)
+
+
+# 全局单例（惰性创建后端）
+quant_store = LazyQuantStore()
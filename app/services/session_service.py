@@ -1,14 +1,29 @@
 """会话管理服务 - 支持多用户会话隔离"""
+import threading
 import pymysql
-from typing import List, Optional, Dict, Any
-from collections import OrderedDict
+from typing import Deque, List, Optional, Dict, Any
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
 from app.core.config import get_settings
+from app.utils.executors import MAINTENANCE, get_executor
 from app.utils.logger import get_logger
+from app.utils.metrics import instrument_connection
 
 settings = get_settings()
 logger = get_logger("app.services.session_service")
 
+_CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS session_history (
+        id BIGINT PRIMARY KEY AUTO_INCREMENT,
+        session_id VARCHAR(100) NOT NULL COMMENT '会话ID，由外层后端生成',
+        role VARCHAR(20) NOT NULL COMMENT '角色：user/assistant',
+        content TEXT NOT NULL COMMENT '消息内容',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+        INDEX idx_session_id (session_id),
+        INDEX idx_created_at (created_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='会话历史表'
+"""
+
 
 class LRUCache:
     """简单的LRU缓存实现"""
@@ -52,7 +67,18 @@ class LRUCache:
 
 
 class SessionService:
-    """会话管理服务 - 支持多用户会话隔离"""
+    """会话管理服务 - 支持多用户会话隔离
+
+    持久化采用 write-behind：
+    - add_message 只更新内存缓存并入队，不触碰数据库
+    - flush() 把队列按批次用多行 INSERT 写入（executemany），由后台任务周期调用，
+      队列积压到 batch_size 时提交一次 flush 到 maintenance 线程池（不在调用线程写库）
+    - 队列有上限，超限（入队或写失败放回时）一律丢弃最旧的待写消息（记 WARNING），保护内存
+    - clear_session 持有 _flush_lock：正在写的批次写完后再删库，已清除会话的消息不会被写回
+    - 建表检查只在 init_storage() 时做一次
+    - 保留策略由 sweep_retention() 周期性按集合删除，不再逐条消息清理
+    - shutdown() 在进程退出前把剩余队列刷完
+    """
 
     def __init__(self):
         self.settings = settings
@@ -60,6 +86,14 @@ class SessionService:
         self._cache = LRUCache(capacity=100)
         # 最大保留消息数（50轮=100条消息）
         self._max_messages = 100
+        # 待写队列：(session_id, role, content, created_at)
+        self._pending: Deque[tuple] = deque()
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._table_ready = False
+        self._dirty = False  # 上次 sweep 之后是否有新写入
+        self._dropped = 0
+        self._flush_scheduled = False
 
     def get_history(self, session_id: str, limit: int = 50) -> List[Dict[str, Any]]:
         """
@@ -82,8 +116,13 @@ class SessionService:
                 messages = cached[-limit*2:]
                 return [{"role": role, "content": content} for role, content in messages]
 
-            # 2. 缓存未命中，查数据库
+            # 2. 缓存未命中，查数据库，并补上尚未落库的待写消息
             messages = self._load_from_db(session_id, limit)
+            with self._pending_lock:
+                pending = [p for p in self._pending if p[0] == session_id]
+            for _, role, content, created_at in pending:
+                messages.append({"role": role, "content": content, "created_at": created_at.isoformat()})
+            messages = messages[-limit*2:]
             # 缓存到内存
             self._cache.put(session_id, [(m["role"], m["content"]) for m in messages])
             return messages
@@ -95,7 +134,7 @@ class SessionService:
 
     def add_message(self, session_id: str, role: str, content: str):
         """
-        添加消息到会话历史
+        添加消息到会话历史（写内存 + 入队，落库由 flush 异步完成）
 
         Args:
             session_id: 会话ID
@@ -118,20 +157,51 @@ class SessionService:
 
             self._cache.put(session_id, cached)
 
-            # 写入数据库
-            self._save_to_db(session_id, role, content)
-
-            # 清理数据库中的旧记录（只保留最新的50轮）
-            self._cleanup_db(session_id, 50)
+            # 入队等待批量写入
+            with self._pending_lock:
+                self._pending.append((session_id, role, content, datetime.now()))
+                overflow = len(self._pending) - self.settings.session_history_queue_max
+                for _ in range(max(0, overflow)):
+                    self._pending.popleft()
+                    self._dropped += 1
+                backlog = len(self._pending)
+            if overflow > 0:
+                logger.warning(f"会话历史写队列已满，丢弃最旧 {overflow} 条（累计 {self._dropped}）")
+
+            # 积压达到一个批次时交给 maintenance 线程池刷一次
+            if backlog >= self.settings.session_history_batch_size:
+                self._schedule_flush()
 
         except Exception as e:
             # 数据库写入失败，仅记录日志不中断服务
             logger.error(f"保存会话消息失败: {e}")
 
+    def _schedule_flush(self):
+        """把一次 flush 提交到 maintenance 线程池（已提交未执行时不重复提交）"""
+        with self._pending_lock:
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+
+        def _run():
+            try:
+                self.flush(blocking=False)
+            finally:
+                self._flush_scheduled = False
+
+        try:
+            get_executor(MAINTENANCE).submit(_run)
+        except Exception as e:
+            self._flush_scheduled = False
+            logger.warning(f"会话历史刷写提交失败，等待周期任务: {e}")
+
     def clear_session(self, session_id: str):
         """
         清除指定会话
 
+        持有 _flush_lock：flush 已取出（或写失败放回）的批次要么在删库前写完，
+        要么在这里从队列中剔除，不会在删库之后再写回。
+
         Args:
             session_id: 会话ID
         """
@@ -139,10 +209,13 @@ class SessionService:
             return
 
         try:
-            # 清除缓存
-            self._cache.delete(session_id)
-            # 删除数据库记录
-            self._delete_from_db(session_id)
+            with self._flush_lock:
+                # 清除缓存与待写队列
+                self._cache.delete(session_id)
+                with self._pending_lock:
+                    self._pending = deque(p for p in self._pending if p[0] != session_id)
+                # 删除数据库记录
+                self._delete_from_db(session_id)
         except Exception as e:
             logger.error(f"清除会话失败: {e}")
 
@@ -150,9 +223,130 @@ class SessionService:
         """清除所有会话缓存"""
         self._cache.clear()
 
+    def pending_count(self) -> int:
+        """待写入数据库的消息数"""
+        with self._pending_lock:
+            return len(self._pending)
+
+    # ================================================================
+    # 持久化：启动建表 / 批量刷写 / 周期清理 / 退出刷写
+    # ================================================================
+
+    def init_storage(self) -> bool:
+        """启动时检查并创建 session_history 表（只做一次）"""
+        if self._table_ready:
+            return True
+        connection = None
+        try:
+            connection = self._get_db_connection()
+            with connection.cursor() as cursor:
+                cursor.execute(_CREATE_TABLE_SQL)
+            connection.commit()
+            self._table_ready = True
+            return True
+        except Exception as e:
+            logger.warning(f"session_history 建表检查失败，持久化暂不可用: {e}")
+            return False
+        finally:
+            if connection:
+                connection.close()
+
+    def flush(self, blocking: bool = True) -> int:
+        """把待写队列批量写入数据库，返回写入条数
+
+        每批一条多行 INSERT；写失败时本批放回队首（仍受队列上限约束），下次再试。
+        """
+        if not self._flush_lock.acquire(blocking=blocking):
+            return 0
+        written = 0
+        try:
+            if not self._pending or not self.init_storage():
+                return 0
+            batch_size = self.settings.session_history_batch_size
+            while True:
+                with self._pending_lock:
+                    batch = [self._pending.popleft()
+                             for _ in range(min(batch_size, len(self._pending)))]
+                if not batch:
+                    break
+                try:
+                    self._insert_batch(batch)
+                except Exception as e:
+                    with self._pending_lock:
+                        self._pending.extendleft(reversed(batch))
+                        overflow = len(self._pending) - self.settings.session_history_queue_max
+                        for _ in range(max(0, overflow)):
+                            self._pending.popleft()
+                            self._dropped += 1
+                    logger.error(f"会话历史批量写入失败（{len(batch)} 条待重试）: {e}")
+                    break
+                written += len(batch)
+                self._dirty = True
+            return written
+        finally:
+            self._flush_lock.release()
+
+    def sweep_retention(self, max_rounds: int = None, time_limit_hours: int = None) -> int:
+        """按集合清理旧记录，返回删除行数
+
+        清理策略（与原逐条清理一致，只是改为全表一次完成）：
+        1. 删除超过N小时（默认1小时）的旧消息
+        2. 每个会话只保留最新的 max_rounds 轮（max_rounds*2 条）
+        """
+        if not self._dirty or not self._table_ready:
+            return 0
+        max_rounds = max_rounds or self.settings.session_history_max_rounds
+        time_limit_hours = time_limit_hours or self.settings.session_history_retention_hours
+        connection = None
+        deleted = 0
+        try:
+            connection = self._get_db_connection()
+            with connection.cursor() as cursor:
+                time_threshold = datetime.now() - timedelta(hours=time_limit_hours)
+                # 分块删除，避免大事务长时间锁表
+                while True:
+                    n = cursor.execute(
+                        "DELETE FROM session_history WHERE created_at < %s LIMIT 5000",
+                        (time_threshold,),
+                    )
+                    connection.commit()
+                    deleted += n
+                    if n < 5000:
+                        break
+
+                deleted += cursor.execute("""
+                    DELETE h FROM session_history h
+                    JOIN (
+                        SELECT id FROM (
+                            SELECT id, ROW_NUMBER() OVER (
+                                PARTITION BY session_id ORDER BY created_at DESC, id DESC
+                            ) AS rn
+                            FROM session_history
+                        ) ranked
+                        WHERE ranked.rn > %s
+                    ) stale ON h.id = stale.id
+                """, (max_rounds * 2,))
+                connection.commit()
+            self._dirty = False
+            return deleted
+        finally:
+            if connection:
+                connection.close()
+
+    def shutdown(self):
+        """进程退出前刷完剩余队列"""
+        remaining = self.pending_count()
+        if not remaining:
+            return
+        written = self.flush()
+        if written < remaining:
+            logger.warning(f"会话历史退出刷写: {written}/{remaining} 条写入，其余丢弃")
+        else:
+            logger.info(f"会话历史退出刷写: {written} 条")
+
     def _get_db_connection(self):
         """获取数据库连接"""
-        return pymysql.connect(
+        return instrument_connection(lambda: pymysql.connect(
             host=self.settings.mysql_host,
             port=self.settings.mysql_port,
             user=self.settings.mysql_user,
@@ -160,7 +354,7 @@ class SessionService:
             database=self.settings.mysql_database,
             charset=self.settings.mysql_charset,
             cursorclass=pymysql.cursors.DictCursor
-        )
+        ), "session")
 
     def _load_from_db(self, session_id: str, limit: int, time_limit_hours: int = 1) -> List[Dict[str, Any]]:
         """
@@ -174,22 +368,12 @@ class SessionService:
         Returns:
             会话历史消息列表
         """
+        if not self.init_storage():
+            return []
         connection = None
         try:
             connection = self._get_db_connection()
             with connection.cursor() as cursor:
-                # 检查表是否存在
-                cursor.execute("""
-                    SELECT COUNT(*) as cnt
-                    FROM information_schema.tables
-                    WHERE table_schema = %s AND table_name = 'session_history'
-                """, (self.settings.mysql_database,))
-                result = cursor.fetchone()
-
-                if not result or result['cnt'] == 0:
-                    # 表不存在，返回空列表
-                    return []
-
                 # 计算时间阈值（最近N小时）
                 time_threshold = datetime.now() - timedelta(hours=time_limit_hours)
 
@@ -217,50 +401,24 @@ class SessionService:
             if connection:
                 connection.close()
 
-    def _save_to_db(self, session_id: str, role: str, content: str):
+    def _insert_batch(self, rows: List[tuple]):
         """
-        保存消息到数据库
+        一条多行 INSERT 写入一批消息（pymysql executemany 会合并 VALUES）
 
         Args:
-            session_id: 会话ID
-            role: 角色
-            content: 消息内容
+            rows: [(session_id, role, content, created_at), ...]
         """
         connection = None
         try:
             connection = self._get_db_connection()
             with connection.cursor() as cursor:
-                # 检查表是否存在
-                cursor.execute("""
-                    SELECT COUNT(*) as cnt
-                    FROM information_schema.tables
-                    WHERE table_schema = %s AND table_name = 'session_history'
-                """, (self.settings.mysql_database,))
-                result = cursor.fetchone()
-
-                if not result or result['cnt'] == 0:
-                    # 表不存在，创建表
-                    cursor.execute("""
-                        CREATE TABLE IF NOT EXISTS session_history (
-                            id BIGINT PRIMARY KEY AUTO_INCREMENT,
-                            session_id VARCHAR(100) NOT NULL COMMENT '会话ID，由外层后端生成',
-                            role VARCHAR(20) NOT NULL COMMENT '角色：user/assistant',
-                            content TEXT NOT NULL COMMENT '消息内容',
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
-                            INDEX idx_session_id (session_id),
-                            INDEX idx_created_at (created_at)
-                        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='会话历史表'
-                    """)
-
-                # 插入消息
-                sql = """
-                    INSERT INTO session_history (session_id, role, content)
-                    VALUES (%s, %s, %s)
-                """
-                cursor.execute(sql, (session_id, role, content))
-                connection.commit()
-
-        except Exception as e:
+                cursor.executemany(
+                    "INSERT INTO session_history (session_id, role, content, created_at) "
+                    "VALUES (%s, %s, %s, %s)",
+                    rows,
+                )
+            connection.commit()
+        except Exception:
             if connection:
                 connection.rollback()
             raise
@@ -268,59 +426,6 @@ class SessionService:
             if connection:
                 connection.close()
 
-    def _cleanup_db(self, session_id: str, limit: int, time_limit_hours: int = 1):
-        """
-        清理数据库中的旧记录
-
-        清理策略：
-        1. 删除超过N小时（默认1小时）的旧消息
-        2. 如果某会话的消息数超过限制，删除最旧的记录
-
-        Args:
-            session_id: 会话ID
-            limit: 保留的对话轮数（在时间限制内）
-            time_limit_hours: 时间限制（小时），默认1小时
-        """
-        connection = None
-        try:
-            connection = self._get_db_connection()
-            with connection.cursor() as cursor:
-                # 1. 删除超过N小时的旧消息
-                time_threshold = datetime.now() - timedelta(hours=time_limit_hours)
-                sql = """
-                    DELETE FROM session_history
-                    WHERE session_id = %s AND created_at < %s
-                """
-                cursor.execute(sql, (session_id, time_threshold))
-                connection.commit()
-
-                # 2. 检查剩余消息数，如果仍超过限制，继续删除最旧的
-                cursor.execute("""
-                    SELECT COUNT(*) as cnt FROM session_history
-                    WHERE session_id = %s
-                """, (session_id,))
-                result = cursor.fetchone()
-                if not result:
-                    return
-
-                total = result['cnt']
-                max_keep = limit * 2  # 转换为消息数
-
-                if total > max_keep:
-                    # 删除最旧的记录
-                    sql = """
-                        DELETE FROM session_history
-                        WHERE session_id = %s
-                        ORDER BY created_at ASC
-                        LIMIT %s
-                    """
-                    cursor.execute(sql, (session_id, total - max_keep))
-                    connection.commit()
-
-        finally:
-            if connection:
-                connection.close()
-
     def _delete_from_db(self, session_id: str):
         """
         删除数据库中的会话记录
@@ -328,21 +433,12 @@ class SessionService:
         Args:
             session_id: 会话ID
         """
+        if not self.init_storage():
+            return
         connection = None
         try:
             connection = self._get_db_connection()
             with connection.cursor() as cursor:
-                # 检查表是否存在
-                cursor.execute("""
-                    SELECT COUNT(*) as cnt
-                    FROM information_schema.tables
-                    WHERE table_schema = %s AND table_name = 'session_history'
-                """, (self.settings.mysql_database,))
-                result = cursor.fetchone()
-
-                if not result or result['cnt'] == 0:
-                    return
-
                 sql = "DELETE FROM session_history WHERE session_id = %s"
                 cursor.execute(sql, (session_id,))
                 connection.commit()
@@ -65,6 +65,8 @@ def compare_buckets(days: int = 7) -> Dict[str, Any]:
     返回 {control: {...}, treatment: {...}, delta_sum_pnl, treatment_active}。
 
     treatment_active = True 表示 treatment 还在可用状态（未触发自动停用）。
+    顶层没有 experiment_bucket 的卡在 SQL 里就并入 control（原来单独成 NULL 组，
+    summarize_buckets 按键覆盖时会丢掉其中一组），与 bucket_of 口径一致。
     fail-open：任何异常都返回 treatment_active=True（不停用）。
     """
     try:
@@ -74,7 +76,7 @@ def compare_buckets(days: int = 7) -> Dict[str, Any]:
             cur.execute(
                 """
                 SELECT
-                    JSON_UNQUOTE(JSON_EXTRACT(math_json, '$.experiment_bucket')) AS bucket,
+                    COALESCE(JSON_UNQUOTE(JSON_EXTRACT(math_json, '$.experiment_bucket')), 'control') AS bucket,
                     COUNT(*) AS n,
                     SUM(status='hit_tp' OR (status='expired' AND pnl_pct > 0)) AS wins,
                     SUM(pnl_pct) AS sum_pnl,
@@ -93,6 +95,29 @@ def compare_buckets(days: int = 7) -> Dict[str, Any]:
         logger.warning(f"ab_framework 查询失败: {type(e).__name__}: {e}")
         return {"control": None, "treatment": None, "delta_sum_pnl": 0, "treatment_active": True, "error": str(e)}
 
+    return summarize_buckets(rows)
+
+
+def bucket_of(math_json: Optional[str], math: Optional[dict]) -> Optional[str]:
+    """
+    单张卡所属实验桶（与 compare_buckets 的 SQL 同口径，供 daily_report 单次遍历复用）。
+
+    math_json 文本不含 experiment_bucket → None（不参与对照）；
+    含但顶层没有该字段 / 解析失败 → "control"。
+    """
+    if not math_json or "experiment_bucket" not in math_json:
+        return None
+    bucket = math.get("experiment_bucket") if isinstance(math, dict) else None
+    if bucket is None:
+        return "control"
+    return bucket if isinstance(bucket, str) else json.dumps(bucket, ensure_ascii=False)
+
+
+def summarize_buckets(rows) -> Dict[str, Any]:
+    """
+    按桶聚合行（bucket / n / wins / sum_pnl / avg_pnl）→ 对照结论；必要时自动停用 treatment。
+    compare_buckets 与 daily_report 共用。
+    """
     buckets = {}
     for r in rows:
         key = r.get("bucket") or "control"
@@ -5,7 +5,7 @@
 1. 贝叶斯权重更新 — 每次信号结算后更新信号源权重
 2. 因子IC追踪 — 持续评估各因子的预测能力
 3. 市场状态自适应 — 不同市场状态下使用不同的策略参数
-4. 参数网格搜索 — 定期搜索更优的阈值组合
+4. 参数网格搜索 — 定期搜索更优的阈值组合（离线批量评估见 app.signals.evolution）
 5. 胜率衰减 — 近期表现权重高于远期
 6. 策略版本管理 — 记录每次迭代的变化
 """
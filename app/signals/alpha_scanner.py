@@ -3,23 +3,30 @@
 
 架构：
 1. 从 discovery API 动态获取全市场币种
-2. 10路并发扫描（asyncio.Semaphore 控制）
+2. 10路并发扫描（asyncio.Semaphore 控制）；SCAN_PROCESS_WORKERS>0 时拆成
+   拉数据（线程）→ 纯计算（进程池，绕开 GIL）→ 融合出卡（线程）三段
 3. 按置信度排序返回 Top-N 信号卡
 """
 from __future__ import annotations
 
 import asyncio
 import math
+import multiprocessing
 import os
+import threading
 import time
-from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Optional, Tuple, Union
 from dataclasses import dataclass
 
 from app.services.data_service import get_discovery_coins
-from app.signals.fusion import fuse_signals
-from app.signals.backtest import backtest_signal
+from app.signals.fusion import compute_signal_core, fetch_core_inputs, fuse_signals
+from app.signals.backtest import backtest_signal, load_scan_prefetch, scan_prefetch
 from app.signals.models import SignalSource, SignalDirection
+from app.signals.scan_delta import delta_filter
 from config.settings import settings as app_settings
+from app.utils.executors import MARKET_SCAN, run_in
 from app.utils.logger import get_logger
 import app.bigorder.deps as bigorder_deps
 
@@ -44,6 +51,7 @@ class ScanResult:
     backtest: Optional[dict] = None
     error: Optional[str] = None
     elapsed: float = 0.0
+    reused: bool = False  # 增量扫描沿用上一轮结果（卡已存过，不再写 signal_card_history）
 
 
 def get_bigorder_12h_signal(coin: str, weight: float) -> Optional[SignalSource]:
@@ -472,12 +480,21 @@ def _get_btc_24h_change() -> Optional[float]:
         return None
 
 
-def _scan_single(
+@dataclass
+class _ScanJob:
+    """I/O 阶段产物：出卡所需的全部已拉取数据（可 pickle，纯计算阶段交给进程池）"""
+    coin: str
+    t0: float
+    ohlcv: dict
+    raw_data: dict
+    core_inputs: dict
+
+
+def _scan_prepare(
     coin: str,
-    btc_24h_change: Optional[float] = None,
     concurrency_stats: Optional[Dict[str, Dict[str, int]]] = None,
-) -> ScanResult:
-    """扫描单个币种（同步，在线程池中执行）"""
+) -> Union[ScanResult, _ScanJob]:
+    """扫描第一阶段（I/O，线程池）：护栏 + 拉数据。提前结束时直接返回 ScanResult"""
     t0 = time.time()
 
     # Phase 5: 单币并发护栏（防止同币多卡同质化风险）
@@ -544,7 +561,24 @@ def _scan_single(
         except Exception:
             pass
 
-        card = fuse_signals(coin, ohlcv, raw_data)
+        return _ScanJob(
+            coin=coin, t0=t0, ohlcv=ohlcv, raw_data=raw_data,
+            core_inputs=fetch_core_inputs(coin, raw_data),
+        )
+    except Exception as e:
+        return ScanResult(coin=coin, error=str(e), elapsed=time.time() - t0)
+
+
+def _scan_compute(job: _ScanJob) -> dict:
+    """扫描第二阶段（纯计算，进程池或当前线程）"""
+    return compute_signal_core(job.coin, job.ohlcv, job.raw_data, **job.core_inputs)
+
+
+def _scan_finish(job: _ScanJob, core: dict, btc_24h_change: Optional[float] = None) -> ScanResult:
+    """扫描第三阶段（I/O，线程池）：大单 / 资金费率 / 护栏 / 冷却期 + 融合出卡"""
+    coin, t0 = job.coin, job.t0
+    try:
+        card = fuse_signals(coin, job.ohlcv, job.raw_data, core=core)
         if not card:
             return ScanResult(coin=coin, elapsed=time.time() - t0)
 
@@ -586,9 +620,122 @@ def _scan_single(
         return ScanResult(coin=coin, error=str(e), elapsed=time.time() - t0)
 
 
+def _scan_single(
+    coin: str,
+    btc_24h_change: Optional[float] = None,
+    concurrency_stats: Optional[Dict[str, Dict[str, int]]] = None,
+) -> ScanResult:
+    """扫描单个币种（同步，三个阶段都在当前线程执行）"""
+    job = _scan_prepare(coin, concurrency_stats)
+    if isinstance(job, ScanResult):
+        return job
+    try:
+        core = _scan_compute(job)
+    except Exception as e:
+        return ScanResult(coin=coin, error=str(e), elapsed=time.time() - job.t0)
+    return _scan_finish(job, core, btc_24h_change)
+
+
+# ── 纯计算进程池（SCAN_PROCESS_WORKERS>0 时启用）──
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """懒创建计算进程池；spawn 启动（主进程有大量线程，fork 不安全）"""
+    global _process_pool
+    workers = app_settings.scan_process_workers
+    if workers <= 0:
+        return None
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"扫描计算进程池已启动: {workers} 进程")
+        return _process_pool
+
+
+def _reset_process_pool(pool: ProcessPoolExecutor):
+    """子进程崩溃（BrokenProcessPool）后丢弃旧池，下次扫描重建"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_process_pool():
+    """服务关闭时回收计算子进程"""
+    global _process_pool
+    with _process_pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _scan_staged(
+    coin: str,
+    semaphore: asyncio.Semaphore,
+    pool: ProcessPoolExecutor,
+    btc_24h_change: Optional[float],
+    concurrency_stats: Optional[Dict[str, Dict[str, int]]],
+) -> ScanResult:
+    """
+    两段式扫描：I/O 阶段在线程池（受 semaphore 限流），纯计算阶段在进程池。
+
+    计算期间不占 semaphore，其他币种可以继续拉数据；进程池异常时该币回退到当前线程计算。
+    """
+    loop = asyncio.get_running_loop()
+    async with semaphore:
+        job = await run_in(MARKET_SCAN, _scan_prepare, coin, concurrency_stats)
+    if isinstance(job, ScanResult):
+        return job
+
+    try:
+        core = await loop.run_in_executor(pool, _scan_compute, job)
+    except BrokenProcessPool as e:
+        logger.warning(f"扫描计算进程池异常，{coin} 回退线程内计算: {e}")
+        _reset_process_pool(pool)
+        core = None
+    except Exception as e:
+        return ScanResult(coin=coin, error=str(e), elapsed=time.time() - job.t0)
+
+    async with semaphore:
+        if core is None:
+            return await run_in(MARKET_SCAN, _finish_inline, job, btc_24h_change)
+        return await run_in(MARKET_SCAN, _scan_finish, job, core, btc_24h_change)
+
+
+def _finish_inline(job: _ScanJob, btc_24h_change: Optional[float]) -> ScanResult:
+    """进程池不可用时：当前线程计算 + 出卡"""
+    try:
+        core = _scan_compute(job)
+    except Exception as e:
+        return ScanResult(coin=job.coin, error=str(e), elapsed=time.time() - job.t0)
+    return _scan_finish(job, core, btc_24h_change)
+
+
+def _scan_global_key(btc_24h_change: Optional[float]) -> Tuple:
+    """影响所有币出卡的全局状态：BTC 护栏拦截方向 / 策略版本 / 市场 regime，变化即全量重扫"""
+    guard = None
+    if btc_24h_change is not None:
+        if btc_24h_change <= -BTC_GUARDRAIL_THRESHOLD:
+            guard = "long"
+        elif btc_24h_change >= BTC_GUARDRAIL_THRESHOLD:
+            guard = "short"
+    try:
+        from app.signals.adaptive_strategy import get_strategy_engine
+        state = get_strategy_engine().state
+        return guard, state.version, state.regime
+    except Exception:
+        return guard, None, None
+
+
 async def scan_all_coins(
     concurrency: int = 10,
     coins: List[str] = None,
+    incremental: Optional[bool] = None,
 ) -> List[ScanResult]:
     """
     全市场并行扫描
@@ -596,12 +743,16 @@ async def scan_all_coins(
     Args:
         concurrency: 并发路数（默认10）
         coins: 指定币种列表，None则动态获取全市场
+        incremental: 是否启用增量预筛（app.signals.scan_delta），None 跟随
+            SCAN_INCREMENTAL_ENABLED / SCAN_INCREMENTAL_SHADOW；指定 coins 时恒为全量
 
     Returns:
         所有扫描结果（有信号的排前面，按置信度降序）
     """
     if coins is None:
         coins = get_discovery_coins()
+    else:
+        incremental = False
 
     if not coins:
         return []
@@ -619,18 +770,40 @@ async def scan_all_coins(
     concurrency_stats = _get_concurrency_stats() if os.getenv("SCAN_CONCURRENCY_GUARDRAIL_ENABLED", "1") == "1" else None
 
     semaphore = asyncio.Semaphore(concurrency)
-    loop = asyncio.get_running_loop()
     results: List[ScanResult] = []
+    pool = _get_process_pool()
 
-    async def _scan_with_limit(coin: str):
-        async with semaphore:
-            result = await loop.run_in_executor(
-                None, _scan_single, coin, btc_24h_change, concurrency_stats
-            )
-            results.append(result)
+    # 批量预取全部币种的已结算卡一次，冷却期 / 回测逐币查询改读内存
+    # I/O 走 market_scan 专用线程池（run_in 传递 contextvars，预取快照只在本次扫描内可见）
+    prefetch = await run_in(MARKET_SCAN, load_scan_prefetch, coins)
 
-    tasks = [asyncio.create_task(_scan_with_limit(coin)) for coin in coins]
-    await asyncio.gather(*tasks, return_exceptions=True)
+    # 增量预筛：只在全市场定时扫描（coins=None）时启用，指定币种的扫描总是全量
+    incremental = incremental if incremental is not None else delta_filter.enabled
+    if incremental:
+        delta_filter.begin(_scan_global_key(btc_24h_change))
+
+    async def _scan_with_limit(coin: str):
+        decision = None
+        if incremental:
+            async with semaphore:
+                decision = await run_in(MARKET_SCAN, delta_filter.check, coin)
+            if decision.skip and not delta_filter.shadow:
+                results.append(delta_filter.reuse(decision))
+                return
+        if pool is not None:
+            result = await _scan_staged(coin, semaphore, pool, btc_24h_change, concurrency_stats)
+        else:
+            async with semaphore:
+                result = await run_in(MARKET_SCAN, _scan_single, coin, btc_24h_change, concurrency_stats)
+        if decision is not None:
+            delta_filter.record(decision, result)
+        results.append(result)
+
+    with scan_prefetch(prefetch):
+        tasks = [asyncio.create_task(_scan_with_limit(coin)) for coin in coins]
+        await asyncio.gather(*tasks, return_exceptions=True)
+    if incremental:
+        delta_filter.finish()
 
     # 有信号的排前面，按置信度降序
     results.sort(key=lambda r: (r.signal_card is not None, r.signal_card.confidence if r.signal_card else 0), reverse=True)
@@ -12,7 +12,10 @@
 """
 import os
 import time as _time
-from typing import Optional, Dict, Any, List, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from typing import Optional, Dict, Any, Iterable, List, Tuple
 from config.settings import settings
 from app.utils.logger import get_logger
 
@@ -96,24 +99,24 @@ def backtest_from_signal_history(
     每条记录都是「真实生成的信号卡 + 真实 TP/SL + 24h K 线后验结果」，
     跟给用户的卡完全同源。
     """
+    direction = _enum_value(direction)
+    signal_grade = _enum_value(signal_grade)
+
+    # 扫描期间优先读预取快照（与逐币查询同口径，不开连接）
+    prefetch = _active_prefetch(coin, lookback_days)
+    if prefetch is not None:
+        return _tiered_history_result(
+            lambda grade: prefetch.settled_cards(coin, direction, grade, lookback_days),
+            signal_grade, min_sample,
+        )
+
     conn = None
     try:
         conn = _get_connection()
-
-        # Tier 1: 同币+同向+同等级
-        if signal_grade:
-            cards = _query_settled_cards(conn, coin, direction, signal_grade, lookback_days)
-            if len(cards) >= 30:
-                return _build_result(cards, confidence_level="high", grade_filter=signal_grade)
-
-        # Tier 2/3: 同币+同向（合并等级）
-        cards = _query_settled_cards(conn, coin, direction, None, lookback_days)
-        if len(cards) >= 30:
-            return _build_result(cards, confidence_level="mid", grade_filter=None)
-        if len(cards) >= min_sample:
-            return _build_result(cards, confidence_level="low", grade_filter=None)
-
-        return None
+        return _tiered_history_result(
+            lambda grade: _query_settled_cards(conn, coin, direction, grade, lookback_days),
+            signal_grade, min_sample,
+        )
 
     except Exception as e:
         logger.error(f"signal_history 回测失败: {e}")
@@ -123,6 +126,32 @@ def backtest_from_signal_history(
             conn.close()
 
 
+def _tiered_history_result(fetch, signal_grade: Optional[str], min_sample: int) -> Optional[Dict[str, Any]]:
+    """按 Tier 1/2/3 逐级取卡并构建结果；fetch(grade) 返回已结算卡（created_at 倒序）"""
+    # Tier 1: 同币+同向+同等级
+    if signal_grade:
+        cards = fetch(signal_grade)
+        if len(cards) >= 30:
+            return _build_result(cards, confidence_level="high", grade_filter=signal_grade)
+
+    # Tier 2/3: 同币+同向（合并等级）
+    cards = fetch(None)
+    if len(cards) >= 30:
+        return _build_result(cards, confidence_level="mid", grade_filter=None)
+    if len(cards) >= min_sample:
+        return _build_result(cards, confidence_level="low", grade_filter=None)
+
+    return None
+
+
+def _enum_value(value):
+    """SignalDirection / SignalGrade 等 str 枚举取 .value（pymysql 按 str() 转义会得到 'SignalGrade.A'）"""
+    return getattr(value, "value", value)
+
+
+SETTLED_CARDS_LIMIT = 500  # 单次回测最多取最近 500 张已结算卡
+
+
 def _query_settled_cards(conn, coin: str, direction: str, grade: Optional[str], lookback_days: int) -> List[dict]:
     """查询已结算卡（hit_tp/hit_sl/expired），按 coin+direction[+grade] 过滤"""
     import pymysql.cursors
@@ -133,17 +162,17 @@ def _query_settled_cards(conn, coin: str, direction: str, grade: Optional[str],
         "status IN ('hit_tp', 'hit_sl', 'expired')",
         "created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)",
     ]
-    params: list = [coin.upper(), direction, lookback_days]
+    params: list = [coin.upper(), _enum_value(direction), lookback_days]
     if grade:
         where_parts.append("grade = %s")
-        params.append(grade)
+        params.append(_enum_value(grade))
     cursor.execute(
         f"""SELECT id, grade, direction, current_price, stop_loss, take_profit,
                   status, pnl_pct, created_at, settled_at
            FROM signal_card_history
            WHERE {" AND ".join(where_parts)}
-           ORDER BY created_at DESC
-           LIMIT 500""",
+           ORDER BY created_at DESC, id DESC
+           LIMIT {SETTLED_CARDS_LIMIT}""",
         params,
     )
     rows = cursor.fetchall()
@@ -165,7 +194,7 @@ def batch_query_winrates(
     """
     一次性查所有 (coin, direction) 在 lookback_days 内的真实结算胜率。
 
-    用单次 GROUP BY 拿全市场，再在内存里过滤候选列表，避免 N 次 DB round-trip。
+    读胜率日聚合（winrate_agg.summarize）拿全市场，再在内存里过滤候选列表，避免 N 次 DB round-trip。
     结果缓存 10 分钟（_WINRATE_CACHE_TTL），因为 signal_card 24h 才结算。
 
     Args:
@@ -182,35 +211,17 @@ def batch_query_winrates(
     if cache is None or now > _winrate_cache["expires_at"]:
         conn = None
         try:
+            from app.signals import winrate_agg
             conn = _get_connection()
-            import pymysql.cursors
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
-            cursor.execute(
-                f"""SELECT
-                        UPPER(coin) AS coin,
-                        direction,
-                        COUNT(*) AS total,
-                        SUM(status='hit_tp') AS wins,
-                        ROUND(AVG(pnl_pct), 3) AS avg_pnl
-                    FROM signal_card_history
-                    WHERE status IN ('hit_tp', 'hit_sl', 'expired')
-                      AND created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                    GROUP BY UPPER(coin), direction
-                 """,
-                (lookback_days,),
-            )
-            rows = cursor.fetchall()
-            cursor.close()
+            rows = winrate_agg.summarize(conn, lookback_days, group_by=("coin", "direction"))
             cache = {}
             for r in rows:
-                total = int(r["total"] or 0)
-                if total < 1:
-                    continue
-                wins = int(r["wins"] or 0)
+                total = r["n_total"]
+                avg_pnl = r["pnl_sum"] / r["pnl_count"] if r["pnl_count"] else 0.0
                 cache[(r["coin"], r["direction"])] = {
-                    "win_rate": round(wins / total * 100, 1),
+                    "win_rate": round(r["n_hit_tp"] / total * 100, 1),
                     "sample_count": total,
-                    "avg_pnl_pct": float(r["avg_pnl"] or 0.0),
+                    "avg_pnl_pct": round(avg_pnl, 3),
                 }
             _winrate_cache["data"] = cache
             _winrate_cache["expires_at"] = now + _WINRATE_CACHE_TTL
@@ -266,9 +277,33 @@ def is_direction_in_cooldown(
     if cached and cached["expires_at"] > now:
         return cached["in_cooldown"], cached["context"]
 
+    # 扫描期间优先读预取快照（覆盖 24h 窗口与 7d 胜率窗口时）
+    prefetch = _active_prefetch(coin, max(window_hours / 24, 7))
+    if prefetch is not None:
+        in_cooldown, context = prefetch.cooldown(coin, direction, consecutive_sl_threshold, window_hours)
+    else:
+        result = _query_cooldown(coin, direction, consecutive_sl_threshold, window_hours)
+        if result is None:
+            # 查询失败不阻塞信号生成（fail-open）
+            return False, None
+        in_cooldown, context = result
+
+    _cooldown_cache[cache_key] = {
+        "in_cooldown": in_cooldown,
+        "context": context,
+        "expires_at": now + _COOLDOWN_CACHE_TTL,
+    }
+    return in_cooldown, context
+
+
+def _query_cooldown(
+    coin: str,
+    direction: str,
+    consecutive_sl_threshold: int,
+    window_hours: int,
+) -> Optional[Tuple[bool, Optional[Dict[str, Any]]]]:
+    """逐币查库判定冷却期；查询失败返回 None"""
     conn = None
-    in_cooldown = False
-    context: Optional[Dict[str, Any]] = None
     try:
         conn = _get_connection()
         import pymysql.cursors
@@ -281,24 +316,15 @@ def is_direction_in_cooldown(
                WHERE coin = %s AND direction = %s
                  AND status IN ('hit_tp', 'hit_sl', 'expired')
                  AND created_at >= DATE_SUB(NOW(), INTERVAL {int(window_hours)} HOUR)
-               ORDER BY created_at DESC
+               ORDER BY created_at DESC, id DESC
                LIMIT {int(consecutive_sl_threshold)}""",
             (coin.upper(), direction.lower()),
         )
         rows = cursor.fetchall()
         cursor.close()
 
-        if len(rows) >= consecutive_sl_threshold and all(r["status"] == "hit_sl" for r in rows):
-            in_cooldown = True
-            context = {
-                "recent_sl_count": len(rows),
-                "last_sl_at": str(rows[0]["created_at"]),
-                "first_sl_at": str(rows[-1]["created_at"]),
-                "window_hours": window_hours,
-                "coin": coin.upper(),
-                "direction": direction.lower(),
-            }
-        elif os.getenv("COOLDOWN_7D_WR_ENABLED", "1") == "1":
+        verdict = _cooldown_from_recent(rows, coin, direction, consecutive_sl_threshold, window_hours)
+        if verdict is None and os.getenv("COOLDOWN_7D_WR_ENABLED", "1") == "1":
             # Phase 5-3: 7d wr<25% 触发（连续亏但没到 3 连，仍需冷却）
             cursor = conn.cursor(pymysql.cursors.DictCursor)
             cursor.execute(
@@ -312,35 +338,48 @@ def is_direction_in_cooldown(
             )
             wr_row = cursor.fetchone() or {}
             cursor.close()
-            n_7d = int(wr_row.get("n") or 0)
-            wins_7d = int(wr_row.get("wins") or 0)
-            if n_7d >= 4:
-                wr_7d = wins_7d / n_7d
-                if wr_7d < 0.25:
-                    in_cooldown = True
-                    context = {
-                        "trigger": "low_7d_wr",
-                        "wr_7d": round(wr_7d, 3),
-                        "n_7d": n_7d,
-                        "wins_7d": wins_7d,
-                        "window_hours": 24 * 7,
-                        "coin": coin.upper(),
-                        "direction": direction.lower(),
-                    }
+            verdict = _cooldown_from_7d(int(wr_row.get("n") or 0), int(wr_row.get("wins") or 0), coin, direction)
     except Exception as e:
         logger.error(f"is_direction_in_cooldown 查询失败 ({coin}/{direction}): {e}")
-        # 查询失败不阻塞信号生成（fail-open）
-        return False, None
+        return None
     finally:
         if conn:
             conn.close()
 
-    _cooldown_cache[cache_key] = {
-        "in_cooldown": in_cooldown,
-        "context": context,
-        "expires_at": now + _COOLDOWN_CACHE_TTL,
-    }
-    return in_cooldown, context
+    return (True, verdict) if verdict else (False, None)
+
+
+def _cooldown_from_recent(
+    rows: List[dict], coin: str, direction: str, consecutive_sl_threshold: int, window_hours: int,
+) -> Optional[Dict[str, Any]]:
+    """窗口内最近 N 张卡（created_at 倒序）全部 hit_sl → 冷却上下文，否则 None"""
+    if len(rows) >= consecutive_sl_threshold and all(r["status"] == "hit_sl" for r in rows):
+        return {
+            "recent_sl_count": len(rows),
+            "last_sl_at": str(rows[0]["created_at"]),
+            "first_sl_at": str(rows[-1]["created_at"]),
+            "window_hours": window_hours,
+            "coin": coin.upper(),
+            "direction": direction.lower(),
+        }
+    return None
+
+
+def _cooldown_from_7d(n_7d: int, wins_7d: int, coin: str, direction: str) -> Optional[Dict[str, Any]]:
+    """7d 样本≥4 且胜率<25% → 冷却上下文，否则 None"""
+    if n_7d >= 4:
+        wr_7d = wins_7d / n_7d
+        if wr_7d < 0.25:
+            return {
+                "trigger": "low_7d_wr",
+                "wr_7d": round(wr_7d, 3),
+                "n_7d": n_7d,
+                "wins_7d": wins_7d,
+                "window_hours": 24 * 7,
+                "coin": coin.upper(),
+                "direction": direction.lower(),
+            }
+    return None
 
 
 def invalidate_cooldown_cache(coin: Optional[str] = None, direction: Optional[str] = None) -> None:
@@ -358,6 +397,126 @@ def invalidate_cooldown_cache(coin: Optional[str] = None, direction: Optional[st
             _cooldown_cache.pop(k, None)
 
 
+# ── 扫描级预取（全市场扫描时一次查全部币种，逐币查询改读内存） ──────────────
+
+# 只在 scan_prefetch() 所在的上下文（全市场扫描任务及其 run_in 线程调用）内可见；
+# 扫描期间聊天 / 接口里的 backtest_signal、is_direction_in_cooldown 仍逐币查库，不读扫描开始时的快照
+_scan_prefetch: ContextVar[Optional["ScanPrefetch"]] = ContextVar("scan_prefetch", default=None)
+
+
+class ScanPrefetch:
+    """
+    一次扫描涉及币种的已结算卡快照（created_at 倒序），按 (COIN, direction) 分组。
+
+    回测（_query_settled_cards）与冷却期（is_direction_in_cooldown）都从这里按原 SQL 的
+    过滤 / 排序 / LIMIT 语义切片，结果与逐币查库一致。时间窗口以数据库 NOW() 为基准，
+    并随本地单调时钟推进，避免扫描持续几分钟后窗口边界偏移。
+    """
+
+    def __init__(self, coins: Iterable[str], lookback_days: int):
+        self.coins = {c.upper() for c in coins}
+        self.lookback_days = lookback_days
+        self._rows: Dict[Tuple[str, str], List[dict]] = {}
+        self._db_now = None
+        self._t0 = _time.monotonic()
+
+    def load(self, conn) -> "ScanPrefetch":
+        """两条查询：数据库当前时间 + 全部币种 lookback 内的已结算卡"""
+        import pymysql.cursors
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        cursor.execute("SELECT NOW() AS db_now")
+        self._db_now = cursor.fetchone()["db_now"]
+        self._t0 = _time.monotonic()
+        coins = sorted(self.coins)
+        if coins:
+            placeholders = ", ".join(["%s"] * len(coins))
+            cursor.execute(
+                f"""SELECT id, coin, grade, direction, current_price, stop_loss, take_profit,
+                          status, pnl_pct, created_at, settled_at
+                   FROM signal_card_history
+                   WHERE coin IN ({placeholders})
+                     AND status IN ('hit_tp', 'hit_sl', 'expired')
+                     AND created_at >= DATE_SUB(%s, INTERVAL %s DAY)
+                   ORDER BY created_at DESC, id DESC""",
+                [*coins, self._db_now, self.lookback_days],
+            )
+            for row in cursor.fetchall():
+                coin = str(row.pop("coin") or "").upper()
+                key = (coin, str(row.get("direction") or "").lower())
+                self._rows.setdefault(key, []).append(row)
+        cursor.close()
+        return self
+
+    def covers(self, coin: str, days: float) -> bool:
+        return self._db_now is not None and coin.upper() in self.coins and days <= self.lookback_days
+
+    def _since(self, coin: str, direction: str, delta: timedelta) -> List[dict]:
+        now = self._db_now + timedelta(seconds=_time.monotonic() - self._t0)
+        cutoff = now - delta
+        rows = self._rows.get((coin.upper(), str(direction).lower()), [])
+        return [r for r in rows if r["created_at"] >= cutoff]
+
+    def settled_cards(self, coin: str, direction: str, grade: Optional[str], lookback_days: int) -> List[dict]:
+        """等价于 _query_settled_cards(conn, coin, direction, grade, lookback_days)"""
+        rows = self._since(coin, direction, timedelta(days=lookback_days))
+        if grade:
+            grade = str(grade).upper()
+            rows = [r for r in rows if str(r.get("grade") or "").upper() == grade]
+        return rows[:SETTLED_CARDS_LIMIT]
+
+    def cooldown(
+        self, coin: str, direction: str, consecutive_sl_threshold: int, window_hours: int,
+    ) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """等价于 _query_cooldown（快照不会查询失败）"""
+        recent = self._since(coin, direction, timedelta(hours=int(window_hours)))
+        verdict = _cooldown_from_recent(
+            recent[:int(consecutive_sl_threshold)], coin, direction, consecutive_sl_threshold, window_hours,
+        )
+        if verdict is None and os.getenv("COOLDOWN_7D_WR_ENABLED", "1") == "1":
+            rows_7d = self._since(coin, direction, timedelta(days=7))
+            wins = sum(
+                1 for r in rows_7d
+                if r["status"] == "hit_tp"
+                or (r["status"] == "expired" and r.get("pnl_pct") is not None and r["pnl_pct"] > 0)
+            )
+            verdict = _cooldown_from_7d(len(rows_7d), wins, coin, direction)
+        return (True, verdict) if verdict else (False, None)
+
+
+def _active_prefetch(coin: str, days: float) -> Optional[ScanPrefetch]:
+    prefetch = _scan_prefetch.get()
+    if prefetch is not None and prefetch.covers(coin, days):
+        return prefetch
+    return None
+
+
+def load_scan_prefetch(coins: Iterable[str], lookback_days: int = 90) -> Optional[ScanPrefetch]:
+    """一次性预取扫描币种的已结算卡（回测 lookback 与冷却期 7d 窗口取大）；失败返回 None"""
+    conn = None
+    try:
+        conn = _get_connection()
+        return ScanPrefetch(coins, max(int(lookback_days), 7)).load(conn)
+    except Exception as e:
+        logger.warning(f"扫描预取失败，回退逐币查询: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+
+@contextmanager
+def scan_prefetch(prefetch: Optional[ScanPrefetch]):
+    """在 with 块内（当前上下文，及其中创建的 task / run_in 线程调用）启用预取快照，退出后恢复"""
+    if prefetch is None:
+        yield prefetch
+        return
+    token = _scan_prefetch.set(prefetch)
+    try:
+        yield prefetch
+    finally:
+        _scan_prefetch.reset(token)
+
+
 def _build_result(cards: List[dict], confidence_level: str, grade_filter: Optional[str]) -> Dict[str, Any]:
     """从已结算卡列表构建回测结果"""
     hit_tp = [c for c in cards if c["status"] == "hit_tp"]
@@ -496,7 +496,7 @@ async def chat(request: SignalChatRequest):
         ]
 
         try:
-            with Timer(rid, "step3.llm_stream"):
+            with Timer(rid, "step3.llm_stream") as t:
                 final_resp = await client.chat.completions.create(
                     model=model,
                     messages=final_messages,
@@ -508,6 +508,7 @@ async def chat(request: SignalChatRequest):
                     delta = chunk.choices[0].delta
                     if delta.content:
                         chunk_n += 1
+                        t.mark("first_token")
                         yield render(sse_chat_delta(rid, delta.content))
             trace(rid, "step3.done", chunks=chunk_n)
         except Exception as e:
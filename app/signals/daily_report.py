@@ -9,12 +9,16 @@
 - Phase 0+1+5 各机制的触发次数
 - Top 5 印钞机 / 失血机（按 sum_pnl）
 
+数据只读一次：一条流式查询拉近 7 天相关的卡，ReportAccumulator 在同一个循环里累加
+全部分区，A/B 桶对照（ab_framework.summarize_buckets）也复用这次遍历。
+
 设计原则：
 1. 失败 fail-open：DB 异常不阻塞其他任务
 2. 结构化 JSON 输出：logger.info 一行 JSON，便于后续 grep/解析
 3. 可扩展：返回 dict，后续可以接 webhook / 邮件 / 社区推送
 """
 import json
+from collections import Counter
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
@@ -23,27 +27,16 @@ from app.utils.logger import get_logger
 logger = get_logger(__name__)
 
 
+SETTLED = ("hit_tp", "hit_sl", "expired")
+_MISSING = object()
+
+
 def _get_conn():
     """复用 settlement 的 DB 连接"""
     from app.signals.settlement import _get_conn
     return _get_conn()
 
 
-def _query_df(query: str, args: tuple = ()) -> List[Dict[str, Any]]:
-    """便捷查询，返回 dict 列表。失败返回空列表。"""
-    try:
-        import pymysql.cursors
-        conn = _get_conn()
-        with conn.cursor(pymysql.cursors.DictCursor) as cur:
-            cur.execute(query, args)
-            rows = cur.fetchall()
-        conn.close()
-        return list(rows)
-    except Exception as e:
-        logger.warning(f"daily_report 查询失败: {type(e).__name__}: {e}")
-        return []
-
-
 def _safe_float(v, default=0.0) -> float:
     try:
         return float(v) if v is not None else default
@@ -58,236 +51,289 @@ def _safe_int(v, default=0) -> int:
         return default
 
 
-def _direction_grade_matrix(days: int = 1) -> List[Dict[str, Any]]:
-    """direction × grade 矩阵：n / wins / wr / sum_pnl"""
-    rows = _query_df(
-        """
-        SELECT direction, grade,
-               COUNT(*) AS n,
-               SUM(status='hit_tp' OR (status='expired' AND pnl_pct > 0)) AS wins,
-               SUM(status='hit_sl') AS sl,
-               AVG(pnl_pct) AS avg_pnl,
-               SUM(pnl_pct) AS sum_pnl
-        FROM signal_card_history
-        WHERE status IN ('hit_tp','hit_sl','expired')
-          AND settled_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-        GROUP BY direction, grade
-        ORDER BY direction, grade
-        """,
-        (days,),
-    )
-    out = []
-    for r in rows:
-        n = _safe_int(r.get("n"))
-        wins = _safe_int(r.get("wins"))
-        out.append({
-            "direction": r.get("direction") or "?",
-            "grade": r.get("grade") or "?",
-            "n": n,
-            "wins": wins,
-            "sl": _safe_int(r.get("sl")),
-            "wr": round(wins / n * 100, 1) if n else 0,
-            "avg_pnl": round(_safe_float(r.get("avg_pnl")), 3),
-            "sum_pnl": round(_safe_float(r.get("sum_pnl")), 2),
-        })
-    return out
-
-
-def _rolling_wr_trend(days: int = 7) -> List[Dict[str, Any]]:
-    """每日 wr 滚动趋势"""
-    rows = _query_df(
-        """
-        SELECT DATE(settled_at) AS d,
-               COUNT(*) AS n,
-               SUM(status='hit_tp' OR (status='expired' AND pnl_pct > 0)) AS wins,
-               SUM(pnl_pct) AS sum_pnl
-        FROM signal_card_history
-        WHERE status IN ('hit_tp','hit_sl','expired')
-          AND settled_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-        GROUP BY DATE(settled_at)
-        ORDER BY d DESC
-        """,
-        (days,),
-    )
-    out = []
-    for r in rows:
-        n = _safe_int(r.get("n"))
-        wins = _safe_int(r.get("wins"))
-        out.append({
-            "date": str(r.get("d")),
-            "n": n,
-            "wins": wins,
-            "wr": round(wins / n * 100, 1) if n else 0,
-            "sum_pnl": round(_safe_float(r.get("sum_pnl")), 2),
-        })
-    return out
-
-
-def _breadth_distribution(days: int = 7) -> Dict[str, int]:
-    """market_breadth 各档分布（从 math_json 提取）"""
-    rows = _query_df(
-        """
-        SELECT JSON_UNQUOTE(JSON_EXTRACT(math_json, '$.market_breadth.breadth')) AS breadth,
-               COUNT(*) AS n
-        FROM signal_card_history
-        WHERE created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-          AND JSON_EXTRACT(math_json, '$.market_breadth.breadth') IS NOT NULL
-        GROUP BY breadth
-        """,
-        (days,),
-    )
-    return {str(r.get("breadth") or "unknown"): _safe_int(r.get("n")) for r in rows}
-
-
-def _guardrail_hits(days: int = 1) -> Dict[str, int]:
-    """昨日 ev_guardrail 触发次数（block / reward）"""
-    rows = _query_df(
-        """
-        SELECT JSON_UNQUOTE(JSON_EXTRACT(math_json, '$.ev_guardrail.action')) AS action,
-               COUNT(*) AS n
-        FROM signal_card_history
-        WHERE created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-          AND JSON_EXTRACT(math_json, '$.ev_guardrail.action') IS NOT NULL
-        GROUP BY action
-        """,
-        (days,),
-    )
-    return {str(r.get("action") or "unknown"): _safe_int(r.get("n")) for r in rows}
+def _json_path(doc, *keys):
+    """等价 JSON_EXTRACT(doc, '$.k1.k2')：路径不存在返回 _MISSING（JSON null 仍算存在）"""
+    for k in keys:
+        if not isinstance(doc, dict) or k not in doc:
+            return _MISSING
+        doc = doc[k]
+    return doc
+
+
+def _json_text(v) -> str:
+    """等价 JSON_UNQUOTE：字符串原样，其余按 JSON 文本（null / true / 数字 / 对象）"""
+    return v if isinstance(v, str) else json.dumps(v, ensure_ascii=False)
+
+
+# ── 累加器 ────────────────────────────────────────────────────────────────────
 
+class _Tally:
+    """已结算卡计数，口径同 SQL：COUNT(*) / SUM(win) / SUM(status='hit_sl') / SUM、AVG(pnl_pct) 忽略 NULL"""
 
-def _alpha_breakdown(days: int = 7) -> List[Dict[str, Any]]:
-    """Phase 4 各 alpha 的独立 wr / sum_pnl（哪个 alpha 在印钞/失血）。
+    __slots__ = ("n", "wins", "sl", "pnl_sum", "pnl_n")
 
-    sources_json 形如 [{"name":"alpha_breakout_retest",...}]，
-    用 LIKE 粗筛 + JSON 解析细筛（兼容 MySQL 5.7 / 8.0）。
+    def __init__(self):
+        self.n = 0
+        self.wins = 0
+        self.sl = 0
+        self.pnl_sum = 0
+        self.pnl_n = 0
+
+    def add(self, status: str, pnl):
+        self.n += 1
+        if status == "hit_tp" or (status == "expired" and pnl is not None and pnl > 0):
+            self.wins += 1
+        if status == "hit_sl":
+            self.sl += 1
+        if pnl is not None:
+            self.pnl_sum += pnl
+            self.pnl_n += 1
+
+    @property
+    def wr(self) -> float:
+        return round(self.wins / self.n * 100, 1) if self.n else 0
+
+    @property
+    def sum_pnl(self) -> Optional[Any]:
+        return self.pnl_sum if self.pnl_n else None
+
+    @property
+    def avg_pnl(self) -> Optional[Any]:
+        return self.pnl_sum / self.pnl_n if self.pnl_n else None
+
+
+class ReportAccumulator:
+    """
+    一次遍历 signal_card_history 同时累加全部报表分区（含 A/B 桶对照）。
+
+    窗口以数据库 NOW() 为基准：结算类分区按 settled_at，market_breadth / ev_guardrail 按 created_at，
+    与原逐分区 SQL 口径一致。
     """
-    rows = _query_df(
-        """
-        SELECT direction, status, pnl_pct, sources_json
-        FROM signal_card_history
-        WHERE status IN ('hit_tp','hit_sl','expired')
-          AND settled_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-          AND sources_json LIKE '%%alpha_%%'
-        """,
-        (days,),
-    )
-    if not rows:
-        return []
 
-    # 客户端按 source name 聚合（避免依赖 JSON_TABLE）
-    agg: Dict[str, Dict[str, Any]] = {}
-    for r in rows:
+    def __init__(self, now: datetime, ab_days: int = 7):
+        self.cut_1d = now - timedelta(days=1)
+        self.cut_7d = now - timedelta(days=7)
+        self.cut_ab = now - timedelta(days=ab_days)
+        self.summary = _Tally()
+        self.matrix: Dict[tuple, _Tally] = {}
+        self.trend: Dict[Any, _Tally] = {}
+        self.coins: Dict[str, _Tally] = {}
+        self.alphas: Dict[str, Dict[str, Any]] = {}
+        self.ab: Dict[str, _Tally] = {}
+        self.breadth: Counter = Counter()
+        self.guardrail: Counter = Counter()
+
+    def add(self, row: Dict[str, Any]):
+        status = row.get("status")
+        pnl = row.get("pnl_pct")
+        created_at = row.get("created_at")
+        settled_at = row.get("settled_at")
+        math_json = row.get("math_json")
+
+        math = None
+        if math_json and ("market_breadth" in math_json or "ev_guardrail" in math_json
+                          or "experiment_bucket" in math_json):
+            try:
+                math = json.loads(math_json)
+            except Exception:
+                math = None
+
+        # created_at 窗口：market_breadth（7d）/ ev_guardrail（1d），不要求已结算
+        if math is not None and created_at is not None and created_at >= self.cut_7d:
+            breadth = _json_path(math, "market_breadth", "breadth")
+            if breadth is not _MISSING:
+                self.breadth[_json_text(breadth) or "unknown"] += 1
+            if created_at >= self.cut_1d:
+                action = _json_path(math, "ev_guardrail", "action")
+                if action is not _MISSING:
+                    self.guardrail[_json_text(action) or "unknown"] += 1
+
+        if status not in SETTLED or settled_at is None:
+            return
+
+        if settled_at >= self.cut_ab:
+            from app.signals.ab_framework import bucket_of
+            bucket = bucket_of(math_json, math)
+            if bucket is not None:
+                self.ab.setdefault(bucket, _Tally()).add(status, pnl)
+
+        if settled_at < self.cut_7d:
+            return
+        self.trend.setdefault(settled_at.date(), _Tally()).add(status, pnl)
+        self.coins.setdefault(row.get("coin") or "?", _Tally()).add(status, pnl)
+        self._add_alpha(row.get("sources_json"), status, pnl)
+
+        if settled_at >= self.cut_1d:
+            self.summary.add(status, pnl)
+            key = (row.get("direction") or "?", row.get("grade") or "?")
+            self.matrix.setdefault(key, _Tally()).add(status, pnl)
+
+    def _add_alpha(self, sources_json: Optional[str], status: str, pnl):
+        """Phase 4 各 alpha 的独立统计（sources_json 含 alpha 才解析）"""
+        if not sources_json or "alpha" not in sources_json:
+            return
         try:
-            sources = json.loads(r.get("sources_json") or "[]")
+            sources = json.loads(sources_json)
         except Exception:
-            continue
+            return
+        if not isinstance(sources, list):
+            return
         names = {s.get("name") for s in sources if isinstance(s, dict)}
-        alpha_names = {n for n in names if n and n.startswith("alpha_")}
+        alpha_names = {n for n in names if isinstance(n, str) and n.startswith("alpha_")}
         if not alpha_names:
-            continue
-        won = r.get("status") == "hit_tp" or (r.get("status") == "expired" and _safe_float(r.get("pnl_pct")) > 0)
-        pnl = _safe_float(r.get("pnl_pct"))
+            return
+        won = status == "hit_tp" or (status == "expired" and _safe_float(pnl) > 0)
         for name in alpha_names:
-            d = agg.setdefault(name, {"alpha": name, "n": 0, "wins": 0, "sum_pnl": 0.0})
+            d = self.alphas.setdefault(name, {"alpha": name, "n": 0, "wins": 0, "sum_pnl": 0.0})
             d["n"] += 1
             if won:
                 d["wins"] += 1
-            d["sum_pnl"] += pnl
-
-    out = []
-    for d in agg.values():
-        n = d["n"]
-        out.append({
-            "alpha": d["alpha"],
-            "n": n,
-            "wr": round(d["wins"] / n * 100, 1) if n else 0,
-            "sum_pnl": round(d["sum_pnl"], 2),
-        })
-    out.sort(key=lambda x: x["sum_pnl"], reverse=True)
-    return out
-
-
-def _top_coins(days: int = 7, limit: int = 5, order_desc: bool = True) -> List[Dict[str, Any]]:
-    """Top N 印钞/失血机（按 sum_pnl）"""
-    direction = "DESC" if order_desc else "ASC"
-    rows = _query_df(
-        f"""
-        SELECT coin,
-               COUNT(*) AS n,
-               SUM(status='hit_tp' OR (status='expired' AND pnl_pct > 0)) AS wins,
-               SUM(pnl_pct) AS sum_pnl,
-               AVG(pnl_pct) AS avg_pnl
-        FROM signal_card_history
-        WHERE status IN ('hit_tp','hit_sl','expired')
-          AND settled_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-        GROUP BY coin
-        HAVING n >= 3
-        ORDER BY sum_pnl {direction}
-        LIMIT %s
-        """,
-        (days, limit),
-    )
-    out = []
-    for r in rows:
-        n = _safe_int(r.get("n"))
-        wins = _safe_int(r.get("wins"))
-        out.append({
-            "coin": r.get("coin") or "?",
-            "n": n,
-            "wr": round(wins / n * 100, 1) if n else 0,
-            "sum_pnl": round(_safe_float(r.get("sum_pnl")), 2),
-            "avg_pnl": round(_safe_float(r.get("avg_pnl")), 3),
-        })
-    return out
-
-
-def _summary_24h() -> Dict[str, Any]:
-    """昨日整体汇总"""
-    rows = _query_df(
-        """
-        SELECT
-            COUNT(*) AS n,
-            SUM(status='hit_tp' OR (status='expired' AND pnl_pct > 0)) AS wins,
-            SUM(status='hit_sl') AS sl,
-            SUM(pnl_pct) AS sum_pnl,
-            AVG(pnl_pct) AS avg_pnl
-        FROM signal_card_history
-        WHERE status IN ('hit_tp','hit_sl','expired')
-          AND settled_at >= DATE_SUB(NOW(), INTERVAL 1 DAY)
-        """
-    )
-    if not rows:
-        return {"n": 0, "wins": 0, "wr": 0, "sum_pnl": 0, "avg_pnl": 0}
-    r = rows[0]
-    n = _safe_int(r.get("n"))
-    wins = _safe_int(r.get("wins"))
-    return {
-        "n": n,
-        "wins": wins,
-        "sl": _safe_int(r.get("sl")),
-        "wr": round(wins / n * 100, 1) if n else 0,
-        "sum_pnl": round(_safe_float(r.get("sum_pnl")), 2),
-        "avg_pnl": round(_safe_float(r.get("avg_pnl")), 3),
-    }
+            d["sum_pnl"] += _safe_float(pnl)
+
+    # ── 各分区输出（结构与原逐分区 SQL 版本一致） ──
+
+    def summary_24h(self) -> Dict[str, Any]:
+        t = self.summary
+        return {
+            "n": t.n,
+            "wins": t.wins,
+            "sl": t.sl,
+            "wr": t.wr,
+            "sum_pnl": round(_safe_float(t.sum_pnl), 2),
+            "avg_pnl": round(_safe_float(t.avg_pnl), 3),
+        }
+
+    def direction_grade_matrix(self) -> List[Dict[str, Any]]:
+        """direction × grade 矩阵：n / wins / wr / sum_pnl"""
+        return [
+            {
+                "direction": direction,
+                "grade": grade,
+                "n": t.n,
+                "wins": t.wins,
+                "sl": t.sl,
+                "wr": t.wr,
+                "avg_pnl": round(_safe_float(t.avg_pnl), 3),
+                "sum_pnl": round(_safe_float(t.sum_pnl), 2),
+            }
+            for (direction, grade), t in sorted(self.matrix.items())
+        ]
+
+    def rolling_wr_trend(self) -> List[Dict[str, Any]]:
+        """每日 wr 滚动趋势（日期倒序）"""
+        return [
+            {"date": str(d), "n": t.n, "wins": t.wins, "wr": t.wr, "sum_pnl": round(_safe_float(t.sum_pnl), 2)}
+            for d, t in sorted(self.trend.items(), reverse=True)
+        ]
+
+    def top_coins(self, limit: int = 5, order_desc: bool = True) -> List[Dict[str, Any]]:
+        """Top N 印钞/失血机（按 sum_pnl，n≥3；sum_pnl 为 NULL 时 DESC 排末尾、ASC 排最前，同 MySQL）"""
+        eligible = [(coin, t) for coin, t in self.coins.items() if t.n >= 3]
+        if order_desc:
+            eligible.sort(key=lambda x: (x[1].sum_pnl is None, -(x[1].sum_pnl or 0), x[0]))
+        else:
+            eligible.sort(key=lambda x: (x[1].sum_pnl is not None, x[1].sum_pnl or 0, x[0]))
+        return [
+            {
+                "coin": coin,
+                "n": t.n,
+                "wr": t.wr,
+                "sum_pnl": round(_safe_float(t.sum_pnl), 2),
+                "avg_pnl": round(_safe_float(t.avg_pnl), 3),
+            }
+            for coin, t in eligible[:limit]
+        ]
+
+    def alpha_breakdown(self) -> List[Dict[str, Any]]:
+        out = [
+            {
+                "alpha": d["alpha"],
+                "n": d["n"],
+                "wr": round(d["wins"] / d["n"] * 100, 1) if d["n"] else 0,
+                "sum_pnl": round(d["sum_pnl"], 2),
+            }
+            for d in self.alphas.values()
+        ]
+        out.sort(key=lambda x: x["sum_pnl"], reverse=True)
+        return out
+
+    def ab_comparison(self) -> Dict[str, Any]:
+        from app.signals.ab_framework import summarize_buckets
+        return summarize_buckets(
+            {"bucket": bucket, "n": t.n, "wins": t.wins, "sum_pnl": t.sum_pnl, "avg_pnl": t.avg_pnl}
+            for bucket, t in self.ab.items()
+        )
+
+
+def _scan_rows(days: int = 7) -> Optional[ReportAccumulator]:
+    """
+    流式读取窗口内的卡（settled_at 或 created_at 落在近 days 天）并逐行累加。
+    SSDictCursor 不把结果集整体缓存在客户端。失败返回 None。
+    """
+    conn = None
+    try:
+        import pymysql.cursors
+        conn = _get_conn()
+        with conn.cursor() as cur:
+            cur.execute("SELECT NOW()")
+            now = cur.fetchone()[0]
+        acc = ReportAccumulator(now, ab_days=days)
+        with conn.cursor(pymysql.cursors.SSDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT coin, direction, grade, status, pnl_pct,
+                       sources_json, math_json, created_at, settled_at
+                FROM signal_card_history
+                WHERE settled_at >= DATE_SUB(%s, INTERVAL %s DAY)
+                   OR created_at >= DATE_SUB(%s, INTERVAL %s DAY)
+                """,
+                (now, days, now, days),
+            )
+            for row in cur:
+                acc.add(row)
+        return acc
+    except Exception as e:
+        logger.warning(f"daily_report 查询失败: {type(e).__name__}: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
 
 
 def generate_daily_report() -> Dict[str, Any]:
     """
-    生成每日报表。fail-open：任何子查询失败都不阻塞其他部分。
+    生成每日报表（含 A/B 桶对照）。fail-open：查询失败时各分区返回空结构。
     """
     now = datetime.utcnow()
-    report = {
-        "generated_at": now.isoformat(),
-        "timezone": "UTC",
-        "summary_24h": _summary_24h(),
-        "direction_grade_matrix_24h": _direction_grade_matrix(days=1),
-        "rolling_7d_trend": _rolling_wr_trend(days=7),
-        "breadth_distribution_7d": _breadth_distribution(days=7),
-        "guardrail_hits_24h": _guardrail_hits(days=1),
-        "top5_printers_7d": _top_coins(days=7, limit=5, order_desc=True),
-        "top5_bleeders_7d": _top_coins(days=7, limit=5, order_desc=False),
-        "alpha_breakdown_7d": _alpha_breakdown(days=7),
-    }
+    acc = _scan_rows(days=7)
+    if acc is not None:
+        report = {
+            "generated_at": now.isoformat(),
+            "timezone": "UTC",
+            "summary_24h": acc.summary_24h(),
+            "direction_grade_matrix_24h": acc.direction_grade_matrix(),
+            "rolling_7d_trend": acc.rolling_wr_trend(),
+            "breadth_distribution_7d": dict(acc.breadth),
+            "guardrail_hits_24h": dict(acc.guardrail),
+            "top5_printers_7d": acc.top_coins(limit=5, order_desc=True),
+            "top5_bleeders_7d": acc.top_coins(limit=5, order_desc=False),
+            "alpha_breakdown_7d": acc.alpha_breakdown(),
+            "ab_buckets_7d": acc.ab_comparison(),
+        }
+    else:
+        report = {
+            "generated_at": now.isoformat(),
+            "timezone": "UTC",
+            "summary_24h": {"n": 0, "wins": 0, "wr": 0, "sum_pnl": 0, "avg_pnl": 0},
+            "direction_grade_matrix_24h": [],
+            "rolling_7d_trend": [],
+            "breadth_distribution_7d": {},
+            "guardrail_hits_24h": {},
+            "top5_printers_7d": [],
+            "top5_bleeders_7d": [],
+            "alpha_breakdown_7d": [],
+            "ab_buckets_7d": None,
+        }
 
     # 加 guardrail 表当前状态
     try:
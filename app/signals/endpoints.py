@@ -8,12 +8,13 @@ from fastapi.responses import JSONResponse
 from sse_starlette.sse import EventSourceResponse
 
 from app.signals.models import SignalCard, SignalStatus, SignalGrade
-from app.signals.fusion import fuse_signals, _build_card_event
+from app.signals.fusion import fuse_signals, encode_card_event
 from app.signals.backtest import backtest_signal, walk_forward_validation
 from app.signals.adaptive_strategy import get_strategy_engine
 from app.signals.settlement import save_signal_card
 from app.signals.review import weekly_review, get_review_summary
-from app.signals.alpha_scanner import scan_all_coins, get_scan_coins
+from app.signals.alpha_scanner import get_scan_coins
+from app.signals import scan_refresh
 from app.services.data_service import (
     get_header_data,
     get_kline_data,
@@ -133,7 +134,7 @@ async def scan_top_coins(
     - 缓存 > 30min → 返回旧数据，后台异步刷新
     - refresh=True → 强制重新扫描
     """
-    from app.signals.settlement import get_latest_scan, save_scan_batch
+    from app.signals.settlement import get_latest_scan
 
     if not refresh:
         cached = await asyncio.get_event_loop().run_in_executor(None, get_latest_scan)
@@ -155,12 +156,8 @@ async def scan_top_coins(
             signals = cached["signals"][:limit]
             displays = cached["displays"][:limit]
 
-            async def _bg_refresh():
-                t0 = time.time()
-                results = await scan_all_coins(concurrency=10)
-                save_scan_batch(results, time.time() - t0)
-
-            asyncio.create_task(_bg_refresh())
+            # 单飞：本进程/其他 worker 已在刷新时不重复起扫描
+            scan_refresh.trigger_refresh(concurrency=10)
 
             return {
                 "source": "cache_stale",
@@ -173,33 +170,27 @@ async def scan_top_coins(
                 "note": "缓存已过期，后台正在刷新",
             }
 
-    # 无缓存或强制刷新：现场扫描（5分钟超时保护）
-    t0 = time.time()
+    # 无缓存或强制刷新：现场扫描（5分钟超时保护），并发请求共享同一次扫描
     try:
-        results = await asyncio.wait_for(scan_all_coins(concurrency=10), timeout=300)
+        refreshed = await scan_refresh.refresh(concurrency=10)
     except asyncio.TimeoutError:
         return JSONResponse(status_code=504, content={"error": "扫描超时(5min)，请稍后重试"})
-    elapsed = time.time() - t0
 
-    # 信号卡写入 signal_card_history（供结算和复盘）
-    signal_results = [r for r in results if r.signal_card is not None]
-    saved = 0
-    for r in signal_results:
-        try:
-            record_id = save_signal_card(r.signal_card)
-            if record_id:
-                saved += 1
-        except Exception:
-            pass
-
-    # 扫描结果写入 scan_cache（30秒超时）
-    try:
-        await asyncio.wait_for(
-            asyncio.get_event_loop().run_in_executor(None, save_scan_batch, results, elapsed),
-            timeout=30,
-        )
-    except asyncio.TimeoutError:
-        pass
+    if not refreshed.leader:
+        # 其他 worker 刚完成刷新，读它写入的缓存
+        cached = await asyncio.get_event_loop().run_in_executor(None, get_latest_scan)
+        if not cached:
+            return JSONResponse(status_code=503, content={"error": "扫描结果暂不可用，请稍后重试"})
+        return {
+            "source": "cache",
+            "total_coins_scanned": cached["total_coins"],
+            "count": len(cached["signals"][:limit]),
+            "signals": cached["signals"][:limit],
+            "display": cached["displays"][:limit],
+            "scan_time": cached["scan_time"],
+            "cached_at": cached["cached_at"],
+        }
+    results, elapsed = refreshed.results, refreshed.elapsed
 
     signals = [r for r in results if r.signal_card is not None][:limit]
 
@@ -453,10 +444,14 @@ async def get_best_signal(
 
     if not signals:
         try:
-            results = await asyncio.wait_for(scan_all_coins(concurrency=10), timeout=300)
+            refreshed = await scan_refresh.refresh(concurrency=10)
         except asyncio.TimeoutError:
             return JSONResponse(status_code=504, content={"error": "扫描超时(5min)，请稍后重试"})
-        signals = [r.signal_card.model_dump_display() for r in results if r.signal_card is not None]
+        if refreshed.leader:
+            signals = [r.signal_card.model_dump_display() for r in refreshed.results if r.signal_card is not None]
+        else:
+            cached = await loop.run_in_executor(None, get_latest_scan)
+            signals = list(cached["signals"]) if cached else []
 
     if not signals:
         return {"status": "no_signal", "message": "当前无信号卡数据，请稍后重试"}
@@ -703,15 +698,15 @@ async def signal_card_stream(
                             signal_card.sample_count = bt["sample_count"]
                             signal_card.avg_profit_pct = bt["avg_profit_pct"]
 
-                        # 构建事件
-                        event_data = _build_card_event(signal_card, bt, tier)
+                        # 构建事件（同一卡片版本只编码一次，各连接共享）
+                        event_data = encode_card_event(signal_card, bt, tier)
 
                         # 记录已推送
                         _pushed_signals[sig_key] = (signal_card.direction.value, signal_card.grade.value, now)
 
                         yield {
                             "event": "signal_card",
-                            "data": json.dumps(event_data, ensure_ascii=False),
+                            "data": event_data,
                         }
 
                     except Exception:
@@ -791,6 +786,10 @@ async def reset_and_settle(
         reset_count = cursor.rowcount
         cursor.close()
         conn.commit()
+        # 重置的卡已不再是已结算状态，按天重建涉及日期的胜率聚合
+        from app.signals import winrate_agg
+        winrate_agg.ensure_table(conn)
+        winrate_agg.rebuild(conn, days=int(hours // 24) + 1)
 
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         cursor.execute(
@@ -862,6 +861,61 @@ async def query_winrate(
     }
 
 
+def _opt_float(v):
+    return float(v or 0) if v else None
+
+
+def _fmt_minute(v):
+    return v.strftime("%Y-%m-%d %H:%M") if v else None
+
+
+def _json_col(v):
+    from app.signals.settlement import _safe_json_loads
+    return _safe_json_loads(v) if v else None
+
+
+# /history 输出字段 → (依赖列, 取值函数)；fields 参数按这里的 key 投影
+_HISTORY_FIELDS = {
+    "id": (("id",), lambda r: r["id"]),
+    "coin": (("coin",), lambda r: r["coin"]),
+    "direction": (("direction",), lambda r: r["direction"]),
+    "grade": (("grade",), lambda r: r["grade"]),
+    "entry_zone": (("entry_low", "entry_high"),
+                   lambda r: [float(r["entry_low"] or 0), float(r["entry_high"] or 0)]),
+    "stop_loss": (("stop_loss",), lambda r: float(r["stop_loss"] or 0)),
+    "take_profit": (("take_profit",), lambda r: float(r["take_profit"] or 0)),
+    "price": (("current_price",), lambda r: float(r["current_price"] or 0)),
+    "confidence": (("confidence",), lambda r: float(r["confidence"] or 0)),
+    "risk_reward": (("risk_reward_ratio",), lambda r: float(r["risk_reward_ratio"] or 0)),
+    "status": (("status",), lambda r: r["status"]),
+    "settled_price": (("settled_price",), lambda r: _opt_float(r["settled_price"])),
+    "pnl_pct": (("pnl_pct",), lambda r: _opt_float(r["pnl_pct"])),
+    "created_at": (("created_at",), lambda r: _fmt_minute(r["created_at"])),
+    "settled_at": (("settled_at",), lambda r: _fmt_minute(r["settled_at"])),
+    # 以下默认不返回（TEXT 大字段 / 策略快照），需在 fields 里显式指定
+    "regime": (("regime",), lambda r: r["regime"]),
+    "strategy_version": (("strategy_version",), lambda r: r["strategy_version"]),
+    "sources": (("sources_json",), lambda r: _json_col(r["sources_json"])),
+    "math": (("math_json",), lambda r: _json_col(r["math_json"])),
+}
+_HISTORY_DEFAULT_FIELDS = (
+    "id", "coin", "direction", "grade", "entry_zone", "stop_loss", "take_profit", "price",
+    "confidence", "risk_reward", "status", "settled_price", "pnl_pct", "created_at", "settled_at",
+)
+
+
+def _history_columns(fields: List[str]) -> str:
+    """投影字段 → SELECT 列（始终带 id / created_at 供 keyset 游标）"""
+    cols = {"id", "created_at"}
+    for f in fields:
+        cols.update(_HISTORY_FIELDS[f][0])
+    return ", ".join(sorted(cols))
+
+
+def _history_row(r: dict, fields: List[str]) -> dict:
+    return {f: _HISTORY_FIELDS[f][1](r) for f in fields}
+
+
 @router.get("/history")
 async def query_history(
     coin: Optional[str] = Query(None, description="币种，如 BTC"),
@@ -870,64 +924,69 @@ async def query_history(
     direction: Optional[str] = Query(None, description="方向: long/short"),
     days: int = Query(7, ge=1, le=90, description="回看天数"),
     limit: int = Query(50, ge=1, le=200, description="返回条数"),
+    cursor: Optional[str] = Query(None, description="翻页游标（上一页返回的 next_cursor）"),
+    fields: Optional[str] = Query(
+        None, description="返回字段，逗号分隔；默认不含 sources / math / regime / strategy_version",
+    ),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="ndjson=流式导出全部匹配记录"),
 ):
-    """查询信号卡历史记录（含结算结果，自动选择直连/代理模式）"""
-    def _query():
-        from app.signals.settlement import _USE_PROXY, _proxy_get, _get_conn
-        import pymysql.cursors
+    """
+    查询信号卡历史记录（含结算结果，自动选择直连/代理模式）
+
+    按 (created_at, id) 倒序 keyset 分页：响应里的 next_cursor 传回 cursor 取下一页，
+    为 null 表示已到末页；total 只在首页（不带 cursor）计算。
+    format=ndjson 时忽略 limit，用服务端游标逐行流式输出全部匹配记录（每行一张卡）。
+    """
+    from app.utils import keyset
+    try:
+        selected = keyset.parse_fields(fields, _HISTORY_FIELDS, _HISTORY_DEFAULT_FIELDS)
+        cursor_sql, cursor_params = keyset.keyset_where(cursor)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
 
-        if _USE_PROXY:
-            result = _proxy_get("/api/history",
-                {"coin": coin, "grade": grade, "status": status, "direction": direction, "days": days, "limit": limit})
-            if not result.get("ok"):
-                return {"error": result.get("error", "query failed")}
-            return {"total": result.get("total", 0), "count": result.get("count", 0), "cards": result.get("cards", [])}
+    from app.signals.settlement import _USE_PROXY, _get_conn
+    filters = {"coin": coin, "grade": grade, "status": status, "direction": direction, "days": days}
 
+    if _USE_PROXY:
+        return await _query_history_proxy(filters, limit, cursor, selected, format)
+
+    where_parts = ["created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)"]
+    params: list = [days]
+    if coin:
+        where_parts.append("coin = %s"); params.append(coin.upper())
+    if grade:
+        where_parts.append("grade = %s"); params.append(grade.upper())
+    if status:
+        where_parts.append("status = %s"); params.append(status)
+    if direction:
+        where_parts.append("direction = %s"); params.append(direction)
+    filter_where = " AND ".join(where_parts)
+    page_where = f"{filter_where} AND {cursor_sql}" if cursor_sql else filter_where
+    page_sql = (f"SELECT {_history_columns(selected)} FROM signal_card_history WHERE {page_where} "
+                f"ORDER BY created_at DESC, id DESC")
+
+    if format == "ndjson":
+        return keyset.NDJSONResponse(
+            keyset.stream_ndjson(_get_conn, page_sql, params + cursor_params,
+                                 lambda r: _history_row(r, selected)),
+        )
+
+    def _query():
+        import pymysql.cursors
         conn = None
         try:
             conn = _get_conn()
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
-            where_parts = ["created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)"]
-            params: list = [days]
-            if coin:
-                where_parts.append("coin = %s"); params.append(coin.upper())
-            if grade:
-                where_parts.append("grade = %s"); params.append(grade.upper())
-            if status:
-                where_parts.append("status = %s"); params.append(status)
-            if direction:
-                where_parts.append("direction = %s"); params.append(direction)
-            where = " AND ".join(where_parts)
-
-            cursor.execute(f"SELECT COUNT(*) as cnt FROM signal_card_history WHERE {where}", params)
-            total = cursor.fetchone()["cnt"]
-
-            cursor.execute(
-                f"""SELECT id, coin, direction, grade,
-                           entry_low, entry_high, stop_loss, take_profit,
-                           current_price, confidence, risk_reward_ratio,
-                           status, settled_price, pnl_pct, created_at, settled_at
-                    FROM signal_card_history WHERE {where}
-                    ORDER BY created_at DESC LIMIT %s""",
-                params + [limit])
-            rows = cursor.fetchall()
-            cursor.close()
-
-            cards = []
-            for r in rows:
-                cards.append({
-                    "id": r["id"], "coin": r["coin"], "direction": r["direction"], "grade": r["grade"],
-                    "entry_zone": [float(r["entry_low"] or 0), float(r["entry_high"] or 0)],
-                    "stop_loss": float(r["stop_loss"] or 0), "take_profit": float(r["take_profit"] or 0),
-                    "price": float(r["current_price"] or 0), "confidence": float(r["confidence"] or 0),
-                    "risk_reward": float(r["risk_reward_ratio"] or 0),
-                    "status": r["status"],
-                    "settled_price": float(r["settled_price"] or 0) if r["settled_price"] else None,
-                    "pnl_pct": float(r["pnl_pct"] or 0) if r["pnl_pct"] else None,
-                    "created_at": r["created_at"].strftime("%Y-%m-%d %H:%M") if r["created_at"] else None,
-                    "settled_at": r["settled_at"].strftime("%Y-%m-%d %H:%M") if r["settled_at"] else None,
-                })
-            return {"total": total, "count": len(cards), "cards": cards}
+            cur = conn.cursor(pymysql.cursors.DictCursor)
+            total = None
+            if not cursor:
+                cur.execute(f"SELECT COUNT(*) as cnt FROM signal_card_history WHERE {filter_where}", params)
+                total = cur.fetchone()["cnt"]
+            cur.execute(f"{page_sql} LIMIT %s", params + cursor_params + [limit])
+            rows = cur.fetchall()
+            cur.close()
+            cards = [_history_row(r, selected) for r in rows]
+            return {"total": total, "count": len(cards), "cards": cards,
+                    "next_cursor": keyset.next_cursor(rows, limit)}
         except Exception as e:
             return {"error": str(e)}
         finally:
@@ -940,13 +999,52 @@ async def query_history(
             return JSONResponse(status_code=500, content={"error": result["error"]})
         return {
             "status": "success",
-            "filters": {"coin": coin, "grade": grade, "status": status, "direction": direction, "days": days},
+            "filters": filters,
             "total": result["total"], "count": result["count"], "cards": result["cards"],
+            "next_cursor": result["next_cursor"],
         }
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
+async def _query_history_proxy(filters: dict, limit: int, cursor: Optional[str], fields: List[str], fmt: str):
+    """代理模式：透传 cursor / fields；ndjson 在本地按页拉取后逐行输出"""
+    from app.signals.settlement import _proxy_get
+    loop = asyncio.get_running_loop()
+    field_param = ",".join(fields)
+
+    def _page(page_cursor, page_limit):
+        return _proxy_get("/api/history", {**filters, "limit": page_limit, "cursor": page_cursor, "fields": field_param})
+
+    if fmt == "ndjson":
+        from app.utils.keyset import NDJSONResponse, json_default
+
+        def _stream():
+            page_cursor = cursor
+            while True:
+                result = _page(page_cursor, 200)
+                if not result.get("ok"):
+                    yield (json.dumps({"error": result.get("error", "query failed")}) + "\n").encode()
+                    return
+                for card in result.get("cards", []):
+                    yield (json.dumps(card, ensure_ascii=False, default=json_default) + "\n").encode()
+                page_cursor = result.get("next_cursor")
+                if not page_cursor:
+                    return
+
+        return NDJSONResponse(_stream())
+
+    result = await loop.run_in_executor(None, _page, cursor, limit)
+    if not result.get("ok"):
+        return JSONResponse(status_code=500, content={"error": result.get("error", "query failed")})
+    return {
+        "status": "success",
+        "filters": filters,
+        "total": result.get("total"), "count": result.get("count", 0), "cards": result.get("cards", []),
+        "next_cursor": result.get("next_cursor"),
+    }
+
+
 # ── 策略评估：多维切片回测 ────────────────────────────────────────────────────
 
 _ALLOWED_GROUP_BY = {
@@ -0,0 +1,533 @@
+"""
+离线策略演化 — 在已结算信号卡上批量评估权重 / REGIME_PRESETS / grade 阈值组合
+
+AdaptiveStrategyEngine.evolve 只能根据近期结果微调权重，无法在历史上大规模比较候选参数
+（逐张卡查库、逐张重融合太慢）。这里把已结算的 signal_card_history 一次性读成列式数组，
+用矩阵运算对成千上万组候选参数按 fuse_signals 的同一套逻辑重新定级，输出每组候选的胜率和 EV，
+并用滚动前推（walk-forward）切分评估样本外表现，避免过拟合。
+
+数据来源：CSV / Parquet 导出（无需数据库），列与 signal_card_history 一致，至少包含
+    direction, status, pnl_pct, sources_json, regime, created_at（math_json 可选）
+导出：python -m app.signals.evolution --export cards.csv --days 180   （需数据库）
+评估：python -m app.signals.evolution --input cards.csv --folds 4 --top 20
+
+重定级逻辑（与 fuse_signals 融合计算段一致）：
+  - 核心源权重 = 候选基础权重 × regime weight_boost 后归一化（同 get_adaptive_weights）；
+    bigorder_decay 使用 bigorder_anomaly 的权重，alpha_* 使用各自 BASE_WEIGHT
+  - weighted_direction = Σ(方向×score×weight) / Σweight，|wd| > 15 才出方向
+  - confidence = min(95, Σ(score×weight)/Σweight×100)，再 + math_score_adjustment×0.3
+  - 信号源 ≥ 2 且同向 ≥ 2，grade 按 S/A/B 阈值（严格模式下最低 B）
+
+局限（与 backtest_v7_compare 相同的"剔除式"回测）：
+  - 只能重评已经生成过的卡；候选参数下新出现的信号无法评估
+  - 候选方向与实际方向相反的卡结果未知，不计入胜率，单独统计 flipped
+  - ev_guardrail / quality_gate / market_breadth 依赖当时的外部状态，不参与重算
+  - 默认只用 origin=scan 的卡（chat 生成的卡走 relaxed 模式，定级规则不同）
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.signals.adaptive_strategy import DEFAULT_WEIGHTS, REGIME_PRESETS
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CORE_SOURCES = list(DEFAULT_WEIGHTS)  # bigorder_anomaly / quantitative / technical
+
+# 信号源名 → 权重槽位（bigorder_decay 复用 bigorder_anomaly 的自适应权重）
+SOURCE_ALIASES = {"bigorder_decay": "bigorder_anomaly"}
+
+# alpha 源的固定权重（与各模块 BASE_WEIGHT 保持一致；未知源按 DEFAULT_ALPHA_WEIGHT）
+ALPHA_WEIGHTS = {
+    "alpha_breakout_retest": 0.20,
+    "alpha_mean_reversion": 0.20,
+    "alpha_funding_rate": 0.15,
+}
+DEFAULT_ALPHA_WEIGHT = 0.20
+
+# 默认 v7 阈值（与 fuse_signals 中 grade_calibrator 读取失败时的回退值一致）
+DEFAULT_THRESHOLDS = (70.0, 60.0, 75.0, 35.0)  # S, A_3src, A_2src, B
+
+GRADE_RANK = {"B": 1, "A": 2, "S": 3}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 列式数据
+# ─────────────────────────────────────────────────────────────────────────────
+
+@dataclass
+class CardColumns:
+    """已结算卡的列式表示（n 张卡 × k 个信号源槽位）"""
+    slots: List[str]                # 槽位名：CORE_SOURCES + 出现过的 alpha 源
+    regimes: List[str]
+    score: np.ndarray               # [n, k] 信号源 score，缺失为 0
+    sign: np.ndarray                # [n, k] +1 long / -1 short / 0 neutral
+    present: np.ndarray             # [n, k] 0/1
+    regime_idx: np.ndarray          # [n]
+    direction: np.ndarray           # [n] 实际方向 +1 / -1
+    math_adj: np.ndarray            # [n] math_score_adjustment
+    win: np.ndarray                 # [n] 0/1
+    pnl: np.ndarray                 # [n] pnl_pct
+    ts: np.ndarray                  # [n] created_at（datetime64）
+
+    @property
+    def n(self) -> int:
+        return len(self.direction)
+
+
+def _safe_json(s, default):
+    if s is None or (isinstance(s, float) and np.isnan(s)):
+        return default
+    if isinstance(s, (list, dict)):
+        return s
+    try:
+        return json.loads(s)
+    except Exception:
+        return default
+
+
+def _is_win(status: str, pnl: float) -> bool:
+    """与 backtest_v7_compare._is_win 一致：hit_tp 算赢，expired 按 pnl 正负"""
+    return status == "hit_tp" or (status == "expired" and pnl > 0)
+
+
+def columns_from_rows(rows: Iterable[Dict[str, Any]], origin: Optional[str] = "scan") -> CardColumns:
+    """把 signal_card_history 行（dict）转成列式数组。origin=None 不按来源过滤"""
+    import pandas as pd
+
+    parsed = []
+    alpha_names: List[str] = []
+    for r in rows:
+        status = r.get("status")
+        if status not in ("hit_tp", "hit_sl", "expired"):
+            continue
+        direction = {"long": 1, "short": -1}.get(str(r.get("direction")))
+        if direction is None:
+            continue
+        math_json = _safe_json(r.get("math_json"), {}) or {}
+        if origin and math_json.get("origin", "scan") != origin:
+            continue
+        sources = [s for s in _safe_json(r.get("sources_json"), []) if isinstance(s, dict)]
+        for s in sources:
+            name = SOURCE_ALIASES.get(s.get("name"), s.get("name"))
+            if name and name not in CORE_SOURCES and name not in alpha_names:
+                alpha_names.append(name)
+        try:
+            pnl = float(r.get("pnl_pct") or 0)
+        except (TypeError, ValueError):
+            pnl = 0.0
+        parsed.append((r, direction, math_json, sources, pnl))
+
+    slots = CORE_SOURCES + sorted(alpha_names)
+    slot_idx = {name: i for i, name in enumerate(slots)}
+    n, k = len(parsed), len(slots)
+
+    score = np.zeros((n, k))
+    sign = np.zeros((n, k))
+    present = np.zeros((n, k))
+    regimes: List[str] = []
+    regime_idx = np.zeros(n, dtype=np.int64)
+    direction = np.zeros(n)
+    math_adj = np.zeros(n)
+    win = np.zeros(n)
+    pnl_arr = np.zeros(n)
+    ts = []
+
+    sign_map = {"long": 1.0, "short": -1.0}
+    for i, (r, d, math_json, sources, pnl) in enumerate(parsed):
+        for s in sources:
+            j = slot_idx[SOURCE_ALIASES.get(s.get("name"), s.get("name"))]
+            try:
+                score[i, j] = float(s.get("score") or 0)
+            except (TypeError, ValueError):
+                score[i, j] = 0.0
+            sign[i, j] = sign_map.get(str(s.get("direction")), 0.0)
+            present[i, j] = 1.0
+        regime = r.get("regime") or math_json.get("market_regime") or "quiet"
+        if regime not in regimes:
+            regimes.append(regime)
+        regime_idx[i] = regimes.index(regime)
+        direction[i] = d
+        math_adj[i] = float(math_json.get("math_score_adjustment") or 0)
+        win[i] = 1.0 if _is_win(r.get("status"), pnl) else 0.0
+        pnl_arr[i] = pnl
+        ts.append(r.get("created_at"))
+
+    ts_arr = pd.to_datetime(pd.Series(ts, dtype="object"), errors="coerce").to_numpy()
+    order = np.argsort(ts_arr, kind="stable")  # 按时间排序，walk-forward 直接按位置切分
+    return CardColumns(
+        slots=slots, regimes=regimes,
+        score=score[order], sign=sign[order], present=present[order],
+        regime_idx=regime_idx[order], direction=direction[order], math_adj=math_adj[order],
+        win=win[order], pnl=pnl_arr[order], ts=ts_arr[order],
+    )
+
+
+def load_cards(path: str, origin: Optional[str] = "scan") -> CardColumns:
+    """从 CSV / Parquet 导出加载（按扩展名识别；Parquet 需要 pyarrow）"""
+    import pandas as pd
+
+    if path.endswith((".parquet", ".pq")):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    df = df.astype(object).where(df.notna(), None)
+    return columns_from_rows(df.to_dict("records"), origin=origin)
+
+
+def export_cards(path: str, days: int = 180) -> int:
+    """从数据库导出已结算卡到 CSV / Parquet，返回行数"""
+    import pandas as pd
+    from app.signals.backtest_v7_compare import _fetch_settled_cards
+
+    df = pd.DataFrame(_fetch_settled_cards(days))
+    if path.endswith((".parquet", ".pq")):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return len(df)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 候选参数
+# ─────────────────────────────────────────────────────────────────────────────
+
+@dataclass
+class Candidate:
+    """一组候选参数"""
+    weights: Dict[str, float]                          # 核心源基础权重
+    weight_boost: Dict[str, Dict[str, float]] = field(
+        default_factory=lambda: {r: dict(p.get("weight_boost", {})) for r, p in REGIME_PRESETS.items()}
+    )
+    thresholds: Tuple[float, float, float, float] = DEFAULT_THRESHOLDS
+    min_grade: str = "B"                               # 只交易该等级及以上
+    label: str = ""
+
+    def describe(self) -> dict:
+        return {
+            "label": self.label,
+            "weights": self.weights,
+            "thresholds": dict(zip(("S", "A_3src", "A_2src", "B"), self.thresholds)),
+            "min_grade": self.min_grade,
+        }
+
+
+def weight_grid(step: float = 0.05, lo: float = 0.10, hi: float = 0.60) -> List[Dict[str, float]]:
+    """核心源权重网格：和为 1，每个权重在 [lo, hi]（与 _bayesian_update 的上下限一致）"""
+    units = int(round(1 / step))
+    out = []
+    for a in range(units + 1):
+        for b in range(units + 1 - a):
+            c = units - a - b
+            w = [a * step, b * step, c * step]
+            if all(lo - 1e-9 <= v <= hi + 1e-9 for v in w):
+                out.append({name: round(v, 4) for name, v in zip(CORE_SOURCES, w)})
+    return out
+
+
+def preset_variants(scales: Sequence[float] = (0.0, 0.5, 1.0, 1.5)) -> List[Dict[str, Dict[str, float]]]:
+    """REGIME_PRESETS weight_boost 变体：boost = 1 + scale × (原 boost − 1)，scale=1 即现行预设"""
+    out = []
+    for scale in scales:
+        out.append({
+            regime: {k: round(1 + scale * (v - 1), 4) for k, v in preset.get("weight_boost", {}).items()}
+            for regime, preset in REGIME_PRESETS.items()
+        })
+    return out
+
+
+def build_candidates(
+    step: float = 0.05,
+    boost_scales: Sequence[float] = (0.0, 0.5, 1.0, 1.5),
+    thresholds: Optional[Sequence[Tuple[float, float, float, float]]] = None,
+    min_grades: Sequence[str] = ("B", "A"),
+) -> List[Candidate]:
+    """权重网格 × preset 变体 × 阈值组合 × 最低等级 的笛卡尔积"""
+    thresholds = thresholds or [DEFAULT_THRESHOLDS]
+    out = []
+    for w, (scale, boost), th, mg in itertools.product(
+        weight_grid(step), zip(boost_scales, preset_variants(boost_scales)), thresholds, min_grades,
+    ):
+        label = (
+            "w=" + "/".join(f"{w[s]:.2f}" for s in CORE_SOURCES)
+            + f" boost×{scale:g} th={'/'.join(f'{t:g}' for t in th)} ≥{mg}"
+        )
+        out.append(Candidate(weights=w, weight_boost=boost, thresholds=tuple(th), min_grade=mg, label=label))
+    return out
+
+
+def _effective_weights(cols: CardColumns, candidates: Sequence[Candidate]) -> np.ndarray:
+    """[C, R, K] 每个候选在每个 regime 下各槽位的实际权重"""
+    C, R, K = len(candidates), len(cols.regimes), len(cols.slots)
+    W = np.zeros((C, R, K))
+    for j, slot in enumerate(cols.slots):
+        if slot not in CORE_SOURCES:
+            W[:, :, j] = ALPHA_WEIGHTS.get(slot, DEFAULT_ALPHA_WEIGHT)
+    core = [cols.slots.index(s) for s in CORE_SOURCES]
+    for c, cand in enumerate(candidates):
+        base = np.array([cand.weights.get(s, DEFAULT_WEIGHTS[s]) for s in CORE_SOURCES])
+        for r, regime in enumerate(cols.regimes):
+            boost = cand.weight_boost.get(regime, {})
+            adjusted = base * np.array([boost.get(s, 1.0) for s in CORE_SOURCES])
+            total = adjusted.sum()
+            if total > 0:
+                adjusted = np.round(adjusted / total, 4)
+            W[c, r, core] = adjusted
+    return W
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 向量化重定级
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _regrade(cols: CardColumns, rows: np.ndarray, W: np.ndarray, th: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """对一组卡（同一 regime）在所有候选下重定级
+
+    Args:
+        rows: 卡的行号
+        W: [C, K] 该 regime 下各候选的槽位权重
+        th: [C, 4] S / A_3src / A_2src / B 阈值
+    Returns:
+        (new_direction [m, C]，0 表示不出信号；grade [m, C]，0 表示不出卡，1/2/3 = B/A/S)
+    """
+    score, sign, present = cols.score[rows], cols.sign[rows], cols.present[rows]
+    total_w = present @ W.T                                     # [m, C]
+    safe_w = np.where(total_w > 0, total_w, 1.0)
+    wd = np.where(total_w > 0, ((score * sign * present) @ W.T) / safe_w, 0.0)
+    conf = np.where(total_w > 0, np.minimum(95.0, ((score * present) @ W.T) / safe_w * 100), 0.0)
+    conf = np.minimum(95.0, conf + cols.math_adj[rows, None] * 0.3)
+
+    new_dir = np.where(wd > 15, 1, np.where(wd < -15, -1, 0))
+    n_src = present.sum(axis=1)[:, None]
+    cons_long = (present * (sign > 0)).sum(axis=1)[:, None]
+    cons_short = (present * (sign < 0)).sum(axis=1)[:, None]
+    consistent = np.where(new_dir > 0, cons_long, np.where(new_dir < 0, cons_short, 0))
+
+    s_conf, a3_conf, a2_conf, b_conf = (th[:, i][None, :] for i in range(4))
+    three = (n_src >= 3) & (consistent >= 3)
+    grade = np.where(three & (conf >= s_conf), 3,
+            np.where(three & (conf >= a3_conf), 2,
+            np.where((consistent >= 2) & (conf >= a2_conf), 2, 1)))
+    valid = (new_dir != 0) & (n_src >= 2) & (consistent >= 2)
+    return np.where(valid, new_dir, 0), np.where(valid, grade, 0)
+
+
+def _fold_index(n: int, folds: int) -> np.ndarray:
+    """按时间顺序等量切成 folds 段"""
+    return np.minimum((np.arange(n) * folds) // max(n, 1), folds - 1)
+
+
+def _evaluate_chunk(cols: CardColumns, candidates: Sequence[Candidate], fold_of: np.ndarray, folds: int) -> Dict[str, np.ndarray]:
+    """返回每个 fold × 候选 的 n / wins / pnl / flipped 聚合，形状 [folds, C]"""
+    C = len(candidates)
+    W = _effective_weights(cols, candidates)
+    th = np.array([c.thresholds for c in candidates], dtype=float)
+    min_grade = np.array([GRADE_RANK.get(c.min_grade, 1) for c in candidates])[None, :]
+
+    agg = {k: np.zeros((folds, C)) for k in ("n", "wins", "pnl", "flipped")}
+    onehot = np.eye(folds)[fold_of]                             # [n, folds]
+    for r in range(len(cols.regimes)):
+        rows = np.nonzero(cols.regime_idx == r)[0]
+        if len(rows) == 0:
+            continue
+        new_dir, grade = _regrade(cols, rows, W[:, r, :], th)
+        traded = grade >= min_grade
+        same = traded & (new_dir == cols.direction[rows, None])
+        flipped = traded & (new_dir == -cols.direction[rows, None])
+        F = onehot[rows].T                                      # [folds, m]
+        agg["n"] += F @ same
+        agg["wins"] += F @ (same * cols.win[rows, None])
+        agg["pnl"] += F @ (same * cols.pnl[rows, None])
+        agg["flipped"] += F @ flipped
+    return agg
+
+
+def _metrics(n, wins, pnl, flipped) -> dict:
+    n = int(n)
+    return {
+        "n": n,
+        "wins": int(wins),
+        "wr": round(float(wins) / n * 100, 1) if n else 0.0,
+        "ev": round(float(pnl) / n, 3) if n else 0.0,
+        "sum_pnl": round(float(pnl), 2),
+        "flipped": int(flipped),
+    }
+
+
+def evaluate_candidates(
+    cols: CardColumns,
+    candidates: Sequence[Candidate],
+    folds: int = 4,
+    min_n: int = 30,
+    objective: str = "ev",
+    top: int = 20,
+    chunk: int = 512,
+) -> Dict[str, Any]:
+    """批量评估候选参数
+
+    walk-forward：按时间切 folds 段，第 i 段（i ≥ 1）用前 i 段做训练挑出 objective 最优的候选，
+    记录它在第 i 段的样本外表现。排行榜按所有测试段合并后的样本外 objective 排序。
+
+    Args:
+        objective: "ev"（平均 pnl）或 "wr"（胜率）
+        min_n: 训练段 / 样本外合计交易数不足的候选不参与选择和排名
+    """
+    if cols.n == 0:
+        return {"error": "no_data", "n": 0}
+    folds = max(2, min(folds, cols.n))
+    fold_of = _fold_index(cols.n, folds)
+
+    agg = {k: np.zeros((folds, len(candidates))) for k in ("n", "wins", "pnl", "flipped")}
+    for start in range(0, len(candidates), chunk):
+        part = _evaluate_chunk(cols, candidates[start:start + chunk], fold_of, folds)
+        for k in agg:
+            agg[k][:, start:start + chunk] = part[k]
+
+    def _score(n, wins, pnl):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            val = pnl / n if objective == "ev" else wins / n
+        return np.where(n >= min_n, val, -np.inf)
+
+    # walk-forward 选择
+    walk = []
+    for i in range(1, folds):
+        train = {k: v[:i].sum(axis=0) for k, v in agg.items()}
+        scores = _score(train["n"], train["wins"], train["pnl"])
+        if not np.isfinite(scores).any():
+            continue
+        best = int(np.argmax(scores))
+        rows_i = np.nonzero(fold_of == i)[0]
+        walk.append({
+            "test_fold": i,
+            "period": [str(cols.ts[rows_i[0]])[:10], str(cols.ts[rows_i[-1]])[:10]],
+            "selected": candidates[best].label,
+            "train": _metrics(*(train[k][best] for k in ("n", "wins", "pnl", "flipped"))),
+            "test": _metrics(*(agg[k][i, best] for k in ("n", "wins", "pnl", "flipped"))),
+        })
+    oos_selected = {k: sum(w["test"][k] for w in walk) for k in ("n", "wins", "sum_pnl")}
+
+    # 样本外排行（合并 fold 1..folds-1）
+    oos = {k: v[1:].sum(axis=0) for k, v in agg.items()}
+    full = {k: v.sum(axis=0) for k, v in agg.items()}
+    ranking_score = _score(oos["n"], oos["wins"], oos["pnl"])
+    order = [int(i) for i in np.argsort(-ranking_score, kind="stable") if np.isfinite(ranking_score[i])][:top]
+    ranking = [{
+        "rank": r + 1,
+        **candidates[c].describe(),
+        "out_of_sample": _metrics(*(oos[k][c] for k in ("n", "wins", "pnl", "flipped"))),
+        "in_sample_all": _metrics(*(full[k][c] for k in ("n", "wins", "pnl", "flipped"))),
+    } for r, c in enumerate(order)]
+
+    return {
+        "cards": cols.n,
+        "period": [str(cols.ts[0])[:10], str(cols.ts[-1])[:10]],
+        "regimes": cols.regimes,
+        "sources": cols.slots,
+        "candidates": len(candidates),
+        "folds": folds,
+        "objective": objective,
+        "walk_forward": walk,
+        "walk_forward_oos": {
+            "n": oos_selected["n"],
+            "wr": round(oos_selected["wins"] / oos_selected["n"] * 100, 1) if oos_selected["n"] else 0.0,
+            "ev": round(oos_selected["sum_pnl"] / oos_selected["n"], 3) if oos_selected["n"] else 0.0,
+            "sum_pnl": round(oos_selected["sum_pnl"], 2),
+        },
+        "ranking": ranking,
+    }
+
+
+def baseline_candidate(weights: Optional[Dict[str, float]] = None) -> Candidate:
+    """现行参数：策略状态里的权重（默认 DEFAULT_WEIGHTS）+ 现行 REGIME_PRESETS + 当前阈值"""
+    if weights is None:
+        try:
+            from app.signals.adaptive_strategy import get_strategy_engine
+            weights = {k: v for k, v in get_strategy_engine().state.weights.items() if k in CORE_SOURCES}
+        except Exception:
+            weights = None
+    try:
+        from app.signals.grade_calibrator import get_effective_thresholds
+        eff = get_effective_thresholds()
+        th = (eff["S_min_conf"], eff["A_3src_min_conf"], eff["A_2src_min_conf"], eff["B_min_conf"])
+    except Exception:
+        th = DEFAULT_THRESHOLDS
+    return Candidate(weights=dict(weights or DEFAULT_WEIGHTS), thresholds=th, label="baseline")
+
+
+def run_evolution(
+    path: str,
+    step: float = 0.05,
+    boost_scales: Sequence[float] = (0.0, 0.5, 1.0, 1.5),
+    thresholds: Optional[Sequence[Tuple[float, float, float, float]]] = None,
+    min_grades: Sequence[str] = ("B", "A"),
+    folds: int = 4,
+    min_n: int = 30,
+    objective: str = "ev",
+    top: int = 20,
+    origin: Optional[str] = "scan",
+) -> Dict[str, Any]:
+    """主入口：加载导出文件 → 生成候选 → 批量评估（含 baseline 对照）"""
+    cols = load_cards(path, origin=origin)
+    candidates = [baseline_candidate()] + build_candidates(step, boost_scales, thresholds, min_grades)
+    report = evaluate_candidates(cols, candidates, folds=folds, min_n=min_n, objective=objective, top=top)
+    if cols.n:
+        base = evaluate_candidates(cols, candidates[:1], folds=folds, min_n=0, objective=objective, top=1)
+        report["baseline"] = base["ranking"][0] if base.get("ranking") else None
+    return report
+
+
+# ── CLI 入口 ────────────────────────────────────────────────────────────────
+
+def _parse_thresholds(values: Optional[List[str]]) -> Optional[List[Tuple[float, ...]]]:
+    if not values:
+        return None
+    return [tuple(float(x) for x in v.split("/")) for v in values]
+
+
+def _cli():
+    parser = argparse.ArgumentParser(description="离线策略演化（网格搜索 + walk-forward）")
+    parser.add_argument("--input", help="已结算卡导出文件（.csv / .parquet）")
+    parser.add_argument("--export", help="从数据库导出已结算卡到该路径后退出")
+    parser.add_argument("--days", type=int, default=180, help="导出窗口（默认 180 天）")
+    parser.add_argument("--step", type=float, default=0.05, help="核心权重网格步长")
+    parser.add_argument("--boost-scales", default="0,0.5,1,1.5", help="REGIME_PRESETS boost 缩放，逗号分隔")
+    parser.add_argument("--thresholds", nargs="*", help="grade 阈值组合 S/A3/A2/B，如 70/60/75/35 65/55/70/35")
+    parser.add_argument("--min-grades", default="B,A", help="最低交易等级，逗号分隔")
+    parser.add_argument("--folds", type=int, default=4)
+    parser.add_argument("--min-n", type=int, default=30)
+    parser.add_argument("--objective", choices=("ev", "wr"), default="ev")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--all-origins", action="store_true", help="包含 chat 生成的卡")
+    args = parser.parse_args()
+
+    if args.export:
+        n = export_cards(args.export, args.days)
+        print(f"exported {n} rows → {args.export}")
+        return
+    if not args.input:
+        parser.error("需要 --input 或 --export")
+
+    report = run_evolution(
+        args.input,
+        step=args.step,
+        boost_scales=[float(x) for x in args.boost_scales.split(",")],
+        thresholds=_parse_thresholds(args.thresholds),
+        min_grades=[g.strip() for g in args.min_grades.split(",")],
+        folds=args.folds,
+        min_n=args.min_n,
+        objective=args.objective,
+        top=args.top,
+        origin=None if args.all_origins else "scan",
+    )
+    print(json.dumps(report, indent=2, ensure_ascii=False, default=str))
+
+
+if __name__ == "__main__":
+    _cli()
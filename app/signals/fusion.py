@@ -9,6 +9,8 @@
 """
 import math
 import os
+import threading
+from collections import OrderedDict
 from typing import Optional, List
 from datetime import datetime
 
@@ -21,6 +23,8 @@ from app.signals.adaptive_strategy import get_strategy_engine
 import app.bigorder.deps as bigorder_deps
 from config.settings import settings
 from app.utils.logger import get_logger
+from app.utils.metrics import SSE_CARD_ENCODE_TOTAL
+from app.utils.sse_protocol import RawJSON, dumps
 
 logger = get_logger("app.signals.fusion")
 
@@ -151,16 +155,13 @@ def _map_tf_state(state: str) -> Optional[str]:
     }.get(state)
 
 
-def _quantitative_source(
-    coin: str, weight: float, lang: str = "zh",
-    entry_ohlcv: Optional[dict] = None,
-) -> Optional[SignalSource]:
-    """获取量化六因子信号源。
+def _fetch_quant_inputs(coin: str, entry_ohlcv: Optional[dict] = None) -> Optional[dict]:
+    """拉取量化六因子所需的全部数据（I/O 阶段）。核心数据拉取失败返回 None。
 
     entry_ohlcv: 上层（endpoints/scan_all_coins）已拉的 1h OHLCV，传入复用避免重复 HTTP 请求。
     """
     try:
-        from app.skills.analysis_skills.quantitative import QuantitativeAnalysisSkill, _parse_kline
+        from app.skills.analysis_skills.quantitative import _parse_kline
         from app.services.data_service import (
             get_header_data, get_kline_data, get_trade_volume,
             get_buy_sell_ratio, get_open_interest, get_funding_rate,
@@ -172,40 +173,59 @@ def _quantitative_source(
         header = get_header_data(coin)
         kline = get_kline_data(coin, 2)
         volume = get_trade_volume(coin)
+    except Exception:
+        return None
 
-        # 1h K线 72 根（满足 ema_triple 需 55）。优先复用上层传入的 entry_ohlcv，否则自己拉
-        ohlcv_1h = entry_ohlcv
-        if ohlcv_1h is None:
-            try:
-                kline_1h = get_kline_data(coin, 1)
-                ohlcv_1h = _parse_kline(kline_1h, min_bars=55)
-            except Exception:
-                pass
+    # 1h K线 72 根（满足 ema_triple 需 55）。优先复用上层传入的 entry_ohlcv，否则自己拉
+    ohlcv_1h = entry_ohlcv
+    if ohlcv_1h is None:
+        try:
+            kline_1h = get_kline_data(coin, 1)
+            ohlcv_1h = _parse_kline(kline_1h, min_bars=55)
+        except Exception:
+            pass
 
-        # 资金数据（激活 capital 因子）— 任一失败不拖垮整张卡
-        bs_ratio = oi = fr = None
-        try: bs_ratio = get_buy_sell_ratio(coin)
-        except Exception: pass
-        try: oi = get_open_interest(coin)
-        except Exception: pass
-        try: fr = get_funding_rate(coin)
-        except Exception: pass
+    # 资金数据（激活 capital 因子）— 任一失败不拖垮整张卡
+    bs_ratio = oi = fr = None
+    try: bs_ratio = get_buy_sell_ratio(coin)
+    except Exception: pass
+    try: oi = get_open_interest(coin)
+    except Exception: pass
+    try: fr = get_funding_rate(coin)
+    except Exception: pass
 
-        raw_data = {
-            "get_header_data": header,
-            "get_kline_data": kline,
-            "get_trade_volume": volume,
-            "get_buy_sell_ratio": bs_ratio,
-            "get_open_interest": oi,
-            "get_funding_rate": fr,
-            "hourly_ohlcv": ohlcv_1h,
-        }
+    return {
+        "get_header_data": header,
+        "get_kline_data": kline,
+        "get_trade_volume": volume,
+        "get_buy_sell_ratio": bs_ratio,
+        "get_open_interest": oi,
+        "get_funding_rate": fr,
+        "hourly_ohlcv": ohlcv_1h,
+    }
+
+
+def _quantitative_source(
+    coin: str, weight: float, lang: str = "zh",
+    entry_ohlcv: Optional[dict] = None,
+) -> Optional[SignalSource]:
+    """获取量化六因子信号源（拉数据 + 计算 + 写入 quant_store）。
 
-        skill = QuantitativeAnalysisSkill()
-        result = skill.analyze(coin, raw_data)
+    entry_ohlcv: 上层（endpoints/scan_all_coins）已拉的 1h OHLCV，传入复用避免重复 HTTP 请求。
+    """
+    raw_data = _fetch_quant_inputs(coin, entry_ohlcv)
+    if raw_data is None:
+        return None
+    try:
+        from app.skills.analysis_skills.quantitative import QuantitativeAnalysisSkill
+        result = QuantitativeAnalysisSkill().analyze(coin, raw_data, publish=True)
     except Exception:
         return None
+    return _quant_source_from_result(result, weight, lang)
+
 
+def _quant_source_from_result(result: Optional[dict], weight: float, lang: str = "zh") -> Optional[SignalSource]:
+    """六因子 LLM 数据包 → 量化信号源"""
     if not result or result.get("error"):
         return None
 
@@ -492,12 +512,90 @@ def _technical_source(ohlcv: dict, weight: float, lang: str = "zh") -> Optional[
     )
 
 
-def fuse_signals(coin: str, ohlcv: dict, raw_data: dict, relaxed: bool = False, lang: str = "zh") -> Optional[SignalCard]:
+def fetch_core_inputs(coin: str, raw_data: dict) -> dict:
+    """compute_signal_core 需要的外部数据（I/O 阶段）：量化六因子原始数据 + 大盘宽度"""
+    # market_breadth 提前取一次（market_context 有 5min LRU，后面 market_breadth 层复用同一次）
+    alpha_breadth = "neutral"
+    try:
+        from app.signals.market_context import get_btc_trend
+        alpha_breadth = (get_btc_trend() or {}).get("market_breadth", "neutral")
+    except Exception:
+        pass
+    return {
+        "quant_raw": _fetch_quant_inputs(coin, raw_data.get("entry_ohlcv")),
+        "alpha_breadth": alpha_breadth,
+    }
+
+
+def compute_signal_core(
+    coin: str, ohlcv: dict, raw_data: dict, quant_raw: Optional[dict],
+    alpha_breadth: str = "neutral", lang: str = "zh",
+) -> dict:
+    """
+    出卡的纯计算部分：数学推导、六因子、技术面、突破回踩 / 均值回归 alpha。
+
+    无 I/O、入参出参均可 pickle，扫描时放进进程池执行（见 alpha_scanner.scan_all_coins）。
+    技术面信号源的 weight 依赖自适应权重（主进程状态），这里置 0，由 fuse_signals 回填。
+    """
+    realtime_price = _extract_realtime_price(raw_data)
+    ohlcv = _apply_realtime_price(ohlcv, realtime_price)
+    entry_ohlcv = _apply_realtime_price(raw_data.get("entry_ohlcv") or {}, realtime_price)
+
+    closes = ohlcv.get("closes", [])
+    math_result = None
+    regime = "quiet"
+    if len(closes) >= 40:
+        math_result = run_math_derivation(closes, direction="long", lang=lang)
+        if math_result and math_result.regime:
+            regime = math_result.regime.regime
+
+    quant_payload = quant_parts = None
+    if quant_raw is not None:
+        try:
+            from app.skills.analysis_skills.quantitative import compute_quant
+            quant_payload, quant_parts = compute_quant(coin, quant_raw)
+        except Exception:
+            pass
+
+    breakout = meanrev = None
+    if os.getenv("ENABLE_ALPHA_BREAKOUT", "1") == "1":
+        try:
+            from app.signals.alpha_breakout_retest import evaluate as eval_breakout
+            breakout = eval_breakout(coin, ohlcv, regime, alpha_breadth)
+        except Exception as e:
+            logger.warning(f"alpha_breakout_retest 异常 {coin}: {type(e).__name__}: {e}")
+
+    if os.getenv("ENABLE_ALPHA_MEANREV", "1") == "1":
+        try:
+            from app.signals.alpha_mean_reversion import evaluate as eval_meanrev
+            # 4h K线用于反转确认（entry_ohlcv 通常是 4h/1h）
+            kline_4h = entry_ohlcv if entry_ohlcv and len(entry_ohlcv.get("closes", [])) >= 2 else None
+            meanrev = eval_meanrev(coin, ohlcv, regime, alpha_breadth, kline_4h)
+        except Exception as e:
+            logger.warning(f"alpha_mean_reversion 异常 {coin}: {type(e).__name__}: {e}")
+
+    return {
+        "math_result": math_result,
+        "regime": regime,
+        "quant_payload": quant_payload,
+        "quant_parts": quant_parts,
+        "technical": _technical_source(ohlcv, 0.0, lang),
+        "breakout": breakout,
+        "meanrev": meanrev,
+        "alpha_breadth": alpha_breadth,
+    }
+
+
+def fuse_signals(
+    coin: str, ohlcv: dict, raw_data: dict, relaxed: bool = False, lang: str = "zh",
+    core: Optional[dict] = None,
+) -> Optional[SignalCard]:
     """
     多维信号融合，生成交易信号卡
 
     Args:
         relaxed: True=降低门槛，始终返回卡（C级兜底），用于 Chat 场景
+        core: 已算好的 compute_signal_core 结果（扫描进程池路径）；None 则就地拉数据并计算
     """
     raw_data = raw_data or {}
     realtime_price = _extract_realtime_price(raw_data)
@@ -507,15 +605,12 @@ def fuse_signals(coin: str, ohlcv: dict, raw_data: dict, relaxed: bool = False,
     # ── 获取自适应引擎 ──────────────────────────────────────────
     engine = get_strategy_engine()
 
-    # ── 先做数学推导（用于获取市场状态）──────────────────────────
+    # ── 纯计算部分（数学推导 / 六因子 / 技术面 / alpha）──────────
+    if core is None:
+        core = compute_signal_core(coin, ohlcv, raw_data, lang=lang, **fetch_core_inputs(coin, raw_data))
     closes = ohlcv.get("closes", [])
-    math_result = None
-    regime = "quiet"
-
-    if len(closes) >= 40:
-        math_result = run_math_derivation(closes, direction="long", lang=lang)
-        if math_result and math_result.regime:
-            regime = math_result.regime.regime
+    math_result = core["math_result"]
+    regime = core["regime"]
 
     # ── 获取自适应权重 ──────────────────────────────────────────
     adaptive_weights = engine.get_adaptive_weights(regime)
@@ -561,47 +656,25 @@ def fuse_signals(coin: str, ohlcv: dict, raw_data: dict, relaxed: bool = False,
     if bigorder_src:
         sources.append(bigorder_src)
 
-    quant_src = _quantitative_source(
-        coin, adaptive_weights.get("quantitative", 0.35), lang,
-        entry_ohlcv=raw_data.get("entry_ohlcv"),
-    )
+    if core["quant_parts"] is not None:
+        from app.skills.analysis_skills.quantitative import publish_quant_parts
+        publish_quant_parts(core["quant_parts"])
+    quant_src = _quant_source_from_result(core["quant_payload"], adaptive_weights.get("quantitative", 0.35), lang)
     dual_tf_info = None
     if quant_src:
         sources.append(quant_src)
         dual_tf_info = quant_src.extra or {}
 
-    tech_src = _technical_source(ohlcv, adaptive_weights.get("technical", 0.30), lang)
+    tech_src = core["technical"]
     if tech_src:
+        tech_src.weight = adaptive_weights.get("technical", 0.30)
         sources.append(tech_src)
 
     # ── Phase 4: 对称 alpha 触发器（双向）──
-    # market_breadth 提前取一次（market_context 有 5min LRU，后面 line 689 复用同一次）
-    alpha_breadth = "neutral"
-    try:
-        from app.signals.market_context import get_btc_trend
-        alpha_breadth = (get_btc_trend() or {}).get("market_breadth", "neutral")
-    except Exception:
-        pass
-
-    if os.getenv("ENABLE_ALPHA_BREAKOUT", "1") == "1":
-        try:
-            from app.signals.alpha_breakout_retest import evaluate as eval_breakout
-            brk = eval_breakout(coin, ohlcv, regime, alpha_breadth)
-            if brk:
-                sources.append(brk)
-        except Exception as e:
-            logger.warning(f"alpha_breakout_retest 异常 {coin}: {type(e).__name__}: {e}")
-
-    if os.getenv("ENABLE_ALPHA_MEANREV", "1") == "1":
-        try:
-            from app.signals.alpha_mean_reversion import evaluate as eval_meanrev
-            # 4h K线用于反转确认（entry_ohlcv 通常是 4h/1h）
-            kline_4h = entry_ohlcv if entry_ohlcv and len(entry_ohlcv.get("closes", [])) >= 2 else None
-            mrev = eval_meanrev(coin, ohlcv, regime, alpha_breadth, kline_4h)
-            if mrev:
-                sources.append(mrev)
-        except Exception as e:
-            logger.warning(f"alpha_mean_reversion 异常 {coin}: {type(e).__name__}: {e}")
+    alpha_breadth = core["alpha_breadth"]
+    for alpha_src in (core["breakout"], core["meanrev"]):
+        if alpha_src:
+            sources.append(alpha_src)
 
     if os.getenv("ENABLE_ALPHA_FUNDING", "1") == "1":
         try:
@@ -1075,3 +1148,55 @@ def _build_card_event(signal_card: SignalCard, bt_result: dict, tier: str) -> di
         }
 
     return event
+
+
+# ── 卡片事件编码缓存 ──
+# /stream 每个连接各自扫描、各自出卡，同一张卡会被每个连接重复构建 + json 编码一次。
+# 按卡片版本缓存编码后的事件 JSON，各连接共享。版本就是 _build_card_event 读取的全部字段，
+# 卡片任何相关字段变化（价格、胜率回填、策略版本……）都是新版本，不会推旧内容。
+# 注意：_build_card_event 新增读取字段时同步加到 card_version。
+
+_CARD_ENCODE_CACHE_SIZE = 1024
+_card_encode_cache: "OrderedDict[tuple, RawJSON]" = OrderedDict()
+_card_encode_lock = threading.Lock()
+
+
+def card_version(signal_card: SignalCard, bt_result: Optional[dict], tier: str) -> tuple:
+    """卡片事件版本键（不走 pydantic 序列化，比构建事件本身便宜）"""
+    m, st = signal_card.math, signal_card.strategy
+    return (
+        tier, signal_card.coin, signal_card.direction, signal_card.grade, signal_card.confidence,
+        signal_card.win_rate, signal_card.sample_count, signal_card.avg_profit_pct,
+        signal_card.current_price, signal_card.entry_low, signal_card.entry_high,
+        signal_card.stop_loss, signal_card.take_profit, signal_card.risk_reward_ratio,
+        signal_card.position_pct, signal_card.invalidation_price,
+        tuple((s.name, s.score, s.direction, s.detail) for s in signal_card.sources),
+        None if m is None else (
+            m.hurst, m.hurst_interpretation, m.entropy_predictability, m.kelly_fraction,
+            m.monte_carlo_bull_prob, m.monte_carlo_bear_prob, m.monte_carlo_var95,
+            m.vol_regime, m.vol_percentile, m.market_regime, tuple(m.key_findings),
+        ),
+        None if st is None else (st.strategy_version, st.regime, st.global_win_rate),
+        None if not bt_result else (
+            bt_result.get("win_rate"), bt_result.get("sample_count"), bt_result.get("sharpe_ratio"),
+        ),
+    )
+
+
+def encode_card_event(signal_card: SignalCard, bt_result: Optional[dict], tier: str) -> RawJSON:
+    """_build_card_event 的编码结果（RawJSON），同一版本只构建 + 编码一次"""
+    key = card_version(signal_card, bt_result, tier)
+    with _card_encode_lock:
+        encoded = _card_encode_cache.get(key)
+        if encoded is not None:
+            _card_encode_cache.move_to_end(key)
+    if encoded is not None:
+        SSE_CARD_ENCODE_TOTAL.inc(result="hit")
+        return encoded
+    encoded = RawJSON(dumps(_build_card_event(signal_card, bt_result, tier)))
+    SSE_CARD_ENCODE_TOTAL.inc(result="miss")
+    with _card_encode_lock:
+        _card_encode_cache[key] = encoded
+        while len(_card_encode_cache) > _CARD_ENCODE_CACHE_SIZE:
+            _card_encode_cache.popitem(last=False)
+    return encoded
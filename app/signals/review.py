@@ -15,13 +15,14 @@ from typing import Optional, Dict, List, Any
 
 from config.settings import settings
 from app.utils.logger import get_logger
+from app.utils.metrics import instrument_connection
 
 logger = get_logger("app.signals.review")
 
 
 def _get_conn():
     import pymysql
-    return pymysql.connect(
+    return instrument_connection(lambda: pymysql.connect(
         host=settings.bigorder_mysql_host or settings.mysql_host,
         port=settings.bigorder_mysql_port or settings.mysql_port,
         user=settings.bigorder_mysql_user or settings.mysql_user,
@@ -30,7 +31,7 @@ def _get_conn():
         charset="utf8mb4",
         connect_timeout=5,
         read_timeout=15,
-    )
+    ), "signals")
 
 
 def weekly_review() -> Dict[str, Any]:
@@ -0,0 +1,216 @@
+"""
+全市场扫描增量预筛 — 输入没怎么变的币沿用上一轮结果，只对变化的币跑完整出卡
+
+问题：每 30 分钟对全部 discovery 币种跑一遍 拉K线 → fuse_signals → 回测 → 存卡，
+大部分币在两轮之间价格、成交量、大单几乎没动，出卡结果也一样。
+
+约定：
+- 预筛只用便宜数据：header（currentPrice / volume，走 fetch_json_cached，随后的完整扫描复用缓存）
+  + 大单 ZSET 在上次完整扫描之后新增的笔数（ZCOUNT，不解析成员）
+- 满足任一条件即完整扫描：首次出现 / 上轮出错 / 上轮结果超过 SCAN_DELTA_MAX_AGE /
+  价格变化 ≥ SCAN_DELTA_PRICE_PCT% / 成交量变化 ≥ SCAN_DELTA_VOLUME_PCT% /
+  新增大单 ≥ SCAN_DELTA_BIGORDER_TICKS / 全局状态变化（BTC 护栏方向、策略版本、市场 regime）
+- 其余币沿用上一轮 ScanResult（reused=True，不重复写 signal_card_history）
+- 比较基准是上次完整扫描时的输入，小幅漂移累积到阈值也会触发
+- SCAN_INCREMENTAL_SHADOW=true：照常全量扫描，但对预筛本会跳过的币比对新旧结果
+  （是否出卡 / 方向 / 等级），不一致计入 scan_prefilter_missed_total 并打日志，用于上线前核对
+- 状态只在进程内（扫描只在 leader 上跑）；换 leader / 重启后首轮全量
+"""
+from __future__ import annotations
+
+import dataclasses
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.settings import settings
+from app.utils.logger import get_logger
+from app.utils.metrics import SCAN_PREFILTER_MISSED, SCAN_PREFILTER_TOTAL, SCAN_SKIP_RATIO
+
+logger = get_logger(__name__)
+
+SKIP = "skip"
+
+
+@dataclass
+class CoinInputs:
+    """预筛用的便宜输入"""
+    price: Optional[float] = None
+    volume: Optional[float] = None
+    new_ticks: int = 0          # 上次完整扫描以来新增的大单笔数
+
+
+@dataclass
+class Decision:
+    coin: str
+    reason: str                 # skip 或触发完整扫描的原因
+    inputs: CoinInputs
+    probed_at: float
+
+    @property
+    def skip(self) -> bool:
+        return self.reason == SKIP
+
+
+@dataclass
+class _CoinState:
+    inputs: CoinInputs
+    scanned_at: float
+    result: Any                 # ScanResult
+
+
+@dataclass
+class _PassStats:
+    started: float = field(default_factory=time.time)
+    reasons: Dict[str, int] = field(default_factory=dict)
+    missed: List[str] = field(default_factory=list)
+
+
+def _num(d: Any, *keys: str) -> Optional[float]:
+    if not isinstance(d, dict):
+        return None
+    for k in keys:
+        try:
+            v = float(d.get(k))
+        except (TypeError, ValueError):
+            continue
+        if v > 0:
+            return v
+    return None
+
+
+def _pct_change(old: Optional[float], new: Optional[float]) -> float:
+    if not old or new is None:
+        return 0.0
+    return abs(new - old) / old * 100
+
+
+def _card_key(result: Any) -> Tuple:
+    card = getattr(result, "signal_card", None)
+    if card is None:
+        return (None, None)
+    return (card.direction.value, card.grade.value)
+
+
+class ScanDeltaFilter:
+    """按币记录上次完整扫描的输入和结果，判断本轮是否需要重算"""
+
+    def __init__(self):
+        self._states: Dict[str, _CoinState] = {}
+        self._global_key: Optional[Tuple] = None
+        self._stats = _PassStats()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.scan_incremental_enabled or settings.scan_incremental_shadow
+
+    @property
+    def shadow(self) -> bool:
+        return settings.scan_incremental_shadow
+
+    def begin(self, global_key: Tuple):
+        """一轮扫描开始；全局状态变了则丢弃全部基准，本轮全量"""
+        with self._lock:
+            if self._global_key is not None and global_key != self._global_key:
+                logger.info(f"增量扫描: 全局状态变化 {self._global_key} → {global_key}，本轮全量")
+                self._states.clear()
+            self._global_key = global_key
+            self._stats = _PassStats()
+
+    def probe(self, coin: str) -> CoinInputs:
+        """拉预筛输入（I/O，在扫描线程池里调用）"""
+        from app.services.data_service import get_header_data
+        import app.bigorder.deps as bigorder_deps
+
+        inputs = CoinInputs()
+        try:
+            header = get_header_data(coin)
+            inputs.price = _num(header, "currentPrice", "current_price", "price")
+            inputs.volume = _num(header, "volume", "volume_24h", "volume24h")
+        except Exception:
+            pass
+        state = self._states.get(coin)
+        consumer = getattr(bigorder_deps, "consumer", None)
+        if consumer is not None and state is not None:
+            try:
+                inputs.new_ticks = consumer.count_ticks(coin, int(state.scanned_at * 1000))
+            except Exception:
+                pass
+        return inputs
+
+    def decide(self, coin: str, inputs: CoinInputs) -> Decision:
+        now = time.time()
+        state = self._states.get(coin)
+        if state is None:
+            reason = "new"
+        elif getattr(state.result, "error", None):
+            reason = "error"
+        elif now - state.scanned_at >= settings.scan_delta_max_age:
+            reason = "max_age"
+        elif inputs.price is None:
+            reason = "no_price"
+        elif _pct_change(state.inputs.price, inputs.price) >= settings.scan_delta_price_pct:
+            reason = "price"
+        elif _pct_change(state.inputs.volume, inputs.volume) >= settings.scan_delta_volume_pct:
+            reason = "volume"
+        elif inputs.new_ticks >= settings.scan_delta_bigorder_ticks:
+            reason = "bigorder"
+        else:
+            reason = SKIP
+        with self._lock:
+            self._stats.reasons[reason] = self._stats.reasons.get(reason, 0) + 1
+        SCAN_PREFILTER_TOTAL.inc(decision=reason)
+        return Decision(coin=coin, reason=reason, inputs=inputs, probed_at=now)
+
+    def check(self, coin: str) -> Decision:
+        return self.decide(coin, self.probe(coin))
+
+    def reuse(self, decision: Decision) -> Any:
+        """沿用上一轮结果（标记 reused，调用方不再存卡）"""
+        prev = self._states[decision.coin].result
+        return dataclasses.replace(prev, reused=True, elapsed=time.time() - decision.probed_at)
+
+    def record(self, decision: Decision, result: Any):
+        """完整扫描后更新基准。
+
+        影子模式下本会被跳过的币：与会被沿用的基准结果比对，且不更新基准
+        （与真正跳过时的行为一致，漂移照样累积）。
+        """
+        prev = self._states.get(decision.coin)
+        if decision.skip and prev is not None:
+            if _card_key(prev.result) != _card_key(result):
+                with self._lock:
+                    self._stats.missed.append(
+                        f"{decision.coin}:{_card_key(prev.result)}→{_card_key(result)}")
+                SCAN_PREFILTER_MISSED.inc()
+            return
+        self._states[decision.coin] = _CoinState(
+            inputs=decision.inputs, scanned_at=decision.probed_at, result=result)
+
+    def finish(self) -> Dict[str, Any]:
+        """本轮汇总：跳过比例 + 影子模式漏判"""
+        with self._lock:
+            stats = self._stats
+        total = sum(stats.reasons.values())
+        skipped = stats.reasons.get(SKIP, 0)
+        ratio = skipped / total if total else 0.0
+        SCAN_SKIP_RATIO.set(ratio)
+        summary = {
+            "total": total,
+            "skipped": skipped,
+            "skip_ratio": round(ratio, 3),
+            "reasons": dict(stats.reasons),
+            "shadow": self.shadow,
+            "missed": list(stats.missed),
+        }
+        mode = "影子" if self.shadow else "增量"
+        logger.info(f"{mode}扫描: {skipped}/{total} 币种可跳过 ({ratio:.0%})，原因分布 {stats.reasons}")
+        if stats.missed:
+            logger.warning(f"增量扫描影子比对: {len(stats.missed)} 个本会跳过的币结果变化: {stats.missed[:20]}")
+        return summary
+
+
+# 全局单例
+delta_filter = ScanDeltaFilter()
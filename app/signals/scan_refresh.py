@@ -0,0 +1,129 @@
+"""
+全市场扫描刷新协调 — 单飞（single-flight）+ 跨 worker 文件锁选主
+
+问题：/scan 缓存过期后每个请求都会起一个后台 scan_all_coins，
+再叠加 _market_scan_task，突发流量下会同时跑多轮上百币种的全量扫描。
+
+约定：
+- 进程内：同一时刻最多一个刷新任务，其余调用方 await 同一个 future（asyncio.shield，
+  调用方断开不会取消共享任务）
+- 跨进程：刷新前抢 FileLock("scan_refresh")，抢不到说明别的 worker 正在刷新，
+  本进程不重复扫描；需要结果的调用方等对方释放锁后读 get_latest_scan()
+- 刷新内容与原 _market_scan_task 一致：scan_all_coins → save_signal_cards（批量）→ save_scan_batch；
+  开启增量预筛（app.signals.scan_delta）时沿用的卡不重复存
+  完成后失效问答用的币种快照（app.services.coin_snapshot），让聊天与新扫描结果对齐
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from app.services import coin_snapshot
+from app.utils.executors import MARKET_SCAN, run_in
+from app.utils.file_lock import FileLock
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SCAN_TIMEOUT = 300   # 扫描最多 5 分钟
+SAVE_TIMEOUT = 30    # 存库最多 30 秒
+
+_lock = FileLock("scan_refresh")
+_inflight: Optional[asyncio.Task] = None
+
+
+@dataclass
+class ScanRefresh:
+    """一次刷新的结果。leader=False 表示由其他 worker 完成，results 为空，需读缓存"""
+    results: List = field(default_factory=list)
+    elapsed: float = 0.0
+    saved_cards: int = 0
+    leader: bool = True
+
+
+def is_refreshing() -> bool:
+    """本进程或其他 worker 是否正在刷新"""
+    return (_inflight is not None and not _inflight.done()) or _lock.is_locked_elsewhere()
+
+
+async def _run_refresh(concurrency: int) -> Optional[ScanRefresh]:
+    if not _lock.try_acquire():
+        logger.info("全市场扫描: 其他 worker 正在刷新，本进程跳过")
+        return None
+    try:
+        from app.signals.alpha_scanner import scan_all_coins
+        from app.signals.settlement import save_scan_batch, save_signal_cards
+
+        t0 = time.time()
+        results = await asyncio.wait_for(scan_all_coins(concurrency=concurrency), timeout=SCAN_TIMEOUT)
+        elapsed = time.time() - t0
+
+        signals = [r for r in results if r.signal_card is not None]
+        logger.info(f"全市场扫描完成: {len(results)} 币种, {len(signals)} 信号, 耗时 {elapsed:.1f}s")
+
+        # 信号卡批量写入 signal_card_history（供结算和复盘）；增量扫描沿用的卡上一轮已存过
+        def _save_cards() -> int:
+            return save_signal_cards([r.signal_card for r in signals if not r.reused])
+
+        saved = await run_in(MARKET_SCAN, _save_cards)
+        if saved:
+            logger.info(f"Signal Cards: {saved} 张写入 signal_card_history")
+
+        try:
+            await asyncio.wait_for(
+                run_in(MARKET_SCAN, save_scan_batch, results, elapsed),
+                timeout=SAVE_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            logger.warning("扫描结果存库超时(30s)，已写本地文件兜底")
+        coin_snapshot.invalidate()
+        return ScanRefresh(results=results, elapsed=elapsed, saved_cards=saved)
+    finally:
+        _lock.release()
+
+
+def _start(concurrency: int) -> asyncio.Task:
+    global _inflight
+    if _inflight is None or _inflight.done():
+        _inflight = asyncio.get_running_loop().create_task(_run_refresh(concurrency))
+        _inflight.add_done_callback(_log_failure)
+    return _inflight
+
+
+def _log_failure(task: asyncio.Task):
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if isinstance(exc, asyncio.TimeoutError):
+        logger.warning("全市场扫描超时(5min)，跳过本轮")
+    elif exc is not None:
+        logger.error(f"全市场扫描刷新异常: {exc}")
+
+
+def trigger_refresh(concurrency: int = 10) -> bool:
+    """后台触发刷新（不等待）。已有刷新在跑时不重复启动，返回 False"""
+    if is_refreshing():
+        return False
+    _start(concurrency)
+    return True
+
+
+async def refresh(concurrency: int = 10, wait_peer: bool = True) -> Optional[ScanRefresh]:
+    """刷新并等待结果（与进程内其他调用方共享同一次扫描）
+
+    其他 worker 持有锁时：wait_peer=True 等其释放后返回 leader=False 的 ScanRefresh，
+    调用方应改读 get_latest_scan()；wait_peer=False 直接返回 None。
+    超时抛 asyncio.TimeoutError。
+    """
+    result = await asyncio.shield(_start(concurrency))
+    if result is not None or not wait_peer:
+        return result
+
+    deadline = time.time() + SCAN_TIMEOUT + SAVE_TIMEOUT
+    while _lock.is_locked_elsewhere():
+        if time.time() > deadline:
+            raise asyncio.TimeoutError()
+        await asyncio.sleep(1)
+    return ScanRefresh(leader=False)
@@ -12,14 +12,22 @@
 
 通过环境变量 USE_DATA_PROXY=true 切换模式
 """
+import base64
+import gzip
+import hashlib
 import json
 import os
+import threading
+import time
+import zlib
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 
 from config.settings import settings
+from app.utils.circuit_breaker import CircuitBreaker
 from app.utils.logger import get_logger
+from app.utils.metrics import instrument_connection
 
 logger = get_logger("app.signals.settlement")
 
@@ -50,26 +58,69 @@ def _get_conn():
     user = _env_get("BIGORDER_MYSQL_USER") or settings.bigorder_mysql_user or settings.mysql_user
     pwd = _env_get("BIGORDER_MYSQL_PASSWORD") or settings.bigorder_mysql_password or settings.mysql_password
     db = _env_get("BIGORDER_MYSQL_DATABASE") or settings.bigorder_mysql_database or settings.mysql_database
-    return pymysql.connect(
+    return instrument_connection(lambda: pymysql.connect(
         host=host, port=port, user=user, password=pwd, database=db,
         charset="utf8mb4", connect_timeout=5, read_timeout=15,
-    )
+    ), "signals")
 
 
 # ── SSH 隧道代理模式（本地开发）─────────────────────────────────────────────
+#
+# 代理调用走一个常驻 requests.Session（keep-alive 连接池，不再每次新建 TCP 连接穿隧道）；
+# 建连失败 / GET 遇 502-504 按 DATA_PROXY_RETRIES 指数退避重试，POST 只重试建连（不重复写入）；
+# 连续失败 DATA_PROXY_BREAKER_FAILURES 次熔断，熔断期间直接返回 {"ok": False}，
+# 调用方走原有兜底（本地文件 / 跳过），不再每次等满超时；
+# 隧道健康检查结果缓存 DATA_PROXY_TUNNEL_CHECK_TTL 秒，热路径不再逐次加锁检查。
 
 _PROXY = None
 _SSH_TUNNEL = None
-_TUNNEL_LOCK = None
+_TUNNEL_LOCK = threading.Lock()
+_TUNNEL_CHECKED = 0.0  # 上次确认隧道可用的时间
+_PROXY_BASE = "http://127.0.0.1:18001"
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+_proxy_breaker = CircuitBreaker(
+    "data_proxy",
+    failure_threshold=settings.data_proxy_breaker_failures,
+    reset_timeout=settings.data_proxy_breaker_reset,
+)
+
+
+def _tunnel_healthy() -> bool:
+    """隧道可用：未被标记失效，SSH transport 仍活跃，转发线程在跑"""
+    tunnel = _SSH_TUNNEL
+    if not tunnel or not tunnel.get("alive", False):
+        return False
+    if not tunnel["transport"].is_active() or not tunnel["thread"].is_alive():
+        tunnel["alive"] = False
+        return False
+    return True
+
+
+def _close_tunnel():
+    """关闭失效隧道，释放本地端口（否则重建时 lsof 会查到本进程自己）"""
+    global _SSH_TUNNEL
+    tunnel, _SSH_TUNNEL = _SSH_TUNNEL, None
+    if not tunnel:
+        return
+    tunnel["stop"].set()
+    for key in ("server", "ssh"):
+        try:
+            tunnel[key].close()
+        except Exception:
+            pass
 
 
 def _ensure_tunnel():
-    global _SSH_TUNNEL, _TUNNEL_LOCK
-    if _TUNNEL_LOCK is None:
-        _TUNNEL_LOCK = __import__("threading").Lock()
+    global _SSH_TUNNEL, _TUNNEL_CHECKED
+    if _SSH_TUNNEL is not None and _SSH_TUNNEL.get("alive", False) \
+            and time.time() - _TUNNEL_CHECKED < settings.data_proxy_tunnel_check_ttl:
+        return
     with _TUNNEL_LOCK:
-        if _SSH_TUNNEL is not None and _SSH_TUNNEL.get("alive", False):
+        if _tunnel_healthy():
+            _TUNNEL_CHECKED = time.time()
             return
+        _close_tunnel()
         try:
             import paramiko
             import socket
@@ -147,42 +198,78 @@ def _ensure_tunnel():
         except Exception as e:
             logger.warning(f"SSH隧道建立失败: {e}，将使用本地文件兜底")
             _SSH_TUNNEL = None
-
-
-def _proxy_get(path: str, params: dict = None) -> dict:
-    import requests
+        _TUNNEL_CHECKED = time.time()
+
+
+def _proxy_session():
+    """常驻 Session：keep-alive 连接池 + urllib3 重试（不读环境代理变量）"""
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                retries = settings.data_proxy_retries
+                retry = Retry(
+                    total=retries, connect=retries, read=retries, status=retries,
+                    backoff_factor=0.3,
+                    status_forcelist=(502, 503, 504),
+                    allowed_methods=frozenset({"GET"}),  # read / status 重试只对幂等 GET
+                    raise_on_status=False,
+                )
+                session = requests.Session()
+                session.trust_env = False
+                session.mount("http://", HTTPAdapter(
+                    pool_connections=1, pool_maxsize=settings.data_proxy_pool_size, max_retries=retry))
+                _SESSION = session
+    return _SESSION
+
+
+def _proxy_request(method: str, path: str, params: dict = None, **kwargs) -> dict:
+    """代理调用：熔断检查 → 隧道 → 连接池请求；任何失败都返回 {"ok": False, "error": ...}"""
+    global _TUNNEL_CHECKED
+    if not _proxy_breaker.allow():
+        return {"ok": False, "error": "data proxy circuit open"}
     try:
         _ensure_tunnel()
     except Exception:
         pass
-    params = params or {}
+    params = dict(params or {})
     params["key"] = settings.data_proxy_key
     try:
-        resp = requests.get("http://127.0.0.1:18001" + path, params=params,
-                            timeout=60, proxies={"http": None, "https": None})
-        return resp.json()
+        resp = _proxy_session().request(
+            method, _PROXY_BASE + path, params=params,
+            timeout=(settings.data_proxy_connect_timeout, settings.data_proxy_read_timeout), **kwargs)
+        if resp.status_code >= 500:
+            resp.raise_for_status()
+        result = resp.json()
     except Exception as e:
-        global _SSH_TUNNEL
+        _proxy_breaker.record_failure()
         if _SSH_TUNNEL:
             _SSH_TUNNEL["alive"] = False
+        _TUNNEL_CHECKED = 0.0
         return {"ok": False, "error": str(e)}
+    _proxy_breaker.record_success()
+    return result
+
+
+_GZIP_MIN_BYTES = 1024
+
+
+def _proxy_get(path: str, params: dict = None) -> dict:
+    return _proxy_request("GET", path, params=params)
 
 
 def _proxy_post(path: str, data: dict) -> dict:
-    import requests
-    try:
-        _ensure_tunnel()
-    except Exception:
-        pass
-    try:
-        resp = requests.post("http://127.0.0.1:18001" + path, params={"key": settings.data_proxy_key},
-                             json=data, timeout=60, proxies={"http": None, "https": None})
-        return resp.json()
-    except Exception as e:
-        global _SSH_TUNNEL
-        if _SSH_TUNNEL:
-            _SSH_TUNNEL["alive"] = False
-        return {"ok": False, "error": str(e)}
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    # 大请求体 gzip（代理端 GzipRequestMiddleware 解压）；响应由 requests 按 Content-Encoding 自动解压
+    if settings.data_proxy_gzip and len(body) >= _GZIP_MIN_BYTES:
+        body = gzip.compress(body, 6)
+        headers["Content-Encoding"] = "gzip"
+    return _proxy_request("POST", path, data=body, headers=headers)
 
 
 # ── 统一接口（根据模式自动选择）───────────────────────────────────────────────
@@ -197,6 +284,40 @@ def save_signal_card(card, force: bool = False) -> Optional[int]:
     return _save_signal_card_direct(card, force=force)
 
 
+_INSERT_CARD_SQL = """INSERT INTO signal_card_history
+            (coin, direction, grade, entry_low, entry_high, stop_loss, take_profit,
+             current_price, invalidation_price, confidence, risk_reward_ratio, position_pct,
+             sources_json, math_json, strategy_version, regime, adaptive_weights_json, status)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)"""
+
+
+def _card_payload(card) -> Dict[str, Any]:
+    """信号卡 → signal_card_history 列（直连 INSERT 与代理请求体共用）"""
+    return {
+        "coin": card.coin, "direction": card.direction.value, "grade": card.grade.value,
+        "entry_low": card.entry_low, "entry_high": card.entry_high,
+        "stop_loss": card.stop_loss, "take_profit": card.take_profit,
+        "current_price": card.current_price, "invalidation_price": card.invalidation_price,
+        "confidence": card.confidence, "risk_reward_ratio": card.risk_reward_ratio,
+        "position_pct": card.position_pct,
+        "sources_json": json.dumps([{"name": s.name, "score": s.score, "direction": s.direction.value, "detail": s.detail}
+                                     for s in card.sources], ensure_ascii=False),
+        "math_json": json.dumps(card.math.model_dump(), ensure_ascii=False) if card.math else None,
+        "strategy_version": card.strategy.strategy_version if card.strategy else 1,
+        "regime": card.strategy.regime if card.strategy else "quiet",
+        "adaptive_weights_json": json.dumps(card.strategy.adaptive_weights) if card.strategy and card.strategy.adaptive_weights else None,
+    }
+
+
+def _card_row(card) -> tuple:
+    p = _card_payload(card)
+    return (p["coin"], p["direction"], p["grade"], p["entry_low"], p["entry_high"],
+            p["stop_loss"], p["take_profit"], p["current_price"], p["invalidation_price"],
+            p["confidence"], p["risk_reward_ratio"], p["position_pct"],
+            p["sources_json"], p["math_json"], p["strategy_version"], p["regime"],
+            p["adaptive_weights_json"], "pending")
+
+
 def _save_signal_card_direct(card, force: bool = False) -> Optional[int]:
     from app.signals.models import SignalGrade
     if card.grade == SignalGrade.C and not force:
@@ -205,25 +326,7 @@ def _save_signal_card_direct(card, force: bool = False) -> Optional[int]:
     try:
         conn = _get_conn()
         cursor = conn.cursor()
-        sources_json = json.dumps(
-            [{"name": s.name, "score": s.score, "direction": s.direction.value, "detail": s.detail}
-             for s in card.sources], ensure_ascii=False)
-        math_json = json.dumps(card.math.model_dump(), ensure_ascii=False) if card.math else None
-        weights_json = json.dumps(card.strategy.adaptive_weights) if card.strategy and card.strategy.adaptive_weights else None
-
-        cursor.execute(
-            """INSERT INTO signal_card_history
-            (coin, direction, grade, entry_low, entry_high, stop_loss, take_profit,
-             current_price, invalidation_price, confidence, risk_reward_ratio, position_pct,
-             sources_json, math_json, strategy_version, regime, adaptive_weights_json, status)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)""",
-            (card.coin, card.direction.value, card.grade.value, card.entry_low, card.entry_high,
-             card.stop_loss, card.take_profit, card.current_price, card.invalidation_price,
-             card.confidence, card.risk_reward_ratio, card.position_pct,
-             sources_json, math_json,
-             card.strategy.strategy_version if card.strategy else 1,
-             card.strategy.regime if card.strategy else "quiet",
-             weights_json, "pending"))
+        cursor.execute(_INSERT_CARD_SQL, _card_row(card))
         conn.commit()
         rid = cursor.lastrowid
         cursor.close()
@@ -240,27 +343,56 @@ def _save_signal_card_proxy(card, force: bool = False) -> Optional[int]:
     from app.signals.models import SignalGrade
     if card.grade == SignalGrade.C and not force:
         return None
-    math_json = json.dumps(card.math.model_dump(), ensure_ascii=False) if card.math else None
-    weights_json = json.dumps(card.strategy.adaptive_weights) if card.strategy and card.strategy.adaptive_weights else None
-    payload = {
-        "coin": card.coin, "direction": card.direction.value, "grade": card.grade.value,
-        "entry_low": card.entry_low, "entry_high": card.entry_high,
-        "stop_loss": card.stop_loss, "take_profit": card.take_profit,
-        "current_price": card.current_price, "invalidation_price": card.invalidation_price,
-        "confidence": card.confidence, "risk_reward_ratio": card.risk_reward_ratio,
-        "position_pct": card.position_pct,
-        "sources_json": json.dumps([{"name": s.name, "score": s.score, "direction": s.direction.value, "detail": s.detail}
-                                     for s in card.sources], ensure_ascii=False),
-        "math_json": math_json, "strategy_version": card.strategy.strategy_version if card.strategy else 1,
-        "regime": card.strategy.regime if card.strategy else "quiet", "adaptive_weights_json": weights_json,
-    }
-    result = _proxy_post("/api/save_signal_card", payload)
+    result = _proxy_post("/api/save_signal_card", _card_payload(card))
     if result.get("ok"):
         return result.get("id")
     logger.error(f"信号卡存库(代理)失败: {result.get('error')}")
     return None
 
 
+_PROXY_BATCH = 200  # 代理批量接口每次请求的最大条数
+
+
+def save_signal_cards(cards: list) -> int:
+    """批量持久化信号卡（扫描出卡用，C 级跳过）：直连一个事务 executemany，代理每 200 张一次请求。
+
+    返回写入张数；整批失败时返回 0（与逐张写入时单张失败不同，批内不部分成功）。
+    """
+    from app.signals.models import SignalGrade
+    cards = [c for c in cards if c.grade != SignalGrade.C]
+    if not cards:
+        return 0
+    if _USE_PROXY:
+        saved = 0
+        for i in range(0, len(cards), _PROXY_BATCH):
+            chunk = cards[i:i + _PROXY_BATCH]
+            result = _proxy_post("/api/save_signal_cards", {"cards": [_card_payload(c) for c in chunk]})
+            if result.get("ok"):
+                saved += result.get("inserted", 0)
+            else:
+                logger.error(f"信号卡批量存库(代理)失败: {result.get('error')}")
+        return saved
+    conn = None
+    try:
+        conn = _get_conn()
+        cursor = conn.cursor()
+        cursor.executemany(_INSERT_CARD_SQL, [_card_row(c) for c in cards])
+        conn.commit()
+        cursor.close()
+        return len(cards)
+    except Exception as e:
+        if conn:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        logger.error(f"信号卡批量存库失败: {e}")
+        return 0
+    finally:
+        if conn:
+            conn.close()
+
+
 def settle_pending_cards() -> Dict[str, int]:
     if _USE_PROXY:
         return _settle_pending_proxy()
@@ -356,89 +488,106 @@ def _settle_one_direct(conn, card_row: dict) -> Optional[tuple]:
 
 
 def _update_status_direct(conn, card_id: int, status: str, settled_price: float, pnl_pct: float):
+    """结算一张 pending 卡，并在同一事务里计入胜率日聚合（已被其他进程结算的卡不重复计数）"""
+    from app.signals import winrate_agg
     try:
+        winrate_agg.ensure_table(conn)
         cursor = conn.cursor()
         cursor.execute(
-            "UPDATE signal_card_history SET status=%s, settled_price=%s, pnl_pct=%s, settled_at=NOW() WHERE id=%s",
+            "UPDATE signal_card_history SET status=%s, settled_price=%s, pnl_pct=%s, settled_at=NOW() "
+            "WHERE id=%s AND status='pending'",
             (status, settled_price, pnl_pct, card_id))
+        if cursor.rowcount:
+            winrate_agg.record_settlement(cursor, card_id)
         conn.commit()
         cursor.close()
     except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
         logger.error(f"更新信号卡状态失败(id={card_id}): {e}")
 
 
+def _settle_outcome(card_row: dict, created_at: datetime) -> Optional[tuple]:
+    """按小时K线判定一张卡的结算结果 (status, settled_price, pnl_pct)，未到结算条件返回 None"""
+    direction = card_row["direction"]
+    stop_loss = float(card_row["stop_loss"])
+    take_profit = float(card_row["take_profit"])
+    entry_price = float(card_row["current_price"])
+    expired = datetime.now() > created_at + timedelta(hours=24)
+
+    klines = _fetch_hourly_klines(card_row["coin"], created_at)
+    if not klines:
+        return ("expired", entry_price, 0.0) if expired else None
+
+    is_long = direction == "long"
+    for bar in klines:
+        if bar["time"] > created_at + timedelta(hours=24):
+            break
+        bh, bl = bar["high"], bar["low"]
+        if is_long:
+            if bh >= take_profit:
+                return ("hit_tp", take_profit, round((take_profit - entry_price) / entry_price * 100, 4))
+            if bl <= stop_loss:
+                return ("hit_sl", stop_loss, round((stop_loss - entry_price) / entry_price * 100, 4))
+        else:
+            if bl <= take_profit:
+                return ("hit_tp", take_profit, round((entry_price - take_profit) / entry_price * 100, 4))
+            if bh >= stop_loss:
+                return ("hit_sl", stop_loss, round((entry_price - stop_loss) / entry_price * 100, 4))
+
+    if expired:
+        last_close = klines[-1]["close"]
+        pnl = round(((last_close - entry_price) if is_long else (entry_price - last_close)) / entry_price * 100, 4)
+        return ("expired", last_close, pnl)
+    return None
+
+
 def _settle_pending_proxy() -> Dict[str, int]:
+    """代理模式结算：逐卡判定后按批提交（每批一次 /api/update_card_status_bulk）"""
+    stats = {"settled": 0, "hit_tp": 0, "hit_sl": 0, "expired": 0}
     try:
         resp = _proxy_get("/api/pending_cards", {"limit": 100})
         if not resp.get("ok"):
-            return {"settled": 0, "hit_tp": 0, "hit_sl": 0, "expired": 0}
+            return stats
         pending = resp.get("cards", [])
         if not pending:
-            return {"settled": 0, "hit_tp": 0, "hit_sl": 0, "expired": 0}
+            return stats
 
-        stats = {"settled": 0, "hit_tp": 0, "hit_sl": 0, "expired": 0}
+        outcomes: Dict[int, tuple] = {}
         for card_row in pending:
-            card_id = card_row["id"]
-            coin = card_row["coin"]
-            direction = card_row["direction"]
-            stop_loss = float(card_row["stop_loss"])
-            take_profit = float(card_row["take_profit"])
-            entry_price = float(card_row["current_price"])
-            created_at_str = card_row.get("created_at", "")
             try:
-                created_at = datetime.strptime(created_at_str, "%Y-%m-%d %H:%M:%S")
+                created_at = datetime.strptime(card_row.get("created_at", ""), "%Y-%m-%d %H:%M:%S")
             except (ValueError, TypeError):
                 continue
-
-            klines = _fetch_hourly_klines(coin, created_at)
-            if not klines:
-                if datetime.now() > created_at + timedelta(hours=24):
-                    _proxy_post("/api/update_card_status", {"card_id": card_id, "status": "expired", "settled_price": entry_price, "pnl_pct": 0.0})
-                    stats["expired"] += 1
-                    stats["settled"] += 1
+            outcome = _settle_outcome(card_row, created_at)
+            if outcome:
+                outcomes[card_row["id"]] = (card_row["coin"],) + outcome
+
+        ids = list(outcomes)
+        for i in range(0, len(ids), _PROXY_BATCH):
+            chunk = ids[i:i + _PROXY_BATCH]
+            result = _proxy_post("/api/update_card_status_bulk", {"updates": [
+                {"card_id": cid, "status": outcomes[cid][1], "settled_price": outcomes[cid][2],
+                 "pnl_pct": outcomes[cid][3]} for cid in chunk]})
+            if not result.get("ok"):
+                logger.error(f"批量结算(代理)失败: {result.get('error')}")
                 continue
-
-            is_long = direction == "long"
-            settled = False
-            for bar in klines:
-                if bar["time"] > created_at + timedelta(hours=24):
-                    break
-                bh, bl = bar["high"], bar["low"]
-                if is_long:
-                    if bh >= take_profit:
-                        pnl = round((take_profit - entry_price) / entry_price * 100, 4)
-                        _proxy_post("/api/update_card_status", {"card_id": card_id, "status": "hit_tp", "settled_price": take_profit, "pnl_pct": pnl})
-                        stats["hit_tp"] += 1; stats["settled"] += 1; settled = True; break
-                    if bl <= stop_loss:
-                        pnl = round((stop_loss - entry_price) / entry_price * 100, 4)
-                        _proxy_post("/api/update_card_status", {"card_id": card_id, "status": "hit_sl", "settled_price": stop_loss, "pnl_pct": pnl})
-                        stats["hit_sl"] += 1; stats["settled"] += 1; settled = True; break
-                else:
-                    if bl <= take_profit:
-                        pnl = round((entry_price - take_profit) / entry_price * 100, 4)
-                        _proxy_post("/api/update_card_status", {"card_id": card_id, "status": "hit_tp", "settled_price": take_profit, "pnl_pct": pnl})
-                        stats["hit_tp"] += 1; stats["settled"] += 1; settled = True; break
-                    if bh >= stop_loss:
-                        pnl = round((entry_price - stop_loss) / entry_price * 100, 4)
-                        _proxy_post("/api/update_card_status", {"card_id": card_id, "status": "hit_sl", "settled_price": stop_loss, "pnl_pct": pnl})
-                        stats["hit_sl"] += 1; stats["settled"] += 1; settled = True; break
-
-            if not settled and datetime.now() > created_at + timedelta(hours=24):
-                last_close = klines[-1]["close"]
-                pnl = round(((last_close - entry_price) if is_long else (entry_price - last_close)) / entry_price * 100, 4)
-                _proxy_post("/api/update_card_status", {"card_id": card_id, "status": "expired", "settled_price": last_close, "pnl_pct": pnl})
-                stats["expired"] += 1; stats["settled"] += 1
-
-            if stats["settled"] > 0:
+            # 只统计本次真正结算的卡（已被其他进程结算的不重复计入胜率）
+            for cid in result.get("updated", []):
+                coin, status, _, pnl = outcomes[cid]
+                stats[status] += 1
+                stats["settled"] += 1
                 try:
                     from app.signals.adaptive_strategy import get_strategy_engine
-                    get_strategy_engine().update_coin_winrate(coin, pnl, "hit_tp" if stats["hit_tp"] else "hit_sl" if stats["hit_sl"] else "expired")
+                    get_strategy_engine().update_coin_winrate(coin, pnl, status)
                 except Exception:
                     pass
         return stats
     except Exception as e:
         logger.error(f"结算(代理)异常: {e}")
-        return {"settled": 0, "hit_tp": 0, "hit_sl": 0, "expired": 0}
+        return stats
 
 
 def _fetch_hourly_klines(coin: str, since: datetime) -> List[dict]:
@@ -496,30 +645,12 @@ def get_accumulated_winrate(coin: str = None, grade: str = None, days: int = 30)
 
     conn = None
     try:
+        from app.signals import winrate_agg
         conn = _get_conn()
-        import pymysql.cursors
-        cursor = conn.cursor(pymysql.cursors.DictCursor)
-        where_parts = ["status IN ('hit_tp', 'hit_sl', 'expired')", "created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)"]
-        params: list = [days]
-        if coin:
-            where_parts.append("coin = %s"); params.append(coin.upper())
-        if grade:
-            where_parts.append("grade = %s"); params.append(grade)
-        where = " AND ".join(where_parts)
-        cursor.execute(f"SELECT status, pnl_pct FROM signal_card_history WHERE {where} ORDER BY created_at DESC LIMIT 500", params)
-        rows = cursor.fetchall()
-        cursor.close()
+        rows = winrate_agg.summarize(conn, days, coin=coin, grade=grade)
         if not rows:
             return None
-        hit_tp = sum(1 for r in rows if r["status"] == "hit_tp")
-        hit_sl = sum(1 for r in rows if r["status"] == "hit_sl")
-        expired = sum(1 for r in rows if r["status"] == "expired")
-        total = len(rows)
-        wins = hit_tp + sum(1 for r in rows if r["status"] == "expired" and (r.get("pnl_pct") or 0) > 0)
-        pnls = [r.get("pnl_pct") or 0 for r in rows]
-        return {"win_rate": round(wins / total * 100, 1), "sample_count": total,
-                "hit_tp": hit_tp, "hit_sl": hit_sl, "expired": expired,
-                "avg_profit_pct": round(sum(pnls) / len(pnls), 2)}
+        return winrate_agg.winrate_summary(rows[0])
     except Exception as e:
         logger.error(f"累加胜率查询失败: {e}")
         return None
@@ -529,8 +660,16 @@ def get_accumulated_winrate(coin: str = None, grade: str = None, days: int = 30)
 
 
 # ── 扫描结果缓存 ──────────────────────────────────────────────────────────
+#
+# 存储：scan_batch 一批一行（只有元数据 + 本批币种顺序），scan_coin_card 一币一行
+# （zlib 压缩的 {"signal","display"} JSON + 内容哈希）。写入时只 upsert 哈希变化的卡，
+# 未变化的卡沿用上一批的行；读取时先查最新批次 id，命中进程内已解码副本直接返回。
+# "变化"以写事务内重读的库中 card_hash 为准（SELECT ... FOR UPDATE），多个 worker / 进程
+# 交替写同一币时不会因本进程记忆过期而漏写。
+# 只有最新一批可完整还原（旧批次引用的卡可能已被覆盖），旧表 scan_cache 仅作兼容读取。
 
-_SCAN_CACHE_FILE = Path(__file__).parent / "scan_cache.json"
+_SCAN_CACHE_FILE = Path(__file__).parent / "scan_cache.json"            # 旧格式，只读兜底
+_SCAN_CACHE_GZ = Path(__file__).parent / "scan_cache.json.gz"
 
 _CREATE_SCAN_CACHE_TABLE = """
 CREATE TABLE IF NOT EXISTS scan_cache (
@@ -545,55 +684,154 @@ CREATE TABLE IF NOT EXISTS scan_cache (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
 """
 
+_CREATE_SCAN_BATCH_TABLE = """
+CREATE TABLE IF NOT EXISTS scan_batch (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    total_coins INT NOT NULL DEFAULT 0,
+    signal_count INT NOT NULL DEFAULT 0,
+    scan_time FLOAT NOT NULL DEFAULT 0,
+    coins TEXT,
+    changed_count INT NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_created (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
 
-def save_scan_batch(results: list, scan_time: float):
+_CREATE_SCAN_COIN_CARD_TABLE = """
+CREATE TABLE IF NOT EXISTS scan_coin_card (
+    coin VARCHAR(20) NOT NULL PRIMARY KEY,
+    batch_id INT NOT NULL,
+    card_hash CHAR(16) NOT NULL,
+    payload MEDIUMBLOB NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+_UPSERT_SCAN_COIN_CARD = """
+INSERT INTO scan_coin_card (coin, batch_id, card_hash, payload) VALUES (%s,%s,%s,%s)
+ON DUPLICATE KEY UPDATE batch_id=VALUES(batch_id), card_hash=VALUES(card_hash), payload=VALUES(payload)
+"""
+
+# 代理模式：各币最近一次确认写入的卡哈希，只用来决定请求里带哪些卡的 payload（省带宽）；
+# 是否真正写入由代理在写事务内比对库中哈希决定，记忆过期时代理返回 missing 再补发
+_scan_card_hashes: Dict[str, str] = {}
+# 最新批次的已解码副本 {"batch_id", "signals", "displays"}
+_scan_decoded: Dict[str, Any] = {}
+_scan_lock = threading.Lock()
+
+
+def _display_card(card) -> Dict[str, Any]:
     from app.utils.formatters import format_price_change
 
+    item = {
+        "type": "signalCard",
+        "data": {
+            "displayText": card.format_card(),
+            "kellyPct": round(card.math.kelly_fraction * 100, 1) if card.math else 12.5,
+            "card": {
+                "coin": card.coin, "direction": card.direction.value, "grade": card.grade.value,
+                "confidence": card.confidence,
+                # 价格字段统一用 format_price_change 字符串展示
+                "currentPrice": format_price_change(card.current_price),
+                "entryZone": [format_price_change(card.entry_low), format_price_change(card.entry_high)],
+                "stopLoss": format_price_change(card.stop_loss),
+                "takeProfit": format_price_change(card.take_profit),
+                "riskReward": card.risk_reward_ratio, "positionPct": round(card.position_pct),
+                "kellyPct": round(card.math.kelly_fraction * 100, 1) if card.math else 12.5,
+                "invalidation": format_price_change(card.invalidation_price) if card.invalidation_price else None,
+                "sources": [{"name": src.name, "score": round(src.score)} for src in card.sources],
+                "winRate": card.win_rate, "sampleCount": card.sample_count, "avgProfit": card.avg_profit_pct,
+            },
+        },
+    }
+    if card.math:
+        item["data"]["math"] = {"hurst": card.math.hurst, "mcBullProb": card.math.monte_carlo_bull_prob,
+                                "volatility": card.math.vol_regime, "marketRegime": card.math.market_regime}
+    if card.strategy:
+        item["data"]["strategy"] = {"version": card.strategy.strategy_version, "regime": card.strategy.regime,
+                                    "globalWinRate": card.strategy.global_win_rate}
+    return item
+
+
+def encode_scan_card(signal: Dict[str, Any], display: Dict[str, Any]):
+    """单币卡片编码：紧凑 JSON → zlib；返回 (内容哈希, 压缩字节)"""
+    raw = json.dumps({"signal": signal, "display": display}, ensure_ascii=False,
+                     separators=(",", ":"), default=str).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=8).hexdigest(), zlib.compress(raw, 6)
+
+
+def decode_scan_card(blob: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(blob))
+
+
+def _changed_scan_cards(cursor, encoded: Dict[str, tuple]) -> Dict[str, tuple]:
+    """写事务内重读这些币的 card_hash（FOR UPDATE 锁行，并发写者排队），返回内容与库里不同的卡"""
+    if not encoded:
+        return {}
+    coins = list(encoded)
+    cursor.execute(
+        f"SELECT coin, card_hash FROM scan_coin_card WHERE coin IN ({','.join(['%s'] * len(coins))}) FOR UPDATE",
+        coins)
+    stored = {row[0]: row[1] for row in cursor.fetchall()}
+    return {c: v for c, v in encoded.items() if stored.get(c) != v[0]}
+
+
+def _proxy_save_scan_cards(meta: Dict[str, Any], encoded: Dict[str, tuple]) -> Dict[str, Any]:
+    """代理写入：带全部卡的哈希 + 本进程认为变化的卡的 payload；代理发现库里哈希对不上却没带
+    payload（本进程记忆过期）时整批回滚并返回 missing，补齐后重发一次"""
+    def _request(with_payload):
+        return _proxy_post("/api/save_scan_cards", dict(
+            meta,
+            hashes={c: h for c, (h, _) in encoded.items()},
+            cards={c: {"hash": encoded[c][0], "payload": base64.b64encode(encoded[c][1]).decode()}
+                   for c in with_payload}))
+
+    sent = {c for c, (h, _) in encoded.items() if _scan_card_hashes.get(c) != h}
+    result = _request(sent)
+    missing = set(result.get("missing") or ()) & set(encoded)
+    if not result.get("ok") and missing:
+        logger.info(f"扫描卡哈希记忆过期，补发 {len(missing)} 张")
+        result = _request(sent | missing)
+    if result.get("ok"):
+        _scan_card_hashes.update({c: h for c, (h, _) in encoded.items()})
+    return result
+
+
+def _remember_scan(batch_id: Optional[int], signals: list, displays: list):
+    if batch_id is None:
+        return
+    with _scan_lock:
+        _scan_decoded.clear()
+        _scan_decoded.update({"batch_id": batch_id, "signals": signals, "displays": displays})
+
+
+def save_scan_batch(results: list, scan_time: float):
     signals = [r for r in results if r.signal_card is not None]
     total_coins = len(results)
-    results_json = json.dumps([s.signal_card.model_dump() for s in signals], ensure_ascii=False)
 
-    display_cards = []
+    coins: List[str] = []
+    signal_dicts: list = []
+    display_cards: list = []
+    encoded: Dict[str, tuple] = {}
     for s in signals:
         card = s.signal_card
-        item = {
-            "type": "signalCard",
-            "data": {
-                "displayText": card.format_card(),
-                "kellyPct": round(card.math.kelly_fraction * 100, 1) if card.math else 12.5,
-                "card": {
-                    "coin": card.coin, "direction": card.direction.value, "grade": card.grade.value,
-                    "confidence": card.confidence,
-                    # 价格字段统一用 format_price_change 字符串展示
-                    "currentPrice": format_price_change(card.current_price),
-                    "entryZone": [format_price_change(card.entry_low), format_price_change(card.entry_high)],
-                    "stopLoss": format_price_change(card.stop_loss),
-                    "takeProfit": format_price_change(card.take_profit),
-                    "riskReward": card.risk_reward_ratio, "positionPct": round(card.position_pct),
-                    "kellyPct": round(card.math.kelly_fraction * 100, 1) if card.math else 12.5,
-                    "invalidation": format_price_change(card.invalidation_price) if card.invalidation_price else None,
-                    "sources": [{"name": src.name, "score": round(src.score)} for src in card.sources],
-                    "winRate": card.win_rate, "sampleCount": card.sample_count, "avgProfit": card.avg_profit_pct,
-                },
-            },
-        }
-        if card.math:
-            item["data"]["math"] = {"hurst": card.math.hurst, "mcBullProb": card.math.monte_carlo_bull_prob,
-                                    "volatility": card.math.vol_regime, "marketRegime": card.math.market_regime}
-        if card.strategy:
-            item["data"]["strategy"] = {"version": card.strategy.strategy_version, "regime": card.strategy.regime,
-                                        "globalWinRate": card.strategy.global_win_rate}
-        display_cards.append(item)
-
-    displays_json = json.dumps(display_cards, ensure_ascii=False)
-
-    # 写 MySQL（直连或代理）
+        signal = card.model_dump()
+        display = _display_card(card)
+        coins.append(card.coin)
+        signal_dicts.append(signal)
+        display_cards.append(display)
+        encoded[card.coin] = encode_scan_card(signal, display)
+
+    # 写 MySQL（直连或代理），只带哈希变化的卡
+    batch_id = None
     if _USE_PROXY:
-        result = _proxy_post("/api/save_scan_batch", {
+        result = _proxy_save_scan_cards({
             "total_coins": total_coins, "signal_count": len(signals),
-            "scan_time": round(scan_time, 1), "results_json": results_json, "displays_json": displays_json})
+            "scan_time": round(scan_time, 1), "coins": coins}, encoded)
         if result.get("ok"):
-            logger.info(f"扫描结果已写入远程 scan_cache ({len(signals)} signals)")
+            batch_id = result.get("batch_id")
+            logger.info(f"扫描结果已写入远程 scan_batch #{batch_id} "
+                        f"({len(signals)} signals, {result.get('changed', 0)} changed)")
         else:
             logger.error(f"扫描结果写远程失败: {result.get('error')}")
     else:
@@ -601,29 +839,40 @@ def save_scan_batch(results: list, scan_time: float):
         try:
             conn = _get_conn()
             cursor = conn.cursor()
-            cursor.execute(_CREATE_SCAN_CACHE_TABLE)
+            cursor.execute(_CREATE_SCAN_BATCH_TABLE)
+            cursor.execute(_CREATE_SCAN_COIN_CARD_TABLE)
+            changed = _changed_scan_cards(cursor, encoded)
             cursor.execute(
-                "INSERT INTO scan_cache (total_coins, signal_count, scan_time, results_json, displays_json) VALUES (%s,%s,%s,%s,%s)",
-                (total_coins, len(signals), round(scan_time, 1), results_json, displays_json))
+                "INSERT INTO scan_batch (total_coins, signal_count, scan_time, coins, changed_count) VALUES (%s,%s,%s,%s,%s)",
+                (total_coins, len(signals), round(scan_time, 1), ",".join(coins), len(changed)))
+            batch_id = cursor.lastrowid
+            if changed:
+                cursor.executemany(_UPSERT_SCAN_COIN_CARD,
+                                   [(c, batch_id, h, blob) for c, (h, blob) in changed.items()])
             conn.commit()
-            cursor.close()
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM scan_cache WHERE id NOT IN (SELECT id FROM (SELECT id FROM scan_cache ORDER BY id DESC LIMIT 10) t)")
+            cursor.execute("DELETE FROM scan_batch WHERE id NOT IN (SELECT id FROM (SELECT id FROM scan_batch ORDER BY id DESC LIMIT 10) t)")
             conn.commit()
             cursor.close()
-            logger.info(f"扫描结果已写入 scan_cache ({len(signals)} signals)")
+            logger.info(f"扫描结果已写入 scan_batch #{batch_id} ({len(signals)} signals, {len(changed)} changed)")
         except Exception as e:
+            batch_id = None
             logger.error(f"扫描结果存MySQL失败: {e}")
         finally:
             if conn:
                 conn.close()
 
-    # 始终写本地文件兜底
+    # 本进程刚写的批次直接作为已解码副本，下一次 get_latest_scan 不必再解压
+    _remember_scan(batch_id, signal_dicts, display_cards)
+
+    # 始终写本地文件兜底（gzip 紧凑 JSON）
     try:
         cache = {"total_coins": total_coins, "signal_count": len(signals),
-                 "scan_time": round(scan_time, 1), "signals": [s.signal_card.model_dump() for s in signals],
+                 "scan_time": round(scan_time, 1), "signals": signal_dicts,
                  "displays": display_cards, "cached_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-        _SCAN_CACHE_FILE.write_text(json.dumps(cache, ensure_ascii=False, indent=2))
+        tmp = _SCAN_CACHE_GZ.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(gzip.compress(
+            json.dumps(cache, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"), 6))
+        os.replace(tmp, _SCAN_CACHE_GZ)
     except Exception as e:
         logger.error(f"扫描结果写本地文件失败: {e}")
 
@@ -653,33 +902,96 @@ def _safe_json_loads(raw):
         return []
 
 
+def _scan_result(meta: Dict[str, Any], signals: list, displays: list, max_age_seconds: int) -> Dict[str, Any]:
+    cached_at = meta.get("created_at")
+    age = (datetime.now() - cached_at).total_seconds() if cached_at else 9999
+    # 返回新列表：调用方切片 / 排序不影响进程内副本（元素只读共享）
+    return {
+        "total_coins": meta["total_coins"], "signal_count": meta["signal_count"],
+        "scan_time": meta["scan_time"],
+        "signals": list(signals), "displays": list(displays),
+        "cached_at": cached_at.strftime("%Y-%m-%d %H:%M:%S") if cached_at else "",
+        "is_stale": age > max_age_seconds,
+    }
+
+
+def _read_scan_batch(cursor, max_age_seconds: int) -> Optional[Dict[str, Any]]:
+    """读最新 scan_batch；批次 id 与进程内副本一致时不再查卡片表"""
+    cursor.execute("""SELECT id, total_coins, signal_count, scan_time, coins, created_at
+                      FROM scan_batch ORDER BY id DESC LIMIT 1""")
+    meta = cursor.fetchone()
+    if not meta:
+        return None
+    with _scan_lock:
+        if _scan_decoded.get("batch_id") == meta["id"]:
+            return _scan_result(meta, _scan_decoded["signals"], _scan_decoded["displays"], max_age_seconds)
+
+    coins = [c for c in (meta["coins"] or "").split(",") if c]
+    cards: Dict[str, Dict[str, Any]] = {}
+    if coins:
+        cursor.execute(
+            f"SELECT coin, payload FROM scan_coin_card WHERE coin IN ({','.join(['%s'] * len(coins))})", coins)
+        for row in cursor.fetchall():
+            cards[row["coin"]] = decode_scan_card(row["payload"])
+    ordered = [cards[c] for c in coins if c in cards]
+    signals = [c["signal"] for c in ordered]
+    displays = [c["display"] for c in ordered]
+    _remember_scan(meta["id"], signals, displays)
+    return _scan_result(meta, signals, displays, max_age_seconds)
+
+
+def _read_legacy_scan_cache(cursor, max_age_seconds: int) -> Optional[Dict[str, Any]]:
+    """旧表 scan_cache（升级前写入的批次）"""
+    cursor.execute(_CREATE_SCAN_CACHE_TABLE)
+    cursor.execute("""SELECT total_coins, signal_count, scan_time, results_json, displays_json, created_at
+                      FROM scan_cache ORDER BY id DESC LIMIT 1""")
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return _scan_result(row, _safe_json_loads(row["results_json"]),
+                        _safe_json_loads(row["displays_json"]), max_age_seconds)
+
+
+def _read_scan_file() -> Optional[Dict[str, Any]]:
+    if _SCAN_CACHE_GZ.exists():
+        return json.loads(gzip.decompress(_SCAN_CACHE_GZ.read_bytes()))
+    if _SCAN_CACHE_FILE.exists():
+        return json.loads(_SCAN_CACHE_FILE.read_text())
+    return None
+
+
 def get_latest_scan(max_age_seconds: int = 1800) -> Optional[Dict[str, Any]]:
     if _USE_PROXY:
-        result = _proxy_get("/api/latest_scan", {"max_age_seconds": max_age_seconds})
-        if result.get("ok") and result.get("data"):
-            return result["data"]
+        with _scan_lock:
+            known = _scan_decoded.get("batch_id") or 0
+        result = _proxy_get("/api/latest_scan", {"max_age_seconds": max_age_seconds, "known_batch_id": known})
+        data = result.get("data") if result.get("ok") else None
+        if data and data.get("unchanged"):
+            # 代理确认最新批次就是本地副本，不回传卡片
+            with _scan_lock:
+                if _scan_decoded.get("batch_id") == data.get("batch_id"):
+                    data["signals"] = list(_scan_decoded["signals"])
+                    data["displays"] = list(_scan_decoded["displays"])
+                    return data
+            result = _proxy_get("/api/latest_scan", {"max_age_seconds": max_age_seconds})
+            data = result.get("data") if result.get("ok") else None
+        if data:
+            signals, displays = data.get("signals", []), data.get("displays", [])
+            _remember_scan(data.get("batch_id"), signals, displays)
+            data["signals"], data["displays"] = list(signals), list(displays)
+            return data
     else:
         conn = None
         try:
             conn = _get_conn()
             import pymysql.cursors
             cursor = conn.cursor(pymysql.cursors.DictCursor)
-            cursor.execute(_CREATE_SCAN_CACHE_TABLE)
-            cursor.execute("""SELECT total_coins, signal_count, scan_time, results_json, displays_json, created_at
-                              FROM scan_cache ORDER BY id DESC LIMIT 1""")
-            row = cursor.fetchone()
+            cursor.execute(_CREATE_SCAN_BATCH_TABLE)
+            cursor.execute(_CREATE_SCAN_COIN_CARD_TABLE)
+            latest = _read_scan_batch(cursor, max_age_seconds) or _read_legacy_scan_cache(cursor, max_age_seconds)
             cursor.close()
-            if row:
-                cached_at = row["created_at"]
-                age = (datetime.now() - cached_at).total_seconds() if cached_at else 9999
-                return {
-                    "total_coins": row["total_coins"], "signal_count": row["signal_count"],
-                    "scan_time": row["scan_time"],
-                    "signals": _safe_json_loads(row["results_json"]),
-                    "displays": _safe_json_loads(row["displays_json"]),
-                    "cached_at": cached_at.strftime("%Y-%m-%d %H:%M:%S") if cached_at else "",
-                    "is_stale": age > max_age_seconds,
-                }
+            if latest:
+                return latest
         except Exception as e:
             logger.error(f"读MySQL扫描缓存失败: {e}")
         finally:
@@ -688,8 +1000,8 @@ def get_latest_scan(max_age_seconds: int = 1800) -> Optional[Dict[str, Any]]:
 
     # 兜底：读本地文件
     try:
-        if _SCAN_CACHE_FILE.exists():
-            cache = json.loads(_SCAN_CACHE_FILE.read_text())
+        cache = _read_scan_file()
+        if cache:
             return {"total_coins": cache.get("total_coins", 0), "signal_count": cache.get("signal_count", 0),
                     "scan_time": cache.get("scan_time", 0), "signals": cache.get("signals", []),
                     "displays": cache.get("displays", []), "cached_at": cache.get("cached_at", ""),
@@ -0,0 +1,306 @@
+"""
+胜率增量聚合 — signal_winrate_daily 按 (day, coin, grade, direction) 存已结算卡计数
+
+问题：/signals/v1/winrate、batch_query_winrates、data_proxy /api/winrate 每次都从
+signal_card_history 取最多 500 行在 Python 里数，或对整段历史 GROUP BY。
+
+约定：
+- day = DATE(created_at)（窗口按生成时间算，与原查询口径一致）
+- 结算时（pending → hit_tp/hit_sl/expired）在同一事务里对该卡所在行 +1（record_settlement）
+- 任意 N 天窗口 = 完整天的聚合行求和 + 起始那一天不完整部分的原始行，结果与原始重算一致
+- 表不存在时首次使用自动建表并全量回填；手工改卡状态（/settle/reset）后按天重建
+
+命令：
+    python -m app.signals.winrate_agg rebuild [--days N]   重建（不传 days 则全量）
+    python -m app.signals.winrate_agg check [--days 30]    与原始重算逐行对账
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.utils.logger import get_logger
+
+logger = get_logger("app.signals.winrate_agg")
+
+TABLE = "signal_winrate_daily"
+
+CREATE_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    day DATE NOT NULL COMMENT '卡片生成日期 DATE(created_at)',
+    coin VARCHAR(20) NOT NULL,
+    grade VARCHAR(5) NOT NULL,
+    direction VARCHAR(10) NOT NULL,
+    n_total INT NOT NULL DEFAULT 0 COMMENT '已结算卡数',
+    n_hit_tp INT NOT NULL DEFAULT 0,
+    n_hit_sl INT NOT NULL DEFAULT 0,
+    n_expired INT NOT NULL DEFAULT 0,
+    n_expired_win INT NOT NULL DEFAULT 0 COMMENT 'expired 且 pnl_pct>0',
+    pnl_sum DECIMAL(16,4) NOT NULL DEFAULT 0 COMMENT 'pnl_pct 之和（NULL 不计）',
+    pnl_count INT NOT NULL DEFAULT 0 COMMENT 'pnl_pct 非 NULL 的卡数',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (day, coin, grade, direction),
+    INDEX idx_coin_day (coin, day)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='信号卡胜率日聚合'
+"""
+
+_SETTLED = "status IN ('hit_tp', 'hit_sl', 'expired')"
+
+# 原始行 → 聚合计数（rollup 与对账共用同一套口径）
+_COUNT_COLUMNS = """COUNT(*) AS n_total,
+       SUM(status = 'hit_tp') AS n_hit_tp,
+       SUM(status = 'hit_sl') AS n_hit_sl,
+       SUM(status = 'expired') AS n_expired,
+       SUM(COALESCE(status = 'expired' AND pnl_pct > 0, 0)) AS n_expired_win,
+       COALESCE(SUM(pnl_pct), 0) AS pnl_sum,
+       COUNT(pnl_pct) AS pnl_count"""
+
+_ROLLUP_SQL = f"""
+INSERT INTO {TABLE}
+    (day, coin, grade, direction, n_total, n_hit_tp, n_hit_sl, n_expired, n_expired_win, pnl_sum, pnl_count)
+SELECT DATE(created_at), UPPER(coin), grade, direction,
+       {_COUNT_COLUMNS}
+FROM signal_card_history
+WHERE {_SETTLED} AND {{where}}
+GROUP BY DATE(created_at), UPPER(coin), grade, direction
+ON DUPLICATE KEY UPDATE
+    n_total = n_total + VALUES(n_total),
+    n_hit_tp = n_hit_tp + VALUES(n_hit_tp),
+    n_hit_sl = n_hit_sl + VALUES(n_hit_sl),
+    n_expired = n_expired + VALUES(n_expired),
+    n_expired_win = n_expired_win + VALUES(n_expired_win),
+    pnl_sum = pnl_sum + VALUES(pnl_sum),
+    pnl_count = pnl_count + VALUES(pnl_count)
+"""
+
+_SUM_FIELDS = ("n_total", "n_hit_tp", "n_hit_sl", "n_expired", "n_expired_win", "pnl_sum", "pnl_count")
+_GROUP_FIELDS = ("coin", "grade", "direction")
+
+_ready_lock = threading.Lock()
+_table_ready = False
+
+# 跨进程建表锁（MySQL 命名锁）：多个 worker / data_proxy 同时首次使用时只有一个建表回填，
+# 其余等它提交后再看到已存在的表。data_proxy 用同一个锁名
+INIT_LOCK_NAME = f"{TABLE}_init"
+INIT_LOCK_TIMEOUT = 30
+
+
+def _scalar(row) -> Any:
+    """取单列结果（兼容元组游标和 DictCursor）"""
+    if row is None:
+        return None
+    if isinstance(row, dict):
+        return next(iter(row.values()), None)
+    return row[0]
+
+
+def ensure_table(conn) -> None:
+    """确保聚合表存在；首次创建时全量回填（DDL 会隐式提交，必须在业务事务之外调用）
+
+    进程内用 _ready_lock、进程间用 GET_LOCK 串行化：检查、建表、回填都在命名锁内，
+    回填走 rebuild()（DELETE + INSERT 同一事务），并发首次调用不会重复累加。
+    """
+    global _table_ready
+    if _table_ready:
+        return
+    with _ready_lock:
+        if _table_ready:
+            return
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (INIT_LOCK_NAME, INIT_LOCK_TIMEOUT))
+            if _scalar(cursor.fetchone()) != 1:
+                raise RuntimeError(f"{TABLE} 初始化锁等待超时（{INIT_LOCK_TIMEOUT}s）")
+            try:
+                cursor.execute("SHOW TABLES LIKE %s", (TABLE,))
+                if cursor.fetchone() is None:
+                    cursor.execute(CREATE_TABLE_SQL)
+                    count = rebuild(conn)
+                    logger.info(f"{TABLE} 已创建并回填 {count} 行")
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (INIT_LOCK_NAME,))
+                cursor.fetchone()
+        finally:
+            cursor.close()
+        _table_ready = True
+
+
+def record_settlement(cursor, card_id: int) -> None:
+    """把刚结算的卡计入聚合（调用方负责与状态 UPDATE 同事务提交）"""
+    cursor.execute(_ROLLUP_SQL.format(where="id = %s"), (card_id,))
+
+
+def rebuild(conn, days: Optional[int] = None) -> int:
+    """重建聚合：days=None 全量，否则只重建 DATE(NOW() - days) 起的各天。返回写入行数"""
+    cursor = conn.cursor()
+    try:
+        if days is None:
+            cursor.execute(f"DELETE FROM {TABLE}")
+            cursor.execute(_ROLLUP_SQL.format(where="1 = 1"))
+        else:
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE day >= DATE(DATE_SUB(NOW(), INTERVAL %s DAY))", (int(days),)
+            )
+            cursor.execute(
+                _ROLLUP_SQL.format(where="created_at >= DATE(DATE_SUB(NOW(), INTERVAL %s DAY))"), (int(days),)
+            )
+        written = cursor.rowcount
+        conn.commit()
+        return written
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def summarize(
+    conn,
+    days: int,
+    group_by: Sequence[str] = (),
+    coin: Optional[str] = None,
+    grade: Optional[str] = None,
+    direction: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    created_at >= NOW() - days 窗口内的已结算卡计数，按 group_by（coin/grade/direction 子集）分组。
+
+    完整天读聚合行，窗口起始那一天（不完整）读原始行，一条 SQL 内 UNION ALL 后汇总。
+    """
+    ensure_table(conn)
+    import pymysql.cursors
+
+    group_by = [g for g in group_by if g in _GROUP_FIELDS]
+    agg_where = ["day > DATE(DATE_SUB(NOW(), INTERVAL %s DAY))"]
+    raw_where = [
+        _SETTLED,
+        "created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)",
+        "created_at < DATE(DATE_SUB(NOW(), INTERVAL %s DAY)) + INTERVAL 1 DAY",
+    ]
+    agg_params: list = [int(days)]
+    raw_params: list = [int(days), int(days)]
+    for col, value in (("coin", coin.upper() if coin else None), ("grade", grade), ("direction", direction)):
+        if value:
+            agg_where.append(f"{col} = %s")
+            raw_where.append(f"{col} = %s")
+            agg_params.append(value)
+            raw_params.append(value)
+
+    select_keys = "".join(f"{g}, " for g in group_by)
+    sums = ", ".join(f"SUM({f}) AS {f}" for f in _SUM_FIELDS)
+    group_clause = f"GROUP BY {', '.join(group_by)}" if group_by else ""
+    sql = f"""
+        SELECT {select_keys}{sums}
+        FROM (
+            SELECT coin, grade, direction, {", ".join(_SUM_FIELDS)}
+            FROM {TABLE}
+            WHERE {" AND ".join(agg_where)}
+            UNION ALL
+            SELECT UPPER(coin), grade, direction,
+                   1, status = 'hit_tp', status = 'hit_sl', status = 'expired',
+                   COALESCE(status = 'expired' AND pnl_pct > 0, 0),
+                   COALESCE(pnl_pct, 0), pnl_pct IS NOT NULL
+            FROM signal_card_history
+            WHERE {" AND ".join(raw_where)}
+        ) t
+        {group_clause}
+    """
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    cursor.execute(sql, agg_params + raw_params)
+    rows = cursor.fetchall()
+    cursor.close()
+
+    result = []
+    for r in rows:
+        item = {g: r[g] for g in group_by}
+        for f in _SUM_FIELDS:
+            item[f] = float(r[f] or 0) if f == "pnl_sum" else int(r[f] or 0)
+        if item["n_total"]:
+            result.append(item)
+    return result
+
+
+def winrate_summary(row: Dict[str, Any]) -> Dict[str, Any]:
+    """聚合计数 → get_accumulated_winrate / data_proxy /api/winrate 的返回结构"""
+    total = row["n_total"]
+    wins = row["n_hit_tp"] + row["n_expired_win"]
+    return {
+        "win_rate": round(wins / total * 100, 1),
+        "sample_count": total,
+        "hit_tp": row["n_hit_tp"],
+        "hit_sl": row["n_hit_sl"],
+        "expired": row["n_expired"],
+        "avg_profit_pct": round(row["pnl_sum"] / total, 2),
+    }
+
+
+def check_consistency(conn, days: int = 30) -> Dict[str, Any]:
+    """对账：聚合表 vs signal_card_history 原始重算，逐 (day, coin, grade, direction) 比较"""
+    ensure_table(conn)
+    import pymysql.cursors
+
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    cursor.execute(
+        f"""SELECT day, coin, grade, direction, {", ".join(_SUM_FIELDS)}
+            FROM {TABLE} WHERE day >= DATE(DATE_SUB(NOW(), INTERVAL %s DAY))""",
+        (int(days),),
+    )
+    agg_rows = cursor.fetchall()
+    cursor.execute(
+        f"""SELECT DATE(created_at) AS day, UPPER(coin) AS coin, grade, direction,
+                   {_COUNT_COLUMNS}
+            FROM signal_card_history
+            WHERE {_SETTLED} AND created_at >= DATE(DATE_SUB(NOW(), INTERVAL %s DAY))
+            GROUP BY DATE(created_at), UPPER(coin), grade, direction""",
+        (int(days),),
+    )
+    raw_rows = cursor.fetchall()
+    cursor.close()
+
+    def _index(rows):
+        out = {}
+        for r in rows:
+            key = (str(r["day"]), str(r["coin"]).upper(), str(r["grade"]).upper(), str(r["direction"]).lower())
+            out[key] = tuple(round(float(r[f] or 0), 4) for f in _SUM_FIELDS)
+        return out
+
+    agg, raw = _index(agg_rows), _index(raw_rows)
+    mismatches = []
+    for key in sorted(set(agg) | set(raw)):
+        a, b = agg.get(key), raw.get(key)
+        if a != b:
+            mismatches.append({
+                "key": dict(zip(("day", "coin", "grade", "direction"), key)),
+                "aggregate": dict(zip(_SUM_FIELDS, a)) if a else None,
+                "raw": dict(zip(_SUM_FIELDS, b)) if b else None,
+            })
+    return {"days": days, "checked": len(set(agg) | set(raw)), "mismatches": mismatches}
+
+
+def _cli():
+    from app.signals.settlement import _get_conn
+
+    parser = argparse.ArgumentParser(description="信号卡胜率日聚合：重建 / 对账")
+    parser.add_argument("command", choices=("rebuild", "check"))
+    parser.add_argument("--days", type=int, default=None, help="rebuild 默认全量；check 默认 30 天")
+    args = parser.parse_args()
+
+    conn = _get_conn()
+    try:
+        if args.command == "rebuild":
+            ensure_table(conn)
+            written = rebuild(conn, args.days)
+            print(f"{TABLE} 重建完成: {written} 行（{'全量' if args.days is None else f'近 {args.days} 天'}）")
+        else:
+            report = check_consistency(conn, args.days or 30)
+            print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+            if report["mismatches"]:
+                raise SystemExit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    _cli()
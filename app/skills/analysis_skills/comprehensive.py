@@ -1,15 +1,7 @@
 """综合分析 Skill"""
-import asyncio
 from app.utils.logger import get_logger
 from app.skills.base import BaseSkill, IntentInfo, SkillResult
-from app.services.data_service import (
-    get_header_data,
-    get_kline_data,
-    get_recent_news,
-    get_buy_sell_ratio,
-    get_open_interest,
-    get_funding_rate
-)
+from app.services.coin_snapshot import get_snapshot
 
 
 logger = get_logger("app.skills.analysis_skills.comprehensive")
@@ -40,32 +32,15 @@ class ComprehensiveAnalysisSkill(BaseSkill):
         symbol: str,
         intent: IntentInfo
     ) -> SkillResult:
-        """执行综合分析（并发调用多个 API）"""
-        # 并发调用所有相关 API
-        tasks = [
-            asyncio.to_thread(get_header_data, symbol),
-            asyncio.to_thread(get_kline_data, symbol),
-            asyncio.to_thread(get_recent_news, symbol, limit=5),
-            asyncio.to_thread(get_buy_sell_ratio, symbol),
-            asyncio.to_thread(get_open_interest, symbol),
-            asyncio.to_thread(get_funding_rate, symbol)
-        ]
-
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        """执行综合分析（经币种快照读取，缺失的数据源并发补拉）"""
+        api_names = self.get_required_apis()
+        snapshot = await get_snapshot(symbol, api_names)
+        results = snapshot.results(api_names)
 
         # 解析结果
         data = {}
         api_calls = []
 
-        api_names = [
-            "get_header_data",
-            "get_kline_data",
-            "get_recent_news",
-            "get_buy_sell_ratio",
-            "get_open_interest",
-            "get_funding_rate"
-        ]
-
         for api_name, result in zip(api_names, results):
             if not isinstance(result, Exception):
                 # 检查结果是否有效（非空字典/非空列表）
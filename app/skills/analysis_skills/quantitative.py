@@ -7,14 +7,16 @@
 1. 去除冗余的局部 import，统一使用文件头部已导入的指标函数
 2. 新增"市场状态自适应权重"：用 ADX 判断趋势市/盘整市，动态调整六因子权重
 3. 新增轻量回测函数 backtest_trend_momentum_rule，用历史K线滚动验证简化规则
-   的历史胜率，便于校准阈值（不影响交易信号本身）
+   的历史胜率，便于校准阈值（不影响交易信号本身）；sweep_trend_momentum_rule
+   在同一份指标上批量评估参数网格
 """
 from __future__ import annotations
 
-import asyncio
+import itertools
 import math
+import time
 from dataclasses import dataclass, field
-from typing import Any, Optional
+from typing import Any, Optional, Tuple
 
 from .indicators import (
     ema, ema_triple, adx, supertrend,
@@ -138,6 +140,15 @@ def _parse_kline(kline_data: dict, volume_data: list = None, min_bars: int = 25)
     return dict(opens=opens, highs=highs, lows=lows, closes=closes, volumes=volumes)
 
 
+def _last_bar_date(raw_data: dict) -> str:
+    """日线最后一根的日期，用于判断预计算结果是否跨日"""
+    kline = raw_data.get("get_kline_data")
+    if not isinstance(kline, dict):
+        return ""
+    dates = kline.get("categoryData") or []
+    return str(dates[-1]) if dates else ""
+
+
 def _extract_realtime_price(raw_data: dict) -> Optional[float]:
     """从 header 数据中提取统一实时价。"""
     header = raw_data.get("get_header_data") or raw_data.get("header_data") or raw_data.get("header")
@@ -959,6 +970,93 @@ def _build_realtime_payload(raw_data: dict) -> dict:
     }
 
 
+def compute_quant(symbol: str, raw_data: dict, ohlcv: Optional[dict] = None) -> Tuple[dict, Optional[dict]]:
+    """
+    六因子完整计算（纯计算，无 I/O，可放进子进程执行）
+    返回: (LLM 数据包, QuantResult 字段 dict)；数据不足时字段 dict 为 None
+    """
+    if ohlcv is None:
+        ohlcv = _parse_kline(
+            raw_data.get("get_kline_data"),
+            raw_data.get("get_trade_volume"),
+        )
+        if ohlcv is not None:
+            ohlcv = _apply_realtime_price(ohlcv, _extract_realtime_price(raw_data))
+    if ohlcv is None:
+        return {
+            "error": "K线数据不足（需要至少60根），无法进行六因子分析",
+            "symbol": symbol,
+        }, None
+
+    price = ohlcv["closes"][-1]
+
+    # 日线六因子
+    factors = [
+        _score_trend(ohlcv),
+        _score_momentum(ohlcv),
+        _score_volume_price(ohlcv),
+        _score_capital(raw_data),
+        _score_volatility_risk(ohlcv, price),
+        _score_market_structure(ohlcv, price),
+    ]
+
+    # 根据市场状态自适应调整六因子权重
+    regime = _determine_market_regime(ohlcv)
+    _apply_adaptive_weights(factors, regime)
+
+    # 1h 六因子（双周期融合核心）
+    ohlcv_1h = raw_data.get("hourly_ohlcv")
+    factors_1h = None
+    if ohlcv_1h and isinstance(ohlcv_1h, dict) and len(ohlcv_1h.get("closes", [])) >= 55:
+        try:
+            price_1h = ohlcv_1h["closes"][-1]
+            factors_1h = [
+                _score_trend(ohlcv_1h),
+                _score_momentum(ohlcv_1h),
+                _score_volume_price(ohlcv_1h),
+                _score_capital(raw_data),  # 资金因子不分周期，共用同一份
+                _score_volatility_risk(ohlcv_1h, price_1h),
+                _score_market_structure(ohlcv_1h, price_1h),
+            ]
+            _apply_adaptive_weights(factors_1h, regime)
+        except Exception:
+            factors_1h = None  # 1h 指标计算失败时降级到纯日线
+
+    # 双周期融合 composite
+    fused_composite, dual_tf_info = _compute_dual_tf_composite(factors, factors_1h, regime)
+
+    # 合成可执行交易信号
+    signal = _build_trade_signal(
+        factors, ohlcv, raw_data, symbol,
+        override_composite=fused_composite,
+        dual_tf_info=dual_tf_info,
+    )
+
+    parts = dict(
+        symbol=symbol,
+        factors=factors,
+        factors_1h=factors_1h,
+        regime=regime,
+        fused_composite=fused_composite,
+        dual_tf_info=dual_tf_info,
+        signal=signal,
+        ohlcv={k: ohlcv[k] for k in ("opens", "highs", "lows", "closes", "volumes")},
+        bar_date=_last_bar_date(raw_data),
+    )
+
+    # 构建 LLM 数据包
+    return _build_llm_payload(symbol, signal, raw_data), parts
+
+
+def publish_quant_parts(parts: dict) -> None:
+    """把 compute_quant 的结果写入 quant_store（扫描路径；子进程算完后由主进程调用）"""
+    try:
+        from app.services.quant_store import QuantResult, quant_store
+        quant_store.put(QuantResult(**parts))
+    except Exception as e:
+        logger.warning(f"量化结果存储失败 {parts.get('symbol')}: {e}")
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Skill 主类
 # ─────────────────────────────────────────────────────────────────────────────
@@ -984,31 +1082,19 @@ class QuantitativeAnalysisSkill:
 
     async def execute_async(self, symbol: str, intent=None):
         """与原框架兼容的异步入口"""
-        # 动态导入数据服务（与原项目结构对齐）
+        # 动态导入数据服务（与原项目结构对齐）；经币种快照读取，与其他 Skill 共享
         try:
-            from app.services.data_service import (
-                get_header_data, get_kline_data, get_recent_news,
-                get_buy_sell_ratio, get_open_interest, get_funding_rate,
-                get_trade_volume,
-            )
+            from app.services.coin_snapshot import get_snapshot
         except ImportError:
             raise RuntimeError("数据服务未找到，请确认 app.services.data_service 路径正确")
 
-        tasks = [
-            asyncio.to_thread(get_header_data,      symbol),
-            asyncio.to_thread(get_kline_data,        symbol),       # 日线60条
-            asyncio.to_thread(get_trade_volume,      symbol),       # 每日成交量
-            asyncio.to_thread(get_recent_news,       symbol, limit=10),
-            asyncio.to_thread(get_buy_sell_ratio,    symbol),
-            asyncio.to_thread(get_open_interest,     symbol),
-            asyncio.to_thread(get_funding_rate,      symbol),
-        ]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
         api_names = [
             "get_header_data", "get_kline_data", "get_trade_volume", "get_recent_news",
             "get_buy_sell_ratio", "get_open_interest", "get_funding_rate",
         ]
+        snapshot = await get_snapshot(symbol, api_names)
+        results = snapshot.results(api_names)
+
         raw_data  = {}
         api_calls = []
         for name, result in zip(api_names, results):
@@ -1018,7 +1104,7 @@ class QuantitativeAnalysisSkill:
             else:
                 logger.info(f"  ⚠️ {name} 调用失败: {result}")
 
-        llm_data = self.analyze(symbol, raw_data)
+        llm_data = self.analyze(symbol, raw_data, ohlcv=snapshot.ohlcv(), reuse=True)
 
         # 与原 SkillResult 接口对齐
         try:
@@ -1034,69 +1120,57 @@ class QuantitativeAnalysisSkill:
 
     # ── 核心分析（可独立调用，方便测试）────────────────────────────────────
 
-    def analyze(self, symbol: str, raw_data: dict) -> dict:
+    def analyze(
+        self,
+        symbol: str,
+        raw_data: dict,
+        ohlcv: Optional[dict] = None,
+        reuse: bool = False,
+        publish: bool = False,
+    ) -> dict:
         """
         主分析入口
         raw_data: 各 API 返回值组成的 dict
+        ohlcv: 已解析并修正实时价的日线（来自币种快照）；不传则从 raw_data 解析
+        reuse: 优先复用扫描存下的新鲜六因子结果（聊天路径），只用实时价重算价位
+        publish: 把本次完整计算结果写入 quant_store（扫描路径）
         返回: LLM 数据包（dict）
         """
-        ohlcv = _parse_kline(
-            raw_data.get("get_kline_data"),
-            raw_data.get("get_trade_volume"),
-        )
-        if ohlcv is None:
-            return {
-                "error": "K线数据不足（需要至少60根），无法进行六因子分析",
-                "symbol": symbol,
-            }
+        if reuse:
+            payload = self._analyze_precomputed(symbol, raw_data)
+            if payload is not None:
+                return payload
 
-        realtime_price = _extract_realtime_price(raw_data)
-        ohlcv = _apply_realtime_price(ohlcv, realtime_price)
-        price = ohlcv["closes"][-1]
-
-        # 日线六因子
-        factors = [
-            _score_trend(ohlcv),
-            _score_momentum(ohlcv),
-            _score_volume_price(ohlcv),
-            _score_capital(raw_data),
-            _score_volatility_risk(ohlcv, price),
-            _score_market_structure(ohlcv, price),
-        ]
+        payload, parts = compute_quant(symbol, raw_data, ohlcv)
+        if publish and parts is not None:
+            publish_quant_parts(parts)
+        return payload
 
-        # 根据市场状态自适应调整六因子权重
-        regime = _determine_market_regime(ohlcv)
-        _apply_adaptive_weights(factors, regime)
-
-        # 1h 六因子（双周期融合核心）
-        ohlcv_1h = raw_data.get("hourly_ohlcv")
-        factors_1h = None
-        if ohlcv_1h and isinstance(ohlcv_1h, dict) and len(ohlcv_1h.get("closes", [])) >= 55:
-            try:
-                price_1h = ohlcv_1h["closes"][-1]
-                factors_1h = [
-                    _score_trend(ohlcv_1h),
-                    _score_momentum(ohlcv_1h),
-                    _score_volume_price(ohlcv_1h),
-                    _score_capital(raw_data),  # 资金因子不分周期，共用同一份
-                    _score_volatility_risk(ohlcv_1h, price_1h),
-                    _score_market_structure(ohlcv_1h, price_1h),
-                ]
-                _apply_adaptive_weights(factors_1h, regime)
-            except Exception:
-                factors_1h = None  # 1h 指标计算失败时降级到纯日线
-
-        # 双周期融合 composite
-        fused_composite, dual_tf_info = _compute_dual_tf_composite(factors, factors_1h, regime)
-
-        # 合成可执行交易信号
-        signal = _build_trade_signal(
-            factors, ohlcv, raw_data, symbol,
-            override_composite=fused_composite,
-            dual_tf_info=dual_tf_info,
-        )
+    def _analyze_precomputed(self, symbol: str, raw_data: dict) -> Optional[dict]:
+        """命中扫描存下的新鲜结果时：因子/融合评分原样复用，只用实时价修正 OHLCV 后重算价位。
 
-        # 构建 LLM 数据包
+        最新日线日期与计算时不一致（跨日）则不复用，返回 None 走完整计算。
+        """
+        try:
+            from app.services.quant_store import quant_store
+            stored = quant_store.get(symbol)
+        except Exception:
+            return None
+        if stored is None or stored.bar_date != _last_bar_date(raw_data):
+            return None
+
+        realtime_price = _extract_realtime_price(raw_data)
+        if realtime_price is None or realtime_price == stored.ohlcv["closes"][-1]:
+            signal = stored.signal
+        else:
+            ohlcv = {k: list(v) for k, v in stored.ohlcv.items()}
+            ohlcv = _apply_realtime_price(ohlcv, realtime_price)
+            signal = _build_trade_signal(
+                stored.factors, ohlcv, raw_data, symbol,
+                override_composite=stored.fused_composite,
+                dual_tf_info=stored.dual_tf_info,
+            )
+        logger.debug(f"{symbol} 复用 {time.time() - stored.computed_at:.0f}s 前的六因子结果")
         return _build_llm_payload(symbol, signal, raw_data)
 
     @staticmethod
@@ -1109,6 +1183,137 @@ class QuantitativeAnalysisSkill:
 # 历史回测辅助函数（独立于交易信号，用于校准阈值）
 # ─────────────────────────────────────────────────────────────────────────────
 
+def _ffill_valid(values: list) -> list:
+    """前向填充：每个位置取"截至该位置最后一个有效值"（None/NaN 视为无效，开头无有效值时为 None）"""
+    out = []
+    last = None
+    for v in values:
+        if v is not None and not (isinstance(v, float) and math.isnan(v)):
+            last = v
+        out.append(last)
+    return out
+
+
+class _RuleIndicators:
+    """回测共用的前向填充指标数组，按周期缓存，参数网格内各组合共享"""
+
+    def __init__(self, closes: list[float], highs: Optional[list[float]] = None,
+                 lows: Optional[list[float]] = None):
+        self.closes = closes
+        self.highs = highs if highs is not None else closes
+        self.lows = lows if lows is not None else closes
+        self._cache: dict = {}
+
+    def _get(self, key: tuple, build):
+        if key not in self._cache:
+            self._cache[key] = _ffill_valid(build())
+        return self._cache[key]
+
+    def ema(self, period: int) -> list:
+        return self._get(("ema", period), lambda: ema(self.closes, period))
+
+    def rsi(self, period: int) -> list:
+        return self._get(("rsi", period), lambda: rsi(self.closes, period))
+
+    def atr(self, period: int) -> list:
+        return self._get(("atr", period), lambda: atr(self.highs, self.lows, self.closes, period))
+
+    def crosses(self, fast: int, slow: int, rsi_period: int) -> list[tuple]:
+        """金叉/死叉事件 [(bar, 'golden'|'death', rsi)]，从 slow 开始扫描，与阈值/持有期无关"""
+        key = ("cross", fast, slow, rsi_period)
+        if key not in self._cache:
+            fast_ema, slow_ema, rsi_vals = self.ema(fast), self.ema(slow), self.rsi(rsi_period)
+            events = []
+            for i in range(slow, len(self.closes)):
+                f_v, s_v, r_v = fast_ema[i], slow_ema[i], rsi_vals[i]
+                f_prev, s_prev = fast_ema[i - 1], slow_ema[i - 1]
+                if not (f_v and s_v and f_prev and s_prev and r_v is not None):
+                    continue
+                if f_prev <= s_prev and f_v > s_v:
+                    events.append((i, "golden", r_v))
+                elif f_prev >= s_prev and f_v < s_v:
+                    events.append((i, "death", r_v))
+            self._cache[key] = events
+        return self._cache[key]
+
+
+_EMPTY_BACKTEST = {"trades": 0, "wins": 0, "win_rate": 0.0,
+                   "avg_pnl_pct": 0.0, "total_pnl_pct": 0.0,
+                   "long_trades": 0, "short_trades": 0}
+
+
+def _simulate_rule(
+    ind: _RuleIndicators,
+    fast: int, slow: int, rsi_period: int,
+    rsi_buy: float, rsi_sell: float,
+    horizon: int, fee_pct: float,
+    stop_atr_mult: Optional[float] = None,
+    atr_period: int = 14,
+) -> dict:
+    """在共享指标上跑一组参数。只遍历交叉事件，持有期内的 bar 直接跳过，整体 O(n)"""
+    closes = ind.closes
+    n = len(closes)
+    if n < slow + horizon + 1:
+        result = dict(_EMPTY_BACKTEST)
+        if stop_atr_mult is not None:
+            result["stop_exits"] = 0
+        return result
+
+    atr_vals = ind.atr(atr_period) if stop_atr_mult is not None else None
+
+    trades = wins = long_trades = short_trades = stop_exits = 0
+    total_pnl = 0.0
+    next_allowed = slow
+    last_entry = n - horizon  # 入场 bar 必须 < n - horizon
+
+    for i, cross, r_v in ind.crosses(fast, slow, rsi_period):
+        if i < next_allowed:
+            continue
+        if i >= last_entry:
+            break
+        # 金叉 + RSI 在多头区间 → 做多；死叉 + RSI 在空头区间 → 做空
+        if cross == "golden" and r_v > rsi_buy:
+            direction = "long"; long_trades += 1
+        elif cross == "death" and r_v < rsi_sell:
+            direction = "short"; short_trades += 1
+        else:
+            continue
+
+        entry = closes[i]
+        exit_ = closes[i + horizon]
+        atr_v = atr_vals[i] if atr_vals is not None else None
+        if atr_v:
+            # 持有期内触及 ATR 止损即按止损价离场
+            stop = entry - stop_atr_mult * atr_v if direction == "long" else entry + stop_atr_mult * atr_v
+            for j in range(i + 1, i + horizon + 1):
+                if (direction == "long" and ind.lows[j] <= stop) or \
+                        (direction == "short" and ind.highs[j] >= stop):
+                    exit_ = stop
+                    stop_exits += 1
+                    break
+
+        gross = (exit_ - entry) / entry * 100 if direction == "long" else (entry - exit_) / entry * 100
+        net = gross - 2 * fee_pct  # 开仓 + 平仓
+        trades += 1
+        total_pnl += net
+        if net > 0:
+            wins += 1
+        next_allowed = i + horizon  # 进入持有期，跳过到下一次可能入场点
+
+    result = {
+        "trades": trades,
+        "wins": wins,
+        "win_rate": round(wins / trades, 4) if trades else 0.0,
+        "avg_pnl_pct": round(total_pnl / trades, 4) if trades else 0.0,
+        "total_pnl_pct": round(total_pnl, 4),
+        "long_trades": long_trades,
+        "short_trades": short_trades,
+    }
+    if stop_atr_mult is not None:
+        result["stop_exits"] = stop_exits
+    return result
+
+
 def backtest_trend_momentum_rule(
     closes: list[float],
     fast: int = 12,
@@ -1118,6 +1323,9 @@ def backtest_trend_momentum_rule(
     rsi_sell: float = 50.0,
     horizon: int = 5,
     fee_pct: float = 0.04,
+    stop_atr_mult: Optional[float] = None,
+    highs: Optional[list[float]] = None,
+    lows: Optional[list[float]] = None,
 ) -> dict:
     """用 EMA(fast/slow) 金叉死叉 + RSI 过滤做滚动规则回测。
 
@@ -1125,6 +1333,9 @@ def backtest_trend_momentum_rule(
       - 用极简规则在历史 K 线上滚动回测，得到"裸趋势规则"的胜率/平均收益
       - 作为阈值校准的基准线，方便后续调整六因子内部阈值时对照
 
+    指标一次算好并前向填充，只遍历交叉事件，复杂度 O(n)。
+    多组参数请用 sweep_trend_momentum_rule，共享同一份指标数组。
+
     Args:
         closes: 收盘价序列（需 >= slow + horizon + 1）
         fast/slow: EMA 快慢线周期
@@ -1132,76 +1343,70 @@ def backtest_trend_momentum_rule(
         rsi_buy/rsi_sell: RSI 过滤阈值
         horizon: 每次入场后的持有 N 根 K 线再平仓
         fee_pct: 单边手续费百分比
+        stop_atr_mult: 可选 ATR(14) 止损倍数，持有期内触及即按止损价离场；None 不设止损
+        highs/lows: 止损判定用的高低价，不传则用 closes
 
     Returns:
         dict: {
             "trades": int, "wins": int, "win_rate": float,
             "avg_pnl_pct": float, "total_pnl_pct": float,
             "long_trades": int, "short_trades": int,
+            "stop_exits": int,  # 仅设置 stop_atr_mult 时返回
         }
     """
-    n = len(closes)
-    if n < slow + horizon + 1:
-        return {"trades": 0, "wins": 0, "win_rate": 0.0,
-                "avg_pnl_pct": 0.0, "total_pnl_pct": 0.0,
-                "long_trades": 0, "short_trades": 0}
+    ind = _RuleIndicators(closes, highs, lows)
+    return _simulate_rule(ind, fast, slow, rsi_period, rsi_buy, rsi_sell,
+                          horizon, fee_pct, stop_atr_mult)
 
-    fast_ema = ema(closes, fast)
-    slow_ema = ema(closes, slow)
-    rsi_vals = rsi(closes, rsi_period)
 
-    def _last_valid(arr, idx):
-        for v in reversed(arr[: idx + 1]):
-            if v is not None and not (isinstance(v, float) and math.isnan(v)):
-                return v
-        return None
-
-    trades = 0
-    wins = 0
-    total_pnl = 0.0
-    long_trades = 0
-    short_trades = 0
-
-    i = slow  # 从 slow 开始确保 EMA 稳定
-    while i < n - horizon:
-        f_v = _last_valid(fast_ema, i)
-        s_v = _last_valid(slow_ema, i)
-        r_v = _last_valid(rsi_vals, i)
-        f_prev = _last_valid(fast_ema, i - 1)
-        s_prev = _last_valid(slow_ema, i - 1)
-        if not (f_v and s_v and f_prev and s_prev and r_v is not None):
-            i += 1
-            continue
+# 参数网格的合法键及默认值（与 backtest_trend_momentum_rule 一致）
+_SWEEP_DEFAULTS = {
+    "fast": 12, "slow": 26, "rsi_period": 14,
+    "rsi_buy": 50.0, "rsi_sell": 50.0,
+    "horizon": 5, "fee_pct": 0.04, "stop_atr_mult": None,
+}
 
-        # 金叉 + RSI 在多头区间 → 做多
-        golden_cross = f_prev <= s_prev and f_v > s_v and r_v > rsi_buy
-        # 死叉 + RSI 在空头区间 → 做空
-        death_cross = f_prev >= s_prev and f_v < s_v and r_v < rsi_sell
 
-        if golden_cross:
-            direction = "long"; long_trades += 1
-        elif death_cross:
-            direction = "short"; short_trades += 1
-        else:
-            i += 1
-            continue
+def sweep_trend_momentum_rule(
+    closes: list[float],
+    grid: dict,
+    highs: Optional[list[float]] = None,
+    lows: Optional[list[float]] = None,
+    rank_by: str = "avg_pnl_pct",
+    min_trades: int = 5,
+    top: Optional[int] = None,
+) -> list[dict]:
+    """参数网格回测：所有组合共享同一份前向填充指标和交叉事件，返回排序后的结果表。
 
-        entry = closes[i]
-        exit_ = closes[i + horizon]
-        gross = (exit_ - entry) / entry * 100 if direction == "long" else (entry - exit_) / entry * 100
-        net = gross - 2 * fee_pct  # 开仓 + 平仓
-        trades += 1
-        total_pnl += net
-        if net > 0:
-            wins += 1
-        i += horizon  # 进入持有期，跳过到下一次可能入场点
+    Args:
+        closes/highs/lows: 同 backtest_trend_momentum_rule
+        grid: {参数名: 候选值列表}，参数名取自 _SWEEP_DEFAULTS，未给出的用默认值
+              例：{"rsi_buy": [45, 50, 55], "horizon": [3, 5, 10], "stop_atr_mult": [None, 1.5, 2.0]}
+        rank_by: 排序指标（win_rate / avg_pnl_pct / total_pnl_pct ...），降序
+        min_trades: 交易数不足的组合排在最后，避免小样本霸榜
+        top: 只返回前 N 行
 
-    return {
-        "trades": trades,
-        "wins": wins,
-        "win_rate": round(wins / trades, 4) if trades else 0.0,
-        "avg_pnl_pct": round(total_pnl / trades, 4) if trades else 0.0,
-        "total_pnl_pct": round(total_pnl, 4),
-        "long_trades": long_trades,
-        "short_trades": short_trades,
-    }
+    Returns:
+        list[dict]: 每行 = 参数 + 回测指标 + rank（从 1 开始）
+    """
+    unknown = set(grid) - set(_SWEEP_DEFAULTS)
+    if unknown:
+        raise ValueError(f"未知回测参数: {sorted(unknown)}")
+
+    keys = list(_SWEEP_DEFAULTS)
+    axes = [list(grid.get(k, [_SWEEP_DEFAULTS[k]])) for k in keys]
+    ind = _RuleIndicators(closes, highs, lows)
+
+    rows = []
+    for combo in itertools.product(*axes):
+        params = dict(zip(keys, combo))
+        if params["fast"] >= params["slow"]:
+            continue
+        metrics = _simulate_rule(ind, **params)
+        metrics.setdefault("stop_exits", 0)
+        rows.append({**params, **metrics})
+
+    rows.sort(key=lambda r: (r["trades"] >= min_trades, r.get(rank_by, 0.0)), reverse=True)
+    for rank, row in enumerate(rows, 1):
+        row["rank"] = rank
+    return rows[:top] if top else rows
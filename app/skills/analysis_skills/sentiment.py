@@ -1,12 +1,6 @@
 """情绪分析 Skill"""
-import asyncio
 from app.skills.base import BaseSkill, IntentInfo, SkillResult
-from app.services.data_service import (
-    get_buy_sell_ratio,
-    get_open_interest,
-    get_trading_volume,
-    get_funding_rate
-)
+from app.services.coin_snapshot import get_snapshot
 
 
 class SentimentAnalysisSkill(BaseSkill):
@@ -33,28 +27,15 @@ class SentimentAnalysisSkill(BaseSkill):
         symbol: str,
         intent: IntentInfo
     ) -> SkillResult:
-        """执行分析（并发调用多个 API）"""
-        # 并发调用所有相关 API
-        tasks = [
-            asyncio.to_thread(get_buy_sell_ratio, symbol),
-            asyncio.to_thread(get_open_interest, symbol),
-            asyncio.to_thread(get_trading_volume, symbol),
-            asyncio.to_thread(get_funding_rate, symbol)
-        ]
-
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        """执行分析（经币种快照读取，缺失的数据源并发补拉）"""
+        api_names = self.get_required_apis()
+        snapshot = await get_snapshot(symbol, api_names)
+        results = snapshot.results(api_names)
 
         # 解析结果
         data = {}
         api_calls = []
 
-        api_names = [
-            "get_buy_sell_ratio",
-            "get_open_interest",
-            "get_trading_volume",
-            "get_funding_rate"
-        ]
-
         for api_name, result in zip(api_names, results):
             if not isinstance(result, Exception):
                 data[api_name] = result
@@ -1,12 +1,8 @@
 """技术分析 Skill"""
-import asyncio
 import pandas as pd
 from app.utils.logger import get_logger
 from app.skills.base import BaseSkill, IntentInfo, SkillResult
-from app.services.data_service import (
-    get_kline_data, get_header_data,
-    get_buy_sell_ratio, get_funding_rate
-)
+from app.services.coin_snapshot import get_snapshot
 
 
 logger = get_logger("app.skills.analysis_skills.technical")
@@ -33,14 +29,10 @@ class TechnicalAnalysisSkill(BaseSkill):
         symbol: str,
         intent: IntentInfo
     ) -> SkillResult:
-        """执行分析（并发调用API）"""
-        kline_data, header_data, ratio_data, funding_data = await asyncio.gather(
-            asyncio.to_thread(get_kline_data, symbol),
-            asyncio.to_thread(get_header_data, symbol),
-            asyncio.to_thread(get_buy_sell_ratio, symbol),
-            asyncio.to_thread(get_funding_rate, symbol),
-            return_exceptions=True
-        )
+        """执行分析（经币种快照读取，缺失的数据源并发补拉）"""
+        api_names = self.get_required_apis()
+        snapshot = await get_snapshot(symbol, api_names)
+        kline_data, header_data, ratio_data, funding_data = snapshot.results(api_names)
 
         if isinstance(kline_data, Exception):
             kline_data = {}
@@ -64,8 +56,12 @@ class TechnicalAnalysisSkill(BaseSkill):
             real_time_price = header_data.get("currentPrice")
             price_change_24h = header_data.get("priceChangePercentage_24h")
 
-        # 计算技术指标（传入实时价格）
-        indicators = self._calculate_indicators(kline_data, real_time_price)
+        # 计算技术指标（传入实时价格）；同一快照内多个请求只算一次
+        indicators = snapshot.derived(
+            "technical_indicators",
+            ("get_kline_data", "get_header_data"),
+            lambda: self._calculate_indicators(kline_data, real_time_price),
+        )
 
         # 提取K线信息
         values = kline_data.get("values", []) if isinstance(kline_data, dict) else []
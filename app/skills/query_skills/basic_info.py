@@ -1,7 +1,6 @@
 """基本信息查询 Skill"""
-import asyncio
 from app.skills.base import BaseSkill, IntentInfo, SkillResult
-from app.services.data_service import get_header_data
+from app.services.coin_snapshot import get_snapshot
 
 
 class BasicInfoSkill(BaseSkill):
@@ -27,8 +26,11 @@ class BasicInfoSkill(BaseSkill):
         intent: IntentInfo
     ) -> SkillResult:
         """执行查询（只调用必要的 API）"""
-        # 只调用 get_header_data
-        header_data = await asyncio.to_thread(get_header_data, symbol)
+        # 只调用 get_header_data（经币种快照，失败时与原来一样抛出）
+        snapshot = await get_snapshot(symbol, ["get_header_data"])
+        header_data = snapshot.result("get_header_data")
+        if isinstance(header_data, Exception):
+            raise header_data
 
         return SkillResult(
             skill_name=self.name,
@@ -1,13 +1,7 @@
 """衍生品查询 Skill"""
-import asyncio
 from app.utils.logger import get_logger
 from app.skills.base import BaseSkill, IntentInfo, SkillResult
-from app.services.data_service import (
-    get_buy_sell_ratio,
-    get_open_interest,
-    get_trading_volume,
-    get_funding_rate
-)
+from app.services.coin_snapshot import get_snapshot
 
 
 logger = get_logger("app.skills.query_skills.derivatives")
@@ -35,31 +29,12 @@ class DerivativesQuerySkill(BaseSkill):
         intent: IntentInfo
     ) -> SkillResult:
         """执行查询（根据 intent.required_apis 调用必要的 API）"""
-        api_calls = []
-        tasks = []
-
-        if "get_buy_sell_ratio" in intent.required_apis:
-            tasks.append(asyncio.to_thread(get_buy_sell_ratio, symbol))
-            api_calls.append("get_buy_sell_ratio")
-
-        if "get_open_interest" in intent.required_apis:
-            tasks.append(asyncio.to_thread(get_open_interest, symbol))
-            api_calls.append("get_open_interest")
-
-        if "get_trading_volume" in intent.required_apis:
-            tasks.append(asyncio.to_thread(get_trading_volume, symbol))
-            api_calls.append("get_trading_volume")
-
-        if "get_funding_rate" in intent.required_apis:
-            tasks.append(asyncio.to_thread(get_funding_rate, symbol))
-            api_calls.append("get_funding_rate")
+        api_calls = [name for name in self.get_required_apis() if name in intent.required_apis]
 
         raw_data = {}
-        if tasks:
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            for i, api_name in enumerate(api_calls):
-                result = results[i]
+        if api_calls:
+            snapshot = await get_snapshot(symbol, api_calls)
+            for api_name, result in zip(api_calls, snapshot.results(api_calls)):
                 if isinstance(result, Exception):
                     logger.info(f"  警告: {api_name} 调用失败: {str(result)}")
                 else:
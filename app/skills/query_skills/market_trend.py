@@ -1,7 +1,6 @@
 """市场趋势查询 Skill"""
-import asyncio
 from app.skills.base import BaseSkill, IntentInfo, SkillResult
-from app.services.data_service import get_kline_data, get_header_data
+from app.services.coin_snapshot import get_snapshot
 
 
 class MarketTrendSkill(BaseSkill):
@@ -26,20 +25,20 @@ class MarketTrendSkill(BaseSkill):
         symbol: str,
         intent: IntentInfo
     ) -> SkillResult:
-        """执行查询（并发调用 API）"""
-        kline_data, header_data = await asyncio.gather(
-            asyncio.to_thread(get_kline_data, symbol),
-            asyncio.to_thread(get_header_data, symbol),
-            return_exceptions=True
-        )
+        """执行查询（经币种快照读取，缺失的数据源并发补拉）"""
+        api_names = self.get_required_apis()
+        snapshot = await get_snapshot(symbol, api_names)
+        kline_data, header_data = snapshot.results(api_names)
 
         if isinstance(kline_data, Exception):
             kline_data = {}
         if isinstance(header_data, Exception):
             header_data = {}
 
-        # 计算趋势（本地计算）
-        trend_info = self._calculate_trend(kline_data)
+        # 计算趋势（本地计算，同一快照内只算一次）
+        trend_info = snapshot.derived(
+            "market_trend", ("get_kline_data",), lambda: self._calculate_trend(kline_data)
+        )
 
         # 构建完整数据
         data = {
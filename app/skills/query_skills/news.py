@@ -1,7 +1,6 @@
 """新闻查询 Skill"""
-import asyncio
 from app.skills.base import BaseSkill, IntentInfo, SkillResult
-from app.services.data_service import get_recent_news
+from app.services.coin_snapshot import get_snapshot
 
 
 class NewsQuerySkill(BaseSkill):
@@ -27,8 +26,13 @@ class NewsQuerySkill(BaseSkill):
         intent: IntentInfo
     ) -> SkillResult:
         """执行查询（只调用必要的 API）"""
-        # 调用 get_recent_news
-        news_data = await asyncio.to_thread(get_recent_news, symbol, limit=5)
+        # 调用 get_recent_news（快照按最大条数缓存，这里截取前 5 条）
+        snapshot = await get_snapshot(symbol, ["get_recent_news"])
+        news_data = snapshot.result("get_recent_news")
+        if isinstance(news_data, Exception):
+            raise news_data
+        if isinstance(news_data, list):
+            news_data = news_data[:5]
 
         return SkillResult(
             skill_name=self.name,
@@ -8,6 +8,10 @@
     with Timer(rid, "step1.llm_route"):
         route_resp = await ...
 
+    with Timer(rid, "step3.llm_stream") as t:
+        async for chunk in stream:
+            t.mark("first_token")   # 同名打点只记第一次
+
     try:
         ...
     except Exception as e:
@@ -17,6 +21,8 @@
 底层用 logging 模块（name=chat_trace），默认 INFO 级别直出 stdout。
 Railway/容器环境默认采集 stdout，无需额外配置即可看到日志。
 如需静默，设环境变量 CHAT_TRACE_LEVEL=WARNING 即可。
+
+Timer 同时把耗时写入 app.utils.metrics 的 chat_step_duration_seconds 直方图（/metrics 导出）。
 """
 import logging
 import os
@@ -24,6 +30,8 @@ import sys
 import time as _time
 from typing import Any, Optional
 
+from app.utils.metrics import CHAT_STEP_SECONDS, CHAT_STEP_MARK_SECONDS
+
 
 # 独立 logger（不污染 root logger，避免影响其他 print-based 日志）
 _logger = logging.getLogger("chat_trace")
@@ -64,13 +72,23 @@ class Timer:
     异常退出时打印 .error，并 re-raise（不吞异常）。
     """
 
-    __slots__ = ("rid", "step", "t0", "extra")
+    __slots__ = ("rid", "step", "t0", "extra", "_marks")
 
     def __init__(self, rid: Optional[str], step: str, **extra: Any):
         self.rid = rid
         self.step = step
         self.t0: float = 0.0
         self.extra = extra
+        self._marks: set = set()
+
+    def mark(self, name: str) -> None:
+        """步骤内打点（如 first_token），同名只记第一次"""
+        if name in self._marks:
+            return
+        self._marks.add(name)
+        dur_ms = (_time.time() - self.t0) * 1000
+        CHAT_STEP_MARK_SECONDS.observe(dur_ms / 1000, step=self.step, mark=name)
+        trace(self.rid, f"{self.step}.{name}", duration_ms=dur_ms, **self.extra)
 
     def __enter__(self):
         self.t0 = _time.time()
@@ -82,6 +100,7 @@ class Timer:
         # CancelledError 是正常现象（SSE 客户端断开 / 上游 task 取消），不算 error
         import asyncio
         if exc_type is not None and issubclass(exc_type, asyncio.CancelledError):
+            CHAT_STEP_SECONDS.observe(dur_ms / 1000, step=self.step, outcome="cancelled")
             trace(
                 self.rid,
                 f"{self.step}.cancelled",
@@ -90,8 +109,10 @@ class Timer:
             )
             return False
         if exc_type is None:
+            CHAT_STEP_SECONDS.observe(dur_ms / 1000, step=self.step, outcome="ok")
             trace(self.rid, f"{self.step}.end", duration_ms=dur_ms, **self.extra)
         else:
+            CHAT_STEP_SECONDS.observe(dur_ms / 1000, step=self.step, outcome="error")
             trace(
                 self.rid,
                 f"{self.step}.error",
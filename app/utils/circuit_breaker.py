@@ -0,0 +1,96 @@
+"""熔断器 — 下游持续失败时快速失败，不再每次调用都等满超时。
+
+状态：
+- closed：正常放行；连续失败 failure_threshold 次 → open
+- open：直接拒绝，reset_timeout 秒后 → half_open
+- half_open：只放行一个试探调用；成功 → closed，失败 → 重新 open
+
+状态导出到 /metrics（circuit_breaker_state{name}，0=closed 1=half_open 2=open）。
+
+用法:
+    breaker = CircuitBreaker("data_proxy", failure_threshold=5, reset_timeout=30)
+    if not breaker.allow():
+        return fallback()
+    try:
+        result = call()
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+"""
+import threading
+import time
+from typing import Any, Dict
+
+from app.utils.logger import get_logger
+from app.utils.metrics import CIRCUIT_BREAKER_STATE
+
+logger = get_logger("app.utils.circuit_breaker")
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """线程安全的连续失败计数熔断器"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        CIRCUIT_BREAKER_STATE.set(0, name=name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.time() - self._opened_at >= self.reset_timeout:
+            self._set_state(HALF_OPEN)
+        return self._state
+
+    def _set_state(self, state: str):
+        if state != self._state:
+            logger.info(f"熔断器 {self.name}: {self._state} → {state}")
+            self._state = state
+            CIRCUIT_BREAKER_STATE.set(_STATE_VALUE[state], name=self.name)
+
+    def allow(self) -> bool:
+        """是否放行本次调用（half_open 时只放行一个试探）"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"熔断器 {self.name}: 连续失败 {self._failures} 次，{self.reset_timeout:.0f}s 内快速失败")
+                self._opened_at = time.time()
+                self._set_state(OPEN)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"name": self.name, "state": self._current_state(), "failures": self._failures}
@@ -0,0 +1,159 @@
+"""命名线程池 — 按工作负载隔离 run_in_executor，批处理不挤占交互请求。
+
+问题：所有后台任务（大单扫描、结算、全市场扫描、护栏重算、日报…）和聊天的
+asyncio.to_thread / run_in_executor(None, ...) 共用事件循环的默认线程池，
+扫描或慢结算把池子占满时，用户请求只能排队。
+
+约定：
+- interactive：事件循环的默认执行器（lifespan 里 install_default），聊天 / HTTP 端点的
+  to_thread 与 run_in_executor(None, ...) 都落在这里，批处理不再使用
+- bigorder / settlement / market_scan / maintenance：各后台任务专用，容量独立
+- klines：出卡时多周期 K 线并发拉取（data_service.get_multi_timeframe_klines），
+  超时的请求在池里继续跑完，不占调用方的池
+- leader：选主锁的抢锁 / 续期（app.core.leader），单线程；交互池被聊天占满时续期也不排队，
+  不会因此超过 Redis 租约 TTL 而丢失领导权
+- 每个池的排队数、执行中数、排队等待耗时导出到 /metrics（executor_* 指标）
+- collect_pending()：收集当前上下文里 run_in 提交的线程池 future。调度器的一轮任务
+  超时被取消后，线程里的同步函数仍在跑，调度器据此等它跑完再放行下一轮
+
+用法:
+    from app.utils.executors import run_in
+    result = await run_in("settlement", settle_pending_cards)
+"""
+import asyncio
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional, Set
+
+from app.core.config import get_settings
+from app.utils.logger import get_logger
+from app.utils.metrics import EXECUTOR_ACTIVE, EXECUTOR_QUEUED, EXECUTOR_WAIT_SECONDS
+
+logger = get_logger("app.utils.executors")
+
+INTERACTIVE = "interactive"
+BIGORDER = "bigorder"
+SETTLEMENT = "settlement"
+MARKET_SCAN = "market_scan"
+MAINTENANCE = "maintenance"
+KLINES = "klines"
+LEADER = "leader"
+
+
+def _pool_sizes() -> Dict[str, int]:
+    settings = get_settings()
+    return {
+        INTERACTIVE: settings.executor_interactive_workers,
+        BIGORDER: settings.executor_bigorder_workers,
+        SETTLEMENT: settings.executor_settlement_workers,
+        MARKET_SCAN: settings.executor_market_scan_workers,
+        MAINTENANCE: settings.executor_maintenance_workers,
+        KLINES: settings.executor_kline_workers,
+        LEADER: 1,  # 锁操作串行，不可配置
+    }
+
+
+class BoundedExecutor(ThreadPoolExecutor):
+    """带排队 / 执行中计数的 ThreadPoolExecutor（max_workers 即容量上限）"""
+
+    def __init__(self, name: str, max_workers: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix=f"exec-{name}")
+        self.name = name
+        EXECUTOR_QUEUED.set(0, executor=name)
+        EXECUTOR_ACTIVE.set(0, executor=name)
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        EXECUTOR_QUEUED.inc(executor=self.name)
+        queued_at = time.perf_counter()
+        state = {"started": False}
+
+        def _run():
+            state["started"] = True
+            EXECUTOR_QUEUED.dec(executor=self.name)
+            EXECUTOR_WAIT_SECONDS.observe(time.perf_counter() - queued_at, executor=self.name)
+            EXECUTOR_ACTIVE.inc(executor=self.name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                EXECUTOR_ACTIVE.dec(executor=self.name)
+
+        try:
+            future = super().submit(_run)
+        except Exception:
+            EXECUTOR_QUEUED.dec(executor=self.name)
+            raise
+
+        def _on_done(f: Future):
+            # 排队中被取消（shutdown cancel_futures）的任务不会进 _run，这里补减
+            if f.cancelled() and not state["started"]:
+                EXECUTOR_QUEUED.dec(executor=self.name)
+
+        future.add_done_callback(_on_done)
+        return future
+
+
+_executors: Dict[str, BoundedExecutor] = {}
+_lock = threading.Lock()
+_pending: contextvars.ContextVar[Optional[Set[Future]]] = contextvars.ContextVar("executor_pending", default=None)
+
+
+def get_executor(name: str) -> BoundedExecutor:
+    """按名字取（首次调用时创建）命名线程池；未知名字抛 KeyError"""
+    executor = _executors.get(name)
+    if executor is not None:
+        return executor
+    with _lock:
+        if name not in _executors:
+            sizes = _pool_sizes()
+            _executors[name] = BoundedExecutor(name, max(1, sizes[name]))
+        return _executors[name]
+
+
+async def run_in(name: str, fn: Callable, *args, **kwargs) -> Any:
+    """在命名线程池里执行同步函数：`await run_in("settlement", fn, arg)`
+
+    与 asyncio.to_thread 一样把调用方的 contextvars 上下文带进线程（run_in_executor 不会）。
+    """
+    ctx = contextvars.copy_context()
+    future = get_executor(name).submit(functools.partial(ctx.run, fn, *args, **kwargs))
+    pending = _pending.get()
+    if pending is not None:
+        pending.add(future)
+        future.add_done_callback(pending.discard)
+    return await asyncio.wrap_future(future)
+
+
+@contextlib.contextmanager
+def collect_pending() -> Iterator[Set[Future]]:
+    """块内（含其中创建的 task）经 run_in 提交、尚未结束的线程池 future 集合
+
+    调用方被取消（asyncio.wait_for 超时）时 await 结束了，但已开始执行的同步函数不会停，
+    对应 future 留在集合里直到真正跑完。
+    """
+    futures: Set[Future] = set()
+    token = _pending.set(futures)
+    try:
+        yield futures
+    finally:
+        _pending.reset(token)
+
+
+def install_default(loop: asyncio.AbstractEventLoop) -> None:
+    """把 interactive 池设为事件循环默认执行器（asyncio.to_thread / run_in_executor(None) 走这里）"""
+    loop.set_default_executor(get_executor(INTERACTIVE))
+    logger.info(
+        "命名线程池: " + ", ".join(f"{k}={v}" for k, v in _pool_sizes().items())
+    )
+
+
+def shutdown_all(wait: bool = False) -> None:
+    """服务关闭时回收全部命名线程池（默认不等待，排队任务直接取消）"""
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,102 @@
+"""跨进程文件锁 — 多 uvicorn worker 之间选出唯一执行者。
+
+基于 fcntl.flock（Linux / macOS）。锁随持有进程退出由内核自动释放，
+不会因 worker 崩溃留下死锁。Windows 无 fcntl 时退化为"总是拿到锁"（单进程开发环境）。
+
+持有期间锁文件内容为持有者 pid，释放前清空。is_locked_elsewhere 只读 pid 并检查进程存活，
+不去抢锁 —— 探测若也 flock，会在探测的瞬间让别人的 try_acquire 失败（/scan 每次都会探测）。
+
+用法:
+    lock = FileLock("scan_refresh")
+    if lock.try_acquire():
+        try:
+            ...
+        finally:
+            lock.release()
+"""
+import os
+import tempfile
+import threading
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows 开发环境
+    fcntl = None
+
+
+def lock_path(name: str) -> str:
+    """锁文件路径：LOCK_DIR 环境变量（默认系统临时目录）下的 mozi_{name}.lock"""
+    directory = os.environ.get("LOCK_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, f"mozi_{name}.lock")
+
+
+class FileLock:
+    """非阻塞独占文件锁（同一进程内也互斥）"""
+
+    def __init__(self, name: str, path: Optional[str] = None):
+        self.name = name
+        self.path = path or lock_path(name)
+        self._fd: Optional[int] = None
+        self._mutex = threading.Lock()
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        """尝试拿锁，拿不到立即返回 False"""
+        with self._mutex:
+            if self._fd is not None:
+                return False
+            if fcntl is None:
+                self._fd = -1
+                return True
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            # 写入持有者 pid，便于排查
+            os.ftruncate(fd, 0)
+            os.write(fd, str(os.getpid()).encode())
+            self._fd = fd
+            return True
+
+    def release(self):
+        with self._mutex:
+            if self._fd is None:
+                return
+            if fcntl is not None and self._fd >= 0:
+                try:
+                    os.ftruncate(self._fd, 0)
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                finally:
+                    os.close(self._fd)
+            self._fd = None
+
+    def is_locked_elsewhere(self) -> bool:
+        """探测锁是否被其他持有者占用（只读锁文件里的 pid，不加锁、不改变本实例状态）
+
+        持有者被 kill 后内核已释放 flock，文件里残留的 pid 不存活即视为空闲。
+        try_acquire 拿锁到写入 pid 之间的极短窗口会探测为空闲，调用方只拿它做提示。
+        """
+        if fcntl is None or self._fd is not None:
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                pid = int(f.read(32).strip() or 0)
+        except (OSError, ValueError):
+            return False
+        return pid > 0 and _pid_alive(pid)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
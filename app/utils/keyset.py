@@ -0,0 +1,127 @@
+"""历史记录分页 / 导出工具 — keyset 分页 + 字段投影 + NDJSON 流式导出。
+
+- keyset 分页：按 (created_at, id) 倒序翻页，游标是上一页最后一行的 (created_at, id)，
+  编码成不透明字符串 next_cursor；深翻页不退化成 OFFSET 扫描
+- 字段投影：fields=a,b,c 只查 / 只返回需要的列，TEXT 大字段（sources_json 等）按需取
+- NDJSON 流式：SSCursor（服务端游标）逐行读、逐行写，导出大范围数据内存恒定；
+  NDJSONResponse 在响应结束（含客户端中途断开）时立即关闭生成器，连接不等 GC 才释放
+
+用法:
+    where_sql, params = keyset_where(cursor)        # "(created_at < %s OR (...))"
+    return NDJSONResponse(stream_ndjson(conn_factory, sql, params, row_fn))
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """(created_at, id) → 不透明游标字符串"""
+    raw = f"{created_at.strftime('%Y-%m-%d %H:%M:%S.%f')}|{int(row_id)}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """游标字符串 → (created_at, id)；格式不对抛 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.strptime(ts, "%Y-%m-%d %H:%M:%S.%f"), int(row_id)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {cursor}") from e
+
+
+def keyset_where(cursor: Optional[str], ts_col: str = "created_at", id_col: str = "id") -> Tuple[str, list]:
+    """游标 → WHERE 片段（配合 ORDER BY ts_col DESC, id_col DESC）。无游标返回 ("", [])"""
+    if not cursor:
+        return "", []
+    ts, row_id = decode_cursor(cursor)
+    return f"({ts_col} < %s OR ({ts_col} = %s AND {id_col} < %s))", [ts, ts, row_id]
+
+
+def next_cursor(rows: Sequence[Dict[str, Any]], limit: int,
+                ts_col: str = "created_at", id_col: str = "id") -> Optional[str]:
+    """本页满 limit 条时返回下一页游标，否则 None（已到末页）"""
+    if len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    return encode_cursor(last[ts_col], last[id_col])
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str], default: Sequence[str]) -> List[str]:
+    """fields=a,b,c → 校验后的字段列表（保持请求顺序、去重）；未知字段抛 ValueError"""
+    if not fields:
+        return list(default)
+    allowed = set(allowed)
+    out: List[str] = []
+    for name in (f.strip() for f in fields.split(",")):
+        if not name or name in out:
+            continue
+        if name not in allowed:
+            raise ValueError(f"unknown field: {name}")
+        out.append(name)
+    return out or list(default)
+
+
+def json_default(v):
+    """与 FastAPI jsonable_encoder 一致：datetime/date → ISO 字符串，Decimal → float"""
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, bytes):
+        return v.decode("utf-8", errors="replace")
+    return str(v)
+
+
+def stream_ndjson(
+    conn_factory: Callable[[], Any],
+    sql: str,
+    params: Sequence[Any],
+    row_fn: Callable[[Dict[str, Any]], Dict[str, Any]] = lambda r: r,
+) -> Iterator[bytes]:
+    """
+    SSDictCursor 逐行读取并输出 NDJSON（每行一个 JSON 对象）。
+
+    同步生成器：交给 NDJSONResponse 时 Starlette 会放到线程池迭代，不阻塞事件循环。
+    连接在生成器结束 / 被关闭（GeneratorExit）时关闭；中途断开时直接关连接，
+    不走 cursor.close()（SSCursor 关闭会把剩余结果集读完）。
+    """
+    import pymysql.cursors
+
+    conn = conn_factory()
+    try:
+        cur = conn.cursor(pymysql.cursors.SSDictCursor)
+        cur.execute(sql, params)
+        for row in cur:
+            yield (json.dumps(row_fn(row), ensure_ascii=False, default=json_default) + "\n").encode()
+        cur.close()
+    finally:
+        conn.close()
+
+
+class NDJSONResponse(StreamingResponse):
+    """
+    NDJSON 流式响应：响应结束或客户端断开后立即 close() 源生成器。
+
+    Starlette 在客户端断开时只是停止迭代，不关闭同步生成器，生成器里的 finally（关连接）
+    要等垃圾回收才执行，期间连接和服务端游标一直占着。
+    """
+    media_type = "application/x-ndjson"
+
+    def __init__(self, content: Iterator[bytes], **kwargs):
+        self._source = content
+        super().__init__(content, **kwargs)
+
+    async def stream_response(self, send) -> None:
+        try:
+            await super().stream_response(send)
+        finally:
+            close = getattr(self._source, "close", None)
+            if close is not None:
+                await run_in_threadpool(close)
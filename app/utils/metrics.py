@@ -0,0 +1,392 @@
+"""进程内指标注册表 — Counter / Gauge / Histogram，Prometheus 文本格式导出。
+
+用法:
+    from app.utils.metrics import counter, histogram, time_block
+
+    UPSTREAM = histogram("upstream_fetch_seconds", "上游 fetch_json 耗时", ["endpoint", "outcome"])
+    UPSTREAM.observe(0.12, endpoint="/detail/kline", outcome="ok")
+
+    with time_block(UPSTREAM, endpoint="/detail/header"):
+        ...
+
+    render()  # -> /metrics 文本
+
+不依赖 prometheus_client；每个 worker 进程各自一份，多 worker 部署时由抓取端聚合。
+Histogram 用固定桶（累积计数），p50/p99 由抓取端 histogram_quantile 计算。
+标签值只放有界集合（路由模板、步骤名、任务名），不要放 request_id / 币种之类。
+"""
+import math
+import sys
+import threading
+import time as _time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 默认延迟桶（秒）：覆盖 5ms 的缓存命中到 5min 的全市场扫描
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+
+def _fmt_value(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if v == -math.inf:
+        return "-Inf"
+    return repr(float(v))
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    TYPE = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: 标签应为 {self.labelnames}，实际 {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.TYPE}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """单调递增计数"""
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        if amount < 0:
+            raise ValueError(f"{self.name}: counter 只能递增")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+
+    TYPE = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """固定桶直方图 — 每个标签组合维护各桶计数 + sum + count"""
+
+    TYPE = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        if "le" in self.labelnames:
+            raise ValueError(f"{name}: histogram 不能使用 le 标签")
+        bounds = sorted(float(b) for b in buckets)
+        if not bounds or bounds[-1] != math.inf:
+            bounds.append(math.inf)
+        self.buckets: Tuple[float, ...] = tuple(bounds)
+        # {label_key: [bucket_counts(非累积)..., sum, count]}
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        # 落在第一个 >= value 的桶（le 语义）
+        idx = len(self.buckets) - 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                idx = i
+                break
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = row
+            row[idx] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def snapshot(self, **labels) -> Dict[str, object]:
+        """返回 {buckets: [(le, 累积计数)], sum, count}，供测试 / 诊断"""
+        with self._lock:
+            row = list(self._values.get(self._key(labels)) or [0.0] * (len(self.buckets) + 2))
+        cumulative, acc = [], 0.0
+        for bound, n in zip(self.buckets, row[:len(self.buckets)]):
+            acc += n
+            cumulative.append((bound, acc))
+        return {"buckets": cumulative, "sum": row[-2], "count": row[-1]}
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = []
+        for key, row in items:
+            acc = 0.0
+            for bound, n in zip(self.buckets, row[:len(self.buckets)]):
+                acc += n
+                lines.append(
+                    f"{self.name}_bucket{_fmt_labels(self.labelnames, key, ('le', _fmt_value(bound)))} {_fmt_value(acc)}"
+                )
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(row[-2])}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {_fmt_value(row[-1])}")
+        return lines
+
+
+class Registry:
+    """指标注册表。同名重复注册返回已有实例（类型/标签不一致时报错）"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help: str, labelnames: Iterable[str], **kw) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(name)
+            if existing is not None:
+                if not isinstance(existing, cls) or existing.labelnames != tuple(labelnames):
+                    raise ValueError(f"指标 {name} 已以不同类型/标签注册")
+                return existing
+            metric = cls(name, help, labelnames, **kw)
+            self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+render = REGISTRY.render
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@contextmanager
+def time_block(hist: Histogram, **labels):
+    """计时上下文：正常退出 outcome=ok，异常 outcome=error（hist 需带 outcome 标签）"""
+    t0 = _time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        hist.observe(_time.perf_counter() - t0, outcome=outcome, **labels)
+
+
+# ============================================================
+# 内置指标：HTTP / chat 步骤 / 上游 API / MySQL / 后台任务 / 线程池
+# ============================================================
+
+HTTP_REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds", "HTTP 请求处理耗时（到响应头返回）", ["method", "route", "status"],
+)
+HTTP_IN_FLIGHT = gauge("http_requests_in_flight", "正在处理的 HTTP 请求数")
+
+CHAT_STEP_SECONDS = histogram(
+    "chat_step_duration_seconds", "chat_trace.Timer 步骤耗时", ["step", "outcome"],
+)
+CHAT_STEP_MARK_SECONDS = histogram(
+    "chat_step_mark_seconds", "Timer 步骤内打点距步骤开始的耗时（如 first_token）", ["step", "mark"],
+)
+
+UPSTREAM_FETCH_SECONDS = histogram(
+    "upstream_fetch_duration_seconds", "上游 fetch_json 耗时（含重试）", ["endpoint", "outcome"],
+)
+UPSTREAM_CACHE_TOTAL = counter(
+    "upstream_cache_requests_total", "fetch_json_cached 缓存命中情况", ["endpoint", "result"],
+)
+
+MYSQL_QUERY_SECONDS = histogram(
+    "mysql_query_duration_seconds", "MySQL 语句耗时", ["db", "caller", "op", "outcome"],
+)
+MYSQL_CONNECT_SECONDS = histogram(
+    "mysql_connect_duration_seconds", "MySQL 建连耗时", ["db", "outcome"],
+)
+
+TASK_RUN_SECONDS = histogram(
+    "background_task_duration_seconds", "后台任务单轮耗时", ["task", "outcome"],
+)
+TASK_LAST_SUCCESS = gauge(
+    "background_task_last_success_timestamp_seconds", "后台任务最近一次成功完成的 unix 时间", ["task"],
+)
+
+EXECUTOR_QUEUED = gauge("executor_queue_depth", "命名线程池排队中的任务数", ["executor"])
+EXECUTOR_ACTIVE = gauge("executor_active_threads", "命名线程池执行中的任务数", ["executor"])
+EXECUTOR_WAIT_SECONDS = histogram(
+    "executor_queue_wait_seconds", "任务从提交到开始执行的排队耗时", ["executor"],
+)
+
+SSE_CARD_ENCODE_TOTAL = counter(
+    "sse_card_encode_total", "SSE 信号卡事件编码（hit=复用已编码版本，miss=构建并编码）", ["result"],
+)
+
+CIRCUIT_BREAKER_STATE = gauge(
+    "circuit_breaker_state", "熔断器状态（0=closed 1=half_open 2=open）", ["name"],
+)
+
+SCAN_PREFILTER_TOTAL = counter(
+    "scan_prefilter_decisions_total", "全市场扫描增量预筛判定（skip 或触发完整扫描的原因）", ["decision"],
+)
+SCAN_PREFILTER_MISSED = counter(
+    "scan_prefilter_missed_total", "影子模式下本会跳过但出卡结果（方向/等级）变化的币种数",
+)
+SCAN_SKIP_RATIO = gauge("scan_prefilter_skip_ratio", "最近一轮全市场扫描可跳过的币种比例")
+
+
+@contextmanager
+def track_task(task: str):
+    """后台任务单轮计时：`with track_task("market_scan"): ...`"""
+    with time_block(TASK_RUN_SECONDS, task=task):
+        yield
+    TASK_LAST_SUCCESS.set(_time.time(), task=task)
+
+
+# ============================================================
+# MySQL 连接包装：按调用函数名 + 语句类型计时，业务代码零改动
+# ============================================================
+
+def _sql_op(query) -> str:
+    head = str(query).lstrip().split(None, 1)
+    return head[0].upper() if head else "UNKNOWN"
+
+
+class _TimedCursor:
+    __slots__ = ("_cursor", "_db")
+
+    def __init__(self, cursor, db: str):
+        self._cursor = cursor
+        self._db = db
+
+    def _timed(self, fn, query, *args, **kwargs):
+        caller = sys._getframe(2).f_code.co_name
+        t0 = _time.perf_counter()
+        outcome = "ok"
+        try:
+            return fn(query, *args, **kwargs)
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            MYSQL_QUERY_SECONDS.observe(
+                _time.perf_counter() - t0, db=self._db, caller=caller, op=_sql_op(query), outcome=outcome,
+            )
+
+    def execute(self, query, *args, **kwargs):
+        return self._timed(self._cursor.execute, query, *args, **kwargs)
+
+    def executemany(self, query, *args, **kwargs):
+        return self._timed(self._cursor.executemany, query, *args, **kwargs)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._cursor.__exit__(*exc)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _TimedConnection:
+    __slots__ = ("_conn", "_db")
+
+    def __init__(self, conn, db: str):
+        self._conn = conn
+        self._db = db
+
+    def cursor(self, *args, **kwargs):
+        return _TimedCursor(self._conn.cursor(*args, **kwargs), self._db)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def instrument_connection(connect, db: str):
+    """建连并包装：`instrument_connection(lambda: pymysql.connect(...), "signals")`"""
+    with time_block(MYSQL_CONNECT_SECONDS, db=db):
+        conn = connect()
+    return _TimedConnection(conn, db)
@@ -12,10 +12,26 @@
   error     | meta        | 出错，code + message
 
 每帧都透传 request_id。
+
+编码：
+- dumps() 装了 orjson 用 orjson（未装或遇到 orjson 不支持的对象时回退标准库 json）；
+  两者都输出紧凑分隔符、不转义非 ASCII，无法编码的对象（含 datetime / dataclass）走 str()
+- payload 可以是预编码的 RawJSON（encode_payload 或各业务的编码缓存产出），
+  render 只编码帧头，把 payload 原样拼进去，同一张卡推给多个连接不重复序列化
 """
 import json
 from typing import Optional, Any
 
+try:
+    import orjson as _orjson
+    _ORJSON_OPTS = (_orjson.OPT_NON_STR_KEYS
+                    | _orjson.OPT_PASSTHROUGH_DATETIME
+                    | _orjson.OPT_PASSTHROUGH_DATACLASS)
+except ImportError:  # 可选依赖
+    _orjson = None
+
+_json_encoder = json.JSONEncoder(ensure_ascii=False, default=str, separators=(",", ":"))
+
 # 错误码
 ERR_LLM_TIMEOUT = 5001
 ERR_TOOL_TIMEOUT = 5002
@@ -23,6 +39,26 @@ ERR_INTERNAL = 5003
 ERR_SERVICE_UNAVAILABLE = 5004
 
 
+class RawJSON(str):
+    """已编码的 JSON 文本，render 时原样拼接"""
+    __slots__ = ()
+
+
+def dumps(obj: Any) -> str:
+    """JSON 编码（orjson 优先，回退标准库）"""
+    if _orjson is not None:
+        try:
+            return _orjson.dumps(obj, default=str, option=_ORJSON_OPTS).decode("utf-8")
+        except TypeError:  # 超 64 位整数等 orjson 不支持的值
+            pass
+    return _json_encoder.encode(obj)
+
+
+def encode_payload(payload: Any) -> RawJSON:
+    """预编码 payload，多次推送复用"""
+    return payload if isinstance(payload, RawJSON) else RawJSON(dumps(payload))
+
+
 def sse_start(request_id: str, conversation_id: Optional[str] = None) -> dict:
     frame = {"event": "start", "data_type": "meta", "request_id": request_id}
     if conversation_id:
@@ -56,8 +92,14 @@ def sse_error(request_id: str, code: int, message: str) -> dict:
 
 
 def render(frame: dict) -> dict:
-    """将协议帧转为 EventSourceResponse 兼容的 {"event": ..., "data": json.dumps(...)}"""
-    return {
-        "event": frame["event"],
-        "data": json.dumps(frame, ensure_ascii=False, default=str),
-    }
+    """将协议帧转为 EventSourceResponse 兼容的 {"event": ..., "data": json.dumps(...)}
+
+    payload 为 RawJSON 时只编码其余字段，payload 原样拼在末尾（与整帧编码结果一致）。
+    """
+    payload = frame.get("payload")
+    if isinstance(payload, RawJSON):
+        head = dumps({k: v for k, v in frame.items() if k != "payload"})
+        data = f'{head[:-1]},"payload":{payload}}}'
+    else:
+        data = dumps(frame)
+    return {"event": frame["event"], "data": data}
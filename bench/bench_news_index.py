@@ -0,0 +1,108 @@
+"""基准：按币取最新新闻，源表 RLIKE 全表扫描 vs news_coin_index 索引 vs 进程内缓存
+
+    python bench/bench_news_index.py [--rows 1000000] [--coins 400] [--repeat 20]
+
+SQLite 文件库（临时目录）代替 MySQL：合成 --rows 行 ods_news_feed_processed_di（近 30 天，每条 1~3 个币，
+BTC / ETH 出现频率远高于长尾币，另有 ETHFI 这种前缀相同的币），用 tests/sqlite_mysql 适配层跑真实的
+NewsIndex.sync（首次回填，批量 NEWS_INDEX_SYNC_BATCH）和 NewsIndex.get_news。
+回退路径就是线上的参数化 RLIKE 查询；SQLite 的 REGEXP 由 Python 回调实现，比 MySQL 慢，
+所以另给一列原生 LIKE 子串扫描作参照 —— 两者都是全表扫描，差距来自匹配函数而不是执行计划。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+
+from app.services import news_index as news_index_module  # noqa: E402
+from app.services.news_index import SOURCE_TABLE, NewsIndex  # noqa: E402
+from tests import sqlite_mysql  # noqa: E402
+
+SCHEMA = f"""
+CREATE TABLE {SOURCE_TABLE} (
+    id INTEGER PRIMARY KEY,
+    title TEXT, topic TEXT, create_time DATETIME, coins TEXT
+);
+CREATE INDEX idx_src_time ON {SOURCE_TABLE} (create_time);
+"""
+
+
+def populate(conn, rows: int, coins: int, now: datetime):
+    rng = random.Random(47)
+    universe = ["BTC", "ETH", "SOL", "ETHFI"] + [f"C{i}" for i in range(coins)]
+    weights = [60, 40, 20, 2] + [1] * coins
+    span = timedelta(days=30).total_seconds()
+
+    def gen():
+        for i in range(rows):
+            ct = now - timedelta(seconds=span * (rows - i) / rows)
+            picked = set(rng.choices(universe, weights, k=rng.randint(1, 3)))
+            yield (f"news {i} " + "x" * 80, "market", ct.replace(microsecond=0), ",".join(picked))
+
+    conn.raw.executemany(f"INSERT INTO {SOURCE_TABLE} (title, topic, create_time, coins) VALUES (?,?,?,?)", gen())
+    conn.raw.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--coins", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    settings = news_index_module.settings
+    settings.news_index_backfill_days = 31
+    settings.news_index_sync_batch = 5000
+    now = datetime.now().replace(microsecond=0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite_mysql.connect(SCHEMA, now, path=str(Path(tmp) / "news.db"))
+        t0 = time.perf_counter()
+        populate(conn, args.rows, args.coins, now)
+        print(f"源表 {args.rows} 行，生成 {time.perf_counter() - t0:.1f}s")
+
+        index = NewsIndex()
+        index._get_conn = lambda: conn
+        t0 = time.perf_counter()
+        written = index.sync()
+        print(f"NewsIndex.sync 首次回填 → {written} 索引行，{time.perf_counter() - t0:.1f}s")
+
+        print(f"{'币种':<8}{'RLIKE 回退':>14}{'LIKE 参照':>14}{'索引':>12}{'缓存命中':>12}")
+        for coin in ("ETH", "C7", "NOPE"):
+            settings.news_cache_ttl = 0
+            settings.news_index_enabled = False
+            index.invalidate()
+            rlike = _timed(lambda: index.get_news(coin), 3)
+            cursor = conn.cursor()
+            like = _timed(lambda: cursor.execute(
+                f"SELECT title, create_time, topic FROM {SOURCE_TABLE} "
+                "WHERE coins LIKE %s ORDER BY create_time DESC LIMIT %s", (f"%{coin}%", 100)
+            ) or cursor.fetchall(), 3)
+
+            settings.news_index_enabled = True
+            indexed = _timed(lambda: index.get_news(coin), args.repeat)
+            settings.news_cache_ttl = 60
+            index.get_news(coin)
+            cached = _timed(lambda: index.get_news(coin), args.repeat)
+            print(f"{coin:<8}{rlike * 1000:>12.1f}ms{like * 1000:>12.1f}ms{indexed * 1000:>10.2f}ms"
+                  f"{cached * 1e6:>10.1f}us")
+        conn.raw.close()
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+if __name__ == "__main__":
+    main()
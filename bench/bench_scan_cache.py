@@ -0,0 +1,149 @@
+"""基准：扫描结果落库，旧 scan_cache（整批 JSON）vs scan_batch + scan_coin_card（按币 zlib，只写变化的卡）
+
+    python bench/bench_scan_cache.py [--coins 320] [--changed 0.1] [--scans 5] [--repeat 20]
+
+合成 N 张信号卡，用 tests/sqlite_mysql 的 SQLite 适配层跑真实的 save_scan_batch / get_latest_scan，
+不连 MySQL。每轮扫描随机改动 --changed 比例币的价格，统计：
+  - 每批写入字节数（执行 SQL 时实际带出的参数字节）：旧格式整批 results_json + displays_json
+  - 读取解析耗时：旧格式两次 json.loads；新格式冷读（别的 worker 写的批次，解压 N 张卡）与进程内副本命中
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+
+from app.signals import settlement  # noqa: E402
+from app.signals.models import (  # noqa: E402
+    MathDerivationSummary, SignalCard, SignalDirection, SignalGrade, SignalSource, StrategyMeta,
+)
+from tests import sqlite_mysql  # noqa: E402
+
+
+def synthetic_card(i: int, rng: random.Random) -> SignalCard:
+    price = rng.uniform(0.01, 50000)
+    return SignalCard(
+        coin=f"C{i:03d}", direction=SignalDirection.LONG, grade=SignalGrade.A, current_price=price,
+        entry_low=price * 0.98, entry_high=price * 1.01, stop_loss=price * 0.95, take_profit=price * 1.1,
+        risk_reward_ratio=2.1, confidence=rng.uniform(50, 90),
+        sources=[SignalSource(name=n, score=rng.uniform(0, 100), direction=SignalDirection.LONG, weight=0.3,
+                              detail="大单净流入 " * 8)
+                 for n in ("bigorder_anomaly", "quantitative", "technical")],
+        math=MathDerivationSummary(hurst=0.61, monte_carlo_bull_prob=0.6, market_regime="trend",
+                                   key_findings=["发现" * 10] * 4),
+        strategy=StrategyMeta(strategy_version=3, regime="trend", global_win_rate=0.55),
+        win_rate=0.6, sample_count=40, avg_profit_pct=2.3,
+    )
+
+
+class _CountingCursor:
+    """统计写语句带出的参数字节（近似写入量）"""
+
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def execute(self, sql, params=()):
+        self._count(sql, [params or ()])
+        return self._cursor.execute(sql, params)
+
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        self._count(sql, rows)
+        return self._cursor.executemany(sql, rows)
+
+    def _count(self, sql, rows):
+        if sql.lstrip().upper().startswith(("INSERT", "UPDATE")):
+            self._counter[0] += sum(len(v) if isinstance(v, bytes) else len(str(v).encode())
+                                    for row in rows for v in row)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def legacy_row(cards):
+    results = json.dumps([c.model_dump() for c in cards], ensure_ascii=False, default=str)
+    displays = json.dumps([settlement._display_card(c) for c in cards], ensure_ascii=False, default=str)
+    return results, displays
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--coins", type=int, default=320)
+    parser.add_argument("--changed", type=float, default=0.1)
+    parser.add_argument("--scans", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(45)
+    cards = [synthetic_card(i, rng) for i in range(args.coins)]
+    conn = sqlite_mysql.connect("", datetime.now())
+    written = [0]
+    settlement._get_conn = lambda: SimpleNamespace(
+        cursor=lambda *a: _CountingCursor(conn.cursor(*a), written), commit=conn.commit, close=lambda: None)
+    settlement._SCAN_CACHE_GZ = Path(tempfile.gettempdir()) / f"bench_scan_cache.{os.getpid()}.json.gz"
+
+    results, displays = legacy_row(cards)
+    legacy_bytes = len(results.encode()) + len(displays.encode())
+    print(f"coins: {args.coins}  changed/scan: {args.changed:.0%}")
+    print(f"legacy scan_cache       {legacy_bytes / 1024:8.1f} KiB/批（每批整批重写）")
+
+    per_scan = []
+    save_ms = []
+    try:
+        for k in range(args.scans + 1):
+            if k:
+                for card in rng.sample(cards, int(args.coins * args.changed)):
+                    card.current_price *= 1 + rng.uniform(-0.02, 0.02)
+            written[0] = 0
+            t0 = time.perf_counter()
+            settlement.save_scan_batch([SimpleNamespace(signal_card=c) for c in cards], 1.0)
+            save_ms.append((time.perf_counter() - t0) * 1000)
+            per_scan.append(written[0])
+    finally:
+        settlement._SCAN_CACHE_GZ.unlink(missing_ok=True)
+    steady = sum(per_scan[1:]) / max(1, len(per_scan) - 1)
+    print(f"scan_coin_card 首批      {per_scan[0] / 1024:8.1f} KiB")
+    print(f"scan_coin_card 稳态      {steady / 1024:8.1f} KiB/批  (x{legacy_bytes / steady:.1f} 少于旧格式)")
+    print(f"save_scan_batch          {sum(save_ms[1:]) / max(1, len(save_ms) - 1):8.1f} ms/批（含卡片编码）")
+
+    t_legacy = _timed(lambda: (settlement._safe_json_loads(results), settlement._safe_json_loads(displays)),
+                      args.repeat)
+    print(f"parse legacy            {t_legacy * 1000:8.2f} ms")
+
+    def cold():
+        settlement._scan_decoded.clear()
+        with conn.cursor(dict) as cursor:
+            return settlement._read_scan_batch(cursor, 1800)
+
+    assert len(cold()["signals"]) == args.coins
+    t_cold = _timed(cold, args.repeat)
+    print(f"parse compact cold      {t_cold * 1000:8.2f} ms  (解压 {args.coins} 张卡)")
+
+    def hit():
+        with conn.cursor(dict) as cursor:
+            return settlement._read_scan_batch(cursor, 1800)
+
+    t_hit = _timed(hit, args.repeat)
+    print(f"parse compact hit       {t_hit * 1000:8.2f} ms  (进程内副本，只查批次 id)")
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""基准：全市场扫描的纯计算阶段（_scan_compute），当前线程逐币 vs spawn 进程池
+
+    python bench/bench_scan_compute.py [--coins 300] [--workers 4] [--repeat 3]
+
+合成 300 个币的日线 / 小时线（I/O 阶段的产物），不访问任何外部服务。
+进程池的启动（spawn + 子进程 import）单独计时，不计入稳态吞吐；quant_raw 置空（六因子需要远程数据）。
+--workers 默认取 os.cpu_count()；单核机器上进程池只会带来 IPC 开销，加速比要在多核上看。
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import pickle
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+
+from app.signals.alpha_scanner import _ScanJob, _scan_compute  # noqa: E402
+
+
+def _bars(rng: random.Random, n: int, price: float, vol: float) -> dict:
+    opens, highs, lows, closes, volumes = [], [], [], [], []
+    for _ in range(n):
+        o = price
+        price *= 1 + rng.gauss(0, vol)
+        opens.append(o)
+        closes.append(price)
+        highs.append(max(o, price) * (1 + abs(rng.gauss(0, vol / 3))))
+        lows.append(min(o, price) * (1 - abs(rng.gauss(0, vol / 3))))
+        volumes.append(rng.uniform(1e6, 5e7))
+    return dict(opens=opens, highs=highs, lows=lows, closes=closes, volumes=volumes)
+
+
+def synthetic_jobs(coins: int, seed: int = 41):
+    rng = random.Random(seed)
+    jobs = []
+    for i in range(coins):
+        price = rng.uniform(0.01, 50000)
+        daily = _bars(rng, 60, price, 0.04)
+        hourly = _bars(rng, 72, daily["closes"][-1], 0.01)
+        raw_data = {
+            "header": {"currentPrice": hourly["closes"][-1]},
+            "current_price": hourly["closes"][-1],
+            "entry_ohlcv": hourly,
+            "kline_periods": {"signal": "daily_30d", "entry": "hourly_72h"},
+        }
+        jobs.append(_ScanJob(
+            coin=f"C{i:03d}", t0=time.time(), ohlcv=daily, raw_data=raw_data,
+            core_inputs={"quant_raw": None, "alpha_breadth": "neutral"},
+        ))
+    return jobs
+
+
+def run_inline(jobs):
+    return [_scan_compute(job) for job in jobs]
+
+
+async def run_pool(pool, jobs):
+    # 与 _scan_staged 相同：每个币单独 run_in_executor 提交
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(loop.run_in_executor(pool, _scan_compute, job) for job in jobs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--coins", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    jobs = synthetic_jobs(args.coins)
+    job_bytes = sum(len(pickle.dumps(j)) for j in jobs) / len(jobs)
+    print(f"CPU: {os.cpu_count()}  coins: {args.coins}  workers: {args.workers}  "
+          f"job pickle: {job_bytes / 1024:.1f} KB/coin")
+
+    run_inline(jobs[:5])   # 预热 import / 缓存
+    inline = min(_timed(lambda: run_inline(jobs)) for _ in range(args.repeat))
+    print(f"inline            {inline * 1000:8.1f} ms  ({inline / len(jobs) * 1000:.2f} ms/coin)")
+
+    t0 = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+    asyncio.run(run_pool(pool, jobs[: args.workers]))
+    startup = time.perf_counter() - t0
+    print(f"pool startup      {startup * 1000:8.1f} ms  (spawn {args.workers} 个子进程 + 首次 import)")
+    try:
+        pooled = min(_timed(lambda: asyncio.run(run_pool(pool, jobs))) for _ in range(args.repeat))
+    finally:
+        pool.shutdown()
+    print(f"process pool      {pooled * 1000:8.1f} ms  ({pooled / len(jobs) * 1000:.2f} ms/coin)  "
+          f"speedup x{inline / pooled:.2f}")
+
+
+def _timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    main()
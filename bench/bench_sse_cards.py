@@ -0,0 +1,88 @@
+"""基准：信号卡推给多个 SSE 连接，逐连接构建 + json.dumps vs 按版本缓存的预编码事件
+
+    python bench/bench_sse_cards.py [--cards 300] [--clients 50]
+
+与 /stream 一致：每个连接各自出卡（内容相同、对象不同），逐张编码事件再渲染成 SSE 帧。
+  - stream：fusion._build_card_event + json.dumps（改动前）vs fusion.encode_card_event（按 card_version 缓存）
+  - frame：json.dumps 整帧（改动前）vs sse_protocol.render（payload 为预编码 RawJSON，只编码帧头）
+两条路径的输出逐帧 json.loads 比对一致后才计时结果。
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+
+from app.signals import fusion  # noqa: E402
+from app.signals.models import (  # noqa: E402
+    MathDerivationSummary, SignalCard, SignalDirection, SignalGrade, SignalSource, StrategyMeta,
+)
+from app.utils import sse_protocol as sp  # noqa: E402
+
+BACKTEST = {"win_rate": 0.6, "sample_count": 40, "sharpe_ratio": 1.2}
+
+
+def synthetic_card(i: int) -> SignalCard:
+    rng = random.Random(i)
+    price = rng.uniform(0.01, 50000)
+    return SignalCard(
+        coin=f"C{i:03d}", direction=SignalDirection.LONG, grade=SignalGrade.A, current_price=price,
+        entry_low=price * 0.98, entry_high=price * 1.01, stop_loss=price * 0.95, take_profit=price * 1.1,
+        risk_reward_ratio=2.1, confidence=round(rng.uniform(50, 90), 1),
+        sources=[SignalSource(name=n, score=rng.uniform(0, 100), direction=SignalDirection.LONG, weight=0.3,
+                              detail="大单净流入 " * 8)
+                 for n in ("bigorder_anomaly", "quantitative", "technical")],
+        math=MathDerivationSummary(hurst=0.61, monte_carlo_bull_prob=0.6, market_regime="trend",
+                                   key_findings=["发现" * 10] * 4),
+        strategy=StrategyMeta(strategy_version=3, regime="trend", global_win_rate=0.55),
+        win_rate=0.6, sample_count=40, avg_profit_pct=2.3,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=300)
+    parser.add_argument("--clients", type=int, default=50)
+    args = parser.parse_args()
+    n = args.cards * args.clients
+    print(f"cards: {args.cards}  clients: {args.clients}  orjson: {sp._orjson is not None}")
+
+    per_client = [[synthetic_card(i) for i in range(args.cards)] for _ in range(args.clients)]
+    gc.collect()
+
+    t0 = time.perf_counter()
+    old = [json.dumps(fusion._build_card_event(c, BACKTEST, "pro"), ensure_ascii=False)
+           for cards in per_client for c in cards]
+    t_old = time.perf_counter() - t0
+    fusion._card_encode_cache.clear()
+    t0 = time.perf_counter()
+    new = [fusion.encode_card_event(c, BACKTEST, "pro") for cards in per_client for c in cards]
+    t_new = time.perf_counter() - t0
+    assert all(json.loads(a) == json.loads(b) for a, b in zip(old, new))
+    print(f"stream  build+dumps {t_old * 1000:8.1f} ms  cached {t_new * 1000:8.1f} ms  "
+          f"x{t_old / t_new:.1f}  ({t_new / n * 1e6:.1f} us/卡/连接)")
+
+    events = [fusion._build_card_event(c, BACKTEST, "pro") for c in per_client[0]]
+    t0 = time.perf_counter()
+    old = [json.dumps(sp.sse_signal_card(f"r{k}", e), ensure_ascii=False, default=str)
+           for k in range(args.clients) for e in events]
+    t_old = time.perf_counter() - t0
+    encoded = [sp.encode_payload(e) for e in events]
+    t0 = time.perf_counter()
+    new = [sp.render(sp.sse_signal_card(f"r{k}", e))["data"] for k in range(args.clients) for e in encoded]
+    t_new = time.perf_counter() - t0
+    assert all(json.loads(a) == json.loads(b) for a, b in zip(old, new))
+    print(f"frame   json.dumps  {t_old * 1000:8.1f} ms  render  {t_new * 1000:8.1f} ms  x{t_old / t_new:.1f}")
+
+    size = sum(len(s.encode()) for s in new) / len(new)
+    print(f"平均帧 {size / 1024:.1f} KiB，{args.clients} 个连接共 {size * n / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""基准：5 年日线上的趋势动量规则回测，改写前（_last_valid 回溯）vs 现实现，以及参数网格
+
+    python bench/bench_trend_rule.py [--days 1826] [--repeat 3]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.skills.analysis_skills.quantitative import (  # noqa: E402
+    backtest_trend_momentum_rule, sweep_trend_momentum_rule,
+)
+from tests.legacy.trend_rule import backtest_trend_momentum_rule_legacy  # noqa: E402
+
+GRID = {
+    "fast": [5, 9, 12], "slow": [21, 26, 50], "rsi_buy": [45, 50, 55],
+    "horizon": [3, 5, 10], "stop_atr_mult": [None, 2.0],
+}
+
+
+def daily_bars(days: int, seed: int = 42):
+    rng = random.Random(seed)
+    price, closes = 30000.0, []
+    for _ in range(days):
+        price *= 1 + rng.gauss(0.0005, 0.035)
+        closes.append(price)
+    highs = [c * (1 + abs(rng.gauss(0, 0.015))) for c in closes]
+    lows = [c * (1 - abs(rng.gauss(0, 0.015))) for c in closes]
+    return closes, highs, lows
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=5 * 365 + 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    closes, highs, lows = daily_bars(args.days)
+    legacy = backtest_trend_momentum_rule_legacy(closes)
+    current = backtest_trend_momentum_rule(closes)
+    assert legacy == current, (legacy, current)
+
+    t_legacy = best_of(lambda: backtest_trend_momentum_rule_legacy(closes), args.repeat)
+    t_current = best_of(lambda: backtest_trend_momentum_rule(closes), args.repeat)
+    combos = [c for c in sweep_trend_momentum_rule(closes, GRID, highs=highs, lows=lows)]
+    t_sweep = best_of(lambda: sweep_trend_momentum_rule(closes, GRID, highs=highs, lows=lows), args.repeat)
+
+    print(f"bars={len(closes)} trades={current['trades']}")
+    print(f"single run   legacy {t_legacy * 1000:9.1f} ms   current {t_current * 1000:7.2f} ms"
+          f"   ({t_legacy / t_current:.0f}x)")
+    print(f"sweep {len(combos)} combos (shared indicators): {t_sweep * 1000:.1f} ms"
+          f"  ≈ {t_sweep / len(combos) * 1000:.2f} ms/combo")
+
+
+if __name__ == "__main__":
+    main()
@@ -62,6 +62,13 @@ class Settings(BaseSettings):
 
     # ── Agent LLM 配置 ──
     max_news_items: int = 100
+    news_index_enabled: bool = True  # 新闻按币种索引表（news_coin_index），关闭则直接查源表
+    news_cache_ttl: int = 60  # 按币新闻缓存（秒）
+    news_index_sync_interval: int = 120  # 源表 → 索引表增量同步间隔（秒）
+    news_index_sync_batch: int = 5000  # 每批从源表拉取的新闻条数
+    news_index_sync_overlap: int = 600  # 每轮从索引水位往前重扫的秒数（补晚到的新闻）
+    news_index_backfill_days: int = 7  # 索引表为空时首次回填天数
+    news_index_retention_days: int = 30  # 索引行保留天数
     kline_days_limit: int = 30
     llm_temperature: float = 0.5
     llm_max_tokens: int = 1200
@@ -70,6 +77,16 @@ class Settings(BaseSettings):
     analysis_llm_temperature: float = 0.5
     analysis_llm_max_tokens: int = 2000
     tool_call_max_retries: int = 1
+    coin_snapshot_ttl: float = 30.0  # 问答 Skill 共用的币种快照有效期（秒）
+    coin_snapshot_max_coins: int = 256  # 同时保留快照的币种数上限（LRU）
+    quant_store_backend: str = "memory"  # 扫描六因子结果存储：memory / redis（多 worker 共享）
+    quant_store_ttl: int = 2100  # 聊天复用扫描结果的最长时间（秒），略大于 signal_scan_interval
+    kline_store_enabled: bool = False  # K线本地存储（SQLite），只增量拉取最新几根
+    kline_store_path: str = ""  # 存储文件路径，空则为系统临时目录 mozi_klines.sqlite3
+    kline_tail_param: str = ""  # 上游按条数取尾部的 query 参数名；空则每次整段拉取再合并
+    kline_tail_bars: int = 3  # 增量拉取的根数（覆盖未收盘的最后一根 + 余量）
+    kline_store_full_refresh: int = 21600  # 整段重拉间隔（秒），兜底上游修订历史K线
+    kline_timeframe_timeout: float = 8.0  # 多周期K线并发拉取时每个周期的最长等待（秒），超时该周期为空
 
     # ── Redis（bigorder；Railway 变量名 REDIS_*） ──
     redis_enabled: bool = Field(default=False, validation_alias="REDIS_ENABLED")
@@ -78,6 +95,21 @@ class Settings(BaseSettings):
     redis_db: int = Field(default=0, validation_alias="REDIS_DB")
     redis_password: str = Field(default="", validation_alias="REDIS_PASSWORD")
 
+    # ── 会话存储（memory=进程内存；redis=多 worker 共享，复用上面的 REDIS_* 连接） ──
+    session_backend: str = "memory"
+    session_ttl: int = 1800  # 会话过期时间（秒）
+    session_max_questions: int = 5  # 每个会话保留的最近问题数
+    session_lru_size: int = 1024  # redis 后端前置 LRU 条目数
+    session_lru_ttl: float = 5.0  # redis 后端前置 LRU 缓存时长（秒）
+
+    # ── 会话历史持久化（session_history 表，write-behind） ──
+    session_history_flush_interval: float = 2.0  # 批量刷写间隔（秒）
+    session_history_batch_size: int = 200  # 单条多行 INSERT 的最大行数
+    session_history_queue_max: int = 5000  # 待写队列上限，超出丢弃最旧
+    session_history_sweep_interval: int = 300  # 保留策略清理间隔（秒）
+    session_history_retention_hours: int = 1  # 只保留最近 N 小时
+    session_history_max_rounds: int = 50  # 每个会话最多保留轮数
+
     # ── Bigorder MySQL（独立数据库） ──
     bigorder_mysql_host: str = ""
     bigorder_mysql_port: int = 3306
@@ -87,16 +119,47 @@ class Settings(BaseSettings):
 
     # ── Bigorder LLM（独立模型） ──
     bigorder_deepseek_model: str = "deepseek-v4-flash"
+    bigorder_llm_concurrency: int = 4  # 异动解读最大并发 LLM 请求数
+    bigorder_llm_cache_ttl: int = 600  # 相同取整得分的解读复用时长（秒）
+    bigorder_llm_batch_size: int = 0  # >1 时多个信号合并进一个 prompt；0/1 为逐条
+    bigorder_llm_deadline: float = 25.0  # 一轮批量解读（含逐条补齐）总时限（秒），应小于 scan_interval
 
     # ── Bigorder 引擎参数 ──
     scan_interval: int = 30  # BigOrder 大单侦测扫描间隔（秒）
     signal_scan_interval: int = 1800  # 信号卡全市场扫描间隔（秒），30分钟
+    scan_process_workers: int = 0  # 全市场扫描纯计算阶段的进程数（绕开 GIL）；0=沿用线程池
+    scan_incremental_enabled: bool = False  # 全市场扫描增量预筛：输入没变的币沿用上一轮结果
+    scan_incremental_shadow: bool = False  # 影子模式：照常全量扫描，只统计跳过比例并比对本会跳过的币
+    scan_delta_price_pct: float = 1.0  # 价格相对上次完整扫描变化 ≥ 该百分比则重扫
+    scan_delta_volume_pct: float = 15.0  # 24h 成交量变化 ≥ 该百分比则重扫
+    scan_delta_bigorder_ticks: int = 10  # 上次完整扫描以来新增大单 ≥ 该笔数则重扫
+    scan_delta_max_age: int = 7200  # 沿用结果最长时间（秒），超过强制重扫
+
+    # ── 命名线程池（app.utils.executors；批处理与交互请求隔离） ──
+    executor_interactive_workers: int = 32  # 事件循环默认池：聊天 / 端点的 to_thread
+    executor_bigorder_workers: int = 4  # 大单侦测 30s 扫描
+    executor_settlement_workers: int = 2  # 信号卡 5min 结算
+    executor_market_scan_workers: int = 12  # 全市场扫描（≥ 扫描并发 10）
+    executor_maintenance_workers: int = 4  # 护栏重算 / 日报 / 复盘 / 漂移 / 会话历史刷写
+    executor_kline_workers: int = 8  # 出卡多周期K线并发拉取（多个请求同时出卡时的总并发上限）
+    scheduler_state_path: str = ""  # 后台任务上次运行时间持久化文件，空则为系统临时目录 mozi_scheduler_state.json
+    leader_lock_backend: str = "file"  # 后台任务选主：file（同机多 worker，fcntl）/ redis（跨机器，复用 REDIS_*）
+    leader_lock_ttl: int = 30  # redis 选主租约（秒），leader 退出后最迟该时长后被接管
+    leader_check_interval: float = 5.0  # 抢锁 / 续期检查间隔（秒）
     history_window_count: int = 288
     score_threshold_strong: int = 70
 
     # ── 远程数据代理 ──
     data_proxy_url: str = Field(default="http://43.134.86.135:8001", validation_alias="DATA_PROXY_URL")
     data_proxy_key: str = Field(default="signal_proxy_2026", validation_alias="DATA_PROXY_KEY")
+    data_proxy_gzip: bool = False  # 代理请求体 ≥1KB 时 gzip（需代理端已部署 GzipRequestMiddleware，先升级代理再打开）
+    data_proxy_pool_size: int = 8  # 代理 HTTP keep-alive 连接池大小
+    data_proxy_connect_timeout: float = 5.0  # 代理建连超时（秒）
+    data_proxy_read_timeout: float = 60.0  # 代理读超时（秒）
+    data_proxy_retries: int = 2  # 建连失败 / GET 遇 502-504 的重试次数（指数退避；POST 只重试建连）
+    data_proxy_breaker_failures: int = 5  # 连续失败该次数后熔断，期间代理调用直接走兜底
+    data_proxy_breaker_reset: float = 30.0  # 熔断持续时间（秒），之后放行一个试探请求
+    data_proxy_tunnel_check_ttl: float = 10.0  # SSH 隧道健康检查结果缓存（秒）
     score_threshold_medium: int = 50
     flow_window_seconds: int = 300
     price_window_seconds: int = 900
@@ -4,12 +4,23 @@
 启动: DATA_PROXY_KEY=xxx python3 -c "import uvicorn; from data_proxy import app; uvicorn.run(app, host='0.0.0.0', port=8001)"
 
 或: uvicorn data_proxy:app --host 0.0.0.0 --port 8001
+
+- MySQL 连接池：DATA_PROXY_POOL_SIZE（默认 8）条空闲连接复用
+- 响应 ≥1KB 按 Accept-Encoding gzip；请求体支持 Content-Encoding: gzip（先验 key，
+  边收边解压，解压后上限 DATA_PROXY_MAX_BODY 字节，默认 32MB，超限 413，非法 gzip 400）
+- 批量接口：/api/save_signal_cards、/api/update_card_status_bulk（一个事务 executemany）
 """
 import json
 import os
-from typing import Optional
+import queue
+import threading
+import zlib
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
 from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
 app = FastAPI(title="Signal Data Proxy", version="1.0.0")
@@ -34,7 +45,7 @@ def _check_key(key: str):
     return True
 
 
-def _get_conn():
+def _connect():
     import pymysql
     return pymysql.connect(
         host=_MYSQL["host"],
@@ -49,6 +60,157 @@ def _get_conn():
     )
 
 
+# ── 连接池 ──────────────────────────────────────────────────────────────────
+# 每个请求原来都新建一条 MySQL 连接；这里复用空闲连接。端点代码不变：
+# _get_conn() 拿到的连接 close() 时回滚未提交事务后归还池子，出错的连接直接丢弃。
+
+_POOL_SIZE = int(os.environ.get("DATA_PROXY_POOL_SIZE", "8"))
+_pool: "queue.LifoQueue" = queue.LifoQueue(maxsize=_POOL_SIZE)
+
+
+class _PooledConnection:
+    """pymysql 连接包装：close() 归还连接池而不是断开"""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._raw.rollback()      # 清掉未提交事务，下个请求拿到干净连接
+            _pool.put_nowait(self._raw)
+        except Exception:
+            try:
+                self._raw.close()
+            except Exception:
+                pass
+
+
+def _get_conn():
+    while True:
+        try:
+            raw = _pool.get_nowait()
+        except queue.Empty:
+            return _PooledConnection(_connect())
+        try:
+            raw.ping(reconnect=False)
+            return _PooledConnection(raw)
+        except Exception:
+            try:
+                raw.close()
+            except Exception:
+                pass
+
+
+# ── gzip 请求体 ─────────────────────────────────────────────────────────────
+# 响应由 GZipMiddleware 按 Accept-Encoding 压缩；请求体带 Content-Encoding: gzip 时在这里解压。
+# 先校验 key（query 参数）再读请求体；边收边解压，解压后超过 DATA_PROXY_MAX_BODY 立即 413，
+# 不是合法 gzip（含截断）返回 400
+
+_MAX_BODY = int(os.environ.get("DATA_PROXY_MAX_BODY", str(32 * 1024 * 1024)))
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class _Gunzip:
+    """增量 gzip 解压（支持多段拼接），累计输出超过 limit 抛 _BodyTooLarge"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.size = 0
+        self.parts = []
+        self._d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def feed(self, data: bytes):
+        while data:
+            # 每次最多多解出 1 字节：刚好超限即可判定，不会一次性展开压缩炸弹
+            self._add(self._d.decompress(data, self.limit - self.size + 1))
+            if self._d.eof:
+                data = self._d.unused_data
+                if data:
+                    self._d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                data = self._d.unconsumed_tail
+
+    def finish(self) -> bytes:
+        self._add(self._d.flush())
+        if not self._d.eof:
+            raise zlib.error("truncated gzip stream")
+        return b"".join(self.parts)
+
+    def _add(self, out: bytes):
+        self.size += len(out)
+        if self.size > self.limit:
+            raise _BodyTooLarge()
+        self.parts.append(out)
+
+
+class GzipRequestMiddleware:
+    def __init__(self, app, max_body: int = None):
+        self.app = app
+        self.max_body = max_body or _MAX_BODY
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = [(k, v) for k, v in scope["headers"]]
+        if not any(k == b"content-encoding" and v.strip().lower() == b"gzip" for k, v in headers):
+            return await self.app(scope, receive, send)
+
+        # 与各接口的 _check_key 一致的鉴权失败响应，未鉴权的请求体不读不解压
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        if not _check_key((query.get("key") or [None])[0]):
+            return await JSONResponse({"ok": False, "error": "auth failed"})(scope, receive, send)
+
+        gunzip = _Gunzip(self.max_body)
+        received = 0
+        try:
+            more = True
+            while more:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                chunk = message.get("body", b"")
+                received += len(chunk)
+                if received > self.max_body:
+                    raise _BodyTooLarge()
+                gunzip.feed(chunk)
+                more = message.get("more_body", False)
+            body = gunzip.finish()
+        except _BodyTooLarge:
+            return await JSONResponse({"ok": False, "error": f"request body exceeds {self.max_body} bytes"},
+                                      status_code=413)(scope, receive, send)
+        except zlib.error as e:
+            return await JSONResponse({"ok": False, "error": f"malformed gzip body: {e}"},
+                                      status_code=400)(scope, receive, send)
+
+        headers = [(k, v) for k, v in headers if k not in (b"content-encoding", b"content-length")]
+        headers.append((b"content-length", str(len(body)).encode()))
+        scope = dict(scope, headers=headers)
+        sent = False
+
+        async def _receive():
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        return await self.app(scope, _receive, send)
+
+
+app.add_middleware(GzipRequestMiddleware)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+
 # ── 信号卡写入 ──────────────────────────────────────────────────────────────
 
 class SignalCardInput(BaseModel):
@@ -106,6 +268,51 @@ def save_signal_card(card: SignalCardInput, key: str = Query(...)):
             conn.close()
 
 
+class SignalCardsInput(BaseModel):
+    cards: List[SignalCardInput]
+
+
+@app.post("/api/save_signal_cards")
+def save_signal_cards(data: SignalCardsInput, key: str = Query(...)):
+    """批量写信号卡：一次 executemany、一个事务（C 级跳过）"""
+    if not _check_key(key):
+        return {"ok": False, "error": "auth failed"}
+    rows = [
+        (c.coin, c.direction, c.grade, c.entry_low, c.entry_high,
+         c.stop_loss, c.take_profit, c.current_price, c.invalidation_price,
+         c.confidence, c.risk_reward_ratio, c.position_pct,
+         c.sources_json, c.math_json, c.strategy_version, c.regime,
+         c.adaptive_weights_json, "pending")
+        for c in data.cards if c.grade != "C"
+    ]
+    if not rows:
+        return {"ok": True, "inserted": 0}
+    conn = None
+    try:
+        conn = _get_conn()
+        cursor = conn.cursor()
+        cursor.executemany(
+            """
+            INSERT INTO signal_card_history
+            (coin, direction, grade, entry_low, entry_high, stop_loss, take_profit,
+             current_price, invalidation_price, confidence, risk_reward_ratio, position_pct,
+             sources_json, math_json, strategy_version, regime, adaptive_weights_json, status)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+            """,
+            rows,
+        )
+        conn.commit()
+        cursor.close()
+        return {"ok": True, "inserted": len(rows)}
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        return {"ok": False, "error": str(e)}
+    finally:
+        if conn:
+            conn.close()
+
+
 # ── 查询 pending 卡（供结算）───────────────────────────────────────────────
 
 @app.get("/api/pending_cards")
@@ -144,6 +351,95 @@ def get_pending_cards(key: str = Query(...), limit: int = Query(100)):
             conn.close()
 
 
+# ── 胜率日聚合（与 app/signals/winrate_agg.py 同表同口径，本文件独立部署故内联）──
+
+_WINRATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS signal_winrate_daily (
+    day DATE NOT NULL,
+    coin VARCHAR(20) NOT NULL,
+    grade VARCHAR(5) NOT NULL,
+    direction VARCHAR(10) NOT NULL,
+    n_total INT NOT NULL DEFAULT 0,
+    n_hit_tp INT NOT NULL DEFAULT 0,
+    n_hit_sl INT NOT NULL DEFAULT 0,
+    n_expired INT NOT NULL DEFAULT 0,
+    n_expired_win INT NOT NULL DEFAULT 0,
+    pnl_sum DECIMAL(16,4) NOT NULL DEFAULT 0,
+    pnl_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (day, coin, grade, direction),
+    INDEX idx_coin_day (coin, day)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+_WINRATE_ROLLUP_SQL = """
+INSERT INTO signal_winrate_daily
+    (day, coin, grade, direction, n_total, n_hit_tp, n_hit_sl, n_expired, n_expired_win, pnl_sum, pnl_count)
+SELECT DATE(created_at), UPPER(coin), grade, direction,
+       COUNT(*), SUM(status = 'hit_tp'), SUM(status = 'hit_sl'), SUM(status = 'expired'),
+       SUM(COALESCE(status = 'expired' AND pnl_pct > 0, 0)), COALESCE(SUM(pnl_pct), 0), COUNT(pnl_pct)
+FROM signal_card_history
+WHERE status IN ('hit_tp', 'hit_sl', 'expired') AND {where}
+GROUP BY DATE(created_at), UPPER(coin), grade, direction
+ON DUPLICATE KEY UPDATE
+    n_total = n_total + VALUES(n_total),
+    n_hit_tp = n_hit_tp + VALUES(n_hit_tp),
+    n_hit_sl = n_hit_sl + VALUES(n_hit_sl),
+    n_expired = n_expired + VALUES(n_expired),
+    n_expired_win = n_expired_win + VALUES(n_expired_win),
+    pnl_sum = pnl_sum + VALUES(pnl_sum),
+    pnl_count = pnl_count + VALUES(pnl_count)
+"""
+
+_winrate_table_ready = False
+_winrate_ready_lock = threading.Lock()
+# 与 app.signals.winrate_agg.INIT_LOCK_NAME 相同：主服务与 data_proxy 共用一把命名锁
+_WINRATE_INIT_LOCK = "signal_winrate_daily_init"
+
+
+def _scalar(row):
+    if row is None:
+        return None
+    if isinstance(row, dict):
+        return next(iter(row.values()), None)
+    return row[0]
+
+
+def _ensure_winrate_table(conn):
+    """聚合表不存在时建表并全量回填（DDL 隐式提交，须在业务事务之外调用）
+
+    进程内加锁、进程间 GET_LOCK；回填是 DELETE + INSERT 同一事务，并发首次请求不会重复累加。
+    """
+    global _winrate_table_ready
+    if _winrate_table_ready:
+        return
+    with _winrate_ready_lock:
+        if _winrate_table_ready:
+            return
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (_WINRATE_INIT_LOCK, 30))
+            if _scalar(cursor.fetchone()) != 1:
+                raise RuntimeError("signal_winrate_daily 初始化锁等待超时")
+            try:
+                cursor.execute("SHOW TABLES LIKE 'signal_winrate_daily'")
+                if cursor.fetchone() is None:
+                    cursor.execute(_WINRATE_TABLE_SQL)
+                    try:
+                        cursor.execute("DELETE FROM signal_winrate_daily")
+                        cursor.execute(_WINRATE_ROLLUP_SQL.format(where="1 = 1"))
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (_WINRATE_INIT_LOCK,))
+                cursor.fetchone()
+        finally:
+            cursor.close()
+        _winrate_table_ready = True
+
+
 # ── 更新卡状态（结算用）─────────────────────────────────────────────────────
 
 class UpdateCardInput(BaseModel):
@@ -160,19 +456,75 @@ def update_card_status(data: UpdateCardInput, key: str = Query(...)):
     conn = None
     try:
         conn = _get_conn()
+        _ensure_winrate_table(conn)
         cursor = conn.cursor()
         cursor.execute(
             """
             UPDATE signal_card_history
             SET status = %s, settled_price = %s, pnl_pct = %s, settled_at = NOW()
-            WHERE id = %s
+            WHERE id = %s AND status = 'pending'
             """,
             (data.status, data.settled_price, data.pnl_pct, data.card_id),
         )
+        # 同一事务计入胜率日聚合；已结算过的卡不重复计数
+        if cursor.rowcount:
+            cursor.execute(_WINRATE_ROLLUP_SQL.format(where="id = %s"), (data.card_id,))
         conn.commit()
         cursor.close()
         return {"ok": True}
     except Exception as e:
+        if conn:
+            conn.rollback()
+        return {"ok": False, "error": str(e)}
+    finally:
+        if conn:
+            conn.close()
+
+
+class UpdateCardsInput(BaseModel):
+    updates: List[UpdateCardInput]
+
+
+@app.post("/api/update_card_status_bulk")
+def update_card_status_bulk(data: UpdateCardsInput, key: str = Query(...)):
+    """批量结算：锁住仍为 pending 的卡 → executemany 更新 → 同一事务计入胜率日聚合。
+    返回实际结算的 card_id（已被其他进程结算的卡不重复计数）"""
+    if not _check_key(key):
+        return {"ok": False, "error": "auth failed"}
+    if not data.updates:
+        return {"ok": True, "updated": []}
+    conn = None
+    try:
+        conn = _get_conn()
+        _ensure_winrate_table(conn)
+        cursor = conn.cursor()
+        ids = [u.card_id for u in data.updates]
+        placeholders = ",".join(["%s"] * len(ids))
+        cursor.execute(
+            f"SELECT id FROM signal_card_history WHERE id IN ({placeholders}) AND status = 'pending' FOR UPDATE",
+            ids,
+        )
+        pending = {row[0] for row in cursor.fetchall()}
+        updates = [u for u in data.updates if u.card_id in pending]
+        if updates:
+            cursor.executemany(
+                """
+                UPDATE signal_card_history
+                SET status = %s, settled_price = %s, pnl_pct = %s, settled_at = NOW()
+                WHERE id = %s AND status = 'pending'
+                """,
+                [(u.status, u.settled_price, u.pnl_pct, u.card_id) for u in updates],
+            )
+            updated = [u.card_id for u in updates]
+            cursor.execute(
+                _WINRATE_ROLLUP_SQL.format(where=f"id IN ({','.join(['%s'] * len(updated))})"), updated,
+            )
+        conn.commit()
+        cursor.close()
+        return {"ok": True, "updated": [u.card_id for u in updates]}
+    except Exception as e:
+        if conn:
+            conn.rollback()
         return {"ok": False, "error": str(e)}
     finally:
         if conn:
@@ -235,40 +587,167 @@ def save_scan_batch(data: ScanBatchInput, key: str = Query(...)):
 
 # ── 读取最新扫描 ─────────────────────────────────────────────────────────────
 
+_SCAN_BATCH_DDL = """
+    CREATE TABLE IF NOT EXISTS scan_batch (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        total_coins INT NOT NULL DEFAULT 0,
+        signal_count INT NOT NULL DEFAULT 0,
+        scan_time FLOAT NOT NULL DEFAULT 0,
+        coins TEXT,
+        changed_count INT NOT NULL DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_created (created_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+_SCAN_COIN_CARD_DDL = """
+    CREATE TABLE IF NOT EXISTS scan_coin_card (
+        coin VARCHAR(20) NOT NULL PRIMARY KEY,
+        batch_id INT NOT NULL,
+        card_hash CHAR(16) NOT NULL,
+        payload MEDIUMBLOB NOT NULL,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+
+class ScanCardsInput(BaseModel):
+    total_coins: int
+    signal_count: int
+    scan_time: float
+    coins: List[str]
+    cards: Dict[str, Dict[str, str]] = {}   # coin -> {"hash", "payload": base64(zlib(json))}，客户端认为变化的卡
+    hashes: Dict[str, str] = {}             # coin -> hash，本批全部卡（旧客户端不传时取 cards 里的哈希）
+
+
+@app.post("/api/save_scan_cards")
+def save_scan_cards(data: ScanCardsInput, key: str = Query(...)):
+    """紧凑扫描缓存：写一行批次元数据 + upsert 变化的单币卡片（客户端已压缩）
+
+    是否变化以写事务内重读的库中 card_hash 为准（FOR UPDATE）。库里哈希与客户端不同、
+    请求里却没带该卡 payload（客户端记忆过期）时整批回滚，返回 missing 让客户端补发。
+    """
+    if not _check_key(key):
+        return {"ok": False, "error": "auth failed"}
+    import base64
+    conn = None
+    try:
+        conn = _get_conn()
+        cursor = conn.cursor()
+        cursor.execute(_SCAN_BATCH_DDL)
+        cursor.execute(_SCAN_COIN_CARD_DDL)
+        hashes = data.hashes or {coin: c["hash"] for coin, c in data.cards.items()}
+        stored = {}
+        if hashes:
+            cursor.execute(
+                f"SELECT coin, card_hash FROM scan_coin_card WHERE coin IN ({','.join(['%s'] * len(hashes))}) FOR UPDATE",
+                list(hashes),
+            )
+            stored = {row[0]: row[1] for row in cursor.fetchall()}
+        changed = [coin for coin, h in hashes.items() if stored.get(coin) != h]
+        missing = sorted(coin for coin in changed if coin not in data.cards)
+        if missing:
+            conn.rollback()
+            return {"ok": False, "error": "stale card hashes", "missing": missing}
+        cursor.execute(
+            "INSERT INTO scan_batch (total_coins, signal_count, scan_time, coins, changed_count) VALUES (%s,%s,%s,%s,%s)",
+            (data.total_coins, data.signal_count, data.scan_time, ",".join(data.coins), len(changed)),
+        )
+        batch_id = cursor.lastrowid
+        if changed:
+            cursor.executemany(
+                """
+                INSERT INTO scan_coin_card (coin, batch_id, card_hash, payload) VALUES (%s,%s,%s,%s)
+                ON DUPLICATE KEY UPDATE batch_id=VALUES(batch_id), card_hash=VALUES(card_hash), payload=VALUES(payload)
+                """,
+                [(coin, batch_id, data.cards[coin]["hash"], base64.b64decode(data.cards[coin]["payload"]))
+                 for coin in changed],
+            )
+        conn.commit()
+        cursor.execute(
+            "DELETE FROM scan_batch WHERE id NOT IN (SELECT id FROM (SELECT id FROM scan_batch ORDER BY id DESC LIMIT 10) t)"
+        )
+        conn.commit()
+        cursor.close()
+        return {"ok": True, "batch_id": batch_id, "changed": len(changed)}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    finally:
+        if conn:
+            conn.close()
+
+
 @app.get("/api/latest_scan")
-def get_latest_scan(key: str = Query(...), max_age_seconds: int = Query(1800)):
+def get_latest_scan(key: str = Query(...), max_age_seconds: int = Query(1800), known_batch_id: int = Query(0)):
+    """最新扫描批次；known_batch_id 等于最新批次时只回元数据（unchanged=True）"""
     if not _check_key(key):
         return {"ok": False, "error": "auth failed"}
     conn = None
     try:
+        import zlib
         import pymysql.cursors
+        from datetime import datetime
         conn = _get_conn()
         cursor = conn.cursor(pymysql.cursors.DictCursor)
+        cursor.execute(_SCAN_BATCH_DDL)
+        cursor.execute(_SCAN_COIN_CARD_DDL)
         cursor.execute(
             """
-            SELECT total_coins, signal_count, scan_time, results_json, displays_json, created_at
-            FROM scan_cache ORDER BY id DESC LIMIT 1
+            SELECT id, total_coins, signal_count, scan_time, coins, created_at
+            FROM scan_batch ORDER BY id DESC LIMIT 1
             """
         )
         row = cursor.fetchone()
+        batch_id = None
+        unchanged = False
+        signals, displays = [], []
+        if row:
+            batch_id = row["id"]
+            unchanged = known_batch_id == batch_id
+            coins = [c for c in (row["coins"] or "").split(",") if c]
+            if coins and not unchanged:
+                cursor.execute(
+                    f"SELECT coin, payload FROM scan_coin_card WHERE coin IN ({','.join(['%s'] * len(coins))})",
+                    coins,
+                )
+                cards = {r["coin"]: json.loads(zlib.decompress(r["payload"])) for r in cursor.fetchall()}
+                ordered = [cards[c] for c in coins if c in cards]
+                signals = [c["signal"] for c in ordered]
+                displays = [c["display"] for c in ordered]
+        else:
+            # 旧表兼容：升级前写入的批次
+            try:
+                cursor.execute(
+                    """
+                    SELECT total_coins, signal_count, scan_time, results_json, displays_json, created_at
+                    FROM scan_cache ORDER BY id DESC LIMIT 1
+                    """
+                )
+                row = cursor.fetchone()
+            except pymysql.err.ProgrammingError:
+                row = None   # 旧表不存在
+            if row:
+                signals = json.loads(row["results_json"]) if row["results_json"] else []
+                displays = json.loads(row["displays_json"]) if row["displays_json"] else []
         cursor.close()
         if not row:
             return {"ok": True, "data": None}
-        from datetime import datetime
         cached_at = row["created_at"]
         age = (datetime.now() - cached_at).total_seconds() if cached_at else 9999
-        return {
-            "ok": True,
-            "data": {
-                "total_coins": row["total_coins"],
-                "signal_count": row["signal_count"],
-                "scan_time": row["scan_time"],
-                "signals": json.loads(row["results_json"]) if row["results_json"] else [],
-                "displays": json.loads(row["displays_json"]) if row["displays_json"] else [],
-                "cached_at": cached_at.strftime("%Y-%m-%d %H:%M:%S") if cached_at else "",
-                "is_stale": age > max_age_seconds,
-            },
+        payload = {
+            "batch_id": batch_id,
+            "total_coins": row["total_coins"],
+            "signal_count": row["signal_count"],
+            "scan_time": row["scan_time"],
+            "cached_at": cached_at.strftime("%Y-%m-%d %H:%M:%S") if cached_at else "",
+            "is_stale": age > max_age_seconds,
         }
+        if unchanged:
+            payload["unchanged"] = True
+        else:
+            payload["signals"] = signals
+            payload["displays"] = displays
+        return {"ok": True, "data": payload}
     except Exception as e:
         return {"ok": False, "error": str(e)}
     finally:
@@ -286,39 +765,53 @@ def get_winrate(key: str = Query(...), coin: str = Query(None), grade: str = Que
     try:
         import pymysql.cursors
         conn = _get_conn()
+        _ensure_winrate_table(conn)
         cursor = conn.cursor(pymysql.cursors.DictCursor)
 
-        where_parts = [
+        # 完整天读聚合行，窗口起始那一天（不完整）读原始行
+        agg_where = ["day > DATE(DATE_SUB(NOW(), INTERVAL %s DAY))"]
+        raw_where = [
             "status IN ('hit_tp', 'hit_sl', 'expired')",
             "created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)",
+            "created_at < DATE(DATE_SUB(NOW(), INTERVAL %s DAY)) + INTERVAL 1 DAY",
         ]
-        params: list = [days]
-        if coin:
-            where_parts.append("coin = %s")
-            params.append(coin.upper())
-        if grade:
-            where_parts.append("grade = %s")
-            params.append(grade)
+        agg_params: list = [days]
+        raw_params: list = [days, days]
+        for col, value in (("coin", coin.upper() if coin else None), ("grade", grade)):
+            if value:
+                agg_where.append(f"{col} = %s")
+                raw_where.append(f"{col} = %s")
+                agg_params.append(value)
+                raw_params.append(value)
 
-        where = " AND ".join(where_parts)
         cursor.execute(
-            f"SELECT status, pnl_pct FROM signal_card_history WHERE {where} ORDER BY created_at DESC LIMIT 500",
-            params,
+            f"""
+            SELECT SUM(n_total) AS total, SUM(n_hit_tp) AS hit_tp, SUM(n_hit_sl) AS hit_sl,
+                   SUM(n_expired) AS expired, SUM(n_expired_win) AS expired_win, SUM(pnl_sum) AS pnl_sum
+            FROM (
+                SELECT n_total, n_hit_tp, n_hit_sl, n_expired, n_expired_win, pnl_sum
+                FROM signal_winrate_daily WHERE {" AND ".join(agg_where)}
+                UNION ALL
+                SELECT 1, status = 'hit_tp', status = 'hit_sl', status = 'expired',
+                       COALESCE(status = 'expired' AND pnl_pct > 0, 0), COALESCE(pnl_pct, 0)
+                FROM signal_card_history WHERE {" AND ".join(raw_where)}
+            ) t
+            """,
+            agg_params + raw_params,
         )
-        rows = cursor.fetchall()
+        row = cursor.fetchone() or {}
         cursor.close()
 
-        if not rows:
+        total = int(row.get("total") or 0)
+        if not total:
             return {"ok": True, "data": None}
 
-        hit_tp = sum(1 for r in rows if r["status"] == "hit_tp")
-        hit_sl = sum(1 for r in rows if r["status"] == "hit_sl")
-        expired = sum(1 for r in rows if r["status"] == "expired")
-        total = len(rows)
-        wins = hit_tp + sum(1 for r in rows if r["status"] == "expired" and (r.get("pnl_pct") or 0) > 0)
+        hit_tp = int(row["hit_tp"] or 0)
+        hit_sl = int(row["hit_sl"] or 0)
+        expired = int(row["expired"] or 0)
+        wins = hit_tp + int(row["expired_win"] or 0)
         win_rate = wins / total * 100
-        pnls = [r.get("pnl_pct") or 0 for r in rows]
-        avg_profit = sum(pnls) / len(pnls)
+        avg_profit = float(row["pnl_sum"] or 0) / total
 
         return {
             "ok": True,
@@ -340,6 +833,66 @@ def get_winrate(key: str = Query(...), coin: str = Query(None), grade: str = Que
 
 # ── 历史记录查询 ─────────────────────────────────────────────────────────────
 
+def _opt_float(v):
+    return float(v or 0) if v else None
+
+
+def _fmt_minute(v):
+    return v.strftime("%Y-%m-%d %H:%M") if v else None
+
+
+def _json_col(v):
+    if not v:
+        return None
+    try:
+        return json.loads(v)
+    except Exception:
+        return None
+
+
+# 输出字段 → (依赖列, 取值函数)，与 app/signals/endpoints.py 的 /history 一致
+_HISTORY_FIELDS = {
+    "id": (("id",), lambda r: r["id"]),
+    "coin": (("coin",), lambda r: r["coin"]),
+    "direction": (("direction",), lambda r: r["direction"]),
+    "grade": (("grade",), lambda r: r["grade"]),
+    "entry_zone": (("entry_low", "entry_high"),
+                   lambda r: [float(r["entry_low"] or 0), float(r["entry_high"] or 0)]),
+    "stop_loss": (("stop_loss",), lambda r: float(r["stop_loss"] or 0)),
+    "take_profit": (("take_profit",), lambda r: float(r["take_profit"] or 0)),
+    "price": (("current_price",), lambda r: float(r["current_price"] or 0)),
+    "confidence": (("confidence",), lambda r: float(r["confidence"] or 0)),
+    "risk_reward": (("risk_reward_ratio",), lambda r: float(r["risk_reward_ratio"] or 0)),
+    "status": (("status",), lambda r: r["status"]),
+    "settled_price": (("settled_price",), lambda r: _opt_float(r["settled_price"])),
+    "pnl_pct": (("pnl_pct",), lambda r: _opt_float(r["pnl_pct"])),
+    "created_at": (("created_at",), lambda r: _fmt_minute(r["created_at"])),
+    "settled_at": (("settled_at",), lambda r: _fmt_minute(r["settled_at"])),
+    "regime": (("regime",), lambda r: r["regime"]),
+    "strategy_version": (("strategy_version",), lambda r: r["strategy_version"]),
+    "sources": (("sources_json",), lambda r: _json_col(r["sources_json"])),
+    "math": (("math_json",), lambda r: _json_col(r["math_json"])),
+}
+_HISTORY_DEFAULT_FIELDS = (
+    "id", "coin", "direction", "grade", "entry_zone", "stop_loss", "take_profit", "price",
+    "confidence", "risk_reward", "status", "settled_price", "pnl_pct", "created_at", "settled_at",
+)
+
+
+def _encode_cursor(created_at, row_id) -> str:
+    import base64
+    raw = f"{created_at.strftime('%Y-%m-%d %H:%M:%S.%f')}|{int(row_id)}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    import base64
+    from datetime import datetime
+    padded = cursor + "=" * (-len(cursor) % 4)
+    ts, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+    return datetime.strptime(ts, "%Y-%m-%d %H:%M:%S.%f"), int(row_id)
+
+
 @app.get("/api/history")
 def get_history(
     key: str = Query(...),
@@ -349,14 +902,26 @@ def get_history(
     direction: str = Query(None),
     days: int = Query(7),
     limit: int = Query(50),
+    cursor: str = Query(None),
+    fields: str = Query(None),
 ):
+    """按 (created_at, id) 倒序 keyset 分页；fields 投影；total 只在首页计算"""
     if not _check_key(key):
         return {"ok": False, "error": "auth failed"}
+    try:
+        selected = [f.strip() for f in (fields or "").split(",") if f.strip()] or list(_HISTORY_DEFAULT_FIELDS)
+        unknown = [f for f in selected if f not in _HISTORY_FIELDS]
+        if unknown:
+            return {"ok": False, "error": f"unknown field: {unknown[0]}"}
+        cursor_key = _decode_cursor(cursor) if cursor else None
+    except Exception:
+        return {"ok": False, "error": f"invalid cursor: {cursor}"}
+
     conn = None
     try:
         import pymysql.cursors
         conn = _get_conn()
-        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        cur = conn.cursor(pymysql.cursors.DictCursor)
 
         where_parts = ["created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)"]
         params: list = [days]
@@ -375,46 +940,34 @@ def get_history(
 
         where = " AND ".join(where_parts)
 
-        cursor.execute(f"SELECT COUNT(*) as cnt FROM signal_card_history WHERE {where}", params)
-        total = cursor.fetchone()["cnt"]
+        total = None
+        if cursor_key is None:
+            cur.execute(f"SELECT COUNT(*) as cnt FROM signal_card_history WHERE {where}", params)
+            total = cur.fetchone()["cnt"]
 
-        cursor.execute(
+        page_where, page_params = where, list(params)
+        if cursor_key is not None:
+            page_where += " AND (created_at < %s OR (created_at = %s AND id < %s))"
+            page_params += [cursor_key[0], cursor_key[0], cursor_key[1]]
+
+        columns = {"id", "created_at"}
+        for f in selected:
+            columns.update(_HISTORY_FIELDS[f][0])
+        cur.execute(
             f"""
-            SELECT id, coin, direction, grade,
-                   entry_low, entry_high, stop_loss, take_profit,
-                   current_price, confidence, risk_reward_ratio,
-                   status, settled_price, pnl_pct,
-                   created_at, settled_at
+            SELECT {", ".join(sorted(columns))}
             FROM signal_card_history
-            WHERE {where}
-            ORDER BY created_at DESC LIMIT %s
+            WHERE {page_where}
+            ORDER BY created_at DESC, id DESC LIMIT %s
             """,
-            params + [limit],
+            page_params + [limit],
         )
-        rows = cursor.fetchall()
-        cursor.close()
+        rows = cur.fetchall()
+        cur.close()
 
-        cards = []
-        for r in rows:
-            cards.append({
-                "id": r["id"],
-                "coin": r["coin"],
-                "direction": r["direction"],
-                "grade": r["grade"],
-                "entry_zone": [float(r["entry_low"] or 0), float(r["entry_high"] or 0)],
-                "stop_loss": float(r["stop_loss"] or 0),
-                "take_profit": float(r["take_profit"] or 0),
-                "price": float(r["current_price"] or 0),
-                "confidence": float(r["confidence"] or 0),
-                "risk_reward": float(r["risk_reward_ratio"] or 0),
-                "status": r["status"],
-                "settled_price": float(r["settled_price"] or 0) if r["settled_price"] else None,
-                "pnl_pct": float(r["pnl_pct"] or 0) if r["pnl_pct"] else None,
-                "created_at": r["created_at"].strftime("%Y-%m-%d %H:%M") if r["created_at"] else None,
-                "settled_at": r["settled_at"].strftime("%Y-%m-%d %H:%M") if r["settled_at"] else None,
-            })
-
-        return {"ok": True, "total": total, "count": len(cards), "cards": cards}
+        cards = [{f: _HISTORY_FIELDS[f][1](r) for f in selected} for r in rows]
+        next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if rows and len(rows) >= limit else None
+        return {"ok": True, "total": total, "count": len(cards), "cards": cards, "next_cursor": next_cursor}
     except Exception as e:
         return {"ok": False, "error": str(e)}
     finally:
@@ -0,0 +1,19 @@
+-- 新闻按币种索引表
+-- 替代 ods_news_feed_processed_di 上 `coins RLIKE '<symbol>'` 的全表扫描：
+-- 一条新闻按 coins 字段拆成多行，按币取最新 N 条走 idx_coin_time 范围扫描。
+-- 数据由应用的 news_index_sync 后台任务（app.services.news_index）按 create_time 水位增量写入，
+-- 首次运行自动回填 NEWS_INDEX_BACKFILL_DAYS 天，无需手工导数。
+CREATE TABLE IF NOT EXISTS news_coin_index (
+    id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    coin VARCHAR(32) NOT NULL COMMENT '币种（大写）',
+    news_key CHAR(16) NOT NULL COMMENT 'blake2b(create_time|title) 去重键',
+    create_time DATETIME NOT NULL COMMENT '新闻时间（源表 create_time）',
+    title TEXT COMMENT '标题',
+    topic VARCHAR(255) COMMENT '主题',
+    UNIQUE KEY uk_coin_news (coin, news_key),
+    INDEX idx_coin_time (coin, create_time),
+    INDEX idx_create_time (create_time)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='新闻按币种索引';
+
+-- 增量同步按 create_time 水位读源表；源表没有该索引时补上（已有则跳过此句）
+-- ALTER TABLE ods_news_feed_processed_di ADD INDEX idx_create_time (create_time);
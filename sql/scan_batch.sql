@@ -0,0 +1,24 @@
+-- 紧凑扫描缓存（替代 scan_cache 整批 JSON 行）
+-- scan_batch 一批一行，只存元数据和本批币种顺序；scan_coin_card 一币一行，
+-- 存 zlib 压缩的 {"signal","display"} JSON，扫描时只 upsert 内容哈希变化的卡
+CREATE TABLE IF NOT EXISTS scan_batch (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    total_coins INT NOT NULL DEFAULT 0 COMMENT '本批扫描币种数',
+    signal_count INT NOT NULL DEFAULT 0 COMMENT '出卡数',
+    scan_time FLOAT NOT NULL DEFAULT 0 COMMENT '扫描耗时(秒)',
+    coins TEXT COMMENT '本批出卡币种（逗号分隔，保持排序）',
+    changed_count INT NOT NULL DEFAULT 0 COMMENT '本批实际写入的卡片数',
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_created (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='扫描批次';
+
+CREATE TABLE IF NOT EXISTS scan_coin_card (
+    coin VARCHAR(20) NOT NULL PRIMARY KEY COMMENT '币种',
+    batch_id INT NOT NULL COMMENT '最近一次写入该卡的批次',
+    card_hash CHAR(16) NOT NULL COMMENT '未压缩 JSON 的 blake2b-64 哈希',
+    payload MEDIUMBLOB NOT NULL COMMENT 'zlib 压缩的 {"signal","display"} JSON',
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='扫描结果单币卡片';
+
+-- 旧表 scan_cache 保留只读兼容，确认新表有数据后可删除：
+-- DROP TABLE IF EXISTS scan_cache;
@@ -0,0 +1,19 @@
+-- 信号卡胜率日聚合表
+-- 按 (生成日期, 币种, 等级, 方向) 存已结算卡计数，结算时同事务增量更新
+-- 首次部署后回填：python -m app.signals.winrate_agg rebuild
+CREATE TABLE IF NOT EXISTS signal_winrate_daily (
+    day DATE NOT NULL COMMENT '卡片生成日期 DATE(created_at)',
+    coin VARCHAR(20) NOT NULL COMMENT '币种（大写）',
+    grade VARCHAR(5) NOT NULL COMMENT '等级：S/A/B/C',
+    direction VARCHAR(10) NOT NULL COMMENT '方向：long/short',
+    n_total INT NOT NULL DEFAULT 0 COMMENT '已结算卡数',
+    n_hit_tp INT NOT NULL DEFAULT 0 COMMENT '止盈数',
+    n_hit_sl INT NOT NULL DEFAULT 0 COMMENT '止损数',
+    n_expired INT NOT NULL DEFAULT 0 COMMENT '过期数',
+    n_expired_win INT NOT NULL DEFAULT 0 COMMENT 'expired 且 pnl_pct>0',
+    pnl_sum DECIMAL(16,4) NOT NULL DEFAULT 0 COMMENT 'pnl_pct 之和（NULL 不计）',
+    pnl_count INT NOT NULL DEFAULT 0 COMMENT 'pnl_pct 非 NULL 的卡数',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (day, coin, grade, direction),
+    INDEX idx_coin_day (coin, day)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='信号卡胜率日聚合';
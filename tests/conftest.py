@@ -0,0 +1,10 @@
+"""pytest 公共配置：仓库根目录加入 sys.path，补齐导入 config.settings 所需的环境变量"""
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault("DEEPSEEK_API_KEY", "test")
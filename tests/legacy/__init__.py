@@ -0,0 +1 @@
+"""改写前的旧实现，仅供对照测试 / 基准使用（不被业务代码导入）"""
@@ -0,0 +1,70 @@
+"""backtest_trend_momentum_rule 改写前的实现（逐 bar 回溯 _last_valid，O(n²)），仅供对照测试 / 基准使用"""
+import math
+
+from app.skills.analysis_skills.indicators import ema, rsi
+
+
+def backtest_trend_momentum_rule_legacy(
+    closes, fast=12, slow=26, rsi_period=14,
+    rsi_buy=50.0, rsi_sell=50.0, horizon=5, fee_pct=0.04,
+):
+    n = len(closes)
+    if n < slow + horizon + 1:
+        return {"trades": 0, "wins": 0, "win_rate": 0.0,
+                "avg_pnl_pct": 0.0, "total_pnl_pct": 0.0,
+                "long_trades": 0, "short_trades": 0}
+
+    fast_ema = ema(closes, fast)
+    slow_ema = ema(closes, slow)
+    rsi_vals = rsi(closes, rsi_period)
+
+    def _last_valid(arr, idx):
+        for v in reversed(arr[: idx + 1]):
+            if v is not None and not (isinstance(v, float) and math.isnan(v)):
+                return v
+        return None
+
+    trades = wins = long_trades = short_trades = 0
+    total_pnl = 0.0
+
+    i = slow
+    while i < n - horizon:
+        f_v = _last_valid(fast_ema, i)
+        s_v = _last_valid(slow_ema, i)
+        r_v = _last_valid(rsi_vals, i)
+        f_prev = _last_valid(fast_ema, i - 1)
+        s_prev = _last_valid(slow_ema, i - 1)
+        if not (f_v and s_v and f_prev and s_prev and r_v is not None):
+            i += 1
+            continue
+
+        golden_cross = f_prev <= s_prev and f_v > s_v and r_v > rsi_buy
+        death_cross = f_prev >= s_prev and f_v < s_v and r_v < rsi_sell
+
+        if golden_cross:
+            direction = "long"; long_trades += 1
+        elif death_cross:
+            direction = "short"; short_trades += 1
+        else:
+            i += 1
+            continue
+
+        entry = closes[i]
+        exit_ = closes[i + horizon]
+        gross = (exit_ - entry) / entry * 100 if direction == "long" else (entry - exit_) / entry * 100
+        net = gross - 2 * fee_pct
+        trades += 1
+        total_pnl += net
+        if net > 0:
+            wins += 1
+        i += horizon
+
+    return {
+        "trades": trades,
+        "wins": wins,
+        "win_rate": round(wins / trades, 4) if trades else 0.0,
+        "avg_pnl_pct": round(total_pnl / trades, 4) if trades else 0.0,
+        "total_pnl_pct": round(total_pnl, 4),
+        "long_trades": long_trades,
+        "short_trades": short_trades,
+    }
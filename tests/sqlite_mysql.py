@@ -0,0 +1,172 @@
+"""用 SQLite 内存库冒充 pymysql 连接，跑测试需要的那一小部分 MySQL 方言。
+
+只做文本级改写：%s → ?、NOW() → 固定时间、DATE_SUB(x, INTERVAL n DAY|HOUR) → datetime(x, '-n days|hours')、
+JSON_UNQUOTE(JSON_EXTRACT(...)) → json_extract(...)、ON DUPLICATE KEY UPDATE → ON CONFLICT DO UPDATE、
+INSERT IGNORE → INSERT OR IGNORE、RLIKE → REGEXP（Python re）、DELETE ... LIMIT n → rowid 子查询，
+DATE(...) + INTERVAL n DAY → datetime(DATE(...), '+n days')、SHOW TABLES LIKE → sqlite_master，
+GET_LOCK / RELEASE_LOCK 直接返回 1（同一个 SQLite 库本来就单写者），
+时间列（*_time / *_at）上不带别名的 MAX / MIN 按 TIMESTAMP 转回 datetime（SQLite 聚合结果不带列类型），
+FOR UPDATE 去掉、改为在事务外先 BEGIN IMMEDIATE（整库写锁，比 MySQL 行锁粗，但同样让并发的
+"先查 pending 再更新"排队），建表语句里的 ENGINE / ON UPDATE 去掉；
+二级索引拆成单独的 CREATE INDEX，唯一键保留在表上。
+JSON null 的语义两边不同（MySQL 得到 'null' 文本，SQLite 得到 NULL），夹具里不要用。
+"""
+import re
+import sqlite3
+from datetime import date, datetime
+
+_TS = "%Y-%m-%d %H:%M:%S"
+
+sqlite3.register_adapter(datetime, lambda d: d.strftime(_TS))
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_converter("TIMESTAMP", lambda b: datetime.strptime(b.decode(), _TS))
+sqlite3.register_converter("DATETIME", lambda b: datetime.strptime(b.decode(), _TS))
+
+
+def translate(sql: str, now: datetime) -> str:
+    sql = sql.replace("%%", "\0").replace("%s", "?").replace("\0", "%")
+    sql = sql.replace("NOW()", f"'{now.strftime(_TS)}'")
+    sql = re.sub(r"DATE_SUB\(([^,]+), INTERVAL (\?|\d+) (DAY|HOUR)\)",
+                 lambda m: f"datetime({m[1]}, '-' || {m[2]} || ' {m[3].lower()}s')", sql)
+    sql = re.sub(r"(DATE\((?:[^()]|\([^()]*\))*\))\s*\+\s*INTERVAL (\?|\d+) DAY",
+                 r"datetime(\1, '+' || \2 || ' days')", sql)
+    sql = re.sub(r"SHOW TABLES LIKE (\S+)", r"SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE \1", sql)
+    sql = re.sub(r"\b(MAX|MIN)\((\w*(?:time|_at))\)(?!\s+AS\b)", r'\1(\2) AS "\1(\2) [TIMESTAMP]"', sql)
+    sql = re.sub(r"JSON_UNQUOTE\(JSON_EXTRACT\(([^)]*)\)\)", r"json_extract(\1)", sql)
+    sql = sql.replace("JSON_EXTRACT(", "json_extract(")
+    sql = re.sub(r"\s+FOR UPDATE\b", "", sql)
+    sql = sql.replace("INSERT IGNORE", "INSERT OR IGNORE").replace(" RLIKE ", " REGEXP ")
+    m = re.match(r"\s*DELETE FROM (\w+) WHERE (.*) LIMIT (\d+)\s*$", sql, flags=re.S)
+    if m:
+        sql = f"DELETE FROM {m[1]} WHERE rowid IN (SELECT rowid FROM {m[1]} WHERE {m[2]} LIMIT {m[3]})"
+    if "ON DUPLICATE KEY UPDATE" in sql:
+        head, tail = sql.split("ON DUPLICATE KEY UPDATE", 1)
+        sql = head + "ON CONFLICT DO UPDATE SET" + re.sub(r"VALUES\((\w+)\)", r"excluded.\1", tail)
+    if "CREATE TABLE" in sql:
+        sql = re.sub(r"\)\s*ENGINE=.*$", ")", sql.strip(), flags=re.S)
+        sql = re.sub(r"UNIQUE\s+(INDEX|KEY)\s+\w+\s*\(", "UNIQUE (", sql)
+        sql = re.sub(r",\s*(INDEX|KEY)\s+\w+\s*\([^)]*\)", "", sql)
+        sql = re.sub(r"\b(BIG)?INT\s+(NOT NULL\s+)?(AUTO_INCREMENT\s+PRIMARY KEY|PRIMARY KEY\s+AUTO_INCREMENT)",
+                     "INTEGER PRIMARY KEY AUTOINCREMENT", sql)
+        sql = sql.replace("ON UPDATE CURRENT_TIMESTAMP", "")
+        sql = re.sub(r"\s+COMMENT\s+'[^']*'", "", sql)
+    return sql
+
+
+def secondary_indexes(sql: str) -> list:
+    """建表语句里的二级索引 → 单独的 CREATE INDEX（SQLite 索引名全库唯一，加表名前缀）"""
+    m = re.search(r"CREATE TABLE(?: IF NOT EXISTS)?\s+(\w+)", sql)
+    if not m:
+        return []
+    table = m[1]
+    return [f"CREATE INDEX IF NOT EXISTS {table}_{name} ON {table} ({cols})"
+            for name, cols in re.findall(r",\s*(?:INDEX|KEY)\s+(\w+)\s*\(([^)]*)\)", sql)]
+
+
+class _Canned:
+    """固定结果集（SELECT NOW() [AS x] 要返回 datetime，SQLite 只会给字符串）"""
+
+    def __init__(self, cur, rows):
+        self.description = cur.description
+        self._rows = list(rows)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        pass
+
+
+class Cursor:
+    def __init__(self, conn, dict_rows: bool):
+        self._conn = conn
+        self._cur = conn.raw.cursor()
+        self._dict = dict_rows
+
+    def execute(self, sql, args=()):
+        if isinstance(self._cur, _Canned):                      # 同一游标接着执行下一条
+            self._cur = self._conn.raw.cursor()
+        m = re.fullmatch(r"SELECT NOW\(\)(?: AS (\w+))?", sql.strip())
+        if m:
+            self._cur.execute(f"SELECT ? AS {m[1] or 'now'}", (self._conn.now,))
+            self._cur = _Canned(self._cur, [(self._conn.now,)])
+            return
+        if re.match(r"SELECT (GET_LOCK|RELEASE_LOCK)\(", sql.strip()):
+            self._cur.execute("SELECT 1")
+            self._cur = _Canned(self._cur, [(1,)])
+            return
+        if re.search(r"\bFOR UPDATE\b", sql) and not self._conn.raw.in_transaction:
+            self._conn.raw.execute("BEGIN IMMEDIATE")
+        self._cur.execute(translate(sql, self._conn.now), tuple(args or ()))
+        self.rowcount = self._cur.rowcount
+        if "CREATE TABLE" in sql:
+            for stmt in secondary_indexes(sql):
+                self._cur.execute(stmt)
+        return self.rowcount
+
+    def executemany(self, sql, seq):
+        self._cur.executemany(translate(sql, self._conn.now), [tuple(args) for args in seq])
+        self.rowcount = self._cur.rowcount
+        return self.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    def _wrap(self, row):
+        if row is None or not self._dict:
+            return row
+        return {d[0]: v for d, v in zip(self._cur.description, row)}
+
+    def fetchone(self):
+        return self._wrap(self._cur.fetchone())
+
+    def fetchall(self):
+        return [self._wrap(r) for r in self._cur.fetchall()]
+
+    def __iter__(self):
+        for row in self._cur:
+            yield self._wrap(row)
+
+    def close(self):
+        self._cur.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Connection:
+    """pymysql 连接的替身：cursor(cls) 传了游标类（DictCursor / SSDictCursor）就返回 dict 行"""
+
+    def __init__(self, raw: sqlite3.Connection, now: datetime):
+        self.raw = raw
+        self.now = now
+
+    def cursor(self, cursorclass=None):
+        return Cursor(self, dict_rows=cursorclass is not None)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        pass
+
+
+def connect(schema: str, now: datetime, path: str = ":memory:") -> Connection:
+    raw = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES, check_same_thread=False)
+    raw.create_function("REGEXP", 2, lambda pattern, value: value is not None and re.search(pattern, value) is not None)
+    raw.executescript(schema)
+    return Connection(raw, now)
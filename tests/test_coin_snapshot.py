@@ -0,0 +1,151 @@
+"""币种快照缓存：TTL 过期换新快照、同数据源并发只拉一次、失败不缓存、扫描刷新后整体失效、LRU 上限"""
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from app.core.config import get_settings
+from app.services import coin_snapshot
+from app.services.coin_snapshot import CoinSnapshotCache
+
+
+class Upstream:
+    """替换 SOURCES 的假数据源：按 (币种, 数据源) 计数，可设延迟与失败次数"""
+
+    def __init__(self, delay=0.0):
+        self.calls = Counter()
+        self.delay = delay
+        self.fail = Counter()
+        self._lock = threading.Lock()
+
+    def source(self, name):
+        def fetch(symbol):
+            with self._lock:
+                self.calls[(symbol, name)] += 1
+                n = self.calls[(symbol, name)]
+                failing = self.fail[name] > 0
+                if failing:
+                    self.fail[name] -= 1
+            time.sleep(self.delay)
+            if failing:
+                raise ConnectionError(f"{name} 上游 502")
+            return {"symbol": symbol, "name": name, "n": n}
+        return fetch
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    up = Upstream()
+    for name in ("get_header_data", "get_kline_data"):
+        monkeypatch.setitem(coin_snapshot.SOURCES, name, up.source(name))
+    return up
+
+
+def test_ttl_expiry_starts_a_fresh_snapshot(upstream):
+    cache = CoinSnapshotCache(ttl=0.2)
+
+    async def main():
+        first = await cache.get("BTC", ["get_header_data"])
+        again = await cache.get("BTC", ["get_header_data"])
+        await asyncio.sleep(0.25)
+        fresh = await cache.get("BTC", ["get_header_data"])
+        return first, again, fresh
+
+    first, again, fresh = asyncio.run(main())
+    assert again is first and first.get("get_header_data")["n"] == 1
+    assert fresh is not first and first.expired
+    assert fresh.get("get_header_data")["n"] == 2
+    assert upstream.calls[("BTC", "get_header_data")] == 2
+
+
+def test_concurrent_getters_share_one_upstream_call(upstream):
+    upstream.delay = 0.1
+    cache = CoinSnapshotCache()
+
+    async def main():
+        return await asyncio.gather(*(cache.get("ETH", ["get_header_data", "get_kline_data"])
+                                      for _ in range(20)))
+
+    snaps = asyncio.run(main())
+    assert all(s is snaps[0] for s in snaps)
+    assert upstream.calls == Counter({("ETH", "get_header_data"): 1, ("ETH", "get_kline_data"): 1})
+    assert not snaps[0]._inflight
+
+
+def test_failed_fetch_is_not_cached(upstream):
+    upstream.fail["get_kline_data"] = 1
+    cache = CoinSnapshotCache()
+
+    async def main():
+        snap = await cache.get("SOL", ["get_header_data", "get_kline_data"])
+        failed = snap.result("get_kline_data")
+        retry = await cache.get("SOL", ["get_header_data", "get_kline_data"])
+        return snap, failed, retry
+
+    snap, failed, retry = asyncio.run(main())
+    assert isinstance(failed, ConnectionError)
+    assert retry is snap                                  # 同一快照内补拉，成功数据不重拉
+    assert retry.result("get_kline_data")["n"] == 2
+    assert upstream.calls[("SOL", "get_header_data")] == 1
+    assert upstream.calls[("SOL", "get_kline_data")] == 2
+
+
+def test_lru_cap_evicts_least_recently_used(upstream):
+    cache = CoinSnapshotCache(max_coins=3)
+
+    async def main():
+        for coin in ("A", "B", "C"):
+            await cache.get(coin, ["get_header_data"])
+        await cache.get("A", ["get_header_data"])        # A 变为最近使用
+        await cache.get("D", ["get_header_data"])        # 挤掉 B
+
+    asyncio.run(main())
+    assert list(cache._snapshots) == ["C", "A", "D"]
+    assert upstream.calls[("A", "get_header_data")] == 1
+
+
+def test_module_cache_uses_settings():
+    settings = get_settings()
+    assert coin_snapshot._cache.max_coins == settings.coin_snapshot_max_coins
+    assert coin_snapshot._cache.ttl == settings.coin_snapshot_ttl
+
+
+def test_scan_refresh_invalidates_snapshots(upstream, tmp_path, monkeypatch):
+    from app.signals import alpha_scanner, scan_refresh, settlement
+    from app.utils.file_lock import FileLock
+
+    async def fake_scan(concurrency=10):
+        return []
+
+    monkeypatch.setattr(coin_snapshot, "_cache", CoinSnapshotCache())
+    monkeypatch.setattr(scan_refresh, "_lock", FileLock("test", path=str(tmp_path / "scan.lock")))
+    monkeypatch.setattr(scan_refresh, "_inflight", None)
+    monkeypatch.setattr(alpha_scanner, "scan_all_coins", fake_scan)
+    monkeypatch.setattr(settlement, "save_signal_cards", lambda cards: 0)
+    monkeypatch.setattr(settlement, "save_scan_batch", lambda results, elapsed: None)
+
+    async def main():
+        before = await coin_snapshot.get_snapshot("BTC", ["get_header_data"])
+        await scan_refresh.refresh()
+        after = await coin_snapshot.get_snapshot("BTC", ["get_header_data"])
+        return before, after
+
+    before, after = asyncio.run(main())
+    assert after is not before
+    assert before.get("get_header_data")["n"] == 1        # 已拿到的旧快照不受影响
+    assert upstream.calls[("BTC", "get_header_data")] == 2
+
+
+def test_invalidate_single_symbol(upstream):
+    cache = CoinSnapshotCache()
+
+    async def main():
+        btc = await cache.get("BTC", ["get_header_data"])
+        eth = await cache.get("ETH", ["get_header_data"])
+        cache.invalidate("BTC")
+        return (btc, eth), (await cache.get("BTC", []), await cache.get("ETH", []))
+
+    (btc, eth), (btc2, eth2) = asyncio.run(main())
+    assert btc2 is not btc and eth2 is eth
@@ -0,0 +1,108 @@
+"""ReportAccumulator 单次遍历 vs 原逐分区 SQL：同一份夹具行，各分区输出逐项一致（含 ab_buckets_7d）
+
+夹具与期望输出都在 tests/fixtures/：
+- daily_report_rows.json：signal_card_history 行（now 为报表时刻）
+- daily_report_expected.json：原逐分区查询在这份数据上的输出；ab_buckets_7d 取 compare_buckets
+  （顶层没有 experiment_bucket 的卡并入 control，原查询会让 NULL 组与 control 组互相覆盖）
+"""
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from app.signals import ab_framework, daily_report
+from tests import sqlite_mysql
+from tests.legacy import daily_report as legacy
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+SCHEMA = """
+CREATE TABLE signal_card_history (
+    id INTEGER PRIMARY KEY,
+    coin TEXT, direction TEXT, grade TEXT, status TEXT, pnl_pct REAL,
+    sources_json TEXT, math_json TEXT,
+    created_at TIMESTAMP, settled_at TIMESTAMP
+);
+"""
+
+SECTIONS = (
+    "summary_24h", "direction_grade_matrix_24h", "rolling_7d_trend",
+    "breadth_distribution_7d", "guardrail_hits_24h",
+    "top5_printers_7d", "top5_bleeders_7d", "alpha_breakdown_7d", "ab_buckets_7d",
+)
+
+
+def _load_fixture():
+    data = json.loads((FIXTURES / "daily_report_rows.json").read_text(encoding="utf-8"))
+    return datetime.fromisoformat(data["now"]), data["rows"]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    now, rows = _load_fixture()
+    conn = sqlite_mysql.connect(SCHEMA, now)
+    cols = list(rows[0])
+    conn.raw.executemany(
+        f"INSERT INTO signal_card_history ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+        [
+            tuple(
+                datetime.fromisoformat(r[c]) if c.endswith("_at") and r[c] else r[c]
+                for c in cols
+            )
+            for r in rows
+        ],
+    )
+    monkeypatch.setattr(daily_report, "_get_conn", lambda: conn)
+    monkeypatch.setattr(ab_framework, "_get_conn", lambda: conn)
+    monkeypatch.setattr(legacy, "connect", lambda: conn)
+    return conn
+
+
+def _normalize(value):
+    """JSON 往返：tuple/Decimal/date 统一成期望文件里的形态"""
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+def _expected():
+    return json.loads((FIXTURES / "daily_report_expected.json").read_text(encoding="utf-8"))
+
+
+def test_legacy_queries_match_committed_expectation(db):
+    legacy_sections = _normalize(legacy.legacy_report())
+    expected = _expected()
+    for section in SECTIONS:
+        if section != "ab_buckets_7d":
+            assert legacy_sections[section] == expected[section], section
+    assert _normalize(ab_framework.compare_buckets(days=7)) == expected["ab_buckets_7d"]
+
+
+@pytest.mark.parametrize("section", SECTIONS)
+def test_single_pass_matches_per_section_queries(db, section):
+    report = daily_report.generate_daily_report()
+    assert _normalize(report[section]) == _expected()[section]
+
+
+def test_ab_section_matches_standalone_compare_buckets(db):
+    report = daily_report.generate_daily_report()
+    standalone = ab_framework.compare_buckets(days=7)
+    assert _normalize(report["ab_buckets_7d"]) == _normalize(standalone)
+    assert report["ab_buckets_7d"]["treatment"]["n"] >= ab_framework.TREATMENT_MIN_SAMPLE
+
+
+def test_legacy_ab_query_matches_when_every_card_has_top_level_bucket(db):
+    """原 A/B 查询与单次遍历只差在顶层无 experiment_bucket 的卡；去掉这些卡后逐项一致"""
+    db.raw.execute("DELETE FROM signal_card_history WHERE math_json LIKE '%\"meta\"%'")
+    report = daily_report.generate_daily_report()
+    assert _normalize(report["ab_buckets_7d"]) == _normalize(legacy._ab_buckets(days=7))
+
+
+def test_fixture_covers_edge_cases():
+    now, rows = _load_fixture()
+    assert any(r["status"] == "pending" for r in rows)
+    assert any(r["status"] == "expired" and r["pnl_pct"] is None for r in rows)
+    assert any(r["math_json"] and '"meta"' in r["math_json"] for r in rows)
+    assert any(
+        r["settled_at"] and datetime.fromisoformat(r["created_at"]) < now - timedelta(days=7)
+        for r in rows
+    )
@@ -0,0 +1,134 @@
+"""data_proxy gzip 请求体：先验 key 再读体、边收边解压、超限 413、非法 gzip 400；客户端默认不压缩"""
+import asyncio
+import gzip
+import importlib.util
+import json
+import zlib
+
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+from config.settings import Settings
+from tests.conftest import ROOT
+
+
+@pytest.fixture(scope="module")
+def proxy():
+    spec = importlib.util.spec_from_file_location("_gzip_proxy", ROOT / "deploy" / "data_proxy.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    @module.app.post("/_echo")
+    async def echo(request: Request):
+        body = await request.body()
+        return {"ok": True, "size": len(body), "data": json.loads(body)}
+
+    return module
+
+
+@pytest.fixture(scope="module")
+def client(proxy):
+    return TestClient(proxy.app)
+
+
+def _post(client, proxy, body, key=None, encoding="gzip"):
+    headers = {"Content-Type": "application/json"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return client.post("/_echo", params={"key": key or proxy.API_KEY}, content=body, headers=headers)
+
+
+def test_gzip_body_is_decompressed(client, proxy):
+    payload = {"cards": ["x" * 100] * 50}
+    r = _post(client, proxy, gzip.compress(json.dumps(payload).encode()))
+    assert r.status_code == 200 and r.json()["data"] == payload
+
+
+def test_concatenated_gzip_members(client, proxy):
+    raw = json.dumps({"a": "1" * 2000}).encode()
+    body = gzip.compress(raw[:700]) + gzip.compress(raw[700:])
+    assert _post(client, proxy, body).json()["size"] == len(raw)
+
+
+def test_plain_body_passes_through(client, proxy):
+    assert _post(client, proxy, b'{"a": 1}', encoding=None).json()["data"] == {"a": 1}
+
+
+@pytest.mark.parametrize("body", [b"not gzip at all", gzip.compress(b'{"a": 1}')[:-6], b""])
+def test_malformed_or_truncated_gzip_is_400(client, proxy, body):
+    r = _post(client, proxy, body)
+    assert r.status_code == 400
+    assert r.json()["ok"] is False and "malformed gzip" in r.json()["error"]
+
+
+def test_bad_key_rejected_without_reading_body(proxy):
+    received = []
+
+    async def receive():
+        received.append(1)
+        return {"type": "http.request", "body": b"garbage", "more_body": False}
+
+    status, body = _call(proxy, receive, key="wrong")
+    assert status == 200 and json.loads(body) == {"ok": False, "error": "auth failed"}
+    assert received == []
+
+
+def test_bomb_rejected_with_413_before_full_expansion(proxy):
+    """64MB 的 0 压缩后约 64KB：分块送入，超过上限即 413，剩余分块不再读取，也不整体展开"""
+    bomb = gzip.compress(b"\0" * (64 * 1024 * 1024), 9)
+    chunks = [bomb[i:i + 4096] for i in range(0, len(bomb), 4096)]
+    received = []
+
+    async def receive():
+        received.append(1)
+        chunk = chunks[len(received) - 1]
+        return {"type": "http.request", "body": chunk, "more_body": len(received) < len(chunks)}
+
+    status, body = _call(proxy, receive, max_body=1024 * 1024)
+    assert status == 413 and "exceeds" in json.loads(body)["error"]
+    assert len(received) < len(chunks) / 4
+
+
+def test_compressed_size_over_limit_is_413(proxy):
+    body = gzip.compress(bytes(range(256)) * 64)       # 压不小的内容，压缩后仍超过上限
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    status, _ = _call(proxy, receive)
+    assert status == 413
+
+
+def test_limit_is_exact(proxy):
+    gunzip = proxy._Gunzip(limit=10)
+    gunzip.feed(gzip.compress(b"0123456789"))
+    assert gunzip.finish() == b"0123456789"
+    with pytest.raises(proxy._BodyTooLarge):
+        proxy._Gunzip(limit=9).feed(gzip.compress(b"0123456789"))
+    with pytest.raises(zlib.error):
+        proxy._Gunzip(limit=10).finish()
+
+
+def test_client_gzip_off_by_default():
+    assert Settings.model_fields["data_proxy_gzip"].default is False
+
+
+async def _never_called(scope, receive, send):
+    raise AssertionError("请求不应到达接口")
+
+
+def _call(proxy, receive, key=None, max_body=1024):
+    middleware = proxy.GzipRequestMiddleware(_never_called, max_body=max_body)
+    query = f"key={key or proxy.API_KEY}".encode()
+    scope = {"type": "http", "method": "POST", "path": "/_echo", "query_string": query, "headers": [
+        (b"content-encoding", b"gzip"), (b"content-type", b"application/json")]}
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    start = next(m for m in sent if m["type"] == "http.response.start")
+    return start["status"], b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+
@@ -0,0 +1,179 @@
+"""离线策略演化：现行参数下向量化重定级与 fuse_signals 定级一致、walk-forward 按时间切分不重叠、
+CSV 导出 → load_cards 往返"""
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.signals import adaptive_strategy, alpha_scanner, evolution, fusion, grade_calibrator, market_context, quality_gate
+from app.signals.adaptive_strategy import AdaptiveStrategyEngine, StrategyState
+from app.signals.models import SignalDirection, SignalSource
+from app.signals.settlement import _card_payload
+
+THRESHOLDS = {"S_min_conf": 72, "A_3src_min_conf": 58, "A_2src_min_conf": 77, "B_min_conf": 38}
+WEIGHTS = {"bigorder_anomaly": 0.42, "quantitative": 0.33, "technical": 0.25}
+REGIMES = ["trending_up", "trending_down", "mean_reverting", "volatile", "quiet"]
+START = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    """非默认权重 / 阈值的策略状态；外部状态护栏全部关闭，定级只由融合计算决定"""
+    monkeypatch.setattr(adaptive_strategy, "STRATEGY_FILE", tmp_path / "strategy_state.json")
+    eng = AdaptiveStrategyEngine()
+    eng._state = StrategyState(weights=dict(WEIGHTS))
+    monkeypatch.setattr(adaptive_strategy, "get_strategy_engine", lambda: eng)
+    monkeypatch.setattr(fusion, "get_strategy_engine", lambda: eng)
+    monkeypatch.setattr(grade_calibrator, "get_effective_thresholds", lambda: dict(THRESHOLDS))
+    monkeypatch.setattr(alpha_scanner, "detect_accumulation_pattern", lambda coin: None)
+    monkeypatch.setattr(fusion, "_bigorder_source", lambda *args, **kwargs: None)
+    monkeypatch.setattr(quality_gate, "should_drop", lambda score: False)
+    monkeypatch.setattr(market_context, "get_btc_trend", lambda *args, **kwargs: {"market_breadth": "neutral"})
+    monkeypatch.setenv("GUARDRAIL_ENABLED", "0")
+    monkeypatch.setenv("ENABLE_ALPHA_FUNDING", "0")
+    return eng
+
+
+def _direction(rng):
+    return rng.choice([SignalDirection.LONG, SignalDirection.LONG, SignalDirection.SHORT, SignalDirection.NEUTRAL])
+
+
+def _fused_cards(monkeypatch, n=240, seed=34):
+    """随机信号源组合逐张跑 fuse_signals，返回 (卡, 当时的 regime) 列表（只保留出卡的）"""
+    rng = random.Random(seed)
+    closes = [100 + i * 0.5 for i in range(40)]
+    ohlcv = {"opens": closes, "highs": [c + 2 for c in closes], "lows": [c - 2 for c in closes],
+             "closes": closes, "volumes": [1.0] * 40}
+    out = []
+    for i in range(n):
+        regime = rng.choice(REGIMES)
+        bigorder = None
+        if rng.random() < 0.8:
+            bigorder = (rng.uniform(0.1, 1.0), _direction(rng))     # 大单归一化分 0~1
+
+        def decay(coin, weight, **kwargs):
+            if bigorder is None:
+                return None
+            return SignalSource(name="bigorder_decay", score=bigorder[0], direction=bigorder[1], weight=weight)
+
+        monkeypatch.setattr(alpha_scanner, "get_bigorder_decay_signal", decay)
+        quant_dir = rng.choice(["做多", "做多", "做空", "观望"])
+        core = {
+            "math_result": SimpleNamespace(
+                math_score_adjustment=rng.choice([0.0, rng.uniform(-180, 30)]), kelly_fraction=0.0,
+                math_confidence=50, key_findings=[], hurst=None, entropy=None, monte_carlo=None,
+                vol_cone=None, regime=None,
+            ),
+            "regime": regime,
+            "quant_parts": None,
+            "quant_payload": {"交易信号": {"方向": quant_dir, "综合评分": rng.uniform(5, 90), "胜率估计": "55%"}}
+            if rng.random() < 0.85 else None,
+            "technical": SignalSource(name="technical", score=rng.uniform(5, 90), direction=_direction(rng),
+                                      weight=0) if rng.random() < 0.85 else None,
+            "alpha_breadth": "neutral",
+            "breakout": SignalSource(name="alpha_breakout_retest", score=rng.uniform(40, 90),
+                                     direction=_direction(rng), weight=0.20) if rng.random() < 0.25 else None,
+            "meanrev": SignalSource(name="alpha_mean_reversion", score=rng.uniform(40, 90),
+                                    direction=_direction(rng), weight=0.20) if rng.random() < 0.25 else None,
+        }
+        card = fusion.fuse_signals(f"C{i}", dict(ohlcv, closes=list(closes)), {}, core=core)
+        if card is not None:
+            out.append((card, regime))
+    return out
+
+
+def _rows(cards, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for i, (card, _) in enumerate(cards):
+        row = _card_payload(card)
+        status = rng.choice(["hit_tp", "hit_sl", "expired"])
+        row.update(status=status, pnl_pct=round(rng.uniform(-5, 5), 2),
+                   created_at=(START + timedelta(hours=7 * i)).strftime("%Y-%m-%d %H:%M:%S"))
+        rows.append(row)
+    return rows
+
+
+def test_regrade_with_current_params_matches_fuse_signals(engine, monkeypatch):
+    cards = _fused_cards(monkeypatch)
+    grades = {card.grade.value for card, _ in cards}
+    assert len(cards) > 60 and grades >= {"S", "A", "B"}
+
+    cols = evolution.columns_from_rows(_rows(cards), origin=None)
+    baseline = evolution.baseline_candidate()
+    assert baseline.weights == WEIGHTS
+    assert baseline.thresholds == tuple(THRESHOLDS[k] for k in
+                                        ("S_min_conf", "A_3src_min_conf", "A_2src_min_conf", "B_min_conf"))
+
+    W = evolution._effective_weights(cols, [baseline])
+    th = np.array([baseline.thresholds], dtype=float)
+    new_dir = np.zeros(cols.n)
+    grade = np.zeros(cols.n)
+    for r in range(len(cols.regimes)):
+        rows = np.nonzero(cols.regime_idx == r)[0]
+        d, g = evolution._regrade(cols, rows, W[:, r, :], th)
+        new_dir[rows], grade[rows] = d[:, 0], g[:, 0]
+
+    # columns_from_rows 按 created_at 排序，fixture 的时间本身递增，顺序不变
+    expected_grade = np.array([evolution.GRADE_RANK[card.grade.value] for card, _ in cards])
+    expected_dir = np.array([1 if card.direction == SignalDirection.LONG else -1 for card, _ in cards])
+    assert (new_dir == expected_dir).all()
+    assert (grade == expected_grade).all(), [
+        (card.coin, card.grade.value, int(g)) for (card, _), g in zip(cards, grade) if
+        evolution.GRADE_RANK[card.grade.value] != g]
+
+
+def _columns(n, seed=1):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        rows.append({
+            "direction": "long", "status": "hit_tp", "pnl_pct": 1.0, "regime": "quiet",
+            "sources_json": '[{"name": "technical", "score": 50, "direction": "long"}, '
+                            '{"name": "quantitative", "score": 50, "direction": "long"}]',
+            "created_at": (START + timedelta(minutes=rng.randint(0, 60 * 24 * 90))).isoformat(),
+        })
+    return evolution.columns_from_rows(rows)
+
+
+@pytest.mark.parametrize("n, folds", [(100, 4), (101, 4), (7, 3), (5, 5)])
+def test_walk_forward_folds_are_ordered_and_disjoint(n, folds):
+    cols = _columns(n)
+    assert (np.diff(cols.ts.astype("int64")) >= 0).all()          # 乱序输入按时间排好
+    fold_of = evolution._fold_index(cols.n, folds)
+    assert (np.diff(fold_of) >= 0).all()                           # 按位置连续切分
+    assert set(fold_of.tolist()) == set(range(folds))
+    assert sum(np.count_nonzero(fold_of == f) for f in range(folds)) == n
+    for f in range(1, folds):
+        train, test = cols.ts[fold_of < f], cols.ts[fold_of == f]
+        assert train.max() <= test.min()                           # 训练段全部早于测试段
+
+
+def test_walk_forward_periods_follow_time():
+    cols = _columns(200)
+    cand = evolution.baseline_candidate(weights=dict(WEIGHTS))
+    report = evolution.evaluate_candidates(cols, [cand], folds=4, min_n=1)
+    periods = [w["period"] for w in report["walk_forward"]]
+    assert [w["test_fold"] for w in report["walk_forward"]] == [1, 2, 3]
+    assert all(a[1] <= b[0] for a, b in zip(periods, periods[1:]))
+    assert sum(w["test"]["n"] for w in report["walk_forward"]) == report["walk_forward_oos"]["n"]
+
+
+def test_load_cards_csv_round_trip(engine, monkeypatch, tmp_path):
+    cards = _fused_cards(monkeypatch, n=60)
+    rows = _rows(cards)
+    rows.append(dict(rows[0], status="pending"))                   # 未结算不计入
+    rows.append(dict(rows[0], math_json='{"origin": "chat"}'))    # 默认只取 scan
+    direct = evolution.columns_from_rows(rows)
+
+    path = tmp_path / "cards.csv"
+    pd.DataFrame(rows).to_csv(path, index=False)
+    loaded = evolution.load_cards(str(path))
+
+    assert loaded.n == direct.n == len(cards)
+    assert loaded.slots == direct.slots and loaded.regimes == direct.regimes
+    for name in ("score", "sign", "present", "regime_idx", "direction", "math_adj", "win", "pnl", "ts"):
+        assert np.array_equal(getattr(loaded, name), getattr(direct, name)), name
@@ -0,0 +1,62 @@
+"""命名线程池：klines 池承载多周期 K 线拉取，容量取 EXECUTOR_KLINE_WORKERS，executor_* 指标带 klines 标签"""
+import threading
+import time
+
+import pytest
+
+from app.services import data_service
+from app.utils import executors
+from app.utils.executors import KLINES, get_executor
+from app.utils.metrics import EXECUTOR_ACTIVE, EXECUTOR_QUEUED, EXECUTOR_WAIT_SECONDS, render
+
+
+@pytest.fixture
+def fresh_klines_pool(monkeypatch):
+    """按当前设置重建 klines 池，测试后关掉"""
+    monkeypatch.setattr(data_service.settings, "executor_kline_workers", 2)
+    old = executors._executors.pop(KLINES, None)
+    yield
+    pool = executors._executors.pop(KLINES, None)
+    if pool is not None:
+        pool.shutdown(wait=True)
+    if old is not None:
+        executors._executors[KLINES] = old
+
+
+def test_multi_timeframe_runs_on_named_pool(monkeypatch, fresh_klines_pool):
+    threads = []
+    monkeypatch.setattr(data_service.settings, "kline_timeframe_timeout", 5.0)
+
+    def fake_period(symbol, kline_type):
+        threads.append(threading.current_thread().name)
+        time.sleep(0.05)
+        return {"categoryData": ["d"], "klineType": kline_type}
+
+    monkeypatch.setattr(data_service, "get_kline_data_for_period", fake_period)
+    result = data_service.get_multi_timeframe_klines("BTC")
+
+    assert set(result) == {"hourly_72h", "daily_60d", "weekly_1y", "monthly_all"}
+    assert all(name.startswith("exec-klines") for name in threads)
+    assert len(set(threads)) <= 2                       # 容量取 EXECUTOR_KLINE_WORKERS
+    assert get_executor(KLINES)._max_workers == 2
+
+
+def test_klines_metrics_exported(monkeypatch, fresh_klines_pool):
+    monkeypatch.setattr(data_service, "get_kline_data_for_period", lambda s, t: {"klineType": t})
+    before = EXECUTOR_WAIT_SECONDS.snapshot(executor=KLINES)["count"]
+    data_service.get_multi_timeframe_klines("BTC", types=(1, 2, 3))
+
+    deadline = time.time() + 2
+    while EXECUTOR_ACTIVE.get(executor=KLINES) and time.time() < deadline:
+        time.sleep(0.01)
+    assert EXECUTOR_WAIT_SECONDS.snapshot(executor=KLINES)["count"] == before + 3
+    assert EXECUTOR_QUEUED.get(executor=KLINES) == 0
+    assert EXECUTOR_ACTIVE.get(executor=KLINES) == 0
+    assert 'executor_queue_depth{executor="klines"}' in render()
+
+
+def test_pool_sizes_cover_every_named_pool():
+    sizes = executors._pool_sizes()
+    for name in (executors.INTERACTIVE, executors.BIGORDER, executors.SETTLEMENT,
+                 executors.MARKET_SCAN, executors.MAINTENANCE, KLINES):
+        assert sizes[name] >= 1
@@ -0,0 +1,180 @@
+"""文件锁与扫描刷新协调：进程内单飞、跨进程互斥、探测不抢锁、持有者被杀后探测为空闲"""
+import asyncio
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from app.signals import alpha_scanner, scan_refresh, settlement
+from app.utils.file_lock import FileLock
+
+
+def _holder(path: str, events, release):
+    """子进程：拿锁后上报，等 release 事件再放锁退出"""
+    lock = FileLock("test", path=path)
+    events.put(("acquired", lock.try_acquire(), os.getpid()))
+    release.wait(30)
+    lock.release()
+    events.put(("released", True, os.getpid()))
+
+
+def _contender(path: str, events):
+    """子进程：抢一次锁并上报结果"""
+    lock = FileLock("test", path=path)
+    got = lock.try_acquire()
+    events.put(("contender", got, lock.is_locked_elsewhere()))
+    if got:
+        lock.release()
+
+
+def _prober(path: str, events, stop):
+    """子进程：不停探测锁状态，结束时上报探测次数"""
+    lock = FileLock("test", path=path)
+    events.put("probing")
+    count = 0
+    while not stop.is_set():
+        lock.is_locked_elsewhere()
+        count += 1
+    events.put(count)
+
+
+@pytest.fixture
+def lock_file(tmp_path):
+    return str(tmp_path / "mozi_test.lock")
+
+
+def test_cross_process_exclusion(lock_file):
+    ctx = multiprocessing.get_context("spawn")
+    events, release = ctx.Queue(), ctx.Event()
+    holder = ctx.Process(target=_holder, args=(lock_file, events, release), daemon=True)
+    holder.start()
+    try:
+        kind, got, pid = events.get(timeout=30)
+        assert (kind, got, pid) == ("acquired", True, holder.pid)
+        probe = FileLock("test", path=lock_file)
+        assert probe.is_locked_elsewhere()
+
+        contender = ctx.Process(target=_contender, args=(lock_file, events), daemon=True)
+        contender.start()
+        assert events.get(timeout=30) == ("contender", False, True)
+        contender.join(10)
+        assert not probe.try_acquire()
+
+        release.set()
+        assert events.get(timeout=30)[0] == "released"
+        holder.join(10)
+        assert not probe.is_locked_elsewhere()
+        assert probe.try_acquire()
+        probe.release()
+    finally:
+        release.set()
+        holder.join(5)
+        if holder.is_alive():
+            holder.kill()
+
+
+def test_killed_holder_is_not_reported_as_locked(lock_file):
+    ctx = multiprocessing.get_context("spawn")
+    events, release = ctx.Queue(), ctx.Event()
+    holder = ctx.Process(target=_holder, args=(lock_file, events, release), daemon=True)
+    holder.start()
+    assert events.get(timeout=30)[:2] == ("acquired", True)
+    os.kill(holder.pid, signal.SIGKILL)
+    holder.join(10)
+    lock = FileLock("test", path=lock_file)
+    assert not lock.is_locked_elsewhere()        # 文件里残留的 pid 已不存活
+    assert lock.try_acquire()
+    lock.release()
+
+
+def test_probe_never_makes_concurrent_acquire_fail(lock_file):
+    """另一个进程不停探测（/scan 与 wait_peer 轮询），本进程反复拿锁放锁：探测不加锁，拿锁一次都不能失败"""
+    ctx = multiprocessing.get_context("spawn")
+    events, stop = ctx.Queue(), ctx.Event()
+    prober = ctx.Process(target=_prober, args=(lock_file, events, stop), daemon=True)
+    prober.start()
+    try:
+        assert events.get(timeout=30) == "probing"
+        worker = FileLock("test", path=lock_file)
+        attempts = failures = 0
+        deadline = time.time() + 1.0
+        while time.time() < deadline:
+            attempts += 1
+            if worker.try_acquire():
+                worker.release()
+            else:
+                failures += 1
+    finally:
+        stop.set()
+        prober.join(10)
+    assert failures == 0, f"{failures}/{attempts} 次拿锁被探测挤掉"
+    assert events.get(timeout=10) > 100
+
+
+def test_release_clears_holder_pid(lock_file):
+    lock = FileLock("test", path=lock_file)
+    assert lock.try_acquire()
+    with open(lock_file) as f:
+        assert f.read() == str(os.getpid())
+    assert FileLock("test", path=lock_file).is_locked_elsewhere()
+    lock.release()
+    with open(lock_file) as f:
+        assert f.read() == ""
+    assert not FileLock("test", path=lock_file).is_locked_elsewhere()
+
+
+def test_concurrent_refresh_calls_share_one_scan(lock_file, monkeypatch):
+    calls = []
+
+    async def fake_scan(concurrency=10):
+        calls.append(concurrency)
+        await asyncio.sleep(0.2)
+        return []
+
+    monkeypatch.setattr(scan_refresh, "_lock", FileLock("test", path=lock_file))
+    monkeypatch.setattr(scan_refresh, "_inflight", None)
+    monkeypatch.setattr(alpha_scanner, "scan_all_coins", fake_scan)
+    monkeypatch.setattr(settlement, "save_signal_cards", lambda cards: 0)
+    monkeypatch.setattr(settlement, "save_scan_batch", lambda results, elapsed: None)
+
+    async def main():
+        first = await asyncio.gather(*(scan_refresh.refresh() for _ in range(8)))
+        assert not scan_refresh.is_refreshing()
+        second = await scan_refresh.refresh()
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert len(calls) == 2                           # 8 个并发调用共享一次扫描，之后再刷新才是第二次
+    assert all(r is first[0] for r in first) and first[0].leader
+    assert second is not first[0]
+    assert not scan_refresh._lock.held
+
+
+def test_refresh_skips_when_peer_holds_lock(lock_file, monkeypatch):
+    ctx = multiprocessing.get_context("spawn")
+    events, release = ctx.Queue(), ctx.Event()
+    holder = ctx.Process(target=_holder, args=(lock_file, events, release), daemon=True)
+    holder.start()
+    try:
+        assert events.get(timeout=30)[:2] == ("acquired", True)
+        monkeypatch.setattr(scan_refresh, "_lock", FileLock("test", path=lock_file))
+        monkeypatch.setattr(scan_refresh, "_inflight", None)
+        monkeypatch.setattr(alpha_scanner, "scan_all_coins", pytest.fail)
+
+        async def main():
+            assert scan_refresh.is_refreshing()
+            assert await scan_refresh.refresh(wait_peer=False) is None
+            threading.Timer(0.5, release.set).start()
+            t0 = time.time()
+            peer = await scan_refresh.refresh()
+            return peer, time.time() - t0
+
+        peer, waited = asyncio.run(main())
+        assert peer.leader is False and peer.results == []
+        assert waited >= 0.4
+    finally:
+        release.set()
+        holder.join(5)
@@ -0,0 +1,284 @@
+"""历史记录 keyset 分页：游标编解码往返、坏游标 400、同一 created_at 的行翻页不跳不重、
+未知字段拒绝、NDJSON 导出在客户端断开时关连接；data_proxy 的字段表 / 游标编码与 app 侧一致
+
+三个 /history 端点（signals 直连、data_proxy、bigorder）都对着 SQLite 冒充的 MySQL 跑。
+"""
+import importlib.util
+import json
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.bigorder import endpoints as bigorder_endpoints
+from app.signals import endpoints as signal_endpoints
+from app.signals import settlement
+from app.utils import keyset
+from tests import sqlite_mysql
+from tests.conftest import ROOT
+from tests.stub_server import serve
+
+NOW = datetime(2026, 3, 10, 12, 0, 0)
+
+SCHEMA = """
+CREATE TABLE signal_card_history (
+    id INTEGER PRIMARY KEY,
+    coin TEXT, direction TEXT, grade TEXT,
+    entry_low REAL, entry_high REAL, stop_loss REAL, take_profit REAL, current_price REAL,
+    confidence REAL, risk_reward_ratio REAL, status TEXT, settled_price REAL, pnl_pct REAL,
+    regime TEXT, strategy_version TEXT, sources_json TEXT, math_json TEXT,
+    created_at TIMESTAMP, settled_at TIMESTAMP
+);
+CREATE TABLE anomaly_history (
+    id INTEGER PRIMARY KEY,
+    coin TEXT, exchange TEXT, total_score REAL, level TEXT, net_flow_score REAL, density_score REAL,
+    ratio_score REAL, price_score REAL, buy_amount REAL, sell_amount REAL, net_flow REAL,
+    price_change_pct REAL, llm_analysis TEXT, timestamp INTEGER, created_at TIMESTAMP
+);
+"""
+
+
+def _created_at(i):
+    """每 4 行共用一个 created_at：分页边界一定会落在并列的行中间"""
+    return NOW - timedelta(minutes=10 * (i // 4))
+
+
+@pytest.fixture
+def db(monkeypatch):
+    conn = sqlite_mysql.connect(SCHEMA, NOW)
+    conn.raw.executemany(
+        "INSERT INTO signal_card_history (coin, direction, grade, entry_low, entry_high, stop_loss, take_profit, "
+        "current_price, confidence, risk_reward_ratio, status, sources_json, created_at) "
+        "VALUES (?, 'long', 'A', 99, 101, 95, 110, 100, 70, 2, 'pending', '[]', ?)",
+        [("BTC" if i % 3 else "ETH", _created_at(i)) for i in range(30)])
+    conn.raw.executemany(
+        "INSERT INTO anomaly_history (coin, exchange, total_score, level, timestamp, created_at) "
+        "VALUES (?, 'binance', 80, 'high', 0, ?)",
+        [("BTC", _created_at(i)) for i in range(30)])
+    conn.raw.commit()
+    monkeypatch.setattr(settlement, "_USE_PROXY", False)
+    monkeypatch.setattr(settlement, "_get_conn", lambda: conn)
+    monkeypatch.setattr(bigorder_endpoints, "_history_conn", lambda read_timeout=10: conn)
+    return conn
+
+
+def _app():
+    app = FastAPI()
+    app.include_router(signal_endpoints.router, prefix="/api/v1/signals")
+    app.include_router(bigorder_endpoints.router, prefix="/bigorder/v1")
+    return app
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(_app())
+
+
+def _load_proxy():
+    spec = importlib.util.spec_from_file_location("_history_keyset_proxy", ROOT / "deploy" / "data_proxy.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def proxy(db, monkeypatch):
+    module = _load_proxy()
+    monkeypatch.setattr(module, "_get_conn", lambda: db)
+    return module
+
+
+def _expected_ids(db, table, where=""):
+    return [r[0] for r in db.raw.execute(f"SELECT id FROM {table} {where} ORDER BY created_at DESC, id DESC")]
+
+
+# ── 游标 / 字段工具 ───────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("ts", [datetime(2026, 3, 10, 12, 0, 0), datetime(2026, 3, 10, 12, 0, 0, 123456),
+                                datetime(1999, 12, 31, 23, 59, 59, 999999)])
+@pytest.mark.parametrize("row_id", [1, 7, 2 ** 40])
+def test_cursor_round_trip(ts, row_id):
+    cursor = keyset.encode_cursor(ts, row_id)
+    assert "=" not in cursor
+    assert keyset.decode_cursor(cursor) == (ts, row_id)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "!!!", keyset.encode_cursor(NOW, 1)[:-3],
+                                    "MjAyNi0wMy0xMA"])        # 合法 base64，内容不是 ts|id
+def test_decode_rejects_bad_cursor(cursor):
+    with pytest.raises(ValueError):
+        keyset.decode_cursor(cursor)
+
+
+def test_parse_fields():
+    allowed = ("id", "coin", "grade", "sources")
+    assert keyset.parse_fields(None, allowed, ("id", "coin")) == ["id", "coin"]
+    assert keyset.parse_fields(" grade, id ,grade,,", allowed, ("id",)) == ["grade", "id"]
+    assert keyset.parse_fields(",", allowed, ("id",)) == ["id"]
+    with pytest.raises(ValueError, match="unknown field: secret"):
+        keyset.parse_fields("id,secret", allowed, ("id",))
+
+
+# ── 端点分页 ─────────────────────────────────────────────────────────────────
+
+def _pages(get, limit):
+    ids, cursor, pages = [], None, 0
+    while True:
+        body = get({"limit": limit, **({"cursor": cursor} if cursor else {})})
+        pages += 1
+        ids += [c["id"] for c in body["cards"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            return ids, pages
+        assert pages < 100
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4, 5, 7, 30, 200])
+def test_signal_history_pages_ties_without_skip_or_duplicate(db, client, limit):
+    ids, _ = _pages(lambda p: client.get("/api/v1/signals/history", params=p).json(), limit)
+    assert ids == _expected_ids(db, "signal_card_history")
+
+
+def test_signal_history_total_only_on_first_page(db, client):
+    first = client.get("/api/v1/signals/history", params={"limit": 5, "coin": "btc"}).json()
+    assert first["total"] == 20 and first["count"] == 5
+    second = client.get("/api/v1/signals/history", params={"limit": 5, "coin": "btc",
+                                                            "cursor": first["next_cursor"]}).json()
+    assert second["total"] is None
+    ids = [c["id"] for c in first["cards"] + second["cards"]]
+    assert ids == _expected_ids(db, "signal_card_history", "WHERE coin = 'BTC'")[:10]
+
+
+@pytest.mark.parametrize("limit", [1, 4, 6, 30])
+def test_bigorder_history_pages_ties_without_skip_or_duplicate(db, client, limit):
+    def get(params):
+        body = client.get("/bigorder/v1/history", params=params).json()
+        return dict(body, cards=body["data"])
+
+    ids, _ = _pages(get, limit)
+    assert ids == _expected_ids(db, "anomaly_history")
+
+
+@pytest.mark.parametrize("limit", [1, 4, 6, 30])
+def test_proxy_history_pages_ties_without_skip_or_duplicate(db, proxy, limit):
+    proxy_client = TestClient(proxy.app)
+    ids, _ = _pages(lambda p: proxy_client.get("/api/history", params={"key": proxy.API_KEY, **p}).json(), limit)
+    assert ids == _expected_ids(db, "signal_card_history")
+
+
+@pytest.mark.parametrize("path", ["/api/v1/signals/history", "/bigorder/v1/history"])
+@pytest.mark.parametrize("params", [{"cursor": "not-a-cursor"}, {"fields": "id,password"}])
+def test_bad_cursor_or_unknown_field_is_400(client, path, params):
+    resp = client.get(path, params=params)
+    assert resp.status_code == 400
+    assert "invalid cursor" in resp.json()["error"] or "unknown field" in resp.json()["error"]
+
+
+def test_proxy_rejects_bad_cursor_and_unknown_field(proxy):
+    proxy_client = TestClient(proxy.app)
+    bad = proxy_client.get("/api/history", params={"key": proxy.API_KEY, "cursor": "not-a-cursor"}).json()
+    assert bad == {"ok": False, "error": "invalid cursor: not-a-cursor"}
+    unknown = proxy_client.get("/api/history", params={"key": proxy.API_KEY, "fields": "id,password"}).json()
+    assert unknown == {"ok": False, "error": "unknown field: password"}
+
+
+def test_fields_projection(client):
+    body = client.get("/api/v1/signals/history", params={"limit": 2, "fields": "coin,sources,id"}).json()
+    assert [set(c) for c in body["cards"]] == [{"coin", "sources", "id"}] * 2
+    assert body["cards"][0]["sources"] == []
+    assert body["next_cursor"]                                     # 投影里没选 created_at 也能出游标
+
+
+def test_ndjson_export_streams_all_matching_rows(db, client):
+    resp = client.get("/api/v1/signals/history", params={"format": "ndjson", "limit": 1, "fields": "id,created_at"})
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["id"] for r in rows] == _expected_ids(db, "signal_card_history")
+
+
+# ── data_proxy 与 app 侧一致 ─────────────────────────────────────────────────
+
+def test_proxy_fields_and_cursor_match_app(proxy):
+    assert set(proxy._HISTORY_FIELDS) == set(signal_endpoints._HISTORY_FIELDS)
+    assert proxy._HISTORY_DEFAULT_FIELDS == signal_endpoints._HISTORY_DEFAULT_FIELDS
+    for name, (cols, _) in signal_endpoints._HISTORY_FIELDS.items():
+        assert proxy._HISTORY_FIELDS[name][0] == cols, name
+
+    for ts in (NOW, NOW.replace(microsecond=654321)):
+        assert proxy._encode_cursor(ts, 42) == keyset.encode_cursor(ts, 42)
+        assert proxy._decode_cursor(keyset.encode_cursor(ts, 42)) == (ts, 42)
+
+
+def test_proxy_rows_match_app_rows(db, client, proxy):
+    fields = ",".join(signal_endpoints._HISTORY_FIELDS)
+    app_body = client.get("/api/v1/signals/history", params={"limit": 7, "fields": fields}).json()
+    proxy_body = TestClient(proxy.app).get("/api/history", params={"key": proxy.API_KEY, "limit": 7,
+                                                                   "fields": fields}).json()
+    assert proxy_body["cards"] == app_body["cards"]
+    assert proxy_body["next_cursor"] == app_body["next_cursor"]
+
+
+# ── NDJSON 客户端断开 ────────────────────────────────────────────────────────
+
+class _TrackedConn:
+    """包一层：记录 close、逐行慢读（导出不会在断开之前就已经写完）"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.closed = threading.Event()
+        self.rows_read = 0
+
+    def cursor(self, cursorclass=None):
+        inner = self.conn.cursor(cursorclass)
+        outer = self
+
+        class _Slow:
+            def execute(self, sql, params=()):
+                inner.execute(sql, params)
+
+            def __iter__(self):
+                for row in inner:
+                    outer.rows_read += 1
+                    time.sleep(0.01)
+                    yield row
+
+            def close(self):
+                inner.close()
+
+        return _Slow()
+
+    def close(self):
+        self.closed.set()
+
+
+def test_stream_ndjson_closes_connection_when_consumer_stops(db):
+    tracked = _TrackedConn(db)
+    gen = keyset.stream_ndjson(lambda: tracked, "SELECT id FROM signal_card_history ORDER BY id", [])
+    assert json.loads(next(gen)) == {"id": 1}
+    gen.close()                                                     # StreamingResponse 丢弃迭代器
+    assert tracked.closed.is_set() and tracked.rows_read == 1
+
+
+def test_ndjson_export_closes_connection_on_client_disconnect(db, monkeypatch):
+    db.raw.executemany("INSERT INTO signal_card_history (coin, direction, grade, status, created_at) "
+                       "VALUES ('DOGE', 'long', 'B', 'pending', ?)", [(NOW - timedelta(seconds=i),) for i in range(500)])
+    db.raw.commit()
+    tracked = _TrackedConn(db)
+    monkeypatch.setattr(settlement, "_get_conn", lambda: tracked)
+
+    with serve(_app()) as base_url:
+        port = int(base_url.rsplit(":", 1)[1])
+        sock = socket.create_connection(("127.0.0.1", port))
+        sock.sendall(b"GET /api/v1/signals/history?format=ndjson&fields=id HTTP/1.1\r\n"
+                     b"Host: test\r\nConnection: close\r\n\r\n")
+        received = b""
+        while b'{"id"' not in received:
+            received += sock.recv(4096)
+        sock.close()                                                # 只读到开头就断开
+
+        assert tracked.closed.wait(5)
+    assert tracked.rows_read < 200                                  # 没把 530 行读完才关
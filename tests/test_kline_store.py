@@ -0,0 +1,215 @@
+"""KlineStore 对着本地 stub 上游：尾部增量合并、缺根回退整段、重启后从磁盘加载、
+合并失败不留半合并状态、无尾部参数时整段合并只写变化的根
+
+上游走真实的 data_service._fetch_kline_payload（HTTP + fetch_json_cached），stub 记录每次请求。
+"""
+import copy
+from typing import Dict, List, Optional
+
+import pytest
+from fastapi import FastAPI, Query
+
+from app.services import data_service
+from app.services.kline_store import KlineStore, merge_tail
+from tests.stub_server import serve
+
+TAIL_PARAM = "limit"
+
+
+class Upstream:
+    """滚动窗口的 K 线源：bars 为 (时间串, 收盘价)，window 为整段返回的根数（None 为全量）"""
+
+    def __init__(self):
+        self.series: Dict[int, List[tuple]] = {}
+        self.window: Dict[int, Optional[int]] = {}
+        self.requests: List[tuple] = []
+        self.fail = False
+        self.fail_full = False          # 只让整段拉取失败（尾部照常返回）
+
+    def seed(self, kline_type: int, count: int, window: Optional[int]):
+        self.series[kline_type] = [(self._key(i), 100.0 + i) for i in range(count)]
+        self.window[kline_type] = window
+
+    @staticmethod
+    def _key(i: int) -> str:
+        return f"2026-01-01 {i // 60:02d}:{i % 60:02d}"
+
+    def advance(self, kline_type: int, new_bars: int, revise_last: float = None):
+        bars = self.series[kline_type]
+        if revise_last is not None:
+            bars[-1] = (bars[-1][0], revise_last)
+        start = len(bars)
+        bars.extend((self._key(i), 100.0 + i) for i in range(start, start + new_bars))
+
+    def payload(self, kline_type: int, tail: Optional[int] = None) -> dict:
+        bars = self.series[kline_type]
+        window = self.window[kline_type]
+        if window:
+            bars = bars[-window:]
+        if tail:
+            bars = bars[-tail:]
+        return {
+            "coinName": "BTC",
+            "categoryData": [k for k, _ in bars],
+            "xAxisData": [k[-5:] for k, _ in bars],
+            "values": [[v, v + 1, v - 1, v] for _, v in bars],
+        }
+
+    def app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.get("/detail/kline")
+        def kline(symbol: str, type: int, limit: Optional[int] = Query(None)):
+            self.requests.append((symbol, type, limit))
+            if self.fail or (self.fail_full and limit is None):
+                return {"code": 1, "errorMsg": "upstream down"}
+            return {"code": 0, "data": self.payload(type, limit)}
+
+        return app
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    up = Upstream()
+    up.seed(1, 80, window=72)
+    up.seed(4, 30, window=None)
+    with serve(up.app()) as base_url:
+        monkeypatch.setattr(data_service.settings, "kline_api_base", base_url)
+        monkeypatch.setattr(data_service.settings, "kline_tail_param", TAIL_PARAM)
+        monkeypatch.setattr(data_service.settings, "api_max_retries", 1)
+        data_service._api_cache.clear()
+        yield up
+    data_service._api_cache.clear()
+
+
+def _store(path, **kwargs) -> KlineStore:
+    params = dict(fresh_seconds=0, tail_bars=3, full_refresh_seconds=3600)
+    params.update(kwargs)
+    return KlineStore(str(path), data_service._fetch_kline_payload, **params)
+
+
+def _next_scan():
+    """两次扫描之间 URL 缓存已过期（fetch_json_cached 的 30s）"""
+    data_service._api_cache.clear()
+
+
+def test_tail_merge_revises_last_bar_and_appends(upstream, tmp_path):
+    store = _store(tmp_path / "k.sqlite3")
+    assert store.get("BTC", 1) == upstream.payload(1)
+    assert upstream.requests == [("BTC", 1, None)]
+
+    upstream.advance(1, new_bars=2, revise_last=999.0)
+    _next_scan()
+    result = store.get("BTC", 1)
+
+    assert upstream.requests[-1] == ("BTC", 1, 3)
+    assert result == upstream.payload(1)
+    assert len(result["categoryData"]) == 72       # 滚动窗口长度保持
+    assert result["values"][-3][0] == 999.0        # 未收盘那根被覆盖
+
+
+def test_unbounded_monthly_only_grows(upstream, tmp_path):
+    store = _store(tmp_path / "k.sqlite3")
+    store.get("BTC", 4)
+    upstream.advance(4, new_bars=1)
+    _next_scan()
+    result = store.get("BTC", 4)
+    assert upstream.requests[-1] == ("BTC", 4, 3)
+    assert len(result["categoryData"]) == 31
+    assert result == upstream.payload(4)
+
+
+def test_gap_falls_back_to_full_fetch(upstream, tmp_path):
+    store = _store(tmp_path / "k.sqlite3")
+    store.get("BTC", 1)
+
+    upstream.advance(1, new_bars=5)                # 超过 tail_bars：尾部与本地无重叠
+    _next_scan()
+    result = store.get("BTC", 1)
+
+    assert upstream.requests[-2:] == [("BTC", 1, 3), ("BTC", 1, None)]
+    assert result == upstream.payload(1)
+
+
+def test_reload_from_disk_then_continue_incrementally(upstream, tmp_path):
+    path = tmp_path / "k.sqlite3"
+    _store(path).get("BTC", 1)
+    first = upstream.payload(1)
+
+    # 新进程：新鲜期内直接从磁盘出数，不发请求
+    fresh = _store(path, fresh_seconds=3600)
+    before = len(upstream.requests)
+    assert fresh.get("BTC", 1) == first
+    assert len(upstream.requests) == before
+
+    # 新鲜期过后从磁盘状态增量续上
+    upstream.advance(1, new_bars=1)
+    _next_scan()
+    restarted = _store(path)
+    assert restarted.get("BTC", 1) == upstream.payload(1)
+    assert upstream.requests[-1] == ("BTC", 1, 3)
+
+    # 再一个进程读到的是增量写回后的磁盘内容
+    assert _store(path, fresh_seconds=3600).get("BTC", 1) == upstream.payload(1)
+
+
+def test_upstream_error_serves_local_copy(upstream, tmp_path):
+    store = _store(tmp_path / "k.sqlite3")
+    local = store.get("BTC", 1)
+    upstream.fail = True
+    _next_scan()
+    assert store.get("BTC", 1) == local
+
+
+def test_without_tail_param_fetches_full_but_still_merges(upstream, tmp_path, monkeypatch):
+    monkeypatch.setattr(data_service.settings, "kline_tail_param", "")
+    store = _store(tmp_path / "k.sqlite3", incremental=False)
+    store.get("BTC", 1)
+    upstream.advance(1, new_bars=1)
+    _next_scan()
+    assert store.get("BTC", 1) == upstream.payload(1)
+    assert all(limit is None for _, _, limit in upstream.requests)
+
+
+def test_failed_merge_leaves_series_untouched(upstream, tmp_path):
+    store = _store(tmp_path / "k.sqlite3")
+    local = store.get("BTC", 1)
+    series = store._series[("BTC", 1)]
+    snapshot = copy.deepcopy(series)
+
+    # 尾部首根能对上、先改了一根，随后出现一根早于末根的新 bar → 无法合并
+    bars = upstream.series[1]
+    bars[-2] = (bars[-2][0], 555.0)
+    bars.insert(-1, (bars[-2][0] + ":30", 556.0))
+    assert merge_tail(series, upstream.payload(1, tail=3), bounded=True) is None
+    assert series == snapshot
+
+    upstream.fail_full = True                      # 回退整段也失败
+    _next_scan()
+    assert store.get("BTC", 1) == local
+    assert upstream.requests[-2:] == [("BTC", 1, 3), ("BTC", 1, None)]
+    assert store._series[("BTC", 1)] == snapshot
+    assert _store(tmp_path / "k.sqlite3", fresh_seconds=3600).get("BTC", 1) == local
+
+
+def test_without_tail_param_writes_only_changed_bars(upstream, tmp_path, monkeypatch):
+    monkeypatch.setattr(data_service.settings, "kline_tail_param", "")
+    path = tmp_path / "k.sqlite3"
+    store = _store(path, incremental=False)
+    store.get("BTC", 1)
+
+    upstream.advance(1, new_bars=1, revise_last=777.0)
+    bars = upstream.series[1]
+    bars[-20] = (bars[-20][0], 333.0)              # 整段拉取也带回了较早一根的修订
+    _next_scan()
+    before = store._db.total_changes
+    assert store.get("BTC", 1) == upstream.payload(1)
+    # series 行 + 截掉的 1 根 + 新增 1 根 + 修订 2 根，而不是 72 删 + 72 插
+    assert store._db.total_changes - before == 5
+    assert _store(path, fresh_seconds=3600).get("BTC", 1) == upstream.payload(1)
+    assert len(upstream.requests) == 2
+
+    _next_scan()                                   # 无变化：只刷新 series 行
+    before = store._db.total_changes
+    assert store.get("BTC", 1) == upstream.payload(1)
+    assert store._db.total_changes - before == 1
@@ -0,0 +1,170 @@
+"""选主：多进程抢同一把文件锁只有一个 leader，leader 被杀后其他进程接管；锁 I/O 不走交互池"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fakeredis
+import pytest
+
+from app.core.leader import FileLeaderLock, LeaderElector, RedisLeaderLock
+
+WORKERS = 4
+CHECK_INTERVAL = 0.1
+
+
+class StubScheduler:
+    def __init__(self, events=None):
+        self.events = events if events is not None else []
+        self.running = False
+
+    def start(self, leader_only=None):
+        self.running = True
+        self.events.append("start")
+
+    async def stop(self, leader_only=None):
+        self.running = False
+        self.events.append("stop")
+
+
+def _worker(lock_dir: str, events):
+    """子进程：一个 uvicorn worker 的选主循环，成为 leader 时上报 pid"""
+    os.environ["LOCK_DIR"] = lock_dir
+
+    class Reporting(StubScheduler):
+        def start(self, leader_only=None):
+            events.put(("leader", os.getpid()))
+
+    async def main():
+        elector = LeaderElector(Reporting(), lock=FileLeaderLock(), check_interval=CHECK_INTERVAL)
+        await elector.start()
+        events.put(("ready", os.getpid()))
+        await asyncio.sleep(60)
+
+    asyncio.run(main())
+
+
+def _drain(events, timeout):
+    out = []
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            out.append(events.get(timeout=max(0.01, deadline - time.time())))
+        except queue.Empty:
+            break
+    return out
+
+
+def test_single_leader_across_processes_and_failover(tmp_path):
+    ctx = multiprocessing.get_context("spawn")
+    events = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(str(tmp_path), events), daemon=True) for _ in range(WORKERS)]
+    for p in procs:
+        p.start()
+    try:
+        seen = []
+        deadline = time.time() + 60
+        while sum(1 for kind, _ in seen if kind == "ready") < WORKERS and time.time() < deadline:
+            seen.extend(_drain(events, 0.5))
+        seen.extend(_drain(events, CHECK_INTERVAL * 5))   # 再等几个检查周期，确认没有第二个 leader
+        leaders = [pid for kind, pid in seen if kind == "leader"]
+        assert sum(1 for kind, _ in seen if kind == "ready") == WORKERS
+        assert len(leaders) == 1
+
+        first = leaders[0]
+        os.kill(first, signal.SIGKILL)
+        takeover = [pid for kind, pid in _drain(events, 3) if kind == "leader"]
+        assert len(takeover) == 1
+        assert takeover[0] != first and takeover[0] in {p.pid for p in procs}
+    finally:
+        for p in procs:
+            p.kill()
+            p.join(5)
+
+
+def test_redis_lease_single_holder_and_takeover_after_ttl():
+    server = fakeredis.FakeServer()
+    a = RedisLeaderLock(fakeredis.FakeRedis(server=server, decode_responses=True), ttl=0.3)
+    b = RedisLeaderLock(fakeredis.FakeRedis(server=server, decode_responses=True), ttl=0.3)
+    assert a.acquire() is True
+    assert b.acquire() is False
+    assert a.renew() is True
+
+    time.sleep(0.4)                 # a 停止续期（进程卡死 / 被杀），租约到期
+    assert b.acquire() is True
+    assert a.renew() is False       # 旧 leader 续期时发现 token 已不是自己的
+
+
+def test_lock_io_does_not_queue_behind_saturated_interactive_pool():
+    """默认执行器（interactive）被占满时，续期仍按时完成"""
+    events = []
+    lock_threads = []
+
+    class RecordingLock:
+        backend = "file"
+
+        def acquire(self):
+            lock_threads.append(threading.current_thread().name)
+            return True
+
+        def renew(self):
+            lock_threads.append(threading.current_thread().name)
+            return True
+
+        def release(self):
+            pass
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        interactive = ThreadPoolExecutor(max_workers=1, thread_name_prefix="interactive")
+        loop.set_default_executor(interactive)
+        blocker = threading.Event()
+        busy = loop.run_in_executor(None, blocker.wait, 5)   # 聊天把交互池占满
+
+        elector = LeaderElector(StubScheduler(events), lock=RecordingLock(), check_interval=CHECK_INTERVAL)
+        t0 = time.perf_counter()
+        await elector.start()
+        await asyncio.sleep(CHECK_INTERVAL * 3)
+        elapsed = time.perf_counter() - t0
+        await elector.stop()
+        blocker.set()
+        await busy
+        return elapsed
+
+    elapsed = asyncio.run(main())
+    assert elapsed < 1.0
+    assert len(lock_threads) >= 3
+    assert all(name.startswith("exec-leader") for name in lock_threads)
+    assert events == ["start", "stop"]
+
+
+@pytest.mark.parametrize("renew_ok", [True, False])
+def test_leader_stops_background_jobs_when_renew_fails(renew_ok):
+    events = []
+
+    class FlakyLock:
+        backend = "redis"
+
+        def acquire(self):
+            return True
+
+        def renew(self):
+            return renew_ok
+
+        def release(self):
+            pass
+
+    async def main():
+        elector = LeaderElector(StubScheduler(events), lock=FlakyLock(), check_interval=CHECK_INTERVAL)
+        await elector.start()
+        await asyncio.sleep(CHECK_INTERVAL * 1.5)
+        leader = elector.is_leader
+        elector._task.cancel()
+        return leader
+
+    assert asyncio.run(main()) is renew_ok
+    assert events == (["start"] if renew_ok else ["start", "stop"])
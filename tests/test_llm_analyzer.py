@@ -0,0 +1,123 @@
+"""LLMAnalyzer.enrich_many：总时限内返回，超时分组回填兜底文案"""
+import asyncio
+import time
+
+from app.bigorder.llm_analyzer import LLMAnalyzer
+from app.bigorder.models import AnomalySignal, SignalLevel, SignalScore
+
+
+def _signal(coin: str, score: float) -> AnomalySignal:
+    return AnomalySignal(coin=coin, exchange="binance",
+                         score=SignalScore(total_score=score, level=SignalLevel.STRONG))
+
+
+def _analyzer(complete):
+    analyzer = LLMAnalyzer.__new__(LLMAnalyzer)
+    analyzer.client = None
+    analyzer.model = "test"
+    analyzer._cache = {}
+    analyzer._complete = complete
+    return analyzer
+
+
+def test_enrich_many_bounded_by_deadline():
+    async def slow_batch(prompt, max_tokens=500):
+        # 批量调用超时后逐条补齐，单条同样很慢：原实现约为两倍单次超时
+        await asyncio.sleep(5)
+        return "never"
+
+    analyzer = _analyzer(slow_batch)
+    signals = [_signal(f"C{i}", 70 + i * 10) for i in range(4)]
+    started = time.monotonic()
+    asyncio.run(analyzer.enrich_many(signals, batch_size=2, concurrency=2, deadline=0.3))
+    assert time.monotonic() - started < 1.5
+    for s in signals:
+        assert s.llm_analysis == analyzer._fallback_text(s)
+
+
+def test_enrich_many_keeps_finished_chunks():
+    async def complete(prompt, max_tokens=500):
+        if "SLOW" in prompt:
+            await asyncio.sleep(5)
+        return "ok"
+
+    analyzer = _analyzer(complete)
+    fast, slow = _signal("FAST", 70), _signal("SLOW", 90)
+    asyncio.run(analyzer.enrich_many([fast, slow], batch_size=1, concurrency=2, deadline=0.3))
+    assert fast.llm_analysis == "ok"
+    assert slow.llm_analysis == analyzer._fallback_text(slow)
+
+
+def _scored(coin="BTC", total=72.0, flow=60.0, density=40.0, net_flow=1e6, level=SignalLevel.STRONG):
+    score = SignalScore(total_score=total, level=level)
+    score.net_flow.score = flow
+    score.density.score = density
+    return AnomalySignal(coin=coin, exchange="binance", score=score, net_flow=net_flow)
+
+
+def test_cache_key_stable_under_jitter_below_bucket():
+    analyzer = _analyzer(None)
+    base = analyzer.cache_key(_scored())
+    # 各维得分在同一个 5 分桶内抖动：同一个 key
+    assert analyzer.cache_key(_scored(total=71.0, flow=61.2, density=38.0)) == base
+    assert analyzer.cache_key(_scored(total=72.4, flow=58.1, density=41.9)) == base
+    # 跨桶 / 等级 / 资金方向 / 语言变化：不同 key
+    assert analyzer.cache_key(_scored(total=73.0)) != base
+    assert analyzer.cache_key(_scored(flow=64.0)) != base
+    assert analyzer.cache_key(_scored(level=SignalLevel.MEDIUM)) != base
+    assert analyzer.cache_key(_scored(net_flow=-1e6)) != base
+    assert analyzer.cache_key(_scored(), lang="en") != base
+    assert analyzer.cache_key(_scored(coin="ETH")) != base
+
+
+def test_parse_batch_output_handles_missing_and_out_of_order_sections():
+    text = """前导说明，不属于任何信号
+=== SIGNAL 2 ===
+第三条
+  ===  signal 0  ===
+第一条
+=== SIGNAL 7 ===
+越界编号
+=== SIGNAL 0 ===
+重复编号，保留第一次
+=== SIGNAL 3 ===
+"""
+    assert LLMAnalyzer._parse_batch_output(text, 4) == {2: "第三条", 0: "第一条"}
+    assert LLMAnalyzer._parse_batch_output("", 3) == {}
+    assert LLMAnalyzer._parse_batch_output("没有任何标记", 3) == {}
+
+
+def test_analyze_batch_falls_back_only_for_missing_sections():
+    prompts = []
+
+    async def complete(prompt, max_tokens=500):
+        prompts.append(prompt)
+        if "=== SIGNAL <idx> ===" in prompt:
+            return "=== SIGNAL 2 ===\nC2 解读\n=== SIGNAL 0 ===\nC0 解读"
+        return "单条补齐"
+
+    analyzer = _analyzer(complete)
+    signals = [_scored(coin=f"C{i}", total=60 + i * 10) for i in range(3)]
+    results = asyncio.run(analyzer.analyze_batch(signals))
+    assert results == ["C0 解读", "单条补齐", "C2 解读"]
+    assert len(prompts) == 2                                  # 一次批量 + 缺失的 C1 单条
+    assert analyzer._cache_get(analyzer.cache_key(signals[2])) == "C2 解读"
+
+
+def test_enrich_many_semaphore_bounds_concurrency():
+    in_flight = 0
+    peak = 0
+
+    async def complete(prompt, max_tokens=500):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return "ok"
+
+    analyzer = _analyzer(complete)
+    signals = [_signal(f"C{i}", 50 + i * 5) for i in range(8)]
+    asyncio.run(analyzer.enrich_many(signals, batch_size=1, concurrency=2, deadline=5))
+    assert peak == 2
+    assert all(s.llm_analysis == "ok" for s in signals)
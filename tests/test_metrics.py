@@ -0,0 +1,146 @@
+"""metrics：Histogram 桶计算与 Prometheus 文本导出"""
+import math
+
+import pytest
+
+from app.utils.metrics import Registry, time_block
+
+
+def _lines(text: str, prefix: str):
+    return [line for line in text.splitlines() if line.startswith(prefix)]
+
+
+def test_histogram_cumulative_buckets_and_inf():
+    reg = Registry()
+    h = reg.histogram("lat_seconds", "latency", ["route"], buckets=(0.1, 1.0, 0.5))
+    assert h.buckets == (0.1, 0.5, 1.0, math.inf)
+    for v in (0.05, 0.1, 0.3, 0.7, 5.0):  # 0.1 恰好落在 le=0.1（含边界）
+        h.observe(v, route="/a")
+
+    snap = h.snapshot(route="/a")
+    assert snap["buckets"] == [(0.1, 2.0), (0.5, 3.0), (1.0, 4.0), (math.inf, 5.0)]
+    assert snap["count"] == 5
+    assert snap["sum"] == pytest.approx(6.15)
+
+    text = reg.render()
+    assert _lines(text, "lat_seconds_bucket") == [
+        'lat_seconds_bucket{route="/a",le="0.1"} 2.0',
+        'lat_seconds_bucket{route="/a",le="0.5"} 3.0',
+        'lat_seconds_bucket{route="/a",le="1.0"} 4.0',
+        'lat_seconds_bucket{route="/a",le="+Inf"} 5.0',
+    ]
+    assert _lines(text, "lat_seconds_sum") == [f'lat_seconds_sum{{route="/a"}} {repr(0.05 + 0.1 + 0.3 + 0.7 + 5.0)}']
+    assert _lines(text, "lat_seconds_count") == ['lat_seconds_count{route="/a"} 5.0']
+
+
+def test_histogram_label_sets_are_independent():
+    reg = Registry()
+    h = reg.histogram("h", "x", ["k"], buckets=(1.0,))
+    h.observe(0.5, k="a")
+    h.observe(2.0, k="b")
+    text = reg.render()
+    assert 'h_bucket{k="a",le="1.0"} 1.0' in text
+    assert 'h_bucket{k="b",le="1.0"} 0.0' in text
+    assert 'h_bucket{k="b",le="+Inf"} 1.0' in text
+
+
+def test_exposition_header_and_label_escaping():
+    reg = Registry()
+    c = reg.counter("req_total", "requests", ["path"])
+    c.inc(path='a"b\\c\nd')
+    g = reg.gauge("temp", "no labels")
+    g.set(3)
+    text = reg.render()
+    assert text.endswith("\n")
+    assert "# HELP req_total requests\n# TYPE req_total counter" in text
+    assert 'req_total{path="a\\"b\\\\c\\nd"} 1.0' in text
+    assert "# TYPE temp gauge\ntemp 3.0" in text
+    # 指标按名称排序输出
+    assert text.index("# HELP req_total") < text.index("# HELP temp")
+
+
+def test_histogram_rejects_le_label_and_bad_labels():
+    reg = Registry()
+    with pytest.raises(ValueError):
+        reg.histogram("bad", "x", ["le"])
+    h = reg.histogram("ok", "x", ["a"])
+    with pytest.raises(ValueError):
+        h.observe(1.0, b="x")
+
+
+def test_registry_reuses_and_checks_type():
+    reg = Registry()
+    assert reg.counter("n", "x") is reg.counter("n", "x")
+    with pytest.raises(ValueError):
+        reg.gauge("n", "x")
+
+
+def test_counter_rejects_negative():
+    reg = Registry()
+    with pytest.raises(ValueError):
+        reg.counter("c", "x").inc(-1)
+
+
+def test_time_block_outcome_label():
+    reg = Registry()
+    h = reg.histogram("step_seconds", "x", ["step", "outcome"])
+    with time_block(h, step="s"):
+        pass
+    with pytest.raises(RuntimeError):
+        with time_block(h, step="s"):
+            raise RuntimeError
+    assert h.snapshot(step="s", outcome="ok")["count"] == 1
+    assert h.snapshot(step="s", outcome="error")["count"] == 1
+
+
+def _route_labels(routes):
+    """跑一个带 _route_label 中间件的小应用，返回每个请求路径对应的标签"""
+    from fastapi import APIRouter, FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.main import _route_label
+
+    app = FastAPI()
+    labels = []
+
+    @app.middleware("http")
+    async def record(request, call_next):
+        response = await call_next(request)
+        labels.append(_route_label(request))
+        return response
+
+    @app.get("/coin/{coin}/signal")
+    def coin_signal(coin: str):
+        return {}
+
+    @app.get("/coin/{coin}/signal/{kind}")
+    def coin_signal_kind(coin: str, kind: str):
+        return {}
+
+    router = APIRouter(prefix="/api/v1/signals")
+
+    @router.get("/history/{coin}")
+    def history(coin: str):
+        return {}
+
+    app.include_router(router)
+    client = TestClient(app)
+    for path in routes:
+        client.get(path)
+    return labels
+
+
+def test_route_label_uses_matched_template():
+    assert _route_labels([
+        "/coin/BTC/signal",
+        "/coin/signal/signal",          # 参数值与静态段相同
+        "/coin/signal/signal/signal",
+        "/api/v1/signals/history/history",
+        "/nope",
+    ]) == [
+        "/coin/{coin}/signal",
+        "/coin/{coin}/signal",
+        "/coin/{coin}/signal/{kind}",
+        "/api/v1/signals/history/{coin}",
+        "unmatched",
+    ]
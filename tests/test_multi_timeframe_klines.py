@@ -0,0 +1,74 @@
+"""get_multi_timeframe_klines 对着带延迟的 stub：总耗时受 KLINE_TIMEFRAME_TIMEOUT 约束，慢周期置空
+
+三个周期各 0.5s、月线 3s，超时 1.5s：并发拉取应在 ~0.5s 拿到三个快周期，1.5s 时放弃月线；
+月线请求在后台跑完进缓存，下一次出卡直接命中。
+"""
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+
+from app.services import data_service
+from tests.stub_server import serve
+
+DELAYS = {1: 0.5, 2: 0.5, 3: 0.5, 4: 3.0}
+TIMEOUT = 1.5
+
+
+def _stub_app(calls):
+    app = FastAPI()
+
+    @app.get("/detail/kline")
+    async def kline(symbol: str, type: int):
+        calls.append(type)
+        await asyncio.sleep(DELAYS[type])
+        keys = [f"2026-01-{d:02d}" for d in range(1, 11)]
+        return {"code": 0, "data": {"categoryData": keys, "values": [[1, 2, 0, 1]] * len(keys)}}
+
+    return app
+
+
+@pytest.fixture
+def slow_upstream(monkeypatch):
+    calls = []
+    with serve(_stub_app(calls)) as base_url:
+        monkeypatch.setattr(data_service.settings, "kline_api_base", base_url)
+        monkeypatch.setattr(data_service.settings, "kline_timeframe_timeout", TIMEOUT)
+        monkeypatch.setattr(data_service.settings, "kline_store_enabled", False)
+        data_service._api_cache.clear()
+        yield calls
+    data_service._api_cache.clear()
+
+
+def test_slow_timeframe_is_cut_at_timeout(slow_upstream):
+    t0 = time.perf_counter()
+    result = data_service.get_multi_timeframe_klines("BTC")
+    elapsed = time.perf_counter() - t0
+
+    # 并发：不是 0.5*3 + 3 = 4.5s 串行，也不等月线的 3s
+    assert TIMEOUT - 0.05 <= elapsed < TIMEOUT + 0.5
+    for name in ("hourly_72h", "daily_60d", "weekly_1y"):
+        assert result[name]["categoryData"], name
+    assert result["monthly_all"] == {}
+
+
+def test_fast_timeframes_only_wait_for_slowest_fast_one(slow_upstream):
+    t0 = time.perf_counter()
+    result = data_service.get_multi_timeframe_klines("BTC", types=(1, 2, 3))
+    elapsed = time.perf_counter() - t0
+    assert elapsed < 1.2
+    assert all(result[name] for name in ("hourly_72h", "daily_60d", "weekly_1y"))
+
+
+def test_timed_out_request_finishes_in_background_and_is_cached(slow_upstream):
+    data_service.get_multi_timeframe_klines("BTC")
+    time.sleep(DELAYS[4] - TIMEOUT + 0.5)      # 等后台的月线请求跑完
+
+    t0 = time.perf_counter()
+    result = data_service.get_multi_timeframe_klines("BTC")
+    elapsed = time.perf_counter() - t0
+
+    assert elapsed < 0.3
+    assert result["monthly_all"]["categoryData"]
+    assert slow_upstream.count(4) == 1
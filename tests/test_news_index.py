@@ -0,0 +1,193 @@
+"""新闻按币种索引：增量同步拆币写入、精确匹配、去重、短 TTL 缓存与失效、回退源表、参数化、过期清理、
+回填完成前不切索引、水位前的重扫窗口
+
+源表和索引表都在 tests/sqlite_mysql 的 SQLite 库里；RLIKE 用 Python re 实现的 REGEXP 代替。
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import news_index as news_index_module
+from app.services.news_index import SOURCE_TABLE, NewsIndex, split_coins
+from tests import sqlite_mysql
+
+SCHEMA = f"""
+CREATE TABLE {SOURCE_TABLE} (
+    id INTEGER PRIMARY KEY,
+    title TEXT, topic TEXT, create_time DATETIME, coins TEXT
+);
+CREATE INDEX idx_src_time ON {SOURCE_TABLE} (create_time);
+"""
+
+NOW = datetime.now().replace(microsecond=0)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    conn = sqlite_mysql.connect(SCHEMA, NOW)
+    opened = []
+    index = NewsIndex()
+    monkeypatch.setattr(index, "_get_conn", lambda: opened.append(1) or conn)
+    monkeypatch.setattr(news_index_module.settings, "news_index_enabled", True)
+    monkeypatch.setattr(news_index_module.settings, "news_cache_ttl", 60)
+    monkeypatch.setattr(news_index_module.settings, "news_index_backfill_days", 7)
+    monkeypatch.setattr(news_index_module.settings, "news_index_sync_batch", 100)
+    monkeypatch.setattr(news_index_module.settings, "news_index_sync_overlap", 600)
+    return SimpleNamespace(conn=conn, index=index, opened=opened)
+
+
+def _add(db, minutes_ago, title, coins, topic="t"):
+    db.conn.raw.execute(f"INSERT INTO {SOURCE_TABLE} (title, topic, create_time, coins) VALUES (?,?,?,?)",
+                        (title, topic, NOW - timedelta(minutes=minutes_ago), coins))
+    db.conn.raw.commit()
+
+
+def _titles(news):
+    return [item.split("｜")[1] for item in news]
+
+
+def test_split_coins_handles_any_separator():
+    assert split_coins('["eth", "BTC"]') == ["ETH", "BTC"]
+    assert split_coins("ETH,ETHFI eth") == ["ETH", "ETHFI"]
+    assert split_coins(None) == []
+
+
+def test_sync_splits_coins_and_matches_exactly(db):
+    _add(db, 30, "eth up", "ETH")
+    _add(db, 20, "ethfi listing", "ETHFI")
+    _add(db, 10, "majors rally", "BTC,ETH")
+    assert db.index.sync() == 4
+
+    assert _titles(db.index.get_news("eth")) == ["majors rally", "eth up"]     # 不再命中 ETHFI
+    assert _titles(db.index.get_news("BTC")) == ["majors rally"]
+    item = db.index.get_news("ETHFI")[0]
+    assert item == f"{NOW - timedelta(minutes=20)}｜ethfi listing｜t"
+
+
+def test_sync_is_incremental_and_invalidates_touched_coins(db):
+    _add(db, 30, "old", "BTC")
+    db.index.sync()
+    assert _titles(db.index.get_news("BTC")) == ["old"]
+    assert db.index.sync() == 0                                  # >= 水位重读的行靠唯一键去重
+
+    _add(db, 5, "new", "BTC")
+    assert _titles(db.index.get_news("BTC")) == ["old"]          # 缓存未过期
+    assert db.index.sync() == 1
+    assert _titles(db.index.get_news("BTC")) == ["new", "old"]   # 同步写入后该币缓存失效
+
+
+def test_cache_expires_after_ttl(db, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(news_index_module, "time", SimpleNamespace(time=lambda: clock[0]))
+    _add(db, 30, "a", "SOL")
+    db.index.sync()
+    db.index.get_news("SOL")
+    opened = len(db.opened)
+    db.index.get_news("SOL")
+    assert len(db.opened) == opened                              # 命中缓存，不开连接
+
+    db.conn.raw.execute("DELETE FROM news_coin_index")
+    db.conn.raw.commit()
+    clock[0] += 61
+    assert db.index.get_news("SOL") == []
+    assert len(db.opened) == opened + 1
+
+
+def test_falls_back_to_source_table_when_index_empty(db):
+    _add(db, 30, "eth up", "ETH")
+    _add(db, 20, "ethfi listing", "ETHFI")
+    # 索引表没有数据：走源表参数化 RLIKE（子串匹配，保持原行为）
+    assert _titles(db.index.get_news("ETH")) == ["ethfi listing", "eth up"]
+
+
+def test_index_disabled_queries_source(db, monkeypatch):
+    _add(db, 30, "eth up", "ETH")
+    db.index.sync()
+    db.conn.raw.execute("DELETE FROM news_coin_index")
+    db.conn.raw.commit()
+    monkeypatch.setattr(news_index_module.settings, "news_index_enabled", False)
+    assert _titles(db.index.get_news("ETH")) == ["eth up"]
+
+
+@pytest.mark.parametrize("symbol", ["ETH' OR '1'='1", "ETH;DROP TABLE x", "", "E" * 33])
+def test_rejects_symbols_outside_whitelist_without_query(db, symbol):
+    assert db.index.get_news(symbol) == []
+    assert db.opened == []
+
+
+def test_sync_moves_past_timestamp_shared_by_more_than_a_batch(db, monkeypatch):
+    monkeypatch.setattr(news_index_module.settings, "news_index_sync_batch", 2)
+    for i in range(5):
+        _add(db, 10, f"same {i}", "BTC")
+    _add(db, 5, "later", "BTC")
+    _add(db, 4, "last", "ETH")
+    assert db.index.sync() == 7                                  # 同一时间戳一次读完，不停在原水位
+    assert len(db.index.get_news("BTC", 10)) == 6
+    assert _titles(db.index.get_news("ETH")) == ["last"]
+    assert db.index.sync() == 0
+
+
+def test_sync_backfill_window(db):
+    _add(db, 8 * 24 * 60, "too old", "BTC")
+    _add(db, 60, "recent", "BTC")
+    db.index.sync()
+    assert _titles(db.index.get_news("BTC")) == ["recent"]
+
+
+def test_sweep_retention_deletes_old_rows(db, monkeypatch):
+    monkeypatch.setattr(news_index_module.settings, "news_index_backfill_days", 60)
+    monkeypatch.setattr(news_index_module.settings, "news_index_retention_days", 30)
+    for i in range(3):
+        _add(db, (40 + i) * 24 * 60, f"old {i}", "BTC")
+    _add(db, 60, "recent", "BTC")
+    db.index.sync()
+    assert db.index.sweep_retention() == 3
+    assert db.conn.raw.execute("SELECT title FROM news_coin_index").fetchall() == [("recent",)]
+
+
+def test_index_not_used_until_backfill_reaches_source_end(db, monkeypatch):
+    monkeypatch.setattr(news_index_module.settings, "news_index_sync_batch", 2)
+    for i, (title, coins) in enumerate([("eth up", "ETH"), ("ethfi listing", "ETHFI"), ("btc", "BTC"),
+                                        ("eth down", "ETH"), ("sol", "SOL")]):
+        _add(db, 50 - i * 10, title, coins)
+
+    calls = []
+    real_split = news_index_module.split_coins
+
+    def failing_split(raw):
+        calls.append(raw)
+        if len(calls) == 3:
+            raise RuntimeError("connection lost")               # 第二批中途断开
+        return real_split(raw)
+
+    monkeypatch.setattr(news_index_module, "split_coins", failing_split)
+    assert db.index.sync() == 2
+    assert db.conn.raw.execute("SELECT COUNT(*) FROM news_coin_index").fetchone()[0] == 2
+
+    # 索引里已有部分数据，但回填没读到源表末尾：本进程和其他 worker 都仍查源表
+    assert _titles(db.index.get_news("ETH")) == ["eth down", "ethfi listing", "eth up"]
+    other = NewsIndex()
+    monkeypatch.setattr(other, "_get_conn", lambda: db.conn)
+    assert _titles(other.get_news("SOL")) == ["sol"]
+
+    monkeypatch.setattr(news_index_module, "split_coins", real_split)
+    db.index.sync()
+    db.index.invalidate()
+    assert _titles(db.index.get_news("ETH")) == ["eth down", "eth up"]          # 切到索引：精确匹配
+    (marker,) = db.conn.raw.execute("SELECT value FROM news_index_meta WHERE name = 'backfill_done'").fetchone()
+    assert marker == NOW - timedelta(minutes=10)
+
+    fresh = NewsIndex()                                            # 新 worker 读持久化标记
+    monkeypatch.setattr(fresh, "_get_conn", lambda: db.conn)
+    assert _titles(fresh.get_news("ETH")) == ["eth down", "eth up"]
+
+
+def test_sync_rescans_overlap_window_for_late_rows(db):
+    _add(db, 10, "first", "BTC")
+    db.index.sync()
+    _add(db, 15, "late within window", "BTC")                    # 比水位早 5 分钟才写入源表
+    _add(db, 30, "late beyond window", "BTC")                    # 比水位早 20 分钟：不再补
+    assert db.index.sync() == 1
+    db.index.invalidate()
+    assert _titles(db.index.get_news("BTC")) == ["first", "late within window"]
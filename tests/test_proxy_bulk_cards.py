@@ -0,0 +1,259 @@
+"""代理批量写卡 / 批量结算（data_proxy /api/save_signal_cards、/api/update_card_status_bulk）对着 SQLite：
+整批一次 executemany、只结算仍为 pending 的卡、胜率日聚合与状态更新同一事务、客户端只统计代理返回的
+updated、同一批 id 重复或并发结算不重复计数"""
+import importlib.util
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.signals import adaptive_strategy, settlement
+from app.signals.models import SignalDirection, SignalGrade
+from tests import sqlite_mysql
+from tests.conftest import ROOT
+
+NOW = datetime(2026, 3, 10, 15, 30, 0)
+
+SCHEMA = """
+CREATE TABLE signal_card_history (
+    id INTEGER PRIMARY KEY,
+    coin TEXT, direction TEXT, grade TEXT,
+    entry_low REAL, entry_high REAL, stop_loss REAL, take_profit REAL,
+    current_price REAL, invalidation_price REAL, confidence REAL, risk_reward_ratio REAL, position_pct REAL,
+    sources_json TEXT, math_json TEXT, strategy_version INTEGER, regime TEXT, adaptive_weights_json TEXT,
+    status TEXT, settled_price REAL, pnl_pct REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, settled_at TIMESTAMP
+);
+"""
+
+
+class _Cursor(sqlite_mysql.Cursor):
+    def execute(self, sql, args=()):
+        self._conn.calls.append(("execute", sql))
+        rowcount = super().execute(sql, args)
+        if sql.lstrip().startswith("SELECT") and "status = 'pending'" in sql:
+            time.sleep(self._conn.lock_hold)                      # 查完 pending 后多停一会，放大并发窗口
+        return rowcount
+
+    def executemany(self, sql, seq):
+        seq = list(seq)
+        self._conn.calls.append(("executemany", sql, len(seq)))
+        return super().executemany(sql, seq)
+
+
+class _Connection(sqlite_mysql.Connection):
+    """记录每条语句和提交次数的连接"""
+
+    def __init__(self, raw, now, lock_hold=0.0):
+        super().__init__(raw, now)
+        self.calls = []
+        self.lock_hold = lock_hold
+
+    def cursor(self, cursorclass=None):
+        return _Cursor(self, dict_rows=cursorclass is not None)
+
+    def commit(self):
+        self.calls.append(("commit",))
+        super().commit()
+
+
+def _load_proxy():
+    spec = importlib.util.spec_from_file_location("_bulk_cards_proxy", ROOT / "deploy" / "data_proxy.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class _Database:
+    """SQLite 文件库：每次 open 一条新连接（与 pymysql 每请求一条连接一样，并发请求才会真的抢锁）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conns = []
+        sqlite_mysql.connect(SCHEMA, NOW, path).raw.close()
+
+    def open(self, lock_hold=0.0):
+        conn = _Connection(sqlite_mysql.connect("", NOW, self.path).raw, NOW, lock_hold)
+        self.conns.append(conn)
+        return conn
+
+
+@pytest.fixture
+def db(tmp_path):
+    return _Database(str(tmp_path / "cards.db"))
+
+
+@pytest.fixture
+def proxy(db, monkeypatch, tmp_path):
+    module = _load_proxy()
+    holder = SimpleNamespace(lock_hold=0.0)
+    monkeypatch.setattr(module, "_get_conn", lambda: db.open(holder.lock_hold))
+    client = TestClient(module.app)
+    requests = []
+
+    def post(path, data):
+        requests.append((path, data))
+        return client.post(path, params={"key": module.API_KEY}, json=data).json()
+
+    def get(path, params=None):
+        return client.get(path, params={"key": module.API_KEY, **(params or {})}).json()
+
+    monkeypatch.setattr(settlement, "_USE_PROXY", True)
+    monkeypatch.setattr(settlement, "_proxy_post", post)
+    monkeypatch.setattr(settlement, "_proxy_get", get)
+    monkeypatch.setattr(adaptive_strategy, "STRATEGY_FILE", tmp_path / "strategy_state.json")
+    return SimpleNamespace(module=module, post=post, requests=requests, holder=holder)
+
+
+def _card(coin, grade=SignalGrade.A, direction=SignalDirection.LONG):
+    return SimpleNamespace(
+        coin=coin, direction=direction, grade=grade, entry_low=99.0, entry_high=101.0,
+        stop_loss=95.0, take_profit=110.0, current_price=100.0, invalidation_price=94.0,
+        confidence=70.0, risk_reward_ratio=2.0, position_pct=5.0, sources=[], math=None, strategy=None)
+
+
+def _insert_pending(db, rows):
+    """rows: (coin, direction, grade, created_at)；返回新卡 id"""
+    raw = db.open().raw
+    raw.executemany(
+        "INSERT INTO signal_card_history (coin, direction, grade, current_price, stop_loss, take_profit, "
+        "status, created_at) VALUES (?, ?, ?, 100, 95, 110, 'pending', ?)", rows)
+    raw.commit()
+    return [r[0] for r in raw.execute("SELECT id FROM signal_card_history ORDER BY id DESC LIMIT ?",
+                                      (len(rows),))][::-1]
+
+
+def _statuses(db):
+    return dict(db.open().raw.execute("SELECT id, status FROM signal_card_history"))
+
+
+def _winrate(db):
+    """聚合表逐行 → {(day, coin, grade, direction): (n_total, n_hit_tp, n_hit_sl, n_expired, pnl_sum)}"""
+    rows = db.open().raw.execute(
+        "SELECT day, coin, grade, direction, n_total, n_hit_tp, n_hit_sl, n_expired, pnl_sum "
+        "FROM signal_winrate_daily").fetchall()
+    return {(str(r[0]), *r[1:4]): (r[4], r[5], r[6], r[7], round(r[8], 4)) for r in rows}
+
+
+def _raw_winrate(db):
+    rows = db.open().raw.execute(
+        "SELECT DATE(created_at), UPPER(coin), grade, direction, COUNT(*), SUM(status = 'hit_tp'), "
+        "SUM(status = 'hit_sl'), SUM(status = 'expired'), COALESCE(SUM(pnl_pct), 0) FROM signal_card_history "
+        "WHERE status IN ('hit_tp', 'hit_sl', 'expired') GROUP BY 1, 2, 3, 4").fetchall()
+    return {tuple(r[:4]): (r[4], r[5], r[6], r[7], round(r[8], 4)) for r in rows}
+
+
+def _update(card_id, status="hit_tp", pnl=10.0):
+    return {"card_id": card_id, "status": status, "settled_price": 100 * (1 + pnl / 100), "pnl_pct": pnl}
+
+
+def _bulk(proxy, updates):
+    return proxy.post("/api/update_card_status_bulk", {"updates": updates})
+
+
+def test_save_signal_cards_inserts_each_chunk_with_one_executemany(db, proxy):
+    cards = [_card(f"C{i}", grade=SignalGrade.C if i % 10 == 0 else SignalGrade.A) for i in range(450)]
+    assert settlement.save_signal_cards(cards) == 405
+    request_conns = list(db.conns)                                # 三次请求各自的连接
+
+    kept = [c.coin for c in cards if c.grade != SignalGrade.C]
+    assert [len(data["cards"]) for _, data in proxy.requests] == [200, 200, 5]   # 客户端先滤掉 C 级再分块
+    assert [r[0] for r in db.open().raw.execute("SELECT coin FROM signal_card_history ORDER BY id")] == kept
+    assert [[c[0] for c in conn.calls] for conn in request_conns] == [["executemany", "commit"]] * 3
+    assert [conn.calls[0][2] for conn in request_conns] == [200, 200, 5]
+
+
+def test_proxy_skips_c_grade_sent_by_old_clients(db, proxy):
+    payload = settlement._card_payload(_card("BTC"))
+    result = proxy.post("/api/save_signal_cards", {"cards": [payload, dict(payload, coin="ETH", grade="C")]})
+    assert result == {"ok": True, "inserted": 1}
+    assert proxy.post("/api/save_signal_cards", {"cards": [dict(payload, grade="C")]}) == {"ok": True, "inserted": 0}
+    assert [r[0] for r in db.open().raw.execute("SELECT coin FROM signal_card_history")] == ["BTC"]
+
+
+def test_bulk_settle_touches_only_pending_rows(db, proxy):
+    ids = _insert_pending(db, [("BTC", "long", "A", NOW - timedelta(hours=30 + i)) for i in range(6)])
+    assert _bulk(proxy, [_update(ids[0], "hit_sl", -5.0)])["updated"] == [ids[0]]   # 先被结算的一张
+    before = db.open().raw.execute("SELECT * FROM signal_card_history WHERE id = ?", (ids[0],)).fetchone()
+
+    first = len(db.conns)
+    result = _bulk(proxy, [_update(i) for i in ids] + [_update(999_999)])
+    conn = db.conns[first]                                        # 本次请求的连接
+    assert result == {"ok": True, "updated": ids[1:]}             # 已结算的和不存在的都不在 updated 里
+    assert db.open().raw.execute("SELECT * FROM signal_card_history WHERE id = ?", (ids[0],)).fetchone() == before
+    assert set(_statuses(db).values()) == {"hit_tp", "hit_sl"}
+    assert [c[2] for c in conn.calls if c[0] == "executemany"] == [5]
+    assert _winrate(db) == _raw_winrate(db)
+
+
+def test_winrate_rollup_runs_in_the_settle_transaction(db, proxy, monkeypatch):
+    ids = _insert_pending(db, [("ETH", "short", "S", NOW - timedelta(hours=26)) for _ in range(3)])
+    _bulk(proxy, [_update(ids[0])])
+    baseline = _winrate(db)
+
+    first = len(db.conns)
+    monkeypatch.setattr(proxy.module, "_WINRATE_ROLLUP_SQL", "INSERT INTO no_such_table {where}")
+    result = _bulk(proxy, [_update(i) for i in ids[1:]])
+    assert not result["ok"]
+    assert not any(c == ("commit",) for c in db.conns[first].calls)
+    assert _statuses(db) == {ids[0]: "hit_tp", ids[1]: "pending", ids[2]: "pending"}   # 聚合失败 → 状态一起回滚
+    assert _winrate(db) == baseline
+
+
+def test_client_counts_only_ids_the_proxy_settled(db, proxy, monkeypatch):
+    ids = _insert_pending(db, [(coin, "long", "A", NOW - timedelta(hours=30)) for coin in ("BTC", "ETH", "SOL", "DOGE")])
+    raced = ids[1]
+
+    def outcome(card_row, created_at):
+        if card_row["id"] == raced:                               # 判定期间另一个进程先结算了这张
+            assert _bulk(proxy, [_update(raced, "hit_sl", -5.0)])["updated"] == [raced]
+        return ("hit_tp", 110.0, 10.0)
+
+    recorded = []
+    monkeypatch.setattr(settlement, "_settle_outcome", outcome)
+    monkeypatch.setattr(adaptive_strategy, "get_strategy_engine", lambda: SimpleNamespace(
+        update_coin_winrate=lambda coin, pnl, status: recorded.append((coin, status))))
+
+    stats = settlement._settle_pending_proxy()
+    assert stats == {"settled": 3, "hit_tp": 3, "hit_sl": 0, "expired": 0}
+    assert recorded == [("BTC", "hit_tp"), ("SOL", "hit_tp"), ("DOGE", "hit_tp")]
+    assert _statuses(db)[raced] == "hit_sl"
+    assert _winrate(db) == _raw_winrate(db)
+
+
+def test_repeated_settle_of_same_ids_counts_once(db, proxy):
+    ids = _insert_pending(db, [("BTC", "long", "B", NOW - timedelta(hours=30)) for _ in range(4)])
+    updates = [_update(i) for i in ids]
+    assert _bulk(proxy, updates)["updated"] == ids
+    assert _bulk(proxy, updates) == {"ok": True, "updated": []}
+    assert _bulk(proxy, [_update(i, "hit_sl", -5.0) for i in ids]) == {"ok": True, "updated": []}
+    [(n_total, n_hit_tp, n_hit_sl, _, _)] = _winrate(db).values()
+    assert (n_total, n_hit_tp, n_hit_sl) == (4, 4, 0)
+
+
+def test_concurrent_settle_of_same_ids_counts_once(db, proxy):
+    ids = _insert_pending(db, [("SOL", "short", "A", NOW - timedelta(hours=30 + i)) for i in range(5)])
+    _bulk(proxy, [_update(ids[0])])                               # 先建好聚合表，并发只落在结算本身
+    proxy.holder.lock_hold = 0.2
+    results = []
+    start = threading.Barrier(3)
+
+    def settle(status, pnl):
+        start.wait()
+        results.append(_bulk(proxy, [_update(i, status, pnl) for i in ids[1:]]))
+
+    threads = [threading.Thread(target=settle, args=args)
+               for args in (("hit_tp", 10.0), ("hit_sl", -5.0), ("expired", 1.0))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+
+    assert all(r["ok"] for r in results)
+    assert sorted(len(r["updated"]) for r in results) == [0, 0, 4]   # 只有一个请求真的结算了
+    [(n_total, *_)] = _winrate(db).values()
+    assert n_total == 5
+    assert _winrate(db) == _raw_winrate(db)
@@ -0,0 +1,184 @@
+"""代理客户端（settlement._proxy_request）对着本地 FastAPI stub：keep-alive 复用、GET 503 重试、
+POST 不重放、连续失败熔断、half_open 试探成功后闭合"""
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.signals import settlement
+from app.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from tests.stub_server import serve
+
+THRESHOLD = 3
+RESET = 0.3
+
+
+class Stub:
+    def __init__(self):
+        self.hits = Counter()
+        self.peers = []
+        self.fail_first = 0          # /api/flaky 前 N 次返回 503
+        self.healthy = True          # /api/health 是否 500
+        self.app = FastAPI()
+
+        @self.app.get("/api/peer")
+        def peer(request: Request):
+            self.hits["peer"] += 1
+            self.peers.append(request.client.port)
+            return {"ok": True}
+
+        @self.app.get("/api/flaky")
+        def flaky():
+            self.hits["flaky"] += 1
+            if self.hits["flaky"] <= self.fail_first:
+                return JSONResponse({"ok": False}, status_code=503)
+            return {"ok": True, "attempt": self.hits["flaky"]}
+
+        @self.app.post("/api/write")
+        def write():
+            self.hits["write"] += 1
+            return JSONResponse({"ok": False}, status_code=503)
+
+        @self.app.post("/api/slow_write")
+        async def slow_write():
+            self.hits["slow_write"] += 1
+            await asyncio.sleep(1.0)
+            return {"ok": True}
+
+        @self.app.get("/api/health")
+        def health():
+            self.hits["health"] += 1
+            if not self.healthy:
+                return JSONResponse({"ok": False}, status_code=500)
+            return {"ok": True}
+
+
+@pytest.fixture(scope="module")
+def stub():
+    stub = Stub()
+    with serve(stub.app) as base_url:
+        stub.base_url = base_url
+        yield stub
+
+
+@pytest.fixture(autouse=True)
+def client(stub, monkeypatch):
+    stub.hits.clear()
+    stub.peers.clear()
+    stub.fail_first = 0
+    stub.healthy = True
+    monkeypatch.setattr(settlement, "_PROXY_BASE", stub.base_url)
+    monkeypatch.setattr(settlement, "_ensure_tunnel", lambda: None)
+    monkeypatch.setattr(settlement, "_SESSION", None)
+    monkeypatch.setattr(settlement, "_proxy_breaker", CircuitBreaker("test_proxy", THRESHOLD, RESET))
+    monkeypatch.setattr(settlement.settings, "data_proxy_retries", 2)
+    monkeypatch.setattr(settlement.settings, "data_proxy_pool_size", 4)
+    monkeypatch.setattr(settlement.settings, "data_proxy_read_timeout", 0.3)
+    yield
+    if settlement._SESSION is not None:
+        settlement._SESSION.close()
+
+
+def test_sequential_calls_reuse_one_connection(stub):
+    for _ in range(10):
+        assert settlement._proxy_get("/api/peer")["ok"]
+    assert len(stub.peers) == 10
+    assert len(set(stub.peers)) == 1
+
+
+def test_concurrent_calls_bounded_by_pool_size(stub):
+    threads = [threading.Thread(target=lambda: [settlement._proxy_get("/api/peer") for _ in range(5)])
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(stub.peers) == 40
+    assert len(set(stub.peers)) < 40                    # 并发下也在复用
+    # 池满时多出的连接用完即关，之后留在池里的至多 pool_size 条
+    burst = set(stub.peers)
+    stub.peers.clear()
+    for _ in range(10):
+        settlement._proxy_get("/api/peer")
+    assert len(set(stub.peers)) <= 4 and set(stub.peers) <= burst
+
+
+def test_get_retried_on_503(stub):
+    stub.fail_first = 2
+    result = settlement._proxy_get("/api/flaky")
+    assert result == {"ok": True, "attempt": 3}
+    assert stub.hits["flaky"] == 3
+    assert settlement._proxy_breaker.state == CLOSED
+
+
+def test_get_gives_up_after_retries(stub):
+    stub.fail_first = 10
+    result = settlement._proxy_get("/api/flaky")
+    assert result["ok"] is False and "503" in result["error"]
+    assert stub.hits["flaky"] == 3                      # 1 次 + DATA_PROXY_RETRIES 次重试
+    assert settlement._proxy_breaker.status()["failures"] == 1
+
+
+def test_post_not_replayed_on_503(stub):
+    result = settlement._proxy_post("/api/write", {"card": 1})
+    assert result["ok"] is False
+    assert stub.hits["write"] == 1
+
+
+def test_post_not_replayed_on_read_timeout(stub):
+    result = settlement._proxy_post("/api/slow_write", {"card": 1})
+    assert result["ok"] is False
+    assert stub.hits["slow_write"] == 1
+
+
+def test_breaker_opens_after_consecutive_failures(stub):
+    stub.healthy = False
+    for _ in range(THRESHOLD):
+        assert settlement._proxy_get("/api/health")["ok"] is False
+    assert settlement._proxy_breaker.state == OPEN
+
+    result = settlement._proxy_get("/api/health")
+    assert result == {"ok": False, "error": "data proxy circuit open"}
+    assert stub.hits["health"] == THRESHOLD             # 熔断期间不再打到代理
+
+
+def test_half_open_probe_success_closes(stub):
+    stub.healthy = False
+    for _ in range(THRESHOLD):
+        settlement._proxy_get("/api/health")
+    stub.healthy = True
+    time.sleep(RESET + 0.05)
+    assert settlement._proxy_breaker.state == HALF_OPEN
+
+    assert settlement._proxy_get("/api/health")["ok"] is True
+    assert settlement._proxy_breaker.state == CLOSED
+    assert settlement._proxy_get("/api/health")["ok"] is True
+    assert stub.hits["health"] == THRESHOLD + 2
+
+
+def test_half_open_probe_failure_reopens(stub):
+    stub.healthy = False
+    for _ in range(THRESHOLD):
+        settlement._proxy_get("/api/health")
+    time.sleep(RESET + 0.05)
+    assert settlement._proxy_get("/api/health")["ok"] is False      # 试探失败
+    assert settlement._proxy_breaker.state == OPEN
+    assert settlement._proxy_get("/api/health")["error"] == "data proxy circuit open"
+    assert stub.hits["health"] == THRESHOLD + 1
+
+
+def test_half_open_admits_single_probe():
+    breaker = CircuitBreaker("probe", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    admitted = []
+    threads = [threading.Thread(target=lambda: admitted.append(breaker.allow())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert admitted.count(True) == 1
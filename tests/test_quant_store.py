@@ -0,0 +1,128 @@
+"""量化结果存储：惰性单例不在导入时连 Redis、QuantResult 经 Redis 往返、TTL 过期、
+聊天复用扫描结果（_analyze_precomputed）与跨日回退完整计算"""
+import json
+import math
+import time
+
+import fakeredis
+import pytest
+
+from app.services import quant_store as store_mod
+from app.services.quant_store import LazyQuantStore, MemoryQuantStore, QuantResult, RedisQuantStore
+from app.skills.analysis_skills import quantitative
+from app.skills.analysis_skills.quantitative import QuantitativeAnalysisSkill, compute_quant
+
+BARS = 90
+
+
+def _raw_data(last_date="2026/03/31", price=None) -> dict:
+    """合成日线（4 字段 + 成交量表）与 header，足够跑完整六因子"""
+    dates, values, volumes = [], [], []
+    for i in range(BARS):
+        day = f"2026/{1 + i // 30:02d}/{1 + i % 30:02d}"
+        dates.append(day)
+        close = 100 + 10 * math.sin(i / 6) + i * 0.3
+        values.append([close - 1, close + 2, close - 2, close])
+        volumes.append({"dt": day.replace("/", "-"), "usd": 1e6 + 1e4 * (i % 7)})
+    dates[-1] = last_date
+    volumes[-1]["dt"] = last_date.replace("/", "-")
+    close = values[-1][3]
+    return {
+        "get_kline_data": {"categoryData": dates, "values": values},
+        "get_trade_volume": volumes,
+        "get_header_data": {"currentPrice": price or close},
+    }
+
+
+def _result(raw_data=None) -> QuantResult:
+    _, parts = compute_quant("BTC", raw_data or _raw_data())
+    return QuantResult(**parts)
+
+
+@pytest.fixture
+def redis_store(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    store = RedisQuantStore(client, ttl=60)
+    monkeypatch.setattr(store_mod, "quant_store", LazyQuantStore(lambda: store))
+    return store
+
+
+def test_import_does_not_create_backend():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return MemoryQuantStore(ttl=60)
+
+    lazy = LazyQuantStore(factory)
+    assert calls == []
+    assert lazy.get("BTC") is None
+    lazy.put(_result())
+    assert lazy.get("btc").symbol == "BTC"
+    assert calls == [1]
+    assert isinstance(store_mod.quant_store, LazyQuantStore)
+
+
+def test_quant_result_round_trips_through_redis(redis_store):
+    result = _result()
+    redis_store.put(result)
+    loaded = redis_store.get("BTC")
+    assert json.loads(loaded.to_json()) == json.loads(result.to_json())
+    assert loaded.factors == result.factors and loaded.signal == result.signal
+    assert loaded.bar_date == result.bar_date == "2026/03/31"
+    assert loaded.computed_at == result.computed_at
+    assert redis_store.client.ttl("quant:BTC") <= 60
+
+
+def test_redis_entry_expires(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    store = RedisQuantStore(client, ttl=1)
+    store.put(_result())
+    assert store.get("BTC") is not None
+    time.sleep(1.1)
+    assert store.get("BTC") is None
+
+
+def test_chat_reuses_scan_result(redis_store, monkeypatch):
+    raw = _raw_data()
+    expected, parts = compute_quant("BTC", raw)
+    redis_store.put(QuantResult(**parts))
+
+    def no_compute(*args, **kwargs):
+        raise AssertionError("命中新鲜结果时不应重算六因子")
+
+    monkeypatch.setattr(quantitative, "compute_quant", no_compute)
+    payload = QuantitativeAnalysisSkill().analyze("BTC", raw, reuse=True)
+    assert json.loads(json.dumps(payload, default=str)) == json.loads(json.dumps(expected, default=str))
+
+
+def test_realtime_price_moves_levels_without_recomputing_factors(redis_store, monkeypatch):
+    raw = _raw_data()
+    stored = _result(raw)
+    redis_store.put(stored)
+    price = raw["get_header_data"]["currentPrice"] * 1.02
+    moved = _raw_data(price=price)
+
+    monkeypatch.setattr(quantitative, "compute_quant", pytest.fail)
+    payload = QuantitativeAnalysisSkill().analyze("BTC", moved, reuse=True)
+    assert payload["实时数据"]["当前价格"] == price
+    assert payload["交易信号"]["综合评分"] == stored.fused_composite      # 因子评分原样复用
+    assert payload["可执行操作"] != QuantitativeAnalysisSkill().analyze("BTC", raw, reuse=True)["可执行操作"]
+
+
+def test_bar_date_mismatch_falls_through_to_compute(redis_store, monkeypatch):
+    redis_store.put(_result(_raw_data(last_date="2026/03/31")))
+    next_day = _raw_data(last_date="2026/04/01")
+    calls = []
+    real = quantitative.compute_quant
+
+    def counting(*args, **kwargs):
+        calls.append(args[0])
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(quantitative, "compute_quant", counting)
+    skill = QuantitativeAnalysisSkill()
+    assert skill._analyze_precomputed("BTC", next_day) is None
+    payload = skill.analyze("BTC", next_day, reuse=True)
+    assert calls == ["BTC"]
+    assert payload == real("BTC", next_day)[0]
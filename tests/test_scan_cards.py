@@ -0,0 +1,135 @@
+"""scan_coin_card 写入：是否变化以写事务内的库中 card_hash 为准，进程记忆过期不会漏写
+
+直连（settlement 直接写库）和代理（data_proxy /api/save_scan_cards）两条路径都对着同一个 SQLite 库。
+"""
+import base64
+import importlib.util
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.signals import settlement
+from tests import sqlite_mysql
+from tests.conftest import ROOT
+
+
+class FakeCard:
+    def __init__(self, coin, version):
+        self.coin = coin
+        self.version = version
+
+    def model_dump(self):
+        return {"coin": self.coin, "version": self.version}
+
+
+def _results(**versions):
+    return [SimpleNamespace(signal_card=FakeCard(coin, v)) for coin, v in versions.items()]
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    conn = sqlite_mysql.connect("", datetime.now())
+    monkeypatch.setattr(settlement, "_get_conn", lambda: conn)
+    monkeypatch.setattr(settlement, "_display_card", lambda card: {"coin": card.coin})
+    monkeypatch.setattr(settlement, "_SCAN_CACHE_GZ", tmp_path / "scan_cache.json.gz")
+    monkeypatch.setattr(settlement, "_scan_card_hashes", {})
+    monkeypatch.setattr(settlement, "_scan_decoded", {})
+    return conn
+
+
+def _stored(conn):
+    rows = conn.raw.execute("SELECT coin, payload FROM scan_coin_card").fetchall()
+    return {coin: settlement.decode_scan_card(payload)["signal"]["version"] for coin, payload in rows}
+
+
+def _changed_counts(conn):
+    return [r[0] for r in conn.raw.execute("SELECT changed_count FROM scan_batch ORDER BY id")]
+
+
+def test_direct_write_skips_unchanged_cards(db):
+    settlement.save_scan_batch(_results(BTC=1, ETH=1, SOL=1), 1.0)
+    settlement.save_scan_batch(_results(BTC=1, ETH=2, SOL=1), 1.0)
+    assert _stored(db) == {"BTC": 1, "ETH": 2, "SOL": 1}
+    assert _changed_counts(db) == [3, 1]
+
+
+def test_direct_write_rereads_hash_written_by_another_worker(db):
+    settlement.save_scan_batch(_results(BTC=1), 1.0)         # worker A
+    other = sqlite_mysql.Connection(db.raw, db.now)          # worker B（另一个进程，同一张表）
+    h, blob = settlement.encode_scan_card({"coin": "BTC", "version": 2}, {"coin": "BTC"})
+    other.raw.execute("UPDATE scan_coin_card SET card_hash=?, payload=? WHERE coin='BTC'", (h, blob))
+    other.raw.commit()
+
+    settlement.save_scan_batch(_results(BTC=1), 1.0)         # A 再次写出同样的卡
+    assert _stored(db) == {"BTC": 1}
+    settlement._scan_decoded.clear()
+    latest = settlement.get_latest_scan()
+    assert [s["version"] for s in latest["signals"]] == [1]
+
+
+def _load_proxy():
+    spec = importlib.util.spec_from_file_location("_scan_cards_proxy", ROOT / "deploy" / "data_proxy.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def proxy(db, monkeypatch):
+    module = _load_proxy()
+    monkeypatch.setattr(module, "_get_conn", lambda: db)
+    client = TestClient(module.app)
+    requests = []
+
+    def post(path, data):
+        requests.append(data)
+        return client.post(path, params={"key": module.API_KEY}, json=data).json()
+
+    monkeypatch.setattr(settlement, "_USE_PROXY", True)
+    monkeypatch.setattr(settlement, "_proxy_post", post)
+    return SimpleNamespace(module=module, client=client, requests=requests, post=post)
+
+
+def test_proxy_sends_only_changed_payloads(db, proxy):
+    settlement.save_scan_batch(_results(BTC=1, ETH=1), 1.0)
+    settlement.save_scan_batch(_results(BTC=1, ETH=2), 1.0)
+    assert set(proxy.requests[1]["cards"]) == {"ETH"}
+    assert set(proxy.requests[1]["hashes"]) == {"BTC", "ETH"}
+    assert _stored(db) == {"BTC": 1, "ETH": 2}
+    assert _changed_counts(db) == [2, 1]
+
+
+def test_proxy_stale_memory_gets_missing_and_resends(db, proxy):
+    settlement.save_scan_batch(_results(BTC=1, ETH=1), 1.0)  # 进程 A，记忆 BTC=v1
+    h, blob = settlement.encode_scan_card({"coin": "BTC", "version": 2}, {"coin": "BTC"})
+    # 进程 B 经代理写入 BTC=v2
+    result = proxy.post("/api/save_scan_cards", {
+        "total_coins": 1, "signal_count": 1, "scan_time": 1.0, "coins": ["BTC"],
+        "hashes": {"BTC": h}, "cards": {"BTC": {"hash": h, "payload": base64.b64encode(blob).decode()}}})
+    assert result["ok"] and _stored(db)["BTC"] == 2
+    batches = len(_changed_counts(db))
+
+    proxy.requests.clear()
+    settlement.save_scan_batch(_results(BTC=1, ETH=1), 1.0)  # A 的记忆说 BTC 没变
+    assert [set(r["cards"]) for r in proxy.requests] == [set(), {"BTC"}]
+    assert _stored(db) == {"BTC": 1, "ETH": 1}
+    assert len(_changed_counts(db)) == batches + 1           # 被拒的那次整批回滚，没有留下批次行
+
+
+def test_proxy_accepts_old_clients_without_hashes(db, proxy):
+    h, blob = settlement.encode_scan_card({"coin": "BTC", "version": 1}, {"coin": "BTC"})
+    body = {"total_coins": 1, "signal_count": 1, "scan_time": 1.0, "coins": ["BTC"],
+            "cards": {"BTC": {"hash": h, "payload": base64.b64encode(blob).decode()}}}
+    assert proxy.post("/api/save_scan_cards", body)["changed"] == 1
+    assert proxy.post("/api/save_scan_cards", body)["changed"] == 0
+    assert _stored(db) == {"BTC": 1}
+
+
+def test_latest_scan_roundtrip_through_proxy(db, proxy):
+    settlement.save_scan_batch(_results(BTC=1, ETH=3), 1.0)
+    body = proxy.client.get("/api/latest_scan", params={"key": proxy.module.API_KEY}).json()
+    assert [s["version"] for s in body["data"]["signals"]] == [1, 3]
+    assert json.loads(json.dumps(body["data"]["displays"])) == [{"coin": "BTC"}, {"coin": "ETH"}]
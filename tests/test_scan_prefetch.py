@@ -0,0 +1,119 @@
+"""扫描预取与逐币查库等价：ScanPrefetch.settled_cards / cooldown 对同一份数据给出与
+_query_settled_cards / _query_cooldown 相同的结果（多币种、双向、等级过滤、窗口边界、同时刻并列、LIMIT）"""
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.signals import backtest
+from app.signals.backtest import SETTLED_CARDS_LIMIT, ScanPrefetch, _query_cooldown, _query_settled_cards
+from tests import sqlite_mysql
+
+NOW = datetime(2026, 3, 10, 12, 0, 0)
+COINS = ["BTC", "ETH", "SOL", "DOGE"]
+
+SCHEMA = """
+CREATE TABLE signal_card_history (
+    id INTEGER PRIMARY KEY,
+    coin TEXT, direction TEXT, grade TEXT,
+    current_price REAL, stop_loss REAL, take_profit REAL,
+    status TEXT, pnl_pct REAL,
+    created_at TIMESTAMP, settled_at TIMESTAMP
+);
+"""
+
+# 各窗口的边界：恰好在边界上、边界内 1 秒、边界外 1 秒
+BOUNDARIES = [timedelta(days=90), timedelta(days=30), timedelta(days=7), timedelta(hours=24), timedelta(hours=12)]
+
+
+def _rows():
+    rng = random.Random(35)
+    rows = []
+
+    def add(coin, direction, status, created_at, grade=None, pnl=None):
+        rows.append((coin, direction, grade or rng.choice("SAB"), 100.0, 95.0, 110.0, status,
+                     pnl if pnl is not None else round(rng.uniform(-5, 5), 2), created_at,
+                     None if status == "pending" else created_at + timedelta(hours=24)))
+
+    for coin in COINS:
+        for direction in ("long", "short"):
+            for _ in range(60):
+                age = timedelta(seconds=rng.randint(0, 100 * 86400))
+                add(coin, direction, rng.choice(["hit_tp", "hit_sl", "expired", "expired", "pending"]), NOW - age)
+            for b in BOUNDARIES:
+                for shift in (-1, 0, 1):
+                    add(coin, direction, rng.choice(["hit_tp", "hit_sl", "expired"]), NOW - b + timedelta(seconds=shift))
+            tie = NOW - timedelta(hours=rng.randint(1, 20))
+            for _ in range(3):                                   # 同一时刻的卡按 id 倒序
+                add(coin, direction, rng.choice(["hit_tp", "hit_sl"]), tie)
+
+    # BTC long：24h 内最近 3 张全部止损 → 连续止损冷却
+    for h in (1, 2, 3):
+        add("BTC", "long", "hit_sl", NOW - timedelta(minutes=10 * h))
+    # ETH short：7d 胜率低，但没有 3 连止损
+    for h in range(40):
+        add("ETH", "short", "hit_sl" if h % 3 else "expired", NOW - timedelta(days=1, hours=h), pnl=-1.0)
+    # SOL long：超过 LIMIT 的已结算卡
+    for i in range(SETTLED_CARDS_LIMIT + 20):
+        add("SOL", "long", "hit_tp", NOW - timedelta(days=2, seconds=i), grade="A")
+    return rows
+
+
+@pytest.fixture
+def db(monkeypatch):
+    conn = sqlite_mysql.connect(SCHEMA, NOW)
+    conn.raw.executemany(
+        "INSERT INTO signal_card_history (coin, direction, grade, current_price, stop_loss, take_profit, "
+        "status, pnl_pct, created_at, settled_at) VALUES (?,?,?,?,?,?,?,?,?,?)", _rows())
+    conn.raw.commit()
+    monkeypatch.setattr(backtest, "_get_connection", lambda: conn)
+    # 冻结单调时钟：SQLite 的 NOW() 固定，快照的"当前时间"也不随测试耗时推进
+    monkeypatch.setattr(backtest, "_time", SimpleNamespace(monotonic=lambda: 0.0, time=backtest._time.time))
+    return conn
+
+
+@pytest.fixture
+def prefetch(db):
+    return ScanPrefetch(COINS[:3], 90).load(db)
+
+
+def test_load_reads_db_now(prefetch):
+    assert prefetch._db_now == NOW
+    assert prefetch.covers("btc", 90) and not prefetch.covers("BTC", 91)
+    assert not prefetch.covers("DOGE", 7)                         # 不在本次扫描的币种仍逐币查库
+
+
+@pytest.mark.parametrize("coin", COINS[:3])
+@pytest.mark.parametrize("direction", ["long", "short"])
+@pytest.mark.parametrize("grade", [None, "S", "A", "B", "a"])
+@pytest.mark.parametrize("lookback_days", [7, 30, 90])
+def test_settled_cards_match_query(db, prefetch, coin, direction, grade, lookback_days):
+    expected = _query_settled_cards(db, coin, direction, grade, lookback_days)
+    if grade == "a":
+        expected = _query_settled_cards(db, coin, direction, "A", lookback_days)   # 等级不区分大小写
+    assert prefetch.settled_cards(coin.lower(), direction, grade, lookback_days) == expected
+
+
+def test_settled_cards_respect_limit(db, prefetch):
+    cards = prefetch.settled_cards("SOL", "long", None, 90)
+    assert len(cards) == SETTLED_CARDS_LIMIT
+    assert cards == _query_settled_cards(db, "SOL", "long", None, 90)
+
+
+@pytest.mark.parametrize("coin", COINS[:3])
+@pytest.mark.parametrize("direction", ["long", "short"])
+@pytest.mark.parametrize("threshold", [2, 3, 4])
+@pytest.mark.parametrize("window_hours", [12, 24, 48])
+@pytest.mark.parametrize("wr_7d", ["1", "0"])
+def test_cooldown_matches_query(prefetch, monkeypatch, coin, direction, threshold, window_hours, wr_7d):
+    monkeypatch.setenv("COOLDOWN_7D_WR_ENABLED", wr_7d)
+    expected = _query_cooldown(coin, direction, threshold, window_hours)
+    assert prefetch.cooldown(coin, direction, threshold, window_hours) == expected
+
+
+def test_fixture_exercises_both_cooldown_triggers(prefetch):
+    in_cooldown, ctx = prefetch.cooldown("BTC", "long", 3, 24)
+    assert in_cooldown and ctx["recent_sl_count"] == 3
+    in_cooldown, ctx = prefetch.cooldown("ETH", "short", 3, 24)
+    assert in_cooldown and ctx["trigger"] == "low_7d_wr"
@@ -0,0 +1,77 @@
+"""扫描预取快照只在扫描上下文内可见，不泄漏给同时进行的聊天 / 接口调用"""
+import asyncio
+import threading
+from datetime import datetime
+
+from app.signals import backtest
+from app.signals.backtest import ScanPrefetch, _active_prefetch, scan_prefetch
+from app.utils.executors import INTERACTIVE, MARKET_SCAN, run_in
+
+
+def _prefetch() -> ScanPrefetch:
+    p = ScanPrefetch(["BTC"], 90)
+    p._db_now = datetime.now()
+    return p
+
+
+def test_visible_in_scan_tasks_and_run_in_threads():
+    prefetch = _prefetch()
+
+    async def scenario():
+        inside = []
+
+        async def scan_coin():
+            inside.append(_active_prefetch("BTC", 30))
+            inside.append(await run_in(MARKET_SCAN, _active_prefetch, "BTC", 30))
+
+        with scan_prefetch(prefetch):
+            await asyncio.gather(*(asyncio.create_task(scan_coin()) for _ in range(3)))
+        assert inside == [prefetch] * 6
+        assert _active_prefetch("BTC", 30) is None
+
+    asyncio.run(scenario())
+
+
+def test_not_visible_to_concurrent_requests():
+    prefetch = _prefetch()
+
+    async def scenario():
+        scanning = asyncio.Event()
+        done = asyncio.Event()
+        seen = {}
+
+        async def scan():
+            with scan_prefetch(prefetch):
+                scanning.set()
+                await done.wait()
+
+        async def chat_request():
+            await scanning.wait()
+            seen["task"] = _active_prefetch("BTC", 30)
+            seen["interactive"] = await run_in(INTERACTIVE, _active_prefetch, "BTC", 30)
+            seen["to_thread"] = await asyncio.to_thread(_active_prefetch, "BTC", 30)
+            holder = []
+            t = threading.Thread(target=lambda: holder.append(_active_prefetch("BTC", 30)))
+            t.start()
+            t.join()
+            seen["raw_thread"] = holder[0]
+            done.set()
+
+        await asyncio.gather(scan(), chat_request())
+        return seen
+
+    seen = asyncio.run(scenario())
+    assert seen == {"task": None, "interactive": None, "to_thread": None, "raw_thread": None}
+
+
+def test_none_prefetch_is_noop_and_coverage_checked():
+    prefetch = _prefetch()
+
+    async def scenario():
+        with scan_prefetch(None):
+            assert backtest._scan_prefetch.get() is None
+        with scan_prefetch(prefetch):
+            assert _active_prefetch("ETH", 30) is None   # 不在预取币种内
+            assert _active_prefetch("BTC", 365) is None  # 超出预取窗口
+
+    asyncio.run(scenario())
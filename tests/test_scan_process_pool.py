@@ -0,0 +1,89 @@
+"""扫描纯计算阶段放进 spawn 进程池：结果与当前线程一致；进程池崩溃时该币回退线程内计算"""
+import asyncio
+import multiprocessing
+import random
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.signals import alpha_scanner
+from app.signals.alpha_scanner import ScanResult, _ScanJob, _scan_compute
+
+
+def _bars(rng, n, price, vol):
+    out = {k: [] for k in ("opens", "highs", "lows", "closes", "volumes")}
+    for _ in range(n):
+        o = price
+        price *= 1 + rng.gauss(0, vol)
+        out["opens"].append(o)
+        out["closes"].append(price)
+        out["highs"].append(max(o, price) * 1.01)
+        out["lows"].append(min(o, price) * 0.99)
+        out["volumes"].append(rng.uniform(1e6, 5e7))
+    return out
+
+
+def _job(seed: int) -> _ScanJob:
+    rng = random.Random(seed)
+    daily = _bars(rng, 60, 100.0, 0.04)
+    hourly = _bars(rng, 72, daily["closes"][-1], 0.01)
+    return _ScanJob(
+        coin=f"C{seed}", t0=time.time(), ohlcv=daily,
+        raw_data={"header": {"currentPrice": hourly["closes"][-1]}, "entry_ohlcv": hourly},
+        core_inputs={"quant_raw": None, "alpha_breadth": "neutral"},
+    )
+
+
+def _comparable(core: dict) -> dict:
+    math_result = core["math_result"]
+    return {
+        "regime": core["regime"],
+        "technical": core["technical"].model_dump() if core["technical"] else None,
+        "breakout": repr(core["breakout"]),
+        "meanrev": repr(core["meanrev"]),
+        "math_regime": math_result.regime.regime if math_result and math_result.regime else None,
+    }
+
+
+def test_process_pool_matches_inline():
+    jobs = [_job(seed) for seed in range(6)]
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        pooled = list(pool.map(_scan_compute, jobs))
+    finally:
+        pool.shutdown()
+    inline = [_scan_compute(job) for job in jobs]
+    assert [_comparable(c) for c in pooled] == [_comparable(c) for c in inline]
+
+
+class _BrokenPool(Executor):
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_exception(BrokenProcessPool("worker died"))
+        return future
+
+
+def test_broken_pool_falls_back_to_inline(monkeypatch):
+    job = _job(1)
+    finished = []
+    monkeypatch.setattr(alpha_scanner, "_scan_prepare", lambda coin, stats: job)
+    monkeypatch.setattr(
+        alpha_scanner, "_scan_finish",
+        lambda job, core, btc: finished.append(core) or ScanResult(coin=job.coin),
+    )
+    pool = _BrokenPool()
+    alpha_scanner._process_pool = pool
+
+    result = asyncio.run(alpha_scanner._scan_staged(job.coin, asyncio.Semaphore(1), pool, None, None))
+
+    assert result.coin == job.coin and result.error is None
+    assert len(finished) == 1 and _comparable(finished[0]) == _comparable(_scan_compute(job))
+    assert alpha_scanner._process_pool is None      # 下次扫描重建
+
+
+@pytest.mark.parametrize("workers", [0, -1])
+def test_pool_disabled_without_workers(monkeypatch, workers):
+    monkeypatch.setattr(alpha_scanner.app_settings, "scan_process_workers", workers)
+    assert alpha_scanner._get_process_pool() is None
@@ -0,0 +1,122 @@
+"""增量预筛影子模式对拍：按录制的多轮全市场扫描回放，影子模式报出的漏判 == 增量模式实际发出的错卡
+
+录制在 tests/fixtures/scan_shadow_recording.json：每轮的全局状态（BTC 护栏 / 策略版本 / regime）
+和每个币的预筛输入（price / volume / new_ticks）+ 完整扫描结果（card=[方向, 等级] 或 null，error 为扫描出错）。
+同一份录制各跑一遍影子模式和增量模式：
+- 影子模式照常全量扫描，发出的结果与录制完全一致
+- 增量模式跳过的币沿用旧结果；与录制不一致的币，正是影子模式 missed 里列出的币
+- 两种模式每轮的判定原因分布一致（影子模式对本会跳过的币不更新基准，漂移照样累积）
+"""
+import asyncio
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from app.signals import alpha_scanner, scan_delta
+from app.signals.alpha_scanner import ScanResult
+from app.signals.models import SignalDirection, SignalGrade
+from app.signals.scan_delta import SKIP, CoinInputs, ScanDeltaFilter
+from app.utils.metrics import SCAN_PREFILTER_MISSED
+
+RECORDING = Path(__file__).resolve().parent / "fixtures" / "scan_shadow_recording.json"
+
+
+def _recorded_key(row):
+    return tuple(row["card"]) if row["card"] else (None, None)
+
+
+def _served_key(result):
+    card = result.signal_card
+    return (card.direction.value, card.grade.value) if card else (None, None)
+
+
+def replay(recording, monkeypatch, shadow: bool):
+    """回放录制；返回每轮 {"served": {coin: (方向, 等级)}, "reasons", "missed", "full_scans"}"""
+    monkeypatch.setattr(scan_delta.settings, "scan_incremental_enabled", not shadow)
+    monkeypatch.setattr(scan_delta.settings, "scan_incremental_shadow", shadow)
+    delta = ScanDeltaFilter()
+    clock = [1_000_000.0]
+    current = {}
+    full_scans = []
+
+    def probe(coin):
+        row = current["coins"][coin]
+        return CoinInputs(price=row["price"], volume=row["volume"], new_ticks=row["new_ticks"])
+
+    def scan_single(coin, btc_24h_change, concurrency_stats):
+        full_scans.append(coin)
+        row = current["coins"][coin]
+        card = None
+        if row["card"]:
+            card = SimpleNamespace(direction=SignalDirection(row["card"][0]), grade=SignalGrade(row["card"][1]),
+                                   confidence=50)
+        return ScanResult(coin=coin, signal_card=card, error=row.get("error"))
+
+    monkeypatch.setattr(delta, "probe", probe)
+    monkeypatch.setattr(alpha_scanner, "delta_filter", delta)
+    monkeypatch.setattr(scan_delta, "time", SimpleNamespace(time=lambda: clock[0]))
+    monkeypatch.setattr(alpha_scanner, "get_discovery_coins", lambda: list(current["coins"]))
+    monkeypatch.setattr(alpha_scanner, "_get_btc_24h_change", lambda: None)
+    monkeypatch.setattr(alpha_scanner, "_get_concurrency_stats", lambda: {})
+    monkeypatch.setattr(alpha_scanner, "_scan_global_key", lambda btc: tuple(current["global"]))
+    monkeypatch.setattr(alpha_scanner, "load_scan_prefetch", lambda coins: {})
+    monkeypatch.setattr(alpha_scanner, "_get_process_pool", lambda: None)
+    monkeypatch.setattr(alpha_scanner, "_scan_single", scan_single)
+
+    passes = []
+    for recorded in recording["passes"]:
+        current.update(recorded)
+        full_scans.clear()
+        results = asyncio.run(alpha_scanner.scan_all_coins())
+        passes.append({
+            "served": {r.coin: _served_key(r) for r in results},
+            "reasons": dict(delta._stats.reasons),
+            "missed": sorted(m.split(":", 1)[0] for m in delta._stats.missed),
+            "full_scans": len(full_scans),
+        })
+        clock[0] += recording["interval"]
+    return passes
+
+
+@pytest.fixture(scope="module")
+def recording():
+    return json.loads(RECORDING.read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("price_pct", [1.0, 3.0])
+def test_shadow_missed_equals_incremental_mismatches(recording, monkeypatch, price_pct):
+    monkeypatch.setattr(scan_delta.settings, "scan_delta_price_pct", price_pct)
+    missed_before = SCAN_PREFILTER_MISSED.get()
+    shadow = replay(recording, monkeypatch, shadow=True)
+    missed_metric = SCAN_PREFILTER_MISSED.get() - missed_before
+    incremental = replay(recording, monkeypatch, shadow=False)
+
+    total_missed = 0
+    for recorded, s, inc in zip(recording["passes"], shadow, incremental):
+        expected = {coin: _recorded_key(row) for coin, row in recorded["coins"].items()}
+        assert s["served"] == expected                          # 影子模式发出的就是全量结果
+        assert s["full_scans"] == len(expected)
+        assert s["reasons"] == inc["reasons"]
+        mismatched = sorted(c for c, key in inc["served"].items() if key != expected[c])
+        assert s["missed"] == mismatched
+        assert inc["full_scans"] == len(expected) - inc["reasons"].get(SKIP, 0)
+        total_missed += len(mismatched)
+    assert missed_metric == total_missed
+
+
+def test_recording_exercises_skips_misses_and_global_reset(recording, monkeypatch):
+    """录制本身要覆盖：跳过、漏判、各类重扫原因、全局状态变化后全量"""
+    shadow = replay(recording, monkeypatch, shadow=True)
+    reasons = {r for p in shadow for r in p["reasons"]}
+    assert {SKIP, "new", "price", "bigorder", "error"} <= reasons
+    assert sum(len(p["missed"]) for p in shadow) > 0
+    reset = next(i for i, p in enumerate(recording["passes"]) if p["global"] != recording["passes"][0]["global"])
+    assert shadow[reset]["reasons"] == {"new": len(recording["passes"][reset]["coins"])}
+
+
+def test_zero_threshold_never_misses(recording, monkeypatch):
+    monkeypatch.setattr(scan_delta.settings, "scan_delta_price_pct", 0.0)
+    shadow = replay(recording, monkeypatch, shadow=True)
+    assert all(p["missed"] == [] and SKIP not in p["reasons"] for p in shadow)
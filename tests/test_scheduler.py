@@ -0,0 +1,211 @@
+"""调度器：fixed_rate 跳过仍在运行的一轮、错过的节拍合并且对齐原节拍、fixed_delay 按结束时间排下一轮、
+日历型 next_time、超时 / 异常结局、持久化的 last_started 把首轮推到一个周期之后、
+超时后线程里还在跑的同步函数跑完之前不会开第二轮"""
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from app.core.scheduler import FIXED_DELAY, Scheduler
+from app.utils.executors import MAINTENANCE, run_in
+
+TICK = 0.1
+SLACK = 0.05          # 事件循环唤醒的误差
+
+
+@pytest.fixture
+def sched(tmp_path):
+    return Scheduler(state_path=str(tmp_path / "scheduler_state.json"))
+
+
+def _run_for(sched, seconds, leader_only=None):
+    async def main():
+        sched.start(leader_only)
+        await asyncio.sleep(seconds)
+        await sched.stop(leader_only)
+
+    asyncio.run(main())
+
+
+class Recorder:
+    """记录每轮的开始 / 结束时间与并发数"""
+
+    def __init__(self, duration=0.0):
+        self.duration = duration
+        self.starts, self.ends = [], []
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self):
+        self.starts.append(time.time())
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.duration)
+        finally:
+            self.active -= 1
+            self.ends.append(time.time())
+
+
+def _phase(ts, t0, interval=TICK):
+    """相对 t0 偏离最近节拍的距离"""
+    offset = (ts - t0) % interval
+    return min(offset, interval - offset)
+
+
+def test_fixed_rate_skips_tick_while_previous_run_is_busy(sched):
+    job = Recorder(duration=0.25)
+    added = sched.add("busy", job, interval=TICK, initial_delay=0)
+    _run_for(sched, 0.68)
+
+    assert job.max_active == 1
+    assert len(job.starts) == 3                                    # 节拍 0 / 0.3 / 0.6
+    assert added.state.skipped == 4                                # 0.1 0.2 0.4 0.5
+    assert all(_phase(ts, job.starts[0]) < SLACK for ts in job.starts)   # 不随单轮耗时漂移
+    assert added.state.missed == 0
+
+
+def test_fixed_rate_merges_missed_ticks_and_keeps_phase(sched):
+    calls = []
+
+    async def stall_once():
+        calls.append(time.time())
+        if len(calls) == 1:
+            time.sleep(0.35)                       # 首轮卡住事件循环，错过 0.1 / 0.2 / 0.3 三拍
+
+    added = sched.add("stall", stall_once, interval=TICK, initial_delay=0)
+    _run_for(sched, 0.66)
+
+    t0 = calls[0]
+    assert calls[1] - t0 == pytest.approx(0.35, abs=SLACK)         # 醒来只补跑一次
+    assert added.state.missed == 2                                 # 0.2 / 0.3 合并掉
+    assert [round((c - t0) / TICK) for c in calls[2:]] == [4, 5, 6]
+    assert all(_phase(c, t0) < SLACK for c in calls[2:])           # 之后仍对齐原节拍
+    assert added.state.skipped == 0
+
+
+def test_fixed_delay_waits_interval_after_each_run(sched):
+    job = Recorder(duration=0.15)
+    sched.add("delay", job, interval=TICK, mode=FIXED_DELAY, initial_delay=0)
+    _run_for(sched, 0.9)
+
+    assert len(job.starts) >= 3
+    gaps = [start - end for start, end in zip(job.starts[1:], job.ends)]
+    assert all(TICK <= g < TICK + SLACK for g in gaps), gaps
+
+
+def test_calendar_next_time_overrides_interval_and_persisted_state(sched, tmp_path):
+    now = time.time()
+    with open(sched.state_path, "w", encoding="utf-8") as f:
+        json.dump({"weekly": {"last_started": now}}, f)              # 刚跑过：对日历型任务不起作用
+    asked = []
+
+    def next_time(ts):
+        asked.append(ts)
+        return ts + TICK
+
+    job = Recorder(duration=0.05)
+    added = sched.add("weekly", job, interval=3600, next_time=next_time)
+    _run_for(sched, 0.5)
+
+    assert job.starts[0] - asked[0] == pytest.approx(TICK, abs=SLACK)
+    assert len(job.starts) >= 3
+    for end, start in zip(job.ends, job.starts[1:]):               # 每轮结束后按 next_time 排下一次
+        assert start - end == pytest.approx(TICK, abs=SLACK)
+    assert asked == sorted(asked)
+    assert sched.status()[0]["mode"] == "calendar"
+    assert added.state.skipped == added.state.missed == 0
+
+
+async def _hangs():
+    await asyncio.sleep(1)
+
+
+async def _raises():
+    raise ValueError("boom")
+
+
+@pytest.mark.parametrize("job, outcome", [(_hangs, "timeout"), (_raises, "error")])
+def test_timeout_and_error_outcomes(sched, job, outcome):
+    added = sched.add("flaky", job, interval=TICK, mode=FIXED_DELAY, timeout=0.05, initial_delay=0)
+    _run_for(sched, 0.3)
+
+    st = added.state
+    assert st.last_outcome == outcome
+    assert st.runs >= 2                                            # 异常 / 超时不影响后续轮次
+    assert not st.running
+    if outcome == "timeout":
+        assert st.last_duration == pytest.approx(0.05, abs=SLACK)
+    with open(sched.state_path, encoding="utf-8") as f:
+        assert json.load(f)["flaky"]["last_outcome"] == outcome
+
+
+def test_persisted_last_started_pushes_first_run_one_interval_out(sched):
+    job = Recorder()
+    sched.add("daily", job, interval=0.3, initial_delay=0)
+    _run_for(sched, 0.05)
+    assert len(job.starts) == 1
+
+    restarted = Scheduler(state_path=sched.state_path)             # 进程重启
+    again = Recorder()
+    restarted.add("daily", again, interval=0.3, initial_delay=0)
+    t0 = time.time()
+    _run_for(restarted, 0.5)
+    assert again.starts[0] - job.starts[0] == pytest.approx(0.3, abs=SLACK)
+    assert again.starts[0] - t0 > 0.15                             # 没有因为重启立即重跑
+
+
+def test_stale_persisted_run_starts_immediately(sched):
+    with open(sched.state_path, "w", encoding="utf-8") as f:
+        json.dump({"daily": {"last_started": time.time() - 10}}, f)
+    job = Recorder()
+    sched.add("daily", job, interval=1.0, initial_delay=5)
+    t0 = time.time()
+    _run_for(sched, 0.1)
+    assert len(job.starts) == 1 and job.starts[0] - t0 < SLACK
+
+
+def test_worker_jobs_are_not_persisted(sched):
+    sched.add("flush", Recorder(), interval=TICK, initial_delay=0, leader_only=False)
+    sched.add("leader_job", Recorder(), interval=TICK, initial_delay=0)
+    _run_for(sched, 0.05)
+    with open(sched.state_path, encoding="utf-8") as f:
+        assert set(json.load(f)) == {"leader_job"}
+
+
+def test_timed_out_thread_blocks_next_run_until_it_finishes(sched):
+    lock = threading.Lock()
+    threads = {"active": 0, "max": 0}
+
+    def slow_sync():
+        with lock:
+            threads["active"] += 1
+            threads["max"] = max(threads["max"], threads["active"])
+        time.sleep(0.4)
+        with lock:
+            threads["active"] -= 1
+
+    async def job():
+        await run_in(MAINTENANCE, slow_sync)
+
+    added = sched.add("sync_job", job, interval=0.15, timeout=0.1, initial_delay=0)
+    running_after_timeout = []
+
+    async def main():
+        sched.start()
+        await asyncio.sleep(0.2)                                   # 已超时，线程还在跑
+        running_after_timeout.append(added.state.running)
+        await asyncio.sleep(0.55)
+        await sched.stop()
+
+    asyncio.run(main())
+    assert threads["max"] == 1                                     # 没有叠加第二轮
+    assert running_after_timeout == [True]
+    assert added.state.last_outcome in ("timeout", "cancelled")
+    assert added.state.skipped >= 2                                # 0.15 / 0.30 两拍被跳过
+    assert added.state.runs >= 1
+    deadline = time.time() + 2
+    while threads["active"] and time.time() < deadline:        # 停掉调度器后线程仍会跑完
+        time.sleep(0.02)
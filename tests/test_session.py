@@ -0,0 +1,125 @@
+"""会话存储：RedisSessionManager（fakeredis）与惰性单例"""
+import time
+
+import fakeredis
+import pytest
+
+from app.core import session as session_mod
+from app.core.session import LazySessionManager, RedisSessionManager, SessionManager
+
+
+class CountingRedis(fakeredis.FakeRedis):
+    """记录 pipeline 调用次数，用来判断读是否走了 LRU"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pipelines = 0
+
+    def pipeline(self, *args, **kwargs):
+        self.pipelines += 1
+        return super().pipeline(*args, **kwargs)
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def _manager(server, **kwargs):
+    client = CountingRedis(server=server, decode_responses=True)
+    return RedisSessionManager(client, **kwargs), client
+
+
+def test_question_cap(server):
+    mgr, _ = _manager(server, max_questions=3)
+    for i in range(5):
+        mgr.update("c1", question=f"q{i}")
+    assert mgr.get("c1")["questions"] == ["q2", "q3", "q4"]
+    # 其他 worker（无 LRU 缓存）读到的也是截断后的列表
+    other, _ = _manager(server, max_questions=3)
+    assert other.get("c1")["questions"] == ["q2", "q3", "q4"]
+
+
+def test_ttl_set_on_both_keys(server):
+    mgr, client = _manager(server, ttl=120)
+    mgr.update("c1", coin_symbol="BTC", question="hi")
+    meta_key, q_key = mgr._keys("c1")
+    assert 0 < client.ttl(meta_key) <= 120
+    assert 0 < client.ttl(q_key) <= 120
+    client.delete(meta_key, q_key)  # 模拟 Redis 过期
+    fresh, _ = _manager(server, ttl=120)
+    assert fresh.get("c1") is None
+
+
+def test_coin_symbol_kept_across_updates(server):
+    mgr, _ = _manager(server)
+    mgr.update("c1", coin_symbol="ETH", question="a")
+    mgr.update("c1", question="b")
+    session = mgr.get("c1")
+    assert session["coin_symbol"] == "ETH"
+    assert session["questions"] == ["a", "b"]
+
+
+def test_lru_read_through(server):
+    mgr, client = _manager(server, lru_ttl=0.2)
+    writer, _ = _manager(server)
+    writer.update("c1", question="first")
+
+    assert mgr.get("c1")["questions"] == ["first"]
+    reads = client.pipelines
+    assert mgr.get("c1")["questions"] == ["first"]
+    assert client.pipelines == reads  # 命中 LRU，不访问 Redis
+
+    writer.update("c1", question="second")
+    assert mgr.get("c1")["questions"] == ["first"]  # lru_ttl 内看不到其他 worker 的写入
+    time.sleep(0.25)
+    assert mgr.get("c1")["questions"] == ["first", "second"]
+    assert client.pipelines == reads + 1
+
+
+def test_lru_write_through_and_copy(server):
+    mgr, client = _manager(server)
+    mgr.update("c1", question="q")
+    reads = client.pipelines
+    session = mgr.get("c1")
+    assert client.pipelines == reads  # 本进程写入直接刷新 LRU
+    session["questions"].append("mutated")
+    assert mgr.get("c1")["questions"] == ["q"]
+
+
+def test_lru_size_bound(server):
+    mgr, _ = _manager(server, lru_size=2)
+    for cid in ("a", "b", "c"):
+        mgr.update(cid, question=cid)
+    assert list(mgr._lru) == ["b", "c"]
+
+
+def test_missing_session_cached_as_none(server):
+    mgr, client = _manager(server)
+    assert mgr.get("nope") is None
+    reads = client.pipelines
+    assert mgr.get("nope") is None
+    assert client.pipelines == reads
+
+
+def test_redis_errors_degrade(server):
+    mgr, client = _manager(server)
+    server.connected = False
+    assert mgr.get("c1") is None
+    mgr.update("c1", question="q")  # 不抛异常
+    server.connected = True
+
+
+def test_lazy_singleton_does_not_connect_on_import():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return SessionManager()
+
+    lazy = LazySessionManager(factory)
+    assert calls == []
+    lazy.update("c1", coin_symbol="BTC", question="q")
+    assert lazy.get("c1")["questions"] == ["q"]
+    assert calls == [1]
+    assert isinstance(session_mod.session_manager, LazySessionManager)
@@ -0,0 +1,108 @@
+"""SessionService write-behind 队列：不在调用线程写库、丢最旧、清除与刷写互斥"""
+import threading
+import time
+
+import pytest
+
+from app.services import session_service as mod
+from app.services.session_service import SessionService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    svc = SessionService()
+    svc.settings = svc.settings.model_copy(update={
+        "session_history_batch_size": 3,
+        "session_history_queue_max": 5,
+    })
+    svc.inserted = []
+    svc.events = []
+    monkeypatch.setattr(svc, "init_storage", lambda: True)
+
+    def insert(rows):
+        svc.events.append(("insert", threading.current_thread().name, [r[2] for r in rows]))
+        svc.inserted.extend(rows)
+
+    def delete(session_id):
+        svc.events.append(("delete", session_id))
+
+    monkeypatch.setattr(svc, "_insert_batch", insert)
+    monkeypatch.setattr(svc, "_delete_from_db", delete)
+    return svc
+
+
+def _wait(cond, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_add_message_never_writes_on_caller_thread(service):
+    caller = threading.current_thread().name
+    for i in range(3):
+        service.add_message("s1", "user", f"m{i}")
+    assert _wait(lambda: service.inserted)
+    names = {e[1] for e in service.events if e[0] == "insert"}
+    assert caller not in names
+    assert all(n.startswith(f"exec-{mod.MAINTENANCE}") for n in names)
+
+
+def test_enqueue_overflow_drops_oldest(service, monkeypatch):
+    monkeypatch.setattr(service, "_schedule_flush", lambda: None)
+    for i in range(7):
+        service.add_message("s1", "user", f"m{i}")
+    assert [p[2] for p in service._pending] == ["m2", "m3", "m4", "m5", "m6"]
+
+
+def test_failed_flush_overflow_drops_oldest(service, monkeypatch):
+    monkeypatch.setattr(service, "_schedule_flush", lambda: None)
+    for i in range(5):
+        service.add_message("s1", "user", f"m{i}")
+
+    def failing_insert(rows):
+        # 写库期间又有新消息入队，放回后超出上限
+        for j in range(2):
+            service.add_message("s1", "user", f"new{j}")
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(service, "_insert_batch", failing_insert)
+    assert service.flush() == 0
+    assert [p[2] for p in service._pending] == ["m2", "m3", "m4", "new0", "new1"]
+
+
+def test_clear_session_waits_for_inflight_batch(service, monkeypatch):
+    monkeypatch.setattr(service, "_schedule_flush", lambda: None)
+    for i in range(2):
+        service.add_message("s1", "user", f"m{i}")
+    started, release = threading.Event(), threading.Event()
+
+    def slow_insert(rows):
+        started.set()
+        release.wait(2)
+        service.events.append(("insert", [r[2] for r in rows]))
+
+    monkeypatch.setattr(service, "_insert_batch", slow_insert)
+    flusher = threading.Thread(target=service.flush)
+    flusher.start()
+    assert started.wait(2)
+    clearer = threading.Thread(target=service.clear_session, args=("s1",))
+    clearer.start()
+    time.sleep(0.1)
+    assert ("delete", "s1") not in service.events  # 批次写完前不删库
+    release.set()
+    flusher.join(2)
+    clearer.join(2)
+    assert [e[0] for e in service.events] == ["insert", "delete"]
+
+
+def test_clear_session_drops_requeued_batch(service, monkeypatch):
+    monkeypatch.setattr(service, "_schedule_flush", lambda: None)
+    service.add_message("s1", "user", "a")
+    service.add_message("s2", "user", "b")
+    monkeypatch.setattr(service, "_insert_batch", lambda rows: (_ for _ in ()).throw(RuntimeError("down")))
+    service.flush()  # 写失败，批次放回队首
+    service.clear_session("s1")
+    assert [p[0] for p in service._pending] == ["s2"]
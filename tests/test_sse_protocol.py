@@ -0,0 +1,141 @@
+"""SSE 编码：orjson / 标准库 dumps 结果一致，RawJSON payload 的 render 与整帧编码一致，
+信号卡事件按 card_version 缓存（命中、字段变化即新版本、LRU 上限）"""
+import dataclasses
+import json
+from datetime import datetime
+
+import pytest
+
+from app.signals import fusion
+from app.signals.models import (
+    MathDerivationSummary, SignalCard, SignalDirection, SignalGrade, SignalSource, StrategyMeta,
+)
+from app.utils import sse_protocol as sp
+from app.utils.metrics import SSE_CARD_ENCODE_TOTAL
+
+BACKTEST = {"win_rate": 0.6, "sample_count": 40, "sharpe_ratio": 1.2}
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+
+
+PAYLOADS = [
+    {"text": "大单净流入 🚀", "n": 3, "f": 0.1, "neg": -2.5e-7, "none": None, "ok": True},
+    {"when": datetime(2026, 3, 10, 12, 0, 5), "items": [1, "二", {"三": 3}]},
+    {1: "int key", "nested": {"list": [[], {}]}},
+    {"big": 2 ** 70},                                   # orjson 不支持，回退标准库
+    {"point": Point(1)},
+]
+
+
+def _card(price=101.5, **overrides) -> SignalCard:
+    fields = dict(
+        coin="BTC", direction=SignalDirection.LONG, grade=SignalGrade.A, current_price=price,
+        entry_low=price * 0.98, entry_high=price * 1.01, stop_loss=price * 0.95, take_profit=price * 1.1,
+        risk_reward_ratio=2.1, confidence=71.5,
+        sources=[SignalSource(name="technical", score=66.6, direction=SignalDirection.LONG, weight=0.3,
+                              detail="突破")],
+        math=MathDerivationSummary(hurst=0.61, monte_carlo_bull_prob=0.6, market_regime="trend",
+                                   key_findings=["发现"]),
+        strategy=StrategyMeta(strategy_version=3, regime="trend", global_win_rate=0.55),
+        win_rate=0.6, sample_count=40, avg_profit_pct=2.3,
+    )
+    fields.update(overrides)
+    return SignalCard(**fields)
+
+
+@pytest.fixture(autouse=True)
+def empty_card_cache():
+    fusion._card_encode_cache.clear()
+    yield
+    fusion._card_encode_cache.clear()
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_orjson_and_stdlib_dumps_agree(payload, monkeypatch):
+    fast = sp.dumps(payload)
+    monkeypatch.setattr(sp, "_orjson", None)
+    slow = sp.dumps(payload)
+    assert json.loads(fast) == json.loads(slow)
+    assert "\\u" not in fast and ", " not in slow       # 不转义非 ASCII，紧凑分隔符
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_render_raw_payload_matches_full_frame(payload):
+    frame = sp.sse_signal_card("req-1", payload)
+    full = sp.render(frame)
+    raw = sp.render(sp.sse_signal_card("req-1", sp.encode_payload(payload)))
+    assert raw["event"] == full["event"] == "delta"
+    assert json.loads(raw["data"]) == json.loads(full["data"])
+    assert json.loads(raw["data"]) == json.loads(json.dumps(frame, ensure_ascii=False, default=str))
+
+
+def test_encode_payload_is_idempotent():
+    encoded = sp.encode_payload({"a": 1})
+    assert sp.encode_payload(encoded) is encoded
+
+
+@pytest.mark.parametrize("tier", ["pro", "free"])
+def test_encoded_card_event_matches_build(tier):
+    card = _card()
+    expected = json.loads(json.dumps(fusion._build_card_event(card, BACKTEST, tier), ensure_ascii=False))
+    assert json.loads(fusion.encode_card_event(card, BACKTEST, tier)) == expected
+
+
+def test_equal_cards_from_different_connections_hit_cache():
+    hits = SSE_CARD_ENCODE_TOTAL.get(result="hit")
+    first = fusion.encode_card_event(_card(), BACKTEST, "pro")
+    second = fusion.encode_card_event(_card(), BACKTEST, "pro")     # 另一个连接各自构建的同内容卡
+    assert second is first
+    assert SSE_CARD_ENCODE_TOTAL.get(result="hit") == hits + 1
+
+
+CHANGES = [
+    dict(price=102.0),
+    dict(confidence=72.0),
+    dict(grade=SignalGrade.B),
+    dict(direction=SignalDirection.SHORT),
+    dict(win_rate=0.61),
+    dict(sample_count=41),
+    dict(avg_profit_pct=2.4),
+    dict(position_pct=6.0),
+    dict(invalidation_price=90.0),
+    dict(sources=[SignalSource(name="technical", score=66.6, direction=SignalDirection.LONG, weight=0.3,
+                               detail="回踩")]),
+    dict(math=MathDerivationSummary(hurst=0.61, monte_carlo_bull_prob=0.6, market_regime="trend",
+                                    key_findings=["发现", "新发现"])),
+    dict(math=MathDerivationSummary(hurst=0.61, monte_carlo_bull_prob=0.6, market_regime="trend",
+                                    key_findings=["发现"], kelly_fraction=0.2)),
+    dict(strategy=StrategyMeta(strategy_version=4, regime="trend", global_win_rate=0.55)),
+]
+
+
+@pytest.mark.parametrize("change", CHANGES, ids=lambda c: next(iter(c)))
+def test_any_rendered_field_change_is_a_new_version(change):
+    """_build_card_event 读取的字段变化都必须换版本，否则会推旧内容"""
+    base = fusion.encode_card_event(_card(), BACKTEST, "pro")
+    changed_card = _card(**change)
+    assert fusion._build_card_event(changed_card, BACKTEST, "pro") != json.loads(base)
+    encoded = fusion.encode_card_event(changed_card, BACKTEST, "pro")
+    assert json.loads(encoded) == json.loads(json.dumps(fusion._build_card_event(changed_card, BACKTEST, "pro")))
+
+
+def test_backtest_and_tier_are_part_of_version():
+    card = _card()
+    versions = {fusion.card_version(card, bt, tier)
+                for bt in (None, BACKTEST, dict(BACKTEST, sharpe_ratio=1.3)) for tier in ("pro", "free")}
+    assert len(versions) == 6
+
+
+def test_cache_is_bounded_lru(monkeypatch):
+    monkeypatch.setattr(fusion, "_CARD_ENCODE_CACHE_SIZE", 3)
+    keep = fusion.encode_card_event(_card(1.0), None, "pro")
+    for price in (2.0, 3.0):
+        fusion.encode_card_event(_card(price), None, "pro")
+    assert fusion.encode_card_event(_card(1.0), None, "pro") is keep    # 命中后移到队尾
+    fusion.encode_card_event(_card(4.0), None, "pro")                    # 挤掉最久未用的 2.0
+    assert len(fusion._card_encode_cache) == 3
+    assert fusion.card_version(_card(2.0), None, "pro") not in fusion._card_encode_cache
+    assert fusion.card_version(_card(1.0), None, "pro") in fusion._card_encode_cache
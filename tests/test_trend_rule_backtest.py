@@ -0,0 +1,70 @@
+"""backtest_trend_momentum_rule / sweep_trend_momentum_rule 与改写前实现的一致性"""
+import random
+
+import pytest
+
+from app.skills.analysis_skills.quantitative import (
+    backtest_trend_momentum_rule, sweep_trend_momentum_rule,
+)
+from tests.legacy.trend_rule import backtest_trend_momentum_rule_legacy
+
+PARAMS = [
+    {},
+    {"fast": 5, "slow": 20, "rsi_period": 7, "rsi_buy": 55, "rsi_sell": 45, "horizon": 3},
+    {"fast": 9, "slow": 21, "rsi_period": 14, "rsi_buy": 40, "rsi_sell": 60, "horizon": 10, "fee_pct": 0.1},
+]
+
+
+def random_series(rng: random.Random, n: int):
+    price = rng.uniform(0.01, 50000)
+    vol = rng.uniform(0.005, 0.06)
+    drift = rng.uniform(-0.002, 0.002)
+    out = []
+    for _ in range(n):
+        price *= 1 + rng.gauss(drift, vol)
+        price = max(price, 1e-6)
+        out.append(price)
+    if rng.random() < 0.2:
+        # 平台段：EMA 相等、RSI 分母为 0 的边界
+        k = rng.randrange(len(out))
+        out[k:k + 15] = [out[k]] * len(out[k:k + 15])
+    return out
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_parity_with_legacy_on_random_series(seed):
+    rng = random.Random(seed)
+    closes = random_series(rng, rng.randint(20, 400))
+    for params in PARAMS:
+        assert backtest_trend_momentum_rule(closes, **params) == \
+            backtest_trend_momentum_rule_legacy(closes, **params), params
+
+
+def test_sweep_rows_match_single_runs():
+    closes = random_series(random.Random(7), 500)
+    grid = {"fast": [5, 12], "slow": [26], "rsi_buy": [45, 55], "horizon": [3, 5]}
+    rows = sweep_trend_momentum_rule(closes, grid, min_trades=0)
+    assert len(rows) == 8
+    for row in rows:
+        params = {k: row[k] for k in ("fast", "slow", "rsi_period", "rsi_buy", "rsi_sell", "horizon", "fee_pct")}
+        expected = backtest_trend_momentum_rule_legacy(closes, **params)
+        assert {k: row[k] for k in expected} == expected
+    assert [r["rank"] for r in rows] == list(range(1, 9))
+    assert [r["avg_pnl_pct"] for r in rows] == sorted((r["avg_pnl_pct"] for r in rows), reverse=True)
+
+
+def test_sweep_rejects_unknown_params():
+    with pytest.raises(ValueError):
+        sweep_trend_momentum_rule([1.0] * 100, {"bogus": [1]})
+
+
+def test_atr_stop_only_changes_exits():
+    rng = random.Random(3)
+    closes = random_series(rng, 400)
+    highs = [c * 1.01 for c in closes]
+    lows = [c * 0.99 for c in closes]
+    plain = backtest_trend_momentum_rule(closes)
+    stopped = backtest_trend_momentum_rule(closes, stop_atr_mult=1.0, highs=highs, lows=lows)
+    assert stopped["trades"] == plain["trades"]
+    assert stopped["long_trades"] == plain["long_trades"]
+    assert 0 < stopped["stop_exits"] <= stopped["trades"]
@@ -0,0 +1,155 @@
+"""胜率日聚合：经 _update_status_direct 结算后 summarize 与原始 GROUP BY 一致（含窗口起始那一天的
+不完整部分）、check_consistency 能发现被改坏的聚合行、同一张卡结算两次只计一次"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.signals import settlement, winrate_agg
+from tests import sqlite_mysql
+
+NOW = datetime(2026, 3, 10, 15, 30, 0)      # 下午：窗口起始那一天只有一部分在窗口内
+
+SCHEMA = """
+CREATE TABLE signal_card_history (
+    id INTEGER PRIMARY KEY,
+    coin TEXT, direction TEXT, grade TEXT,
+    current_price REAL, stop_loss REAL, take_profit REAL,
+    status TEXT, settled_price REAL, pnl_pct REAL,
+    created_at TIMESTAMP, settled_at TIMESTAMP
+);
+"""
+
+GROUPINGS = [(), ("coin",), ("grade",), ("direction",), ("coin", "direction"), ("coin", "grade", "direction")]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    conn = sqlite_mysql.connect(SCHEMA, NOW)
+    monkeypatch.setattr(winrate_agg, "_table_ready", False)
+    return conn
+
+
+def _insert_pending(conn, rows):
+    conn.raw.executemany(
+        "INSERT INTO signal_card_history (coin, direction, grade, current_price, stop_loss, take_profit, "
+        "status, created_at) VALUES (?, ?, ?, 100, 95, 110, 'pending', ?)", rows)
+    conn.raw.commit()
+    return [r[0] for r in conn.raw.execute("SELECT id FROM signal_card_history WHERE status = 'pending' ORDER BY id")]
+
+
+def _settle_fixture(conn, n=400, seed=36):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        age = timedelta(seconds=rng.randint(0, 40 * 86400))
+        rows.append((rng.choice(["BTC", "eth", "SOL", "DOGE"]), rng.choice(["long", "short"]),
+                     rng.choice("SAB"), NOW - age))
+    # 窗口起始那一天（7 天 / 30 天）：截止时刻前后各几张
+    for days in (7, 30):
+        for minutes in (-90, -1, 0, 1, 90):
+            rows.append(("BTC", "long", "A", NOW - timedelta(days=days) + timedelta(minutes=minutes)))
+    ids = _insert_pending(conn, rows)
+    for card_id in ids:
+        if rng.random() < 0.1:
+            continue                                              # 仍 pending，不计入
+        status = rng.choice(["hit_tp", "hit_sl", "expired"])
+        pnl = None if rng.random() < 0.05 else round(rng.uniform(-6, 6), 4)
+        settlement._update_status_direct(conn, card_id, status, 100.0, pnl)
+
+
+def _raw_summary(conn, days, group_by, coin=None, grade=None, direction=None):
+    """原始重算：created_at >= NOW - days 的已结算卡直接 GROUP BY"""
+    cutoff = NOW - timedelta(days=days)
+    rows = conn.raw.execute(
+        "SELECT UPPER(coin), grade, direction, status, pnl_pct, created_at FROM signal_card_history "
+        "WHERE status IN ('hit_tp', 'hit_sl', 'expired')").fetchall()
+    out = {}
+    for c, g, d, status, pnl, created_at in rows:
+        if created_at < cutoff or (coin and c != coin.upper()) or (grade and g != grade) or (direction and d != direction):
+            continue
+        key = tuple({"coin": c, "grade": g, "direction": d}[f] for f in group_by)
+        item = out.setdefault(key, dict.fromkeys(winrate_agg._SUM_FIELDS, 0))
+        item["n_total"] += 1
+        item["n_hit_tp"] += status == "hit_tp"
+        item["n_hit_sl"] += status == "hit_sl"
+        item["n_expired"] += status == "expired"
+        item["n_expired_win"] += status == "expired" and pnl is not None and pnl > 0
+        item["pnl_sum"] += pnl or 0
+        item["pnl_count"] += pnl is not None
+    return out
+
+
+def _by_key(rows, group_by):
+    return {tuple(r[f] for f in group_by): {f: r[f] for f in winrate_agg._SUM_FIELDS} for r in rows}
+
+
+def _assert_same(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, item in expected.items():
+        got = actual[key]
+        assert got["pnl_sum"] == pytest.approx(item["pnl_sum"]), key
+        assert {f: got[f] for f in got if f != "pnl_sum"} == {f: item[f] for f in item if f != "pnl_sum"}, key
+
+
+@pytest.mark.parametrize("days", [1, 7, 30, 60])
+@pytest.mark.parametrize("group_by", GROUPINGS)
+def test_summarize_matches_raw_group_by(db, days, group_by):
+    _settle_fixture(db)
+    rows = winrate_agg.summarize(db, days, group_by=group_by)
+    _assert_same(_by_key(rows, group_by), _raw_summary(db, days, group_by))
+
+
+@pytest.mark.parametrize("filters", [dict(coin="btc"), dict(grade="A"), dict(direction="short"),
+                                     dict(coin="ETH", grade="S", direction="long")])
+def test_summarize_filters_match_raw(db, filters):
+    _settle_fixture(db)
+    rows = winrate_agg.summarize(db, 30, group_by=("coin", "direction"), **filters)
+    _assert_same(_by_key(rows, ("coin", "direction")), _raw_summary(db, 30, ("coin", "direction"), **filters))
+
+
+def test_partial_start_day_needs_raw_branch(db):
+    """起始那一天截止时刻之前的卡在聚合行里但不在窗口内：只能从原始行分支取截止时刻之后的部分"""
+    _settle_fixture(db)
+    cutoff = NOW - timedelta(days=7)
+    start_day = cutoff.date().isoformat()
+    created = [c for (c,) in db.raw.execute(
+        "SELECT created_at FROM signal_card_history WHERE status != 'pending' AND DATE(created_at) = ?", (start_day,))]
+    assert any(c < cutoff for c in created) and any(c >= cutoff for c in created)
+    agg = db.raw.execute(f"SELECT SUM(n_total) FROM {winrate_agg.TABLE} WHERE day = ?", (start_day,)).fetchone()[0]
+    assert agg == len(created)                                    # 聚合行含整天，不能直接用
+
+    later = db.raw.execute(f"SELECT SUM(n_total) FROM {winrate_agg.TABLE} WHERE day > ?", (start_day,)).fetchone()[0]
+    [row] = winrate_agg.summarize(db, 7)
+    assert row["n_total"] == later + sum(c >= cutoff for c in created) == _raw_summary(db, 7, ())[()]["n_total"]
+
+
+def test_check_consistency_catches_corrupted_row(db):
+    _settle_fixture(db)
+    assert winrate_agg.check_consistency(db, 45)["mismatches"] == []
+
+    day, coin, grade, direction = db.raw.execute(
+        f"SELECT day, coin, grade, direction FROM {winrate_agg.TABLE} ORDER BY day DESC LIMIT 1").fetchone()
+    db.raw.execute(f"UPDATE {winrate_agg.TABLE} SET n_hit_tp = n_hit_tp + 1 "
+                   "WHERE day = ? AND coin = ? AND grade = ? AND direction = ?", (day, coin, grade, direction))
+    db.raw.commit()
+    report = winrate_agg.check_consistency(db, 45)
+    assert len(report["mismatches"]) == 1
+    mismatch = report["mismatches"][0]
+    assert mismatch["key"] == {"day": str(day), "coin": coin, "grade": grade, "direction": direction}
+    assert mismatch["aggregate"]["n_hit_tp"] == mismatch["raw"]["n_hit_tp"] + 1
+
+    winrate_agg.rebuild(db, 45)
+    assert winrate_agg.check_consistency(db, 45)["mismatches"] == []
+
+
+def test_settling_same_card_twice_counts_once(db):
+    [card_id] = _insert_pending(db, [("BTC", "long", "A", NOW - timedelta(hours=30))])
+    settlement._update_status_direct(db, card_id, "hit_tp", 110.0, 10.0)
+    settlement._update_status_direct(db, card_id, "hit_sl", 95.0, -5.0)      # 另一个进程稍后也判定了同一张
+
+    status, pnl = db.raw.execute("SELECT status, pnl_pct FROM signal_card_history WHERE id = ?", (card_id,)).fetchone()
+    assert (status, pnl) == ("hit_tp", 10.0)
+    [row] = winrate_agg.summarize(db, 7)
+    assert row["n_total"] == 1 and row["n_hit_tp"] == 1 and row["n_hit_sl"] == 0
+    assert winrate_agg.check_consistency(db, 7)["mismatches"] == []
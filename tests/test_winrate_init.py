@@ -0,0 +1,188 @@
+"""signal_winrate_daily 首次建表回填：并发首次调用只回填一次，跨进程靠 GET_LOCK 串行"""
+import importlib.util
+import threading
+import time
+
+import pytest
+
+from tests.conftest import ROOT
+
+SETTLED_ROWS = 7
+
+
+class FakeServer:
+    """极简 MySQL：只认建表回填用到的几条语句。回填按 ON DUPLICATE 累加，重复回填会翻倍"""
+
+    def __init__(self, show_delay=0.05):
+        self.show_delay = show_delay
+        self.tables = set()
+        self.agg_total = 0
+        self.backfills = 0
+        self.locks = {}
+        self.guard = threading.Lock()
+        self.statements = []
+
+    def lock(self, name):
+        with self.guard:
+            return self.locks.setdefault(name, threading.Lock())
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.server = conn.server
+        self._result = None
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        server = self.server
+        text = " ".join(sql.split())
+        server.statements.append((self.conn.name, text.split(" (")[0][:40]))
+        if text.startswith("SELECT GET_LOCK"):
+            ok = server.lock(params[0]).acquire(timeout=params[1])
+            self._result = (1 if ok else 0,)
+        elif text.startswith("SELECT RELEASE_LOCK"):
+            server.lock(params[0]).release()
+            self._result = (1,)
+        elif text.startswith("SHOW TABLES"):
+            exists = "signal_winrate_daily" in server.tables
+            time.sleep(server.show_delay)     # 放大检查与建表之间的竞争窗口
+            self._result = ("signal_winrate_daily",) if exists else None
+        elif text.startswith("CREATE TABLE"):
+            server.tables.add("signal_winrate_daily")
+        elif text.startswith("DELETE FROM signal_winrate_daily"):
+            server.agg_total = 0
+        elif text.startswith("INSERT INTO signal_winrate_daily"):
+            server.agg_total += SETTLED_ROWS
+            server.backfills += 1
+            self.rowcount = SETTLED_ROWS
+        else:
+            raise AssertionError(f"unexpected SQL: {text[:60]}")
+
+    def fetchone(self):
+        return self._result
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, server, name="conn"):
+        self.server = server
+        self.name = name
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def _load(path, name):
+    """按文件路径另载一份模块，模拟独立进程（各自的 _table_ready / 进程内锁）"""
+    spec = importlib.util.spec_from_file_location(name, ROOT / path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+TARGETS = {
+    "winrate_agg": ("app/signals/winrate_agg.py", "ensure_table"),
+    "data_proxy": ("deploy/data_proxy.py", "_ensure_winrate_table"),
+}
+
+
+def _run_concurrently(funcs):
+    errors = []
+    barrier = threading.Barrier(len(funcs))
+
+    def worker(fn):
+        barrier.wait()
+        try:
+            fn()
+        except Exception as e:   # pragma: no cover - 失败时带回主线程
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(fn,)) for fn in funcs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    assert not errors
+
+
+@pytest.mark.parametrize("target", sorted(TARGETS))
+def test_concurrent_first_calls_in_one_process_backfill_once(target):
+    path, func = TARGETS[target]
+    module = _load(path, f"_wr_{target}_single")
+    server = FakeServer()
+    ensure = getattr(module, func)
+
+    _run_concurrently([lambda i=i: ensure(FakeConn(server, f"t{i}")) for i in range(8)])
+
+    assert server.backfills == 1
+    assert server.agg_total == SETTLED_ROWS
+
+
+@pytest.mark.parametrize("target", sorted(TARGETS))
+def test_concurrent_first_calls_across_processes_backfill_once(target):
+    path, func = TARGETS[target]
+    server = FakeServer()
+    processes = [getattr(_load(path, f"_wr_{target}_proc{i}"), func) for i in range(4)]
+
+    _run_concurrently([lambda fn=fn, i=i: fn(FakeConn(server, f"p{i}")) for i, fn in enumerate(processes)])
+
+    assert server.backfills == 1
+    assert server.agg_total == SETTLED_ROWS
+    assert not server.lock("signal_winrate_daily_init").locked()
+
+
+def test_main_service_and_proxy_share_lock_name():
+    agg = _load("app/signals/winrate_agg.py", "_wr_lockname_agg")
+    proxy = _load("deploy/data_proxy.py", "_wr_lockname_proxy")
+    assert agg.INIT_LOCK_NAME == proxy._WINRATE_INIT_LOCK
+
+
+@pytest.mark.parametrize("target", sorted(TARGETS))
+def test_backfill_deletes_before_insert_inside_lock(target):
+    path, func = TARGETS[target]
+    module = _load(path, f"_wr_{target}_order")
+    server = FakeServer(show_delay=0)
+    server.agg_total = 3   # 残留的半截回填
+    getattr(module, func)(FakeConn(server))
+
+    kinds = [stmt.split(" ")[0] + " " + stmt.split(" ")[1] for _, stmt in server.statements]
+    assert kinds == [
+        "SELECT GET_LOCK(%s,", "SHOW TABLES", "CREATE TABLE", "DELETE FROM",
+        "INSERT INTO", "SELECT RELEASE_LOCK(%s)",
+    ]
+    assert server.agg_total == SETTLED_ROWS
+
+
+@pytest.mark.parametrize("target", sorted(TARGETS))
+def test_lock_timeout_raises_and_retries_later(target):
+    path, func = TARGETS[target]
+    module = _load(path, f"_wr_{target}_timeout")
+    server = FakeServer(show_delay=0)
+    ensure = getattr(module, func)
+    held = server.lock("signal_winrate_daily_init")
+    held.acquire()
+
+    class QuickTimeout(FakeCursor):
+        def execute(self, sql, params=None):
+            if sql.startswith("SELECT GET_LOCK"):
+                params = (params[0], 0.01)
+            return super().execute(sql, params)
+
+    conn = FakeConn(server)
+    conn.cursor = lambda: QuickTimeout(conn)
+    with pytest.raises(RuntimeError):
+        ensure(conn)
+    assert server.backfills == 0
+
+    held.release()
+    ensure(conn)
+    assert server.backfills == 1